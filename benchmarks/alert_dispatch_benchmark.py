@@ -0,0 +1,94 @@
+"""Alert dispatch throughput benchmark against a local SMTP sink and a fake Slack API.
+
+Simulates an outage where `--services` deployments each report `--samples`
+unhealthy checks. Reports caller-side latency of check_deployment_health, the
+time until every alert has been delivered, and how many Slack calls and SMTP
+connections were made. With --baseline, the same alerts are also sent
+synchronously with send_slack_alert/send_email_alert, one SMTP connection each.
+
+Usage:
+    python benchmarks/alert_dispatch_benchmark.py [--services 50] [--samples 5]
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from slack_sdk import WebClient
+
+import notification.alert_manager as alert_manager
+from benchmarks.fakes import FakeSlack, StubHTTPServer, StubSMTPServer, percentile
+
+def run_dispatcher(services, samples, slack_url, smtp_port, batch_window):
+    dispatcher = alert_manager.AlertDispatcher(
+        batch_window=batch_window, slack_client=WebClient(base_url=slack_url),
+        smtp_server="127.0.0.1", smtp_port=smtp_port, use_tls=False,
+    )
+    alert_manager._dispatcher = dispatcher
+
+    caller_latencies = []
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(samples):
+            for i in range(services):
+                call_start = time.perf_counter()
+                alert_manager.check_deployment_health(0, f"service-{i}")
+                caller_latencies.append(time.perf_counter() - call_start)
+        dispatcher.flush()
+    total = time.perf_counter() - start
+    dispatcher.stop()
+    return caller_latencies, total, dispatcher.stats
+
+def run_baseline(services, samples, slack_url, smtp_port):
+    alert_manager._slack_client = WebClient(base_url=slack_url)
+    alert_manager.SMTP_SERVER, alert_manager.SMTP_PORT, alert_manager.SMTP_USE_TLS = "127.0.0.1", smtp_port, False
+
+    caller_latencies = []
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(samples):
+            for i in range(services):
+                call_start = time.perf_counter()
+                message = f"ALERT: Deployment 'service-{i}' is unhealthy!"
+                alert_manager.send_slack_alert(message)
+                alert_manager.send_email_alert("Deployment Health Alert", message, "admin@example.com")
+                caller_latencies.append(time.perf_counter() - call_start)
+    return caller_latencies, time.perf_counter() - start
+
+def print_latencies(label, latencies):
+    print(f"{label} caller latency p50: {statistics.median(latencies) * 1e6:.0f} us, "
+          f"p99: {percentile(latencies, 0.99) * 1e6:.0f} us")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the background alert dispatcher")
+    parser.add_argument("--services", type=int, default=50, help="Number of unhealthy deployments")
+    parser.add_argument("--samples", type=int, default=5, help="Unhealthy samples per deployment")
+    parser.add_argument("--batch-window", type=float, default=0.5, help="Dispatcher batch window in seconds")
+    parser.add_argument("--slack-latency", type=float, default=0.05, help="Fake Slack response latency in seconds")
+    parser.add_argument("--smtp-latency", type=float, default=0.01, help="SMTP sink per-message latency in seconds")
+    parser.add_argument("--rate-limit-every", type=int, default=20, help="Rate-limit every Nth Slack call (0 disables)")
+    parser.add_argument("--baseline", action="store_true", help="Also run the synchronous send path")
+    args = parser.parse_args()
+
+    fake_slack = FakeSlack(latency=args.slack_latency, rate_limit_every=args.rate_limit_every)
+    with StubHTTPServer(routes=fake_slack.routes) as slack_server, StubSMTPServer(latency=args.smtp_latency) as smtp_server:
+        slack_url = f"{slack_server.url}/api/"
+        latencies, total, stats = run_dispatcher(args.services, args.samples, slack_url, smtp_server.port, args.batch_window)
+        alerts = args.services * args.samples
+        print(f"Dispatcher: {alerts} unhealthy samples delivered in {total:.2f} s ({alerts / total:.0f} samples per second)")
+        print_latencies("Dispatcher", latencies)
+        print(f"Dispatcher: {stats['slack_sent']} Slack messages ({stats['slack_retries']} rate-limit retries), "
+              f"{stats['email_sent']} emails over {stats['smtp_connections']} SMTP connection(s), "
+              f"{stats['suppressed']} repeats suppressed")
+
+        if args.baseline:
+            connections_before = smtp_server.connections
+            latencies, total = run_baseline(args.services, args.samples, slack_url, smtp_server.port)
+            print(f"Baseline: {alerts} unhealthy samples delivered in {total:.2f} s ({alerts / total:.0f} samples per second)")
+            print_latencies("Baseline", latencies)
+            print(f"Baseline: {smtp_server.connections - connections_before} SMTP connections")
@@ -0,0 +1,170 @@
+"""Multi-account, multi-region ECS status checks through the shared AWS client pool, with botocore Stubber.
+
+Writes a targets file with `--accounts` accounts (each reached by assuming a
+role) and `--regions` regions, stubs STS and every (account, region) ECS
+client with botocore's Stubber, and delays each DescribeServices call by
+`--latency` seconds to stand in for the network. Compares checking
+`--services` services one target after another with
+cloud_manager.get_fleet_services_status(), which fans out across all targets,
+and checks that:
+
+- every target's services are reported, with one failing region isolated
+- each account assumed its role once and refreshed it inside the expiry window
+- clients were created once per (account, region, service) and then reused
+- clients use the tuned connection pool and adaptive retries
+
+Exits with status 1 if any check fails.
+
+Usage:
+    python benchmarks/aws_fanout_benchmark.py [--accounts 3] [--regions 6] [--services 40]
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml
+from botocore.stub import Stubber
+
+import cloud.aws_clients as aws_clients
+import cloud.cloud_manager as cloud_manager
+
+REGIONS = ("us-east-1", "us-west-2", "eu-west-1", "eu-central-1", "ap-southeast-1", "ap-northeast-1",
+           "sa-east-1", "ca-central-1")
+CLUSTER = "production"
+
+def assume_role_response(account_id, expires_in):
+    expiration = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=expires_in)
+    return {
+        "Credentials": {"AccessKeyId": f"ASIA{account_id}{int(expires_in):06d}", "SecretAccessKey": "secret",
+                        "SessionToken": "token", "Expiration": expiration},
+        "AssumedRoleUser": {"AssumedRoleId": f"AROA{account_id}:devops-toolkit",
+                            "Arn": f"arn:aws:sts::{account_id}:assumed-role/deploy/devops-toolkit"},
+    }
+
+def describe_response(region, service_names):
+    return {"services": [{"serviceName": name, "status": "ACTIVE", "clusterArn": f"arn:aws:ecs:{region}:1:cluster/{CLUSTER}"}
+                         for name in service_names], "failures": []}
+
+def stub_ecs(targets, service_names, runs, broken, latency):
+    """Stub DescribeServices for every target, `runs` times over; the `broken` target fails every time."""
+    stubbers = []
+    for account, region in targets:
+        ecs_client = aws_clients.get_client("ecs", region, account)
+        ecs_client.meta.events.register("before-parameter-build.ecs.DescribeServices", lambda **kwargs: time.sleep(latency))
+        stubber = Stubber(ecs_client)
+        for _ in range(runs):
+            if (account, region) == broken:
+                stubber.add_client_error("describe_services", service_error_code="ClusterNotFoundException",
+                                         service_message="Cluster not found.")
+                continue
+            for i in range(0, len(service_names), cloud_manager.ECS_DESCRIBE_BATCH):
+                stubber.add_response("describe_services",
+                                     describe_response(region, service_names[i:i + cloud_manager.ECS_DESCRIBE_BATCH]))
+        stubber.activate()
+        stubbers.append(stubber)
+    return stubbers
+
+def no_pending_responses(stubber):
+    try:
+        stubber.assert_no_pending_responses()
+    except AssertionError:
+        return False
+    return True
+
+def serial_status(targets, service_names):
+    # Previous approach: one target at a time, as re-running the command per region and account did
+    statuses = {}
+    for account, region in targets:
+        try:
+            for name, service in cloud_manager.describe_aws_services(CLUSTER, service_names, region, account).items():
+                statuses[(account, region, name)] = service["status"]
+        except Exception as e:
+            print(f"Error in {account}/{region}: {e}")
+    return statuses
+
+def timed(function):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function()
+    return result, time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark multi-account, multi-region ECS status fan-out")
+    parser.add_argument("--accounts", type=int, default=3, help="Accounts, each reached by assuming a role")
+    parser.add_argument("--regions", type=int, default=6, help=f"Regions per account (at most {len(REGIONS)})")
+    parser.add_argument("--services", type=int, default=40, help="ECS services checked per target")
+    parser.add_argument("--latency", type=float, default=0.05, help="Delay per DescribeServices call in seconds")
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+
+    account_ids = {f"account-{i}": f"{111111111111 * (i + 1) % 10 ** 12:012d}" for i in range(args.accounts)}
+    regions = REGIONS[:args.regions]
+    service_names = [f"service-{i}" for i in range(args.services)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        targets_file = os.path.join(directory, "aws.yml")
+        with open(targets_file, "w") as spec:
+            yaml.safe_dump({"regions": list(regions), "accounts": [
+                {"name": name, "role_arn": f"arn:aws:iam::{account_id}:role/deploy"} for name, account_id in account_ids.items()
+            ]}, spec)
+        aws_clients.reset()
+        aws_clients.AWS_TARGETS_FILE = targets_file
+        targets = aws_clients.get_targets()
+
+        # First credentials expire inside botocore's 15 minute refresh window, the refreshed ones in an hour
+        sts_stubber = Stubber(aws_clients.get_client("sts"))
+        for expires_in in (720, 3600):
+            for account_id in account_ids.values():
+                sts_stubber.add_response("assume_role", assume_role_response(account_id, expires_in))
+        sts_stubber.activate()
+
+        broken = targets[-1]
+        stub_ecs(targets, service_names, 2, broken, args.latency)
+        clients_after_setup = len(aws_clients._clients)
+
+        print(f"Targets: {len(account_ids)} accounts x {len(regions)} regions, {args.services} services each, "
+              f"DescribeServices latency {args.latency * 1000:.0f} ms")
+        serial, serial_time = timed(lambda: serial_status(targets, service_names))
+        print(f"{'serial':<8} wall time: {serial_time:>6.2f} s   statuses: {len(serial)}")
+        fanned, fan_time = timed(lambda: cloud_manager.get_fleet_services_status(CLUSTER, service_names))
+        print(f"{'fan-out':<8} wall time: {fan_time:>6.2f} s   statuses: {len(fanned)}   "
+              f"speedup: {serial_time / fan_time:.1f}x")
+
+        # Resolving credentials assumes each role; the second read finds them close to expiry and refreshes
+        first = {name: aws_clients.get_session(name).get_credentials().get_frozen_credentials().access_key
+                 for name in account_ids}
+        second = {name: aws_clients.get_session(name).get_credentials().get_frozen_credentials().access_key
+                  for name in account_ids}
+        third = {name: aws_clients.get_session(name).get_credentials().get_frozen_credentials().access_key
+                 for name in account_ids}
+
+        ecs_config = aws_clients.get_client("ecs", regions[0], "account-0").meta.config
+        expected = {(account, region, name) for account, region in targets if (account, region) != broken
+                    for name in service_names}
+        checks = [
+            ("fan-out reports every healthy target's services", set(fanned) == expected),
+            ("fan-out agrees with the serial checks", fanned == serial),
+            ("failing target isolated", not any(key[:2] == broken for key in fanned)),
+            ("each account assumed its role, then refreshed it before expiry",
+             all(first[name] != second[name] for name in account_ids) and no_pending_responses(sts_stubber)),
+            ("refreshed credentials reused", second == third),
+            ("one client per (account, region, service)", len(aws_clients._clients) == clients_after_setup),
+            ("tuned connection pool and adaptive retries",
+             ecs_config.max_pool_connections == aws_clients.AWS_MAX_POOL_CONNECTIONS
+             and ecs_config.retries.get("mode") == "adaptive"),
+        ]
+        failed = 0
+        for label, passed in checks:
+            print(f"{'PASS' if passed else 'FAIL'}  {label}")
+            failed += not passed
+        sys.exit(1 if failed else 0)
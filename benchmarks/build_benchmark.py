@@ -0,0 +1,70 @@
+"""Build orchestration benchmark against a fake docker client.
+
+Generates build contexts for a release of `--services` images in three tiers
+(a base image, a few runtime images built FROM it, and services built FROM
+the runtimes), then reports total wall time for serial builds (one worker),
+parallel builds and a second, unchanged parallel run that skips every image.
+
+Usage:
+    python benchmarks/build_benchmark.py [--services 40] [--workers 8] [--build-time 0.5]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docker_dep.docker_manager as docker_manager
+from benchmarks.fakes import FakeDockerClient
+
+def write_context(root, name, base):
+    context = os.path.join(root, name)
+    os.makedirs(context)
+    with open(os.path.join(context, "Dockerfile"), "w") as dockerfile:
+        dockerfile.write(f"FROM {base}\nCOPY . /app\n")
+    with open(os.path.join(context, "app.py"), "w") as source:
+        source.write(f"print('{name}')\n")
+    return {"name": f"registry.local/{name}", "context": context}
+
+def make_release(root, services, runtimes=4):
+    builds = [write_context(root, "base", "python:3.11-slim")]
+    for i in range(runtimes):
+        builds.append(write_context(root, f"runtime-{i}", "registry.local/base"))
+    for i in range(services - runtimes - 1):
+        builds.append(write_context(root, f"service-{i}", f"registry.local/runtime-{i % runtimes}"))
+    return builds
+
+def timed_build(builds, workers):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = docker_manager.build_images(builds, max_workers=workers, on_log=lambda name, line: None)
+    statuses = {}
+    for result in results.values():
+        statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    return time.perf_counter() - start, statuses
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parallel, cache-aware image builds")
+    parser.add_argument("--services", type=int, default=40, help="Number of images in the release")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent builds")
+    parser.add_argument("--build-time", type=float, default=0.5, help="Fake build duration per image in seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        builds = make_release(root, args.services)
+        print(f"Images: {len(builds)}, fake build time: {args.build_time:.2f} s, workers: {args.workers}")
+
+        docker_manager._client = FakeDockerClient(build_time=args.build_time)
+        serial, statuses = timed_build(builds, 1)
+        print(f"serial          wall time: {serial:>7.2f} s   {statuses}")
+
+        docker_manager._client = FakeDockerClient(build_time=args.build_time)
+        parallel, statuses = timed_build(builds, args.workers)
+        print(f"parallel        wall time: {parallel:>7.2f} s   {statuses}   speedup: {serial / parallel:.1f}x")
+
+        unchanged, statuses = timed_build(builds, args.workers)
+        print(f"unchanged rerun wall time: {unchanged:>7.2f} s   {statuses}")
@@ -0,0 +1,79 @@
+"""Bulk container teardown benchmark against a fake docker client.
+
+Starts `--containers` labelled CI containers (a `--stubborn` fraction of them
+ignore SIGTERM and are only killed at the end of the grace period) next to
+unrelated containers that must survive, then tears the CI containers down:
+
+- serial: stop_container() and remove_container() one name at a time
+- bulk remove: remove_containers() by label with the default 10 s grace
+- bulk remove 2s: the same with a 2 s grace period
+- stop + prune: stop_containers() with a 2 s grace, then one prune_containers() call
+
+Stop times, grace periods and daemon latency are slept at `--time-scale` of
+their real length; the "real" column scales the wall time back up.
+
+Usage:
+    python benchmarks/container_teardown_benchmark.py [--containers 200] [--workers 16]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docker_dep.docker_manager as docker_manager
+from benchmarks.fakes import FakeDockerClient
+
+LABELS = {"ci-run": "1234"}
+
+def make_fleet(containers, stubborn, bystanders, latency, time_scale):
+    docker_client = FakeDockerClient(latency=latency * time_scale, time_scale=time_scale)
+    stubborn_every = round(1 / stubborn) if stubborn else 0
+    for i in range(containers):
+        ignores_sigterm = stubborn_every and i % stubborn_every == 0
+        docker_client.containers.add(f"ci-1234-{i}", labels=dict(LABELS), stop_time=None if ignores_sigterm else 0.5)
+    for i in range(bystanders):
+        docker_client.containers.add(f"db-{i}", labels={"team": "data"}, stop_time=0.5)
+    return docker_client
+
+def serial_teardown(names):
+    for name in names:
+        docker_manager.stop_container(name)
+        docker_manager.remove_container(name)
+
+def measure(label, teardown, args):
+    docker_manager._client = make_fleet(args.containers, args.stubborn, args.bystanders, args.latency, args.time_scale)
+    names = [name for name in docker_manager._client.containers.containers if name.startswith("ci-")]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        teardown(names)
+    elapsed = time.perf_counter() - start
+    remaining = docker_manager._client.containers.containers
+    assert not any(name.startswith("ci-") for name in remaining), "CI containers left behind"
+    assert sum(1 for name in remaining if name.startswith("db-")) == args.bystanders, "unrelated containers removed"
+    print(f"{label:<16} wall time: {elapsed:>6.2f} s   real: {elapsed / args.time_scale:>8.0f} s   "
+          f"daemon calls: {docker_manager._client.total_calls:>5}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bulk container teardown")
+    parser.add_argument("--containers", type=int, default=200, help="CI containers to tear down")
+    parser.add_argument("--bystanders", type=int, default=50, help="Unrelated containers that must survive")
+    parser.add_argument("--stubborn", type=float, default=0.2, help="Fraction of containers that ignore SIGTERM")
+    parser.add_argument("--workers", type=int, default=docker_manager.CONTAINER_WORKERS, help="Concurrent operations")
+    parser.add_argument("--latency", type=float, default=0.02, help="Daemon latency per call in real seconds")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="Fraction of real time actually slept")
+    args = parser.parse_args()
+
+    print(f"Containers: {args.containers} ({args.stubborn:.0%} ignore SIGTERM) plus {args.bystanders} bystanders, "
+          f"workers: {args.workers}")
+    measure("serial", serial_teardown, args)
+    measure("bulk remove", lambda names: docker_manager.remove_containers(
+        labels=LABELS, max_workers=args.workers), args)
+    measure("bulk remove 2s", lambda names: docker_manager.remove_containers(
+        labels=LABELS, timeout=2, max_workers=args.workers), args)
+    measure("stop + prune", lambda names: (
+        docker_manager.stop_containers(labels=LABELS, timeout=2, max_workers=args.workers),
+        docker_manager.prune_containers(labels=LABELS)), args)
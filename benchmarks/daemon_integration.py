@@ -0,0 +1,158 @@
+"""End-to-end run of the daemon against local stand-ins for everything it talks to.
+
+Starts stub HTTP health targets (one of them down), a fake Prometheus, a fake
+Kubernetes API, a local SMTP sink and a fake Slack API, then runs
+orchestration.daemon.serve() with short intervals for `--duration` seconds and
+stops it the way SIGTERM would. The run is stretched to minimum_alert_duration() when
+it would be too short for the fastest BURN_RATE_ALERTS rule to see enough checks
+of the down target to page. Checks that:
+
+- every target's health history landed in the metric store
+- deployments with high CPU were scaled up through the scale subresource
+- the down target was alerted on Slack and by email, and no healthy one was
+- one metrics endpoint serves health, SLO, scaling, scheduler and operation metrics
+- every job ran, none failed, and shutdown ran the cleanups
+
+Exits with status 1 if any check fails.
+
+Usage:
+    python benchmarks/daemon_integration.py [--duration 6] [--interval 0.5]
+
+tests/test_daemon.py runs the same checks under pytest.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prometheus_client import start_http_server
+from slack_sdk import WebClient
+
+import kubernetes_dep.client_provider as client_provider
+import monitoring.metric_store as metric_store
+import notification.alert_manager as alert_manager
+import orchestration.daemon as daemon
+from monitoring.instrumentation import register_collector
+from monitoring.slo import BURN_RATE_ALERTS, register_collector as register_slo_collector
+from benchmarks.fakes import (FakeAppsV1Api, FakePrometheus, FakeSlack, StubHTTPServer, StubSMTPServer, free_port,
+                             minimum_alert_duration)
+
+def make_fleet(services):
+    """Return the deployment names, the hot ones, and the Prometheus values that make them hot."""
+    deployments = [f"service-{i}" for i in range(services)]
+    hot = set(deployments[:max(1, services // 4)])
+    values = {"cpu_usage": {name: 0.95 if name in hot else 0.5 for name in deployments},
+              "memory_usage": {name: 0.5 for name in deployments}}
+    return deployments, hot, values
+
+def build_config(health_targets, deployments, interval, prometheus_url):
+    return {
+        "shutdown_timeout": 10,
+        "health_checks": {"interval": interval, "targets": health_targets},
+        "scaling": {"interval": interval, "namespace": "default", "deployments": deployments,
+                    "prometheus_url": prometheus_url},
+        "alerts": {"batch_window": interval},
+    }
+
+async def run_for(daemon_config, duration, metrics_url):
+    stop_event = asyncio.Event()
+    task = asyncio.create_task(daemon.serve(daemon_config, stop_event))
+    await asyncio.sleep(duration)
+    # Scrape while the daemon is running, as Prometheus would
+    loop = asyncio.get_running_loop()
+    metrics = await loop.run_in_executor(None, lambda: urllib.request.urlopen(metrics_url, timeout=5).read().decode())
+    stop_event.set()
+    scheduler = await task
+    return scheduler, metrics
+
+def start_metrics_endpoint():
+    """Serve the process's metrics on a free local port and return their URL."""
+    metrics_port = free_port()
+    register_collector()
+    register_slo_collector()
+    start_http_server(metrics_port, addr="127.0.0.1")
+    return f"http://127.0.0.1:{metrics_port}/metrics"
+
+def check_results(scheduler, metrics, output, store, kubernetes, slack, smtp, health_targets, deployments, hot):
+    """Return (label, passed) for everything the daemon should have done."""
+    stored = set(store.series())
+    replicas = {name: kubernetes.get("Deployment", "default", name)["spec"]["replicas"] for name in deployments}
+    return [
+        ("health history for every target",
+         all(f'deployment_health{{deployment_name="{name}"}}' in stored for name in health_targets)),
+        ("down target recorded as unhealthy",
+         not store.query('deployment_health{deployment_name="down-service"}')[1].any()),
+        ("hot deployments scaled up", all(replicas[name] > 2 for name in hot)),
+        ("scale subresource patched", kubernetes.calls.get("patch_namespaced_deployment_scale", 0) > 0),
+        ("Slack alert for the down target", any("down-service" in (text or "") for text in slack.messages)),
+        ("email alert for the down target", any(b"down-service" in message for message in smtp.messages)),
+        ("no alert for healthy targets", not any(f"'{name}'" in (text or "") for text in slack.messages for name in deployments)),
+        ("metrics endpoint has health, SLO, scaling, job and operation metrics",
+         all(name in metrics for name in ("deployment_health{", "slo_burn_rate{", "cpu_usage{", "daemon_job_runs_total{",
+                                          'toolkit_operation_duration_seconds_count{backend="http",operation="health_check"}'))),
+        ("every job ran", all(job.stats["runs"] > 0 for job in scheduler.jobs)),
+        ("no job failed", all(job.stats["failures"] == 0 for job in scheduler.jobs)),
+        ("shutdown reported", "Daemon stopped." in output),
+    ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the daemon against local fakes and check what it did")
+    parser.add_argument("--duration", type=float, help="Seconds to run the daemon for (default and minimum: enough "
+                                                       "checks of the down target to page)")
+    parser.add_argument("--interval", type=float, default=0.5, help="Interval of every daemon job in seconds")
+    parser.add_argument("--services", type=int, default=20, help="Number of healthy services")
+    args = parser.parse_args()
+    duration = max(args.duration or 0, minimum_alert_duration(args.interval))
+    if args.duration and duration > args.duration:
+        print(f"Running for {duration}s instead of {args.duration}s: the down target needs "
+              f"{min(rule[4] for rule in BURN_RATE_ALERTS)} checks every {args.interval}s before it pages")
+
+    deployments, hot, values = make_fleet(args.services)
+    apps_api = FakeAppsV1Api()
+    for name in deployments:
+        apps_api.add_deployment(name, "default", replicas=2)
+    prometheus = FakePrometheus(values=values)
+    slack = FakeSlack()
+
+    with StubHTTPServer() as targets, StubHTTPServer(routes=prometheus.routes) as prometheus_server, \
+            StubHTTPServer(routes=slack.routes) as slack_server, StubSMTPServer() as smtp, \
+            tempfile.TemporaryDirectory() as store_dir:
+        metric_store._metric_store = metric_store.MetricStore(store_dir, flush_interval=args.interval)
+        client_provider.reset()
+        client_provider._apps_api = apps_api
+        alert_manager._slack_client = WebClient(base_url=f"{slack_server.url}/api/")
+        alert_manager.SMTP_SERVER, alert_manager.SMTP_PORT, alert_manager.SMTP_USE_TLS = "127.0.0.1", smtp.port, False
+
+        health_targets = {name: f"{targets.url}/health/{name}" for name in deployments}
+        health_targets["down-service"] = f"http://127.0.0.1:{free_port()}/health"
+        daemon_config = build_config(health_targets, deployments, args.interval, prometheus_server.url)
+        metrics_url = start_metrics_endpoint()
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            scheduler, metrics = asyncio.run(run_for(daemon_config, duration, metrics_url))
+
+        checks = check_results(scheduler, metrics, output.getvalue(), metric_store._metric_store, apps_api.fake,
+                               slack, smtp, health_targets, deployments, hot)
+        dispatcher = alert_manager.get_alert_dispatcher()
+
+        print(f"Ran {', '.join(job.name for job in scheduler.jobs)} every {args.interval}s for {duration}s")
+        for job in scheduler.jobs:
+            print(f"  {job.name:<14} runs: {job.stats['runs']:>3}   failures: {job.stats['failures']}   "
+                  f"overruns: {job.stats['overruns']}   skipped: {job.stats['skipped']}   "
+                  f"last: {job.last_duration * 1000:.1f} ms")
+        print(f"  Kubernetes API calls: {apps_api.total_calls}, Prometheus queries: {prometheus.queries}, "
+              f"health requests: {targets.requests}")
+        print(f"  alerts: {dispatcher.stats['slack_sent']} on Slack, {dispatcher.stats['email_sent']} by email, "
+              f"{dispatcher.stats['suppressed']} suppressed as repeats")
+        failed = 0
+        for label, passed in checks:
+            print(f"{'PASS' if passed else 'FAIL'}  {label}")
+            failed += not passed
+        sys.exit(1 if failed else 0)
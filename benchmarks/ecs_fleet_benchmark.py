@@ -0,0 +1,91 @@
+"""ECS fleet deploy benchmark against a moto-mocked ECS API.
+
+Creates `--services` services in one cluster, then compares a serial rollout
+with deploy_to_aws_ecs() against deploy_fleet_to_aws_ecs(), reporting wall
+time, ECS API calls and task-definition revisions registered. A second fleet
+deploy of the same release shows that unchanged task definitions are reused.
+Each API call is delayed by `--latency` seconds to stand in for the network.
+
+Requires moto (pip install "moto[ecs]").
+
+Usage:
+    python benchmarks/ecs_fleet_benchmark.py [--services 80] [--latency 0.02]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import boto3
+from moto import mock_aws
+
+import cloud.cloud_manager as cloud_manager
+
+CLUSTER = "benchmark"
+
+def release(services, image):
+    return [
+        {"image": image, "cluster": CLUSTER, "service": f"service-{i}", "task_definition": f"service-{i}"}
+        for i in range(services)
+    ]
+
+def serial_deploy(deployments):
+    for deployment in deployments:
+        cloud_manager.deploy_to_aws_ecs(
+            deployment["image"], deployment["cluster"], deployment["service"], deployment["task_definition"])
+
+def run(label, deploy_fn, calls):
+    calls.clear()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        deploy_fn()
+    wall_time = time.perf_counter() - start
+    print(f"{label:<20} wall time: {wall_time:>6.2f} s   API calls: {sum(calls.values()):>4}   "
+          f"RegisterTaskDefinition: {calls['RegisterTaskDefinition']:>3}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bulk ECS deploys")
+    parser.add_argument("--services", type=int, default=80, help="Number of ECS services")
+    parser.add_argument("--latency", type=float, default=0.02, help="Delay per ECS API call in seconds")
+    parser.add_argument("--workers", type=int, default=cloud_manager.ECS_DEPLOY_WORKERS, help="Concurrent service updates")
+    parser.add_argument("--update-rate", type=float, default=50, help="UpdateService calls per second")
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+
+    with mock_aws():
+        ecs_client = cloud_manager.get_ecs_client()
+        calls = Counter()
+
+        def delay(event_name, **kwargs):
+            calls[event_name.rsplit(".", 1)[-1]] += 1
+            time.sleep(args.latency)
+
+        ecs_client.meta.events.register("before-call.ecs.*", delay)
+
+        setup = boto3.client("ecs")
+        setup.create_cluster(clusterName=CLUSTER)
+        initial = setup.register_task_definition(
+            family="initial", containerDefinitions=[{"name": "app", "image": "app:v0", "memory": 512}])
+        for i in range(args.services):
+            setup.create_service(cluster=CLUSTER, serviceName=f"service-{i}",
+                                 taskDefinition=initial["taskDefinition"]["taskDefinitionArn"], desiredCount=1)
+
+        print(f"Services: {args.services}, API latency: {args.latency * 1000:.0f} ms")
+        run("serial", lambda: serial_deploy(release(args.services, "app:v1")), calls)
+        # Start the fleet runs without the in-process cache, as a fresh process would
+        cloud_manager._task_definitions.clear()
+        fleet = lambda: cloud_manager.deploy_fleet_to_aws_ecs(
+            release(args.services, "app:v2"), max_workers=args.workers, update_rate=args.update_rate)
+        run("fleet", fleet, calls)
+        cloud_manager._task_definitions.clear()
+        run("fleet (unchanged)", fleet, calls)
+        run("status (batched)", lambda: cloud_manager.get_aws_services_status(
+            CLUSTER, [f"service-{i}" for i in range(args.services)]), calls)
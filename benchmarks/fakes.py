@@ -0,0 +1,1279 @@
+"""Local stand-ins for the backends the toolkit talks to, used by the benchmarks."""
+import asyncio
+import base64
+import copy
+import datetime
+import hashlib
+import json
+import queue
+import random
+import re
+import socket
+import threading
+import time
+import zlib
+from collections import Counter
+from types import SimpleNamespace
+
+from aiohttp import web
+from botocore.awsrequest import AWSResponse
+from docker import errors as docker_errors
+from kubernetes.client import ApiClient
+from kubernetes.client.exceptions import ApiException
+import requests
+
+class StubHTTPServer:
+    """An aiohttp server running on its own thread and event loop.
+
+    By default every GET answers 200 after `latency` seconds; a `failure_rate`
+    fraction of requests answers 500 instead. Extra routes can be registered
+    with `routes`, a list of (method, path, handler) tuples.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0, routes=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self._routes = routes or []
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._started = threading.Event()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def _default_handler(self, request):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            return web.Response(status=500, text="injected failure")
+        return web.Response(text="ok")
+
+    async def _start(self):
+        app = web.Application()
+        for method, path, handler in self._routes:
+            app.router.add_route(method, path, handler)
+        app.router.add_route("GET", "/{tail:.*}", self._default_handler)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port, backlog=4096)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._start())
+        self._started.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def free_port():
+    """Return a local TCP port nothing is listening on, e.g. for a target that is down."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def minimum_alert_duration(interval):
+    """Seconds a daemon checking every `interval` seconds needs to page about a target down from the start.
+
+    The fastest burn-rate rule fires only after its minimum number of checks,
+    one per interval; the alert then waits up to one batch window (also one
+    interval here) before it is sent, and one more interval is left as slack.
+    """
+    from monitoring.slo import BURN_RATE_ALERTS
+
+    return (min(rule[4] for rule in BURN_RATE_ALERTS) + 2) * interval
+
+def percentile(samples, fraction):
+    """Return the given percentile (0-1) of a list of samples."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+class StubSMTPServer:
+    """A minimal in-process SMTP sink (EHLO/MAIL/RCPT/DATA/QUIT) on its own thread.
+
+    It speaks just enough SMTP for smtplib without STARTTLS or AUTH, and counts
+    connections and delivered messages. A `failure_rate` fraction of messages
+    is refused with a transient 451 reply after DATA.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.connections = 0
+        self.messages = []
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._started = threading.Event()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        writer.write(b"220 stub SMTP ready\r\n")
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                writer.write(b"250 stub\r\n")
+            elif command.startswith("DATA"):
+                writer.write(b"354 end with <CRLF>.<CRLF>\r\n")
+                await writer.drain()
+                body = []
+                while True:
+                    data_line = await reader.readline()
+                    if not data_line or data_line == b".\r\n":
+                        break
+                    body.append(data_line)
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if self.failure_rate and random.random() < self.failure_rate:
+                    writer.write(b"451 injected failure\r\n")
+                else:
+                    self.messages.append(b"".join(body))
+                    writer.write(b"250 OK\r\n")
+            elif command.startswith("QUIT"):
+                writer.write(b"221 bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._started.set()
+        self._loop.run_forever()
+        self._server.close()
+        self._loop.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+class FakeSlack:
+    """Routes for a fake Slack Web API that rate-limits every `rate_limit_every`-th call.
+
+    A `failure_rate` fraction of calls fails with a 500 "internal_error". Point a
+    WebClient at it with `WebClient(base_url=f"{server.url}/api/")`.
+    """
+
+    def __init__(self, latency=0.0, rate_limit_every=0, retry_after=0, failure_rate=0.0):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.messages = []
+
+    async def post_message(self, request):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.rate_limit_every and self.calls % self.rate_limit_every == 0:
+            return web.json_response({"ok": False, "error": "ratelimited"}, status=429,
+                                     headers={"Retry-After": str(self.retry_after)})
+        if self.failure_rate and random.random() < self.failure_rate:
+            return web.json_response({"ok": False, "error": "internal_error"}, status=500)
+        payload = await request.post() if request.content_type != "application/json" else await request.json()
+        self.messages.append(payload.get("text"))
+        return web.json_response({"ok": True, "channel": payload.get("channel"), "ts": str(self.calls)})
+
+    @property
+    def routes(self):
+        return [("POST", "/api/chat.postMessage", self.post_message)]
+
+class FakePrometheus:
+    """Routes for a fake Prometheus HTTP API serving per-deployment instant vectors.
+
+    Understands the selectors the toolkit sends, `metric{deployment="name"}` and
+    `agg by (namespace, deployment) (metric{namespace=~"x|y",deployment=~"a|b"})`,
+    and answers with one series per namespace and deployment, with values from
+    `values[metric][(namespace, deployment)]` or `values[metric][deployment]`,
+    defaulting to a stable pseudo-random value; a value of None means the
+    deployment has no series. With `namespaced=False` the series have no
+    namespace label, like an exporter that does not set one, and only match a
+    namespace matcher that allows the empty value. A `failure_rate` fraction of
+    queries answers 503.
+    """
+
+    SELECTOR = re.compile(r'(\w+)\{([^}]*)\}')
+    MATCHER = re.compile(r'(\w+)(=~|=)"((?:[^"\\]|\\.)*)"')
+
+    def __init__(self, values=None, latency=0.0, failure_rate=0.0, namespaced=True):
+        self.values = values or {}
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.namespaced = namespaced
+        self.queries = 0
+
+    def value(self, metric_name, deployment_name, namespace=None):
+        metric_values = self.values.get(metric_name, {})
+        for key in ((namespace, deployment_name), deployment_name):
+            if key in metric_values:
+                return metric_values[key]
+        return (zlib.crc32(f"{metric_name}/{deployment_name}".encode()) % 100) / 100
+
+    def _names(self, operator, pattern):
+        pattern = pattern.replace('\\"', '"').replace("\\\\", "\\")
+        if operator == "=":
+            return [pattern]
+        return [re.sub(r"\\(.)", r"\1", name) for name in re.split(r"(?<!\\)\|", pattern)]
+
+    async def query(self, request):
+        self.queries += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            return web.json_response({"status": "error", "errorType": "unavailable", "error": "injected failure"}, status=503)
+        params = await request.post() if request.method == "POST" else request.query
+        match = self.SELECTOR.search(params.get("query", ""))
+        matchers = {label: (operator, pattern) for label, operator, pattern in self.MATCHER.findall(match.group(2))} if match else {}
+        if "deployment" not in matchers:
+            return web.json_response({"status": "error", "error": "unsupported query"}, status=400)
+        metric_name = match.group(1)
+        namespaces = self._names(*matchers["namespace"]) if "namespace" in matchers else [None]
+        if not self.namespaced:
+            # A missing label matches like an empty one
+            namespaces = [None] if "namespace" not in matchers or "" in namespaces else []
+        now = time.time()
+        result = []
+        for namespace in namespaces:
+            if namespace == "":
+                continue
+            for name in self._names(*matchers["deployment"]):
+                value = self.value(metric_name, name, namespace)
+                if value is not None:
+                    labels = {"deployment": name} if namespace is None else {"namespace": namespace, "deployment": name}
+                    result.append({"metric": labels, "value": [now, str(value)]})
+        return web.json_response({"status": "success", "data": {"resultType": "vector", "result": result}})
+
+    @property
+    def routes(self):
+        return [("GET", "/api/v1/query", self.query), ("POST", "/api/v1/query", self.query)]
+
+def merge_patch(target, patch):
+    """Apply a JSON merge patch (RFC 7386) to a dict and return the result."""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+def _matches_labels(obj, label_selector):
+    if not label_selector:
+        return True
+    labels = obj.get("metadata", {}).get("labels") or {}
+    for requirement in label_selector.split(","):
+        key, _, value = requirement.partition("=")
+        if labels.get(key.strip()) != value.strip():
+            return False
+    return True
+
+class FakeWatchResponse:
+    """A streaming HTTP response carrying watch events as JSON lines, like urllib3's."""
+
+    def __init__(self, fake_kubernetes, kind, namespace, label_selector, initial, timeout_seconds):
+        self._fake = fake_kubernetes
+        self._kind = kind
+        self._namespace = namespace
+        self._label_selector = label_selector
+        self._events = queue.Queue()
+        self._deadline = time.monotonic() + timeout_seconds if timeout_seconds else None
+        self._closed = False
+        self.status = 200
+        for event in initial:
+            self._events.put(event)
+
+    def offer(self, kind, namespace, event):
+        if kind == self._kind and (self._namespace is None or namespace == self._namespace) \
+                and _matches_labels(event["object"], self._label_selector):
+            self._events.put(event)
+
+    def stream(self, amt=None, decode_content=False):
+        while not self._closed:
+            timeout = None if self._deadline is None else self._deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                break
+            try:
+                event = self._events.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if event is None:
+                break
+            yield (json.dumps(event) + "\n").encode()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._events.put(None)
+            self._fake._unwatch(self)
+
+    def release_conn(self):
+        pass
+
+class FakeRawResponse:
+    """An unparsed HTTP response, as the kubernetes client returns with _preload_content=False."""
+
+    def __init__(self, data):
+        self.data = data
+        self.status = 200
+
+    def release_conn(self):
+        pass
+
+class FakeKubernetes:
+    """In-memory Kubernetes API server state shared by FakeAppsV1Api and FakeCoreV1Api.
+
+    Objects are stored as JSON-like dicts per (kind, namespace, name). Every
+    change bumps a global resourceVersion and is sent to open watches; watches
+    started from an older resourceVersion replay the changes they missed. Each
+    API call sleeps for `latency` seconds and is counted in `calls` by method
+    name; a `failure_rate` fraction of calls then fails with a 500 ApiException.
+    Deployments report a completed rollout `rollout_time` seconds after their
+    spec changes.
+    """
+
+    def __init__(self, latency=0.0, rollout_time=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.rollout_time = rollout_time
+        self.failure_rate = failure_rate
+        self.objects = {}
+        self.history = []
+        self.resource_version = 0
+        self.calls = Counter()
+        self._watches = []
+        self._lock = threading.RLock()
+        self._api_client = ApiClient()
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def call(self, method):
+        with self._lock:
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ApiException(status=500, reason="Internal Server Error (injected failure)")
+
+    def to_dict(self, body):
+        if isinstance(body, dict):
+            return copy.deepcopy(body)
+        return self._api_client.sanitize_for_serialization(body)
+
+    def to_model(self, obj, klass):
+        return self._api_client._ApiClient__deserialize(copy.deepcopy(obj), klass)
+
+    def get(self, kind, namespace, name):
+        obj = self.objects.get((kind, namespace, name))
+        if obj is None:
+            raise ApiException(status=404, reason="Not Found")
+        return obj
+
+    def list(self, kind, namespace=None, label_selector=None):
+        with self._lock:
+            return [obj for (k, ns, _), obj in sorted(self.objects.items())
+                    if k == kind and (namespace is None or ns == namespace) and _matches_labels(obj, label_selector)]
+
+    def store(self, kind, obj):
+        """Create or replace an object and notify watches."""
+        with self._lock:
+            metadata = obj.setdefault("metadata", {})
+            metadata.setdefault("namespace", "default")
+            key = (kind, metadata["namespace"], metadata["name"])
+            event_type = "MODIFIED" if key in self.objects else "ADDED"
+            self.resource_version += 1
+            metadata["resourceVersion"] = str(self.resource_version)
+            self.objects[key] = obj
+            self._notify(kind, metadata["namespace"], event_type, obj)
+            return obj
+
+    def remove(self, kind, namespace, name):
+        with self._lock:
+            obj = self.objects.pop((kind, namespace, name), None)
+            if obj is None:
+                raise ApiException(status=404, reason="Not Found")
+            self.resource_version += 1
+            obj["metadata"]["resourceVersion"] = str(self.resource_version)
+            self._notify(kind, namespace, "DELETED", obj)
+            return obj
+
+    def _notify(self, kind, namespace, event_type, obj):
+        event = {"type": event_type, "object": copy.deepcopy(obj)}
+        self.history.append((self.resource_version, kind, namespace, event))
+        for watch in list(self._watches):
+            watch.offer(kind, namespace, event)
+
+    def watch(self, kind, namespace=None, label_selector=None, resource_version=None, timeout_seconds=None):
+        """Open a watch; without a resourceVersion it starts with ADDED events for existing objects."""
+        with self._lock:
+            if resource_version in (None, "", "0"):
+                initial = [{"type": "ADDED", "object": copy.deepcopy(obj)} for obj in self.list(kind, namespace, label_selector)]
+            else:
+                initial = [event for rv, k, ns, event in self.history
+                           if rv > int(resource_version) and k == kind and (namespace is None or ns == namespace)
+                           and _matches_labels(event["object"], label_selector)]
+            response = FakeWatchResponse(self, kind, namespace, label_selector, initial, timeout_seconds)
+            self._watches.append(response)
+            return response
+
+    def _unwatch(self, response):
+        with self._lock:
+            if response in self._watches:
+                self._watches.remove(response)
+
+    def list_response(self, kind, klass, namespace=None, label_selector=None, watch=False,
+                      resource_version=None, timeout_seconds=None, preload=True):
+        if watch:
+            return self.watch(kind, namespace, label_selector, resource_version, timeout_seconds)
+        with self._lock:
+            items = self.list(kind, namespace, label_selector)
+            body = {"metadata": {"resourceVersion": str(self.resource_version)}, "items": items}
+            if not preload:
+                return FakeRawResponse(json.dumps(body).encode())
+        return self.to_model(body, klass)
+
+    def apply(self, kind, namespace, name, body):
+        """Create or merge-patch an object, like a server-side apply of `body`."""
+        with self._lock:
+            current = self.objects.get((kind, namespace, name))
+            merged = merge_patch(current or {}, self.to_dict(body))
+            merged.setdefault("metadata", {}).update(name=name, namespace=namespace)
+            return self.store(kind, merged)
+
+    def _finish_rollout(self, namespace, name, generation):
+        with self._lock:
+            obj = self.objects.get(("Deployment", namespace, name))
+            if obj is None or obj["metadata"].get("generation") != generation:
+                return
+            replicas = obj.get("spec", {}).get("replicas", 1)
+            obj = copy.deepcopy(obj)
+            obj["status"] = {"observedGeneration": generation, "replicas": replicas, "updatedReplicas": replicas,
+                             "readyReplicas": replicas, "availableReplicas": replicas}
+            self.store("Deployment", obj)
+
+    def store_deployment(self, obj, spec_changed=True):
+        """Store a deployment, bumping its generation and scheduling its rollout if the spec changed."""
+        with self._lock:
+            metadata = obj.setdefault("metadata", {})
+            metadata.setdefault("namespace", "default")
+            previous = self.objects.get(("Deployment", metadata["namespace"], metadata["name"]))
+            generation = (previous or {}).get("metadata", {}).get("generation", 0)
+            if spec_changed:
+                generation += 1
+                obj["status"] = {"observedGeneration": generation, "replicas": 0}
+            metadata["generation"] = generation
+            obj.setdefault("spec", {}).setdefault("replicas", 1)
+            self.store("Deployment", obj)
+        if spec_changed:
+            if self.rollout_time:
+                timer = threading.Timer(self.rollout_time, self._finish_rollout, (metadata["namespace"], metadata["name"], generation))
+                timer.daemon = True
+                timer.start()
+            else:
+                self._finish_rollout(metadata["namespace"], metadata["name"], generation)
+        return obj
+
+class FakeAppsV1Api:
+    """Stand-in for kubernetes.client.AppsV1Api backed by a FakeKubernetes."""
+
+    def __init__(self, fake_kubernetes=None, latency=0.0):
+        self.fake = fake_kubernetes or FakeKubernetes(latency=latency)
+
+    @property
+    def calls(self):
+        return self.fake.calls
+
+    @property
+    def total_calls(self):
+        return self.fake.total_calls
+
+    def add_deployment(self, name, namespace="default", replicas=1, labels=None, image="busybox:latest"):
+        """Add a fully rolled-out deployment without counting an API call."""
+        labels = labels or {"app": name}
+        obj = {
+            "apiVersion": "apps/v1", "kind": "Deployment",
+            "metadata": {"name": name, "namespace": namespace, "labels": labels},
+            "spec": {"replicas": replicas, "selector": {"matchLabels": labels},
+                     "template": {"metadata": {"labels": labels}, "spec": {"containers": [{"name": name, "image": image}]}}},
+        }
+        self.fake.store_deployment(obj)
+        return obj
+
+    def list_namespaced_deployment(self, namespace, label_selector=None, watch=False, resource_version=None,
+                                   timeout_seconds=None, _preload_content=True, **kwargs):
+        """:rtype: V1DeploymentList"""
+        self.fake.call("list_namespaced_deployment")
+        return self.fake.list_response("Deployment", "V1DeploymentList", namespace, label_selector, watch,
+                                       resource_version, timeout_seconds, _preload_content)
+
+    def list_deployment_for_all_namespaces(self, label_selector=None, watch=False, resource_version=None,
+                                           timeout_seconds=None, _preload_content=True, **kwargs):
+        """:rtype: V1DeploymentList"""
+        self.fake.call("list_deployment_for_all_namespaces")
+        return self.fake.list_response("Deployment", "V1DeploymentList", None, label_selector, watch,
+                                       resource_version, timeout_seconds, _preload_content)
+
+    def read_namespaced_deployment(self, name, namespace, **kwargs):
+        self.fake.call("read_namespaced_deployment")
+        return self.fake.to_model(self.fake.get("Deployment", namespace, name), "V1Deployment")
+
+    def create_namespaced_deployment(self, namespace, body, **kwargs):
+        self.fake.call("create_namespaced_deployment")
+        obj = self.fake.to_dict(body)
+        obj.setdefault("metadata", {})["namespace"] = namespace
+        if ("Deployment", namespace, obj["metadata"]["name"]) in self.fake.objects:
+            raise ApiException(status=409, reason="AlreadyExists")
+        return self.fake.to_model(self.fake.store_deployment(obj), "V1Deployment")
+
+    def patch_namespaced_deployment(self, name, namespace, body, field_manager=None, force=None,
+                                    _content_type=None, **kwargs):
+        self.fake.call("patch_namespaced_deployment")
+        patch = self.fake.to_dict(body)
+        with self.fake._lock:
+            current = self.fake.objects.get(("Deployment", namespace, name))
+            if current is None and _content_type != "application/apply-patch+yaml":
+                raise ApiException(status=404, reason="Not Found")
+            merged = merge_patch(current or {}, patch)
+            merged.setdefault("metadata", {}).update(name=name, namespace=namespace)
+            spec_changed = current is None or merged.get("spec") != current.get("spec")
+            if not spec_changed:
+                merged["status"] = current.get("status")
+            return self.fake.to_model(self.fake.store_deployment(merged, spec_changed), "V1Deployment")
+
+    def patch_namespaced_deployment_scale(self, name, namespace, body, **kwargs):
+        self.fake.call("patch_namespaced_deployment_scale")
+        with self.fake._lock:
+            current = copy.deepcopy(self.fake.get("Deployment", namespace, name))
+            current["spec"]["replicas"] = self.fake.to_dict(body)["spec"]["replicas"]
+            self.fake.store_deployment(current)
+        return self.fake.to_model({"spec": {"replicas": current["spec"]["replicas"]}}, "V1Scale")
+
+    def delete_namespaced_deployment(self, name, namespace, **kwargs):
+        self.fake.call("delete_namespaced_deployment")
+        self.fake.remove("Deployment", namespace, name)
+
+class FakePodLogResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def stream(self, amt=None, decode_content=True):
+        return iter(self._data) if not isinstance(self._data, bytes) else iter([self._data])
+
+    def release_conn(self):
+        pass
+
+class FakeCoreV1Api:
+    """Stand-in for kubernetes.client.CoreV1Api (pods, pod logs, secrets, services and config maps) backed by a FakeKubernetes."""
+
+    def __init__(self, fake_kubernetes=None, latency=0.0, log_bytes=0):
+        self.fake = fake_kubernetes or FakeKubernetes(latency=latency)
+        self.log_bytes = log_bytes
+
+    def add_pod(self, name, namespace="default", labels=None, phase="Running"):
+        return self.fake.store("Pod", {"apiVersion": "v1", "kind": "Pod",
+                                       "metadata": {"name": name, "namespace": namespace, "labels": labels or {}},
+                                       "status": {"phase": phase}})
+
+    def add_secret(self, name, data, namespace="default"):
+        encoded = {key: base64.b64encode(value.encode()).decode() for key, value in data.items()}
+        return self.fake.store("Secret", {"apiVersion": "v1", "kind": "Secret",
+                                          "metadata": {"name": name, "namespace": namespace}, "data": encoded})
+
+    def list_namespaced_pod(self, namespace, label_selector=None, watch=False, resource_version=None,
+                            timeout_seconds=None, _preload_content=True, **kwargs):
+        """:rtype: V1PodList"""
+        self.fake.call("list_namespaced_pod")
+        return self.fake.list_response("Pod", "V1PodList", namespace, label_selector, watch,
+                                       resource_version, timeout_seconds, _preload_content)
+
+    def read_namespaced_pod_log(self, name, namespace, _preload_content=True, **kwargs):
+        self.fake.call("read_namespaced_pod_log")
+        self.fake.get("Pod", namespace, name)
+        chunks = synthetic_log_chunks(self.log_bytes)
+        return FakePodLogResponse(chunks) if not _preload_content else b"".join(chunks).decode()
+
+    def read_namespaced_secret(self, name, namespace, **kwargs):
+        self.fake.call("read_namespaced_secret")
+        return self.fake.to_model(self.fake.get("Secret", namespace, name), "V1Secret")
+
+    def list_namespaced_secret(self, namespace, label_selector=None, watch=False, resource_version=None,
+                               timeout_seconds=None, _preload_content=True, **kwargs):
+        """:rtype: V1SecretList"""
+        self.fake.call("list_namespaced_secret")
+        return self.fake.list_response("Secret", "V1SecretList", namespace, label_selector, watch,
+                                       resource_version, timeout_seconds, _preload_content)
+
+    def patch_namespaced_secret(self, name, namespace, body, **kwargs):
+        self.fake.call("patch_namespaced_secret")
+        return self.fake.to_model(self.fake.apply("Secret", namespace, name, body), "V1Secret")
+
+    def delete_namespaced_secret(self, name, namespace, **kwargs):
+        self.fake.call("delete_namespaced_secret")
+        self.fake.remove("Secret", namespace, name)
+
+    def list_namespaced_service(self, namespace, label_selector=None, _preload_content=True, **kwargs):
+        """:rtype: V1ServiceList"""
+        self.fake.call("list_namespaced_service")
+        return self.fake.list_response("Service", "V1ServiceList", namespace, label_selector, preload=_preload_content)
+
+    def read_namespaced_service(self, name, namespace, **kwargs):
+        self.fake.call("read_namespaced_service")
+        return self.fake.to_model(self.fake.get("Service", namespace, name), "V1Service")
+
+    def patch_namespaced_service(self, name, namespace, body, **kwargs):
+        self.fake.call("patch_namespaced_service")
+        return self.fake.to_model(self.fake.apply("Service", namespace, name, body), "V1Service")
+
+    def delete_namespaced_service(self, name, namespace, **kwargs):
+        self.fake.call("delete_namespaced_service")
+        self.fake.remove("Service", namespace, name)
+
+    def list_namespaced_config_map(self, namespace, label_selector=None, _preload_content=True, **kwargs):
+        """:rtype: V1ConfigMapList"""
+        self.fake.call("list_namespaced_config_map")
+        return self.fake.list_response("ConfigMap", "V1ConfigMapList", namespace, label_selector, preload=_preload_content)
+
+    def read_namespaced_config_map(self, name, namespace, **kwargs):
+        self.fake.call("read_namespaced_config_map")
+        return self.fake.to_model(self.fake.get("ConfigMap", namespace, name), "V1ConfigMap")
+
+    def patch_namespaced_config_map(self, name, namespace, body, **kwargs):
+        self.fake.call("patch_namespaced_config_map")
+        return self.fake.to_model(self.fake.apply("ConfigMap", namespace, name, body), "V1ConfigMap")
+
+    def delete_namespaced_config_map(self, name, namespace, **kwargs):
+        self.fake.call("delete_namespaced_config_map")
+        self.fake.remove("ConfigMap", namespace, name)
+
+class FakeImage:
+    def __init__(self, docker_client, tag, labels=None, layers=None):
+        self._docker = docker_client
+        self.tags = [tag]
+        self.labels = labels or {}
+        self.layers = layers or [f"sha256:{zlib.crc32(f'{tag}/{i}'.encode()):08x}" for i in range(3)]
+        self.id = "sha256:" + hashlib.sha256(repr((tag, sorted(self.labels.items()), self.layers)).encode()).hexdigest()
+        self.repo_digests = []
+
+    @property
+    def attrs(self):
+        return {"Id": self.id, "RepoTags": list(self.tags), "RepoDigests": list(self.repo_digests),
+                "Config": {"Labels": dict(self.labels)}}
+
+    @property
+    def manifest_digest(self):
+        return "sha256:" + hashlib.sha256(",".join(self.layers).encode()).hexdigest()
+
+    def tag(self, repository, tag=None):
+        self._docker._call("tag")
+        reference = f"{repository}:{tag or 'latest'}"
+        if reference not in self.tags:
+            self.tags.append(reference)
+        self._docker.images.images[reference] = self
+        self._docker.emit("image", "tag", self.id, {"name": reference})
+        return True
+
+class FakeRegistry:
+    """In-memory image registries keyed by host, used by FakeDockerClient pushes.
+
+    Uploading a layer the registry does not have takes `layer_time` seconds;
+    hosts in `auth_required` reject pushes without an auth config.
+    """
+
+    def __init__(self, layer_time=0.05, auth_required=()):
+        self.layer_time = layer_time
+        self.auth_required = set(auth_required)
+        self.blobs = {}  # host -> set of layer digests
+        self.manifests = {}  # "repository:tag" -> manifest digest
+        self.uploads = 0
+        self.manifest_checks = 0
+        self._lock = threading.Lock()
+
+class FakeDockerAPI:
+    """The low-level APIClient part of FakeDockerClient."""
+
+    def __init__(self, docker_client):
+        self._docker = docker_client
+
+    def push(self, repository, tag=None, stream=False, auth_config=None, decode=False):
+        self._docker._call("push")
+        return self._push(repository, tag or "latest", auth_config)
+
+    def _push(self, repository, tag, auth_config):
+        registry = self._docker.registry
+        host = repository.split("/", 1)[0]
+        image = self._docker.images.images.get(f"{repository}:{tag}")
+        yield {"status": f"The push refers to repository [{repository}]"}
+        if image is None:
+            yield {"errorDetail": {"message": "tag does not exist"}, "error": f"tag does not exist: {repository}:{tag}"}
+            return
+        if host in registry.auth_required and not auth_config:
+            yield {"errorDetail": {"message": "no basic auth credentials"}, "error": "no basic auth credentials"}
+            return
+        for layer in image.layers:
+            layer_id = layer[7:19]
+            yield {"status": "Preparing", "progressDetail": {}, "id": layer_id}
+            with registry._lock:
+                exists = layer in registry.blobs.setdefault(host, set())
+            if exists:
+                yield {"status": "Layer already exists", "progressDetail": {}, "id": layer_id}
+                continue
+            for step in range(4):
+                time.sleep(registry.layer_time / 4)
+                yield {"status": "Pushing", "progressDetail": {"current": step + 1, "total": 4}, "id": layer_id}
+            with registry._lock:
+                registry.blobs[host].add(layer)
+                registry.uploads += 1
+            yield {"status": "Pushed", "progressDetail": {}, "id": layer_id}
+        digest = image.manifest_digest
+        with registry._lock:
+            registry.manifests[f"{repository}:{tag}"] = digest
+        if f"{repository}@{digest}" not in image.repo_digests:
+            image.repo_digests.append(f"{repository}@{digest}")
+        yield {"status": f"{tag}: digest: {digest} size: 1234"}
+        yield {"progressDetail": {}, "aux": {"Tag": tag, "Digest": digest, "Size": 1234}}
+
+    def containers(self, all=False, filters=None):
+        self._docker._call("containers.list")
+        with self._docker._lock:
+            containers = list(self._docker.containers.containers.values())
+        return [{"Id": c.id, "Names": [f"/{c.name}"], "Image": c.image, "State": c.status, "Labels": dict(c.labels)}
+                for c in containers if all or c.status == "running"]
+
+    def images(self):
+        self._docker._call("images.list")
+        images = {image.id: image for image in list(self._docker.images.images.values())}
+        return [{"Id": image.id, "RepoTags": list(image.tags), "Labels": dict(image.labels)} for image in images.values()]
+
+    def inspect_image(self, image):
+        self._docker._call("inspect_image")
+        return self._docker.images._find(image).attrs
+
+    def inspect_distribution(self, image, auth_config=None):
+        self._docker._call("inspect_distribution")
+        registry = self._docker.registry
+        with registry._lock:
+            registry.manifest_checks += 1
+            digest = registry.manifests.get(image)
+        if digest is None:
+            raise docker_errors.NotFound(f"manifest unknown: {image}")
+        return {"Descriptor": {"mediaType": "application/vnd.docker.distribution.manifest.v2+json", "digest": digest}}
+
+    def build(self, path=None, tag=None, labels=None, decode=False, **kwargs):
+        self._docker._call("build")
+        steps = self._docker.build_steps
+        for step in range(steps):
+            time.sleep(self._docker.build_time / steps)
+            yield {"stream": f"Step {step + 1}/{steps} : building {tag}\n"}
+        self._docker.images.add(tag, labels)
+        yield {"stream": f"Successfully tagged {tag}\n"}
+
+class FakeImageCollection:
+    def __init__(self, docker_client):
+        self._docker = docker_client
+        self.images = {}
+
+    def add(self, tag, labels=None, layers=None):
+        self.images[tag] = FakeImage(self._docker, tag, labels, layers)
+        self._docker.emit("image", "tag", self.images[tag].id, {"name": tag})
+        return self.images[tag]
+
+    def _find(self, name):
+        image = self.images.get(name) or self.images.get(f"{name}:latest")
+        if image is None:
+            image = next((image for image in list(self.images.values()) if image.id == name), None)
+        if image is None:
+            raise docker_errors.ImageNotFound(f"No such image: {name}")
+        return image
+
+    def get(self, name):
+        self._docker._call("images.get")
+        return self._find(name)
+
+def synthetic_log_chunks(total_bytes, chunk_size=64 * 1024, line=b"2024-01-01T00:00:00Z INFO request handled status=200 path=/health\n"):
+    """Yield `total_bytes` of log data in chunks, reusing one buffer so the source itself uses no memory."""
+    chunk = (line * (chunk_size // len(line) + 1))[:chunk_size]
+    sent = 0
+    while sent < total_bytes:
+        size = min(chunk_size, total_bytes - sent)
+        yield chunk if size == chunk_size else chunk[:size]
+        sent += size
+
+def docker_api_error(status_code, message):
+    """An APIError carrying an HTTP status, as docker-py raises them."""
+    response = requests.Response()
+    response.status_code = status_code
+    return docker_errors.APIError(message, response=response, explanation=message)
+
+class FakeContainer:
+    """A container that exits `stop_time` seconds after SIGTERM, or ignores it if `stop_time` is None."""
+
+    def __init__(self, docker_client, name, image="busybox:latest", status="running", labels=None, log_bytes=0,
+                 stop_time=0.0):
+        self._docker = docker_client
+        self.name = name
+        self.id = f"{zlib.crc32(name.encode()):08x}" * 8
+        self.image = image
+        self.status = status
+        self.labels = labels or {}
+        self.log_bytes = log_bytes
+        self.stop_time = stop_time
+
+    def _emit(self, action):
+        self._docker.emit("container", action, self.id, dict(self.labels, name=self.name, image=self.image))
+
+    def _check_exists(self):
+        if self._docker.containers.containers.get(self.name) is not self:
+            raise docker_errors.NotFound(f"No such container: {self.id}")
+
+    def stop(self, timeout=10):
+        self._docker._call("stop")
+        self._check_exists()
+        if self.status == "running":
+            self._docker._sleep(timeout if self.stop_time is None else min(timeout, self.stop_time))
+            self.status = "exited"
+            self._emit("die")
+        self._emit("stop")
+
+    def start(self):
+        self._docker._call("start")
+        self._check_exists()
+        self.status = "running"
+        self._emit("start")
+
+    def restart(self, timeout=10):
+        self._docker._call("restart")
+        self._check_exists()
+        if self.status == "running":
+            self._docker._sleep(timeout if self.stop_time is None else min(timeout, self.stop_time))
+            self._emit("die")
+        self.status = "running"
+        self._emit("start")
+        self._emit("restart")
+
+    def remove(self, v=False, link=False, force=False):
+        self._docker._call("remove")
+        if self.status == "running" and not force:
+            raise docker_api_error(409, f"You cannot remove a running container {self.id}. Stop the container before "
+                                        "attempting removal or force remove")
+        with self._docker._lock:
+            if self._docker.containers.containers.get(self.name) is not self:
+                raise docker_errors.NotFound(f"No such container: {self.name}")
+            del self._docker.containers.containers[self.name]
+        if self.status == "running":
+            self.status = "exited"
+            self._emit("die")
+        self._emit("destroy")
+
+    def logs(self, stream=False, follow=False, since=None, tail="all", **kwargs):
+        self._docker._call("logs")
+        self._check_exists()
+        chunks = synthetic_log_chunks(self.log_bytes)
+        return chunks if stream else b"".join(chunks)
+
+class FakeContainerCollection:
+    def __init__(self, docker_client):
+        self._docker = docker_client
+        self.containers = {}
+
+    def add(self, name, **kwargs):
+        container = self.containers[name] = FakeContainer(self._docker, name, **kwargs)
+        container._emit("create")
+        if container.status == "running":
+            container._emit("start")
+        elif container.status == "exited":
+            container._emit("die")
+        return container
+
+    def prepare_model(self, attrs):
+        # Models of removed containers are detached and fail like a real daemon would
+        name = attrs["Name"].lstrip("/")
+        container = self.containers.get(name)
+        if container is None or container.id != attrs["Id"]:
+            container = FakeContainer(self._docker, name, status=attrs["State"]["Status"],
+                                      labels=attrs["Config"]["Labels"])
+        return container
+
+    def get(self, name):
+        self._docker._call("containers.get")
+        container = self.containers.get(name)
+        if container is None:
+            raise docker_errors.NotFound(f"No such container: {name}")
+        return container
+
+    @staticmethod
+    def _matches(container, filters):
+        for label in filters.get("label", []):
+            key, _, value = label.partition("=")
+            if key not in container.labels or (value and container.labels[key] != value):
+                return False
+        status = filters.get("status")
+        return not status or container.status in ([status] if isinstance(status, str) else status)
+
+    def list(self, all=False, filters=None, **kwargs):
+        self._docker._call("containers.list")
+        filters = filters or {}
+        with self._docker._lock:
+            containers = list(self.containers.values())
+        return [c for c in containers if (all or c.status == "running") and self._matches(c, filters)]
+
+    def prune(self, filters=None):
+        self._docker._call("containers.prune")
+        filters = filters or {}
+        with self._docker._lock:
+            pruned = [c for c in self.containers.values() if c.status != "running" and self._matches(c, filters)]
+            for container in pruned:
+                del self.containers[container.name]
+        for container in pruned:
+            container._emit("destroy")
+        return {"ContainersDeleted": [container.id for container in pruned], "SpaceReclaimed": 4096 * len(pruned)}
+
+class FakeEventStream:
+    """A blocking iterator over FakeDockerClient events, like docker-py's CancellableStream."""
+
+    def __init__(self, docker_client, since=None, filters=None):
+        self._docker = docker_client
+        self._since_nano = int(float(since) * 1e9) if since else 0
+        self._types = set((filters or {}).get("type") or ())
+        self._position = 0
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        events = self._docker._events
+        with self._docker._events_changed:
+            while True:
+                if self._closed:
+                    raise StopIteration
+                if self._position < len(events):
+                    event = events[self._position]
+                    self._position += 1
+                    if event["timeNano"] >= self._since_nano and (not self._types or event["Type"] in self._types):
+                        return event
+                    continue
+                self._docker._events_changed.wait()
+
+    def close(self):
+        with self._docker._events_changed:
+            self._closed = True
+            self._docker._events_changed.notify_all()
+
+class FakeDockerClient:
+    """In-memory stand-in for docker.DockerClient.
+
+    Every daemon call sleeps for `latency` seconds and is counted in `calls`;
+    builds take `build_time` seconds spread over `build_steps` log lines, and
+    pushes go to `registry` (a FakeRegistry). A `failure_rate` fraction of
+    daemon calls fails with an APIError. Container stop times and grace
+    periods are in simulated seconds, slept for `time_scale` times as long.
+    Container and image changes are recorded as daemon events, which emit()
+    adds to directly and events() streams.
+    """
+
+    def __init__(self, latency=0.0, build_time=0.1, build_steps=5, registry=None, time_scale=1.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.time_scale = time_scale
+        self.build_time = build_time
+        self.build_steps = build_steps
+        self.registry = registry or FakeRegistry()
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._events = []
+        self._events_changed = threading.Condition()
+        self.api = FakeDockerAPI(self)
+        self.images = FakeImageCollection(self)
+        self.containers = FakeContainerCollection(self)
+
+    def _call(self, method):
+        with self._lock:
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise docker_api_error(500, f"500 Server Error for {method}: injected failure")
+
+    def _sleep(self, simulated_seconds):
+        if simulated_seconds:
+            time.sleep(simulated_seconds * self.time_scale)
+
+    def emit(self, event_type, action, actor_id, attributes=None):
+        """Record a daemon event, as the daemon does for every container and image change."""
+        now = time.time_ns()
+        event = {"Type": event_type, "Action": action, "Actor": {"ID": actor_id, "Attributes": dict(attributes or {})},
+                 "scope": "local", "time": now // 1000000000, "timeNano": now}
+        with self._events_changed:
+            self._events.append(event)
+            self._events_changed.notify_all()
+        return event
+
+    def events(self, since=None, until=None, filters=None, decode=False):
+        self._call("events")
+        return FakeEventStream(self, since, filters)
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+class FakeGoogleCredentials:
+    """google-auth credentials whose tokens last `lifetime` seconds.
+
+    Every issued token is remembered in `issued`, which credentials loaded
+    from the same key can share.
+    """
+
+    def __init__(self, lifetime=3600, issued=None):
+        self.lifetime = lifetime
+        self.token = None
+        self.expiry = None
+        self.refreshes = 0
+        self.issued = {} if issued is None else issued  # token -> expiry as a Unix timestamp
+
+    @property
+    def valid(self):
+        return self.token is not None and self.issued[self.token] > time.time()
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.token = f"ya29.fake-{len(self.issued) + 1}"
+        self.issued[self.token] = time.time() + self.lifetime
+        self.expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + datetime.timedelta(seconds=self.lifetime)
+
+    def is_valid_token(self, token):
+        return self.issued.get(token, 0) > time.time()
+
+class FakeClusterManager:
+    """Stand-in for container_v1.ClusterManagerClient serving `clusters`, a map of cluster path to endpoint."""
+
+    CA_CERTIFICATE = base64.b64encode(b"-----BEGIN CERTIFICATE-----\nZmFrZQ==\n-----END CERTIFICATE-----\n").decode()
+
+    def __init__(self, clusters, latency=0.0):
+        self.clusters = clusters
+        self.latency = latency
+        self.calls = Counter()
+
+    def get_cluster(self, name=None, **kwargs):
+        self.calls["get_cluster"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if name not in self.clusters:
+            raise KeyError(f"Cluster not found: {name}")
+        return SimpleNamespace(name=name.rsplit("/", 1)[-1], endpoint=self.clusters[name],
+                               master_auth=SimpleNamespace(cluster_ca_certificate=self.CA_CERTIFICATE))
+
+class FakeKubeAPIServer:
+    """Routes for a fake Kubernetes API server that serves reads and server-side applies of Deployments.
+
+    Requests must carry a bearer token that `authorize(token)` accepts, or they get a 401.
+    """
+
+    def __init__(self, authorize=None, latency=0.0):
+        self.authorize = authorize
+        self.latency = latency
+        self.requests = 0
+        self.rejected = 0
+        self.deployments = {}  # (namespace, name) -> applied object
+
+    def _status(self, reason, code):
+        return web.json_response({"kind": "Status", "apiVersion": "v1", "status": "Failure",
+                                  "reason": reason, "code": code}, status=code)
+
+    async def _authorized(self, request):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if self.authorize is not None and not self.authorize(token):
+            self.rejected += 1
+            return False
+        return True
+
+    async def read_deployment(self, request):
+        if not await self._authorized(request):
+            return self._status("Unauthorized", 401)
+        deployment = self.deployments.get((request.match_info["namespace"], request.match_info["name"]))
+        return web.json_response(deployment) if deployment is not None else self._status("NotFound", 404)
+
+    async def apply_deployment(self, request):
+        if not await self._authorized(request):
+            return self._status("Unauthorized", 401)
+        namespace, name = request.match_info["namespace"], request.match_info["name"]
+        body = json.loads(await request.text())
+        previous = self.deployments.get((namespace, name))
+        generation = (previous["metadata"]["generation"] + 1) if previous else 1
+        body["metadata"].update(namespace=namespace, generation=generation, resourceVersion=str(self.requests))
+        self.deployments[(namespace, name)] = body
+        return web.json_response(body)
+
+    @property
+    def routes(self):
+        path = "/apis/apps/v1/namespaces/{namespace}/deployments/{name}"
+        return [("GET", path, self.read_deployment), ("PATCH", path, self.apply_deployment)]
+
+class FakeAWS:
+    """In-memory ECS, ECR and Secrets Manager for real boto3 clients.
+
+    attach() hooks a client's before-call event, as botocore's Stubber does, so
+    calls never reach the network. Unlike Stubber's queue of expected calls it
+    keeps task definitions, services and secrets as state, so calls can come
+    from many threads in any order. Each call sleeps for `latency` seconds and
+    is counted in `calls` by operation name; a `failure_rate` fraction of calls
+    then fails with a 500 ServerException.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, region="us-east-1", account_id="123456789012"):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.region = region
+        self.account_id = account_id
+        self.calls = Counter()
+        self.task_definitions = {}  # family -> list of registered revisions
+        self.services = {}  # (cluster, service) -> task definition ARN
+        self.secrets = {}  # secret name -> SecretString
+        self._lock = threading.Lock()
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def attach(self, client):
+        """Serve every call of a boto3 client from this fake."""
+        client.meta.events.register("before-call.*.*", self._handle, unique_id=f"fake-aws-{id(self)}")
+        return client
+
+    def add_service(self, cluster, service):
+        self.services[(cluster, service)] = None
+
+    def add_secret(self, name, value):
+        self.secrets[name] = value
+
+    def _error(self, status, code, message):
+        return AWSResponse(None, status, {}, None), {"Error": {"Code": code, "Message": message},
+                                                      "ResponseMetadata": {"HTTPStatusCode": status}}
+
+    def _handle(self, model, params, **kwargs):
+        # The json protocol services all send their parameters as a JSON body
+        operation = model.name
+        request = json.loads(params["body"] or b"{}")
+        with self._lock:
+            self.calls[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            return self._error(500, "ServerException", "injected failure")
+        handler = getattr(self, f"_{re.sub(r'(?<!^)(?=[A-Z])', '_', operation).lower()}", None)
+        if handler is None:
+            return self._error(400, "InvalidAction", f"{operation} is not supported by the fake")
+        with self._lock:
+            response = handler(request)
+        if isinstance(response, tuple):
+            return response
+        response["ResponseMetadata"] = {"HTTPStatusCode": 200}
+        return AWSResponse(None, 200, {}, None), response
+
+    def _task_definition_arn(self, family, revision):
+        return f"arn:aws:ecs:{self.region}:{self.account_id}:task-definition/{family}:{revision}"
+
+    def _list_task_definitions(self, request):
+        revisions = [revision for family, family_revisions in self.task_definitions.items()
+                     if family.startswith(request.get("familyPrefix", "")) for revision in family_revisions]
+        arns = sorted((revision["taskDefinitionArn"] for revision in revisions),
+                      key=lambda arn: int(arn.rsplit(":", 1)[1]), reverse=request.get("sort") == "DESC")
+        return {"taskDefinitionArns": arns[:request.get("maxResults", 100)]}
+
+    def _describe_task_definition(self, request):
+        family, _, revision = request["taskDefinition"].rsplit("/", 1)[-1].partition(":")
+        family_revisions = self.task_definitions.get(family, [])
+        index = int(revision) - 1 if revision else len(family_revisions) - 1
+        if not 0 <= index < len(family_revisions):
+            return self._error(400, "ClientException", "Unable to describe task definition.")
+        registered = family_revisions[index]
+        response = {"taskDefinition": {key: value for key, value in registered.items() if key != "tags"}}
+        if "TAGS" in request.get("include", []):
+            response["tags"] = registered["tags"]
+        return response
+
+    def _register_task_definition(self, request):
+        family_revisions = self.task_definitions.setdefault(request["family"], [])
+        revision = len(family_revisions) + 1
+        registered = {"taskDefinitionArn": self._task_definition_arn(request["family"], revision),
+                      "family": request["family"], "revision": revision, "status": "ACTIVE",
+                      "containerDefinitions": request["containerDefinitions"], "tags": request.get("tags", [])}
+        family_revisions.append(registered)
+        return {"taskDefinition": {key: value for key, value in registered.items() if key != "tags"},
+                "tags": registered["tags"]}
+
+    def _update_service(self, request):
+        key = (request.get("cluster", "default"), request["service"])
+        if key not in self.services:
+            return self._error(400, "ServiceNotFoundException", "Service not found.")
+        self.services[key] = request.get("taskDefinition") or self.services[key]
+        return {"service": {"serviceName": key[1], "status": "ACTIVE", "taskDefinition": self.services[key]}}
+
+    def _get_authorization_token(self, request):
+        token = base64.b64encode(b"AWS:fake-password").decode()
+        expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=12)
+        return {"authorizationData": [{"authorizationToken": token, "expiresAt": expires_at,
+                                       "proxyEndpoint": f"https://{self.account_id}.dkr.ecr.{self.region}.amazonaws.com"}]}
+
+    def _get_secret_value(self, request):
+        name = request["SecretId"]
+        if name not in self.secrets:
+            return self._error(400, "ResourceNotFoundException", "Secrets Manager can't find the specified secret.")
+        return {"Name": name, "SecretString": self.secrets[name]}
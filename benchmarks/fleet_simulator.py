@@ -0,0 +1,280 @@
+"""Fleet simulator: drives the toolkit's entry points at fleet scale against local stand-ins for every backend.
+
+Serves fake health endpoints, Prometheus, Slack and SMTP over HTTP/SMTP, a
+fake Kubernetes API (FakeAppsV1Api/FakeCoreV1Api) and fake ECS, ECR and
+Secrets Manager behind real boto3 clients, all with `--latency` seconds per
+call and a `--failure-rate` fraction of failed calls. Then runs, for
+`--deployments` deployments on `--workers` threads:
+
+- health: `--rounds` sweeps of monitor_health(), with a `--down` fraction of
+  deployments unreachable so that the SLO engine pages over Slack and email
+- scaling: `--rounds` calls of check_and_scale_deployment() per deployment
+- k8s_deploy: two releases with create_deployment()
+- ecs_deploy: two releases with deploy_to_aws_ecs()
+- config: `--rounds` reads of get_config() per deployment from Secrets Manager
+
+and reports per scenario the calls, failed calls, throughput, latency
+percentiles, backend calls and memory. The report is written as JSON to
+`--output`; with `--compare`, it is compared with an earlier report and a
+throughput drop or p99 latency rise beyond `--tolerance` is a regression.
+
+Exits with status 1 on a regression or if any check fails.
+
+Usage:
+    python benchmarks/fleet_simulator.py [--deployments 200] [--workers 16] [--output fleet-report.json]
+    python benchmarks/fleet_simulator.py --compare fleet-report.json --output fleet-report-new.json
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+
+from slack_sdk import WebClient
+
+import cloud.cloud_manager as cloud_manager
+import config.config_manager as config_manager
+import kubernetes_dep.client_provider as client_provider
+import monitoring.metric_store as metric_store
+import notification.alert_manager as alert_manager
+import scaling.resource_manager as resource_manager
+from benchmarks.fakes import (FakeAWS, FakeAppsV1Api, FakeCoreV1Api, FakeKubernetes, FakePrometheus, FakeSlack,
+                              StubHTTPServer, StubSMTPServer, free_port, percentile)
+from kubernetes_dep.kubernetes_manager import create_deployment
+from monitoring.monitor import monitor_health
+from monitoring.slo import BURN_RATE_ALERTS, SLOEngine, set_slo_engine
+
+SCENARIOS = ("health", "scaling", "k8s_deploy", "ecs_deploy", "config")
+NAMESPACE = "fleet"
+CLUSTER = "fleet"
+
+class Fleet:
+    """The stand-ins, wired into the toolkit's shared clients, and the deployments they serve."""
+
+    def __init__(self, args, stack):
+        self.names = [f"service-{i}" for i in range(args.deployments)]
+        self.down = set(self.names[:int(args.deployments * args.down)])
+        self.kubernetes = FakeKubernetes(latency=args.latency, failure_rate=args.failure_rate)
+        self.apps_api, self.core_api = FakeAppsV1Api(self.kubernetes), FakeCoreV1Api(self.kubernetes)
+        self.aws = FakeAWS(latency=args.latency, failure_rate=args.failure_rate)
+        self.prometheus = FakePrometheus(latency=args.latency, failure_rate=args.failure_rate)
+        self.slack = FakeSlack(latency=args.latency, failure_rate=args.failure_rate)
+        self.targets = stack.enter_context(StubHTTPServer(latency=args.latency, failure_rate=args.failure_rate))
+        self.prometheus_server = stack.enter_context(StubHTTPServer(routes=self.prometheus.routes))
+        self.slack_server = stack.enter_context(StubHTTPServer(routes=self.slack.routes))
+        self.smtp = stack.enter_context(StubSMTPServer(latency=args.latency, failure_rate=args.failure_rate))
+        down_url = f"http://127.0.0.1:{free_port()}"
+        self.health_urls = {name: f"{down_url if name in self.down else self.targets.url}/health/{name}"
+                            for name in self.names}
+        for name in self.names:
+            self.apps_api.add_deployment(name, NAMESPACE, replicas=2)
+            self.aws.add_service(CLUSTER, name)
+            self.aws.add_secret(f"fleet/{name}", json.dumps({"database_url": f"postgres://{name}.db:5432/app"}))
+
+        metric_store._metric_store = metric_store.MetricStore(stack.enter_context(tempfile.TemporaryDirectory()))
+        stack.callback(lambda: metric_store._metric_store.close())
+        client_provider.reset()
+        client_provider._apps_api, client_provider._core_api = self.apps_api, self.core_api
+        stack.callback(client_provider.reset)
+        resource_manager.PROMETHEUS_URL = self.prometheus_server.url
+        self.aws.attach(cloud_manager.get_ecs_client())
+        self.aws.attach(config_manager.get_secrets_client())
+        config_manager.CONFIG_SOURCE = "aws"
+        config_manager.invalidate_config()
+        self.slo_engine = SLOEngine()
+        set_slo_engine(self.slo_engine)
+        self.dispatcher = alert_manager.AlertDispatcher(
+            batch_window=0.2, slack_client=WebClient(base_url=f"{self.slack_server.url}/api/"),
+            smtp_server="127.0.0.1", smtp_port=self.smtp.port, use_tls=False)
+        alert_manager.set_alert_dispatcher(self.dispatcher)
+        stack.callback(self.dispatcher.stop)
+
+    def backend_calls(self):
+        return {"kubernetes": self.kubernetes.total_calls, "aws": self.aws.total_calls,
+                "prometheus": self.prometheus.queries, "health_endpoints": self.targets.requests,
+                "slack": self.slack.calls, "smtp_messages": len(self.smtp.messages)}
+
+def health_calls(fleet, args):
+    return [lambda name=name: monitor_health(fleet.health_urls[name], name) is None
+            for _ in range(args.rounds) for name in fleet.names]
+
+def scaling_calls(fleet, args):
+    return [lambda name=name: resource_manager.check_and_scale_deployment(name, namespace=NAMESPACE) is not None
+            for _ in range(args.rounds) for name in fleet.names]
+
+def k8s_deploy_calls(fleet, args):
+    def deploy(name, image):
+        create_deployment(image, name, NAMESPACE)
+        # create_deployment() reports errors instead of raising them, so check what the API server holds
+        deployment = fleet.kubernetes.objects.get(("Deployment", NAMESPACE, name))
+        return deployment is not None and deployment["spec"]["template"]["spec"]["containers"][0]["image"] == image
+
+    return [lambda name=name, release=release: deploy(name, f"registry.example.com/{name}:{release}")
+            for release in ("1.0", "1.1") for name in fleet.names]
+
+def ecs_deploy_calls(fleet, args):
+    return [lambda name=name, release=release: cloud_manager.deploy_to_aws_ecs(
+                f"registry.example.com/{name}:{release}", CLUSTER, name, name) is not None
+            for release in ("1.0", "1.1") for name in fleet.names]
+
+def config_calls(fleet, args):
+    return [lambda name=name: config_manager.get_config(f"fleet/{name}") == fleet.aws.secrets[f"fleet/{name}"]
+            for _ in range(args.rounds) for name in fleet.names]
+
+SCENARIO_CALLS = {
+    "health": health_calls,
+    "scaling": scaling_calls,
+    "k8s_deploy": k8s_deploy_calls,
+    "ecs_deploy": ecs_deploy_calls,
+    "config": config_calls,
+}
+
+def max_rss_kb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+def run_scenario(name, fleet, args):
+    """Run a scenario's calls on the worker pool and return its report."""
+    calls = SCENARIO_CALLS[name](fleet, args)
+
+    def timed(call):
+        start = time.perf_counter()
+        try:
+            ok = bool(call())
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - start
+
+    before = fleet.backend_calls()
+    if args.trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(timed, calls))
+        elapsed = time.perf_counter() - start
+        if name == "health":
+            # Alerts go out in the background; wait for them so the report counts them
+            fleet.dispatcher.flush(timeout=30)
+    traced_peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+    if args.trace_memory:
+        tracemalloc.stop()
+    after = fleet.backend_calls()
+
+    latencies = [seconds * 1000 for _, seconds in results]
+    report = {
+        "calls": len(results),
+        "failed": sum(not ok for ok, _ in results),
+        "seconds": elapsed,
+        "throughput": len(results) / elapsed if elapsed else 0.0,
+        "latency_ms": {"p50": percentile(latencies, 0.5), "p90": percentile(latencies, 0.9),
+                       "p99": percentile(latencies, 0.99), "max": max(latencies, default=0.0)},
+        "backend_calls": {backend: after[backend] - before[backend] for backend in after if after[backend] != before[backend]},
+        "max_rss_kb": max_rss_kb(),
+    }
+    if traced_peak is not None:
+        report["traced_peak_kb"] = traced_peak // 1024
+    if name == "health":
+        report["slo_alerts"] = fleet.slo_engine.stats["alerts"]
+        report["alerts_sent"] = {"slack": fleet.dispatcher.stats["slack_sent"], "email": fleet.dispatcher.stats["email_sent"]}
+    return report
+
+def print_report(name, report):
+    latency = report["latency_ms"]
+    backends = ", ".join(f"{backend} {calls}" for backend, calls in report["backend_calls"].items())
+    print(f"{name:<11} {report['calls']:>6} {report['failed']:>6} {report['throughput']:>9.0f}/s "
+          f"{latency['p50']:>8.1f} {latency['p90']:>8.1f} {latency['p99']:>8.1f} {report['max_rss_kb'] / 1024:>7.0f} MB   {backends}")
+
+def compare(previous, current, tolerance):
+    """Print the change of every scenario in both reports and return the regressions."""
+    regressions = []
+    print(f"Compared with the report from {previous.get('created', 'an earlier run')} (tolerance {tolerance:.0%}):")
+    changed = sorted(key for key, value in current["args"].items() if previous.get("args", {}).get(key) != value)
+    if changed:
+        print(f"  note: the runs used different settings for {', '.join(changed)}")
+    for name, report in current["scenarios"].items():
+        old = previous.get("scenarios", {}).get(name)
+        if old is None:
+            continue
+        throughput = report["throughput"] / old["throughput"] - 1 if old["throughput"] else 0.0
+        p99 = report["latency_ms"]["p99"] / old["latency_ms"]["p99"] - 1 if old["latency_ms"]["p99"] else 0.0
+        regressed = throughput < -tolerance or p99 > tolerance
+        print(f"  {name:<11} throughput {throughput:>+7.1%}   p99 latency {p99:>+7.1%}{'   REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive the toolkit's entry points at fleet scale against local stand-ins")
+    parser.add_argument("--deployments", type=int, default=200, help="Deployments in the fleet")
+    parser.add_argument("--workers", type=int, default=16, help="Entry point calls running at the same time")
+    parser.add_argument("--rounds", type=int, default=10, help="Health sweeps, scaling checks and config reads per deployment")
+    parser.add_argument("--latency", type=float, default=0.005, help="Latency of every backend call in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.01, help="Fraction of backend calls that fail")
+    parser.add_argument("--down", type=float, default=0.02, help="Fraction of deployments whose health endpoint is down")
+    parser.add_argument("--scenarios", type=str, default=",".join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument("--trace-memory", action="store_true", help="Also report each scenario's peak Python allocations (slower)")
+    parser.add_argument("--output", type=str, default="fleet-report.json", help="Where to write the JSON report")
+    parser.add_argument("--compare", type=str, help="An earlier JSON report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Relative change counted as a regression")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIO_CALLS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "scenarios": {},
+    }
+    print(f"{args.deployments} deployments, {args.workers} workers, backend latency {args.latency * 1000:.0f} ms, "
+          f"failure rate {args.failure_rate:.1%}")
+    print(f"{'scenario':<11} {'calls':>6} {'failed':>6} {'throughput':>11} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+          f"{'max RSS':>10}   backend calls")
+    with contextlib.ExitStack() as stack:
+        fleet = Fleet(args, stack)
+        for name in scenarios:
+            report["scenarios"][name] = run_scenario(name, fleet, args)
+            print_report(name, report["scenarios"][name])
+        paged = {name for name in fleet.down if "page" in fleet.slo_engine.firing(name)}
+
+    with open(args.output, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"Report written to {args.output}")
+
+    checks = []
+    if "health" in scenarios and args.rounds >= BURN_RATE_ALERTS[0][4]:
+        checks.append(("every deployment with a down health endpoint paged", paged == fleet.down))
+    if args.failure_rate == 0:
+        checks.append(("no failed calls without injected failures",
+                       all(scenario["failed"] == 0 for scenario in report["scenarios"].values())))
+    if args.compare:
+        with open(args.compare) as previous_file:
+            regressions = compare(json.load(previous_file), report, args.tolerance)
+        checks.append(("no throughput or p99 latency regression", not regressions))
+
+    failed = 0
+    for label, passed in checks:
+        print(f"{'PASS' if passed else 'FAIL'}  {label}")
+        failed += not passed
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,114 @@
+"""Remote calls per GKE deployment batch with the shared GKE connection layer, against local stand-ins.
+
+Serves two fake GKE clusters (fake Kubernetes API servers that check bearer
+tokens) behind a fake ClusterManagerClient, and deploys `--batches` batches
+of `--deployments` back-to-back deploy_to_gke() calls spread over both
+clusters. Tokens last `--token-lifetime` seconds and cluster data is cached
+for `--cluster-ttl` seconds, with `--pause` seconds between batches, so
+refreshes happen during the run. Compares:
+
+- uncached: credentials, client and cluster data rebuilt for every deployment,
+  as deploy_to_gke() used to do
+- cached: cloud.gke_clients reusing them across the batch
+
+and reports credential loads, token refreshes, ClusterManagerClients
+created, get_cluster calls and API requests per batch. Exits with status 1
+if a deployment is missing or any request was sent with an expired token.
+
+Usage:
+    python benchmarks/gke_deploy_benchmark.py [--batches 5] [--deployments 20]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cloud.cloud_manager as cloud_manager
+import cloud.gke_clients as gke_clients
+from benchmarks.fakes import FakeClusterManager, FakeGoogleCredentials, FakeKubeAPIServer, StubHTTPServer
+
+PROJECT, LOCATION = "toolkit-project", "europe-west1"
+CLUSTERS = ("prod-a", "prod-b")
+
+def install_stand_ins(issued, token_lifetime, cluster_manager, counts):
+    def load_credentials():
+        # Like reading the key file again: new credentials without a token
+        counts["credential loads"] += 1
+        return FakeGoogleCredentials(lifetime=token_lifetime, issued=issued)
+
+    def create_cluster_manager(loaded_credentials):
+        counts["cluster managers"] += 1
+        return cluster_manager
+
+    gke_clients.load_credentials = load_credentials
+    gke_clients.create_cluster_manager = create_cluster_manager
+
+def run(label, args, servers, cached):
+    issued = {}
+    cluster_manager = FakeClusterManager({gke_clients.cluster_path(PROJECT, LOCATION, name): server.url
+                                          for name, (server, _) in servers.items()})
+    counts = Counter()
+    install_stand_ins(issued, args.token_lifetime, cluster_manager, counts)
+    for _, api_server in servers.values():
+        api_server.authorize = FakeGoogleCredentials(issued=issued).is_valid_token
+        api_server.deployments.clear()
+        api_server.requests = api_server.rejected = 0
+    gke_clients.reset()
+
+    print(f"{label}:")
+    start = time.perf_counter()
+    for batch in range(args.batches):
+        before = Counter(counts, refreshes=len(issued), get_cluster=cluster_manager.calls["get_cluster"],
+                         requests=sum(api_server.requests for _, api_server in servers.values()))
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(args.deployments):
+                if not cached:
+                    gke_clients.reset()
+                cloud_manager.deploy_to_gke(f"app:v{batch}", f"service-{i}", replicas=2, project_id=PROJECT,
+                                            location=LOCATION, cluster_name=CLUSTERS[i % len(CLUSTERS)])
+        after = Counter(counts, refreshes=len(issued), get_cluster=cluster_manager.calls["get_cluster"],
+                        requests=sum(api_server.requests for _, api_server in servers.values()))
+        delta = {key: after[key] - before[key] for key in
+                 ("credential loads", "refreshes", "cluster managers", "get_cluster", "requests")}
+        print(f"  batch {batch + 1}: credential loads {delta['credential loads']:>3}   token refreshes {delta['refreshes']:>3}   "
+              f"cluster managers {delta['cluster managers']:>3}   get_cluster {delta['get_cluster']:>3}   "
+              f"API requests {delta['requests']:>3}")
+        time.sleep(args.pause)
+    elapsed = time.perf_counter() - start - args.pause * args.batches
+
+    rejected = sum(api_server.rejected for _, api_server in servers.values())
+    applied = {(name, key[1]): deployment["spec"]["template"]["spec"]["containers"][0]["image"]
+               for name, (_, api_server) in servers.items() for key, deployment in api_server.deployments.items()}
+    expected = {(CLUSTERS[i % len(CLUSTERS)], f"service-{i}"): f"app:v{args.batches - 1}" for i in range(args.deployments)}
+    print(f"  wall time {elapsed:.2f} s (without pauses), requests with an expired token: {rejected}")
+    return rejected == 0 and applied == expected
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark remote calls per GKE deployment batch")
+    parser.add_argument("--batches", type=int, default=5, help="Deployment batches")
+    parser.add_argument("--deployments", type=int, default=20, help="Deployments per batch, spread over two clusters")
+    parser.add_argument("--token-lifetime", type=float, default=3.0, help="Seconds each access token lasts")
+    parser.add_argument("--refresh-margin", type=float, default=1.0, help="Seconds before expiry that tokens are refreshed")
+    parser.add_argument("--cluster-ttl", type=float, default=2.0, help="Seconds cluster endpoint and CA data are cached")
+    parser.add_argument("--pause", type=float, default=0.8, help="Seconds between batches")
+    args = parser.parse_args()
+
+    gke_clients.TOKEN_REFRESH_MARGIN = args.refresh_margin
+    gke_clients.CLUSTER_CACHE_TTL = args.cluster_ttl
+    api_servers = {name: FakeKubeAPIServer() for name in CLUSTERS}
+    with contextlib.ExitStack() as stack:
+        servers = {name: (stack.enter_context(StubHTTPServer(routes=api_server.routes)), api_server)
+                   for name, api_server in api_servers.items()}
+        print(f"{args.batches} batches of {args.deployments} deployments over {len(CLUSTERS)} clusters, "
+              f"token lifetime {args.token_lifetime}s, cluster cache {args.cluster_ttl}s")
+        uncached_ok = run("uncached", args, servers, cached=False)
+        cached_ok = run("cached", args, servers, cached=True)
+
+    passed = uncached_ok and cached_ok
+    print(f"{'PASS' if passed else 'FAIL'}  every deployment applied to its cluster, no request with an expired token")
+    sys.exit(0 if passed else 1)
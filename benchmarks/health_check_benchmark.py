@@ -0,0 +1,66 @@
+"""Health check throughput benchmark against a local stub HTTP server.
+
+Runs repeated sweeps of HealthCheckScheduler over N targets and reports checks
+per second and p50/p99 sweep latency. A fraction of targets can be made slow to
+show the effect of hanging services. With --baseline, the serial
+monitor_health() loop is timed for one sweep as well.
+
+Usage:
+    python benchmarks/health_check_benchmark.py [--targets 1000] [--sweeps 10]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import monitoring.metric_store as metric_store
+from benchmarks.fakes import StubHTTPServer, percentile
+from monitoring.monitor import HealthCheckScheduler, monitor_health
+
+async def run_sweeps(targets, sweeps, concurrency, timeout):
+    durations = []
+    async with HealthCheckScheduler(targets, timeout=timeout, concurrency=concurrency, verbose=False) as scheduler:
+        for _ in range(sweeps):
+            start = time.perf_counter()
+            await scheduler.run_sweep()
+            durations.append(time.perf_counter() - start)
+    return durations
+
+def run_baseline(targets):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for deployment_name, url in targets.items():
+            monitor_health(url, deployment_name)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent health checks")
+    parser.add_argument("--targets", type=int, default=1000, help="Number of health check targets")
+    parser.add_argument("--sweeps", type=int, default=10, help="Number of sweeps to run")
+    parser.add_argument("--concurrency", type=int, default=100, help="Maximum checks in flight")
+    parser.add_argument("--timeout", type=float, default=5, help="Per-check timeout in seconds")
+    parser.add_argument("--latency", type=float, default=0.0, help="Stub server response latency in seconds")
+    parser.add_argument("--baseline", action="store_true", help="Also time one serial monitor_health sweep")
+    args = parser.parse_args()
+
+    with StubHTTPServer(latency=args.latency) as server, tempfile.TemporaryDirectory() as store_dir:
+        # Keep the health history the checks record out of the working directory
+        metric_store._metric_store = metric_store.MetricStore(store_dir)
+        targets = {f"service-{i}": f"{server.url}/health/{i}" for i in range(args.targets)}
+        durations = asyncio.run(run_sweeps(targets, args.sweeps, args.concurrency, args.timeout))
+
+        print(f"Targets: {args.targets}, sweeps: {args.sweeps}, concurrency: {args.concurrency}")
+        print(f"Checks per second: {args.targets * args.sweeps / sum(durations):.0f}")
+        print(f"Sweep latency p50: {statistics.median(durations) * 1000:.1f} ms, p99: {percentile(durations, 0.99) * 1000:.1f} ms")
+
+        if args.baseline:
+            serial = run_baseline(targets)
+            print(f"Serial monitor_health sweep: {serial * 1000:.1f} ms ({args.targets / serial:.0f} checks per second)")
+        metric_store._metric_store.close()
@@ -0,0 +1,85 @@
+"""Kubernetes API calls saved by the shared informer cache, against a fake API server with watches.
+
+Runs `--rounds` rounds of the reads the managers make (a read of every
+deployment, a pod list per deployment for logs, and secret lookups), with a
+few scale patches between rounds, first with direct API reads and then with
+client_provider's informers. Reports API calls by method and wall time, and
+checks that the cached deployments caught up with every write.
+
+Usage:
+    python benchmarks/informer_benchmark.py [--deployments 200] [--namespaces 4] [--rounds 10]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config.config_manager as config_manager
+import kubernetes_dep.client_provider as client_provider
+import scaling.resource_manager as resource_manager
+from benchmarks.fakes import FakeAppsV1Api, FakeCoreV1Api, FakeKubernetes
+
+def make_cluster(deployments, namespaces, pods_per_deployment, latency):
+    fake = FakeKubernetes(latency=latency)
+    apps_api, core_api = FakeAppsV1Api(fake), FakeCoreV1Api(fake)
+    targets = []
+    for i in range(deployments):
+        namespace, name = f"team-{i % namespaces}", f"service-{i}"
+        apps_api.add_deployment(name, namespace)
+        for pod in range(pods_per_deployment):
+            core_api.add_pod(f"{name}-{pod}", namespace, labels={"app": name})
+        core_api.add_secret(f"{name}-credentials", {"password": f"secret-{i}"}, namespace)
+        targets.append((namespace, name))
+    fake.calls.clear()
+    return fake, apps_api, core_api, targets
+
+def run_round(targets, round_number):
+    for namespace, name in targets:
+        client_provider.get_object("Deployment", name, namespace)
+        client_provider.list_objects("Pod", namespace, label_selector=f"app={name}")
+        config_manager.get_secret_kubernetes(f"{name}-credentials", namespace)
+    # A few writes between rounds, which always go to the API server
+    for namespace, name in targets[round_number::max(1, len(targets) // 5)]:
+        resource_manager.scale_deployment(name, 2 + round_number, namespace)
+    resource_manager.get_replica_counts(targets[0][0])
+
+def measure(label, use_informers, args):
+    fake, apps_api, core_api, targets = make_cluster(args.deployments, args.namespaces, args.pods, args.latency)
+    client_provider.reset()
+    client_provider.USE_INFORMERS = use_informers
+    client_provider._apps_api, client_provider._core_api = apps_api, core_api
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for round_number in range(args.rounds):
+            run_round(targets, round_number)
+    wall_time = time.perf_counter() - start
+    calls = dict(sorted(fake.calls.items()))
+    print(f"{label:<10} API calls: {fake.total_calls:>6}   wall time: {wall_time:>6.2f} s")
+    print(f"{'':<10} {calls}")
+
+    if use_informers:
+        # Writes reach the cache through the watch; give the last ones a moment
+        time.sleep(0.2)
+        stale = [key for key in targets
+                 if client_provider.get_object("Deployment", key[1], key[0]).spec.replicas
+                 != fake.objects[("Deployment",) + key]["spec"]["replicas"]]
+        print(f"{'':<10} stale cached deployments after the run: {len(stale)}")
+    client_provider.reset()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the shared Kubernetes informer cache")
+    parser.add_argument("--deployments", type=int, default=200, help="Number of deployments")
+    parser.add_argument("--namespaces", type=int, default=4, help="Number of namespaces")
+    parser.add_argument("--pods", type=int, default=3, help="Pods per deployment")
+    parser.add_argument("--rounds", type=int, default=10, help="Rounds of reads")
+    parser.add_argument("--latency", type=float, default=0.001, help="Fake API latency per call in seconds")
+    args = parser.parse_args()
+
+    config_manager.CONFIG_SOURCE = "kubernetes"
+    print(f"Deployments: {args.deployments} in {args.namespaces} namespaces, {args.rounds} rounds")
+    measure("direct", False, args)
+    measure("informers", True, args)
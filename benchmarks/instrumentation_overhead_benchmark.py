@@ -0,0 +1,103 @@
+"""Per-call overhead of the operation instrumentation.
+
+Times `--calls` calls of an empty function bare, through @instrument and
+inside a track() block, single-threaded and from `--threads` threads at once,
+and reports the added cost per call. It then times keep-alive HTTP requests to
+a local stub server, the cheapest real operation the toolkit instruments, and
+reports the overhead relative to one request.
+
+Exits with status 1 if the overhead per call exceeds `--max-overhead-us`
+microseconds or `--max-relative` of a local HTTP request.
+
+Usage:
+    python benchmarks/instrumentation_overhead_benchmark.py [--calls 200000] [--threads 4]
+"""
+import argparse
+import http.client
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import StubHTTPServer
+from monitoring.instrumentation import get_operation_stats, instrument, reset_stats, track
+
+def noop():
+    return None
+
+@instrument("noop", "benchmark")
+def instrumented_noop():
+    return None
+
+def tracked_noop():
+    with track("noop_block", "benchmark"):
+        return None
+
+def time_calls(function, calls, threads=1):
+    """Return the wall time per call of `function` called `calls` times in total from `threads` threads."""
+    per_thread = calls // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(per_thread):
+            function()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return (time.perf_counter() - start) / (per_thread * threads)
+
+def best_of(runs, function, *args):
+    return min(function(*args) for _ in range(runs))
+
+def time_http_requests(server, requests):
+    connection = http.client.HTTPConnection(server.host, server.port)
+    start = time.perf_counter()
+    for _ in range(requests):
+        connection.request("GET", "/health")
+        connection.getresponse().read()
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return elapsed / requests
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the overhead of operation instrumentation")
+    parser.add_argument("--calls", type=int, default=200000, help="Calls per measurement")
+    parser.add_argument("--threads", type=int, default=4, help="Threads for the contended measurement")
+    parser.add_argument("--runs", type=int, default=5, help="Measurements per variant, the best one is kept")
+    parser.add_argument("--requests", type=int, default=2000, help="HTTP requests for the reference operation")
+    parser.add_argument("--max-overhead-us", type=float, default=5.0, help="Largest acceptable overhead per call")
+    parser.add_argument("--max-relative", type=float, default=0.02, help="Largest acceptable overhead per HTTP request")
+    args = parser.parse_args()
+
+    print(f"Calls: {args.calls} per run, best of {args.runs}")
+    overheads = {}
+    for threads in (1, args.threads):
+        bare = best_of(args.runs, time_calls, noop, args.calls, threads)
+        for label, function in (("@instrument", instrumented_noop), ("track()", tracked_noop)):
+            per_call = best_of(args.runs, time_calls, function, args.calls, threads)
+            overheads[(label, threads)] = per_call - bare
+            print(f"{label:<12} {threads:>2} thread(s)   bare {bare * 1e9:>7.0f} ns   "
+                  f"instrumented {per_call * 1e9:>7.0f} ns   overhead {(per_call - bare) * 1e9:>7.0f} ns/call")
+
+    expected = args.runs * args.calls // args.threads * args.threads + args.runs * args.calls
+    recorded = get_operation_stats()[("noop", "benchmark")]["calls"]
+    assert recorded == expected, f"recorded {recorded} calls, expected {expected}"
+    reset_stats()
+
+    with StubHTTPServer() as server:
+        request_time = best_of(args.runs, time_http_requests, server, args.requests)
+    worst = max(overheads.values())
+    relative = worst / request_time
+    print(f"local HTTP request {request_time * 1e6:.0f} us, worst overhead {worst * 1e6:.2f} us ({relative:.3%})")
+
+    failed = worst * 1e6 > args.max_overhead_us or relative > args.max_relative
+    print(f"{'FAIL' if failed else 'PASS'}  overhead within {args.max_overhead_us} us/call and {args.max_relative:.0%} of a request")
+    sys.exit(1 if failed else 0)
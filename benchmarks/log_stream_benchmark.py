@@ -0,0 +1,64 @@
+"""Peak memory and throughput of streaming log retrieval with a fake multi-GB log source.
+
+- buffered: the old approach, container.logs() into memory and decode it
+  (run on a smaller --baseline-mb log, since it holds the whole log)
+- docker stream: docker_manager.stream_logs() with a regex filter
+- fan-in: log_stream.fan_in() over --pods sources of the same total size
+
+Peak memory is measured with tracemalloc and should stay flat for the
+streaming paths regardless of --size-mb.
+
+Usage:
+    python benchmarks/log_stream_benchmark.py [--size-mb 1024] [--pods 8]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docker_dep.docker_manager as docker_manager
+from benchmarks.fakes import FakeDockerClient, synthetic_log_chunks
+from monitoring.log_stream import fan_in, iter_log_lines
+
+MB = 1024 * 1024
+
+def measure(label, size_bytes, consume):
+    tracemalloc.start()
+    start = time.perf_counter()
+    lines = consume()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<16} {size_bytes / MB:>8.0f} MB   {lines:>10} lines   "
+          f"{size_bytes / MB / elapsed:>7.0f} MB/s   peak memory {peak / MB:>8.2f} MB")
+
+def buffered(container_name):
+    logs = docker_manager.get_client().containers.get(container_name).logs()
+    return len(logs.decode("utf-8").splitlines())
+
+def docker_stream(container_name, pattern):
+    return sum(1 for _ in docker_manager.stream_logs(container_name, pattern=pattern))
+
+def pods_fan_in(size_bytes, pods, pattern):
+    sources = {f"pod-{i}": iter_log_lines(synthetic_log_chunks(size_bytes // pods), pattern) for i in range(pods)}
+    return sum(1 for _ in fan_in(sources))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark streaming log retrieval memory use")
+    parser.add_argument("--size-mb", type=int, default=1024, help="Size of the fake log in MB")
+    parser.add_argument("--baseline-mb", type=int, default=64, help="Log size for the buffered baseline in MB")
+    parser.add_argument("--pods", type=int, default=8, help="Number of pods for the fan-in run")
+    parser.add_argument("--pattern", type=str, default="status=200", help="Regex applied while streaming")
+    args = parser.parse_args()
+
+    client = FakeDockerClient()
+    client.containers.add("baseline", log_bytes=args.baseline_mb * MB)
+    client.containers.add("big", log_bytes=args.size_mb * MB)
+    docker_manager._client = client
+
+    measure("buffered", args.baseline_mb * MB, lambda: buffered("baseline"))
+    measure("docker stream", args.size_mb * MB, lambda: docker_stream("big", args.pattern))
+    measure(f"fan-in {args.pods} pods", args.size_mb * MB, lambda: pods_fan_in(args.size_mb * MB, args.pods, args.pattern))
@@ -0,0 +1,79 @@
+"""Logging throughput and caller-side latency, synchronous FileHandler vs the queued JSON-lines backend.
+
+Logs `--records` events from `--threads` threads through:
+
+- file handler: the previous setup, a logging.FileHandler written on the calling thread
+- queued: monitoring.logger.setup_logger(), a queue handler with a batching,
+  rotating writer on a background listener
+
+and reports calls per second, p50/p99/max latency seen by the caller, and the
+time until everything queued is on disk. Logs are written to a temporary
+directory.
+
+Usage:
+    python benchmarks/logging_benchmark.py [--records 200000] [--threads 4]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import percentile
+
+def file_handler_logger(directory):
+    logger = logging.getLogger("benchmark.file_handler")
+    logger.propagate = False
+    handler = logging.FileHandler(os.path.join(directory, "file_handler.log"))
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    return logger, handler.close
+
+def queued_logger(directory):
+    import monitoring.logger as logger_module
+    logger_module.LOG_DIRECTORY = directory
+    logger = logger_module.setup_logger("benchmark.queued", "queued.log")
+    logger.propagate = False
+    return logger, logger_module.shutdown_logging
+
+def measure(label, make_logger, records, threads):
+    with tempfile.TemporaryDirectory() as directory:
+        logger, close = make_logger(directory)
+        per_thread = records // threads
+        latencies = [[] for _ in range(threads)]
+
+        def worker(samples):
+            for i in range(per_thread):
+                start = time.perf_counter_ns()
+                logger.info("Container %s changed state to %s", f"web-{i % 50}", "running")
+                samples.append(time.perf_counter_ns() - start)
+
+        workers = [threading.Thread(target=worker, args=(samples,)) for samples in latencies]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        calls_done = time.perf_counter() - start
+        close()
+        drained = time.perf_counter() - start
+
+        samples = sorted(sample / 1000 for thread_samples in latencies for sample in thread_samples)
+        print(f"{label:<14} {per_thread * threads / calls_done:>10.0f} calls/s   "
+              f"latency p50 {percentile(samples, 0.5):>6.1f} us  p99 {percentile(samples, 0.99):>7.1f} us  "
+              f"max {samples[-1] / 1000:>7.1f} ms   on disk after {drained:.2f} s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark synchronous vs queued logging")
+    parser.add_argument("--records", type=int, default=200000, help="Total log calls")
+    parser.add_argument("--threads", type=int, default=4, help="Threads logging concurrently")
+    args = parser.parse_args()
+
+    print(f"Records: {args.records}, threads: {args.threads}")
+    measure("file handler", file_handler_logger, args.records, args.threads)
+    measure("queued", queued_logger, args.records, args.threads)
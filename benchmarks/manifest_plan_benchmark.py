@@ -0,0 +1,189 @@
+"""Plan/diff time against object count for `k8s --deploy` manifests, against a fake Kubernetes API server.
+
+For each object count in `--objects`, writes one multi-document manifest of
+Deployments, Services and ConfigMaps spread over `--namespaces` namespaces,
+applies it to a fresh fake cluster, and times a no-change plan:
+
+- baseline: pure-Python YAML loader and one read per object
+- engine: kubernetes_dep.manifest_plan, with the C loader and one raw list per
+  kind and namespace
+
+Then, at the largest count, edits the manifest (changed images, removed and
+added objects), scales a few deployments behind its back, and checks that
+the plan finds exactly those changes, that applying it sends only them and
+that the next plan is clean. Exits with status 1 if any check fails.
+
+Usage:
+    python benchmarks/manifest_plan_benchmark.py [--objects 250,500,1000,2000] [--namespaces 4]
+"""
+import argparse
+import contextlib
+import copy
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml
+
+import kubernetes_dep.client_provider as client_provider
+import kubernetes_dep.manifest_plan as manifest_plan
+from benchmarks.fakes import FakeAppsV1Api, FakeCoreV1Api, FakeKubernetes
+
+_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+def make_objects(count, namespaces):
+    """Return `count` objects: per service a Deployment, a Service and a ConfigMap."""
+    objects = []
+    for i in range((count + 2) // 3):
+        name, labels = f"service-{i}", {"app": f"service-{i}", "team": f"team-{i % 7}"}
+        metadata = {"name": name, "namespace": f"team-{i % namespaces}", "labels": labels}
+        objects.append({
+            "apiVersion": "apps/v1", "kind": "Deployment", "metadata": copy.deepcopy(metadata),
+            "spec": {"replicas": 2, "selector": {"matchLabels": {"app": name}}, "template": {
+                "metadata": {"labels": labels},
+                "spec": {"containers": [{
+                    "name": name, "image": f"registry.example.com/{name}:1.0.{i}",
+                    "ports": [{"containerPort": 8080}],
+                    "env": [{"name": "LOG_LEVEL", "value": "info"}, {"name": "REGION", "value": "eu-west-1"}],
+                    "resources": {"requests": {"cpu": "250m", "memory": "256Mi"}, "limits": {"cpu": "1", "memory": "512Mi"}},
+                }]},
+            }},
+        })
+        objects.append({"apiVersion": "v1", "kind": "Service", "metadata": copy.deepcopy(metadata),
+                        "spec": {"selector": {"app": name}, "ports": [{"port": 80, "targetPort": 8080}]}})
+        objects.append({"apiVersion": "v1", "kind": "ConfigMap", "metadata": {**copy.deepcopy(metadata), "name": f"{name}-config"},
+                        "data": {"settings.yaml": f"workers: {i % 8 + 1}\ntimeout: 30\n", "feature_flags": "checkout,search"}})
+    return objects[:count]
+
+def write_manifest(path, objects):
+    with open(path, "w") as manifest_file:
+        yaml.dump_all(objects, manifest_file, Dumper=_DUMPER)
+
+def make_cluster(latency):
+    fake = FakeKubernetes(latency=latency)
+    client_provider.reset()
+    client_provider._apps_api, client_provider._core_api = FakeAppsV1Api(fake), FakeCoreV1Api(fake)
+    return fake
+
+def baseline_plan(path):
+    """Plan with the pure-Python loader and one read per object."""
+    loader = manifest_plan._LOADER
+    manifest_plan._LOADER = yaml.SafeLoader
+    try:
+        desired = manifest_plan.load_desired_objects(path)
+    finally:
+        manifest_plan._LOADER = loader
+
+    def read(key):
+        kind, namespace, name = key
+        get_api, suffix = manifest_plan._KINDS[kind]
+        api = get_api()
+        try:
+            obj = getattr(api, f"read_namespaced_{suffix}")(name, namespace)
+        except Exception:
+            return key, None
+        return key, api.fake._api_client.sanitize_for_serialization(obj)
+
+    with ThreadPoolExecutor(max_workers=manifest_plan.LIST_WORKERS) as executor:
+        live = {key: obj for key, obj in executor.map(read, desired) if obj is not None}
+    return manifest_plan.plan_objects(desired, live)
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def actions(plan):
+    counts = {}
+    for entry in plan:
+        counts[entry.action] = counts.get(entry.action, 0) + 1
+    return counts
+
+def measure(count, args, directory):
+    path = os.path.join(directory, f"manifest-{count}.yaml")
+    objects = make_objects(count, args.namespaces)
+    write_manifest(path, objects)
+    fake = make_cluster(args.latency)
+    with contextlib.redirect_stdout(io.StringIO()):
+        manifest_plan.apply_plan(manifest_plan.plan_manifests(path)[1])
+
+    fake.calls.clear()
+    baseline, baseline_time = timed(lambda: baseline_plan(path))
+    baseline_calls = fake.total_calls
+    fake.calls.clear()
+    desired, load_time = timed(lambda: manifest_plan.load_desired_objects(path))
+    live, list_time = timed(lambda: manifest_plan.fetch_live_objects((kind, namespace) for kind, namespace, _ in desired))
+    plan, diff_time = timed(lambda: manifest_plan.plan_objects(desired, live))
+    total = load_time + list_time + diff_time
+    print(f"{count:>7}   {baseline_time:>8.2f} s {baseline_calls:>7}   {load_time:>6.2f} s {list_time:>6.2f} s "
+          f"{diff_time:>6.2f} s {total:>6.2f} s {fake.total_calls:>6}   {baseline_time / total:>6.1f}x")
+    unchanged = actions(plan) == {"unchanged": len(desired)} and actions(baseline) == actions(plan)
+    return path, objects, fake, unchanged
+
+def check_changes(path, objects, fake):
+    """Edit the manifest and the live state, and check the plan, its apply and the next plan."""
+    deployments = [obj for obj in objects if obj["kind"] == "Deployment"]
+    config_maps = [obj for obj in objects if obj["kind"] == "ConfigMap"]
+    edited = copy.deepcopy(objects)
+    for obj in edited:
+        if obj["kind"] == "Deployment" and obj in deployments[:5]:
+            obj["spec"]["template"]["spec"]["containers"][0]["image"] += "-patched"
+    removed = {(obj["kind"], obj["metadata"]["namespace"], obj["metadata"]["name"]) for obj in config_maps[:3]}
+    edited = [obj for obj in edited if (obj["kind"], obj["metadata"]["namespace"], obj["metadata"]["name"]) not in removed]
+    edited += [{"apiVersion": "v1", "kind": "Service", "metadata": {"name": f"new-service-{i}", "namespace": "team-0"},
+                "spec": {"selector": {"app": f"new-service-{i}"}, "ports": [{"port": 80}]}} for i in range(2)]
+    write_manifest(path, edited)
+    # Four deployments are hand-edited in the cluster, three more scaled by an autoscaler, which is not drift
+    for obj in deployments[5:12]:
+        live = copy.deepcopy(fake.get("Deployment", obj["metadata"]["namespace"], obj["metadata"]["name"]))
+        if obj in deployments[5:9]:
+            live["spec"]["template"]["spec"]["containers"][0]["image"] += "-hotfix"
+        else:
+            live["spec"]["replicas"] = 5
+        fake.store_deployment(live)
+
+    fake.calls.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, plan = manifest_plan.plan_manifests(path)
+        results = manifest_plan.apply_plan(plan, prune=True)
+    writes = sum(calls for method, calls in fake.calls.items() if not method.startswith(("list_", "read_")))
+    reasons = sorted(entry.reason for entry in plan if entry.action == "update")
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, replan = manifest_plan.plan_manifests(path)
+    return [
+        ("plan finds 2 creates, 5 changed, 4 drifted and 3 prunes",
+         {key: value for key, value in actions(plan).items() if key != "unchanged"} == {"create": 2, "update": 9, "prune": 3}
+         and reasons == ["changed"] * 5 + ["drift"] * 4
+         and {entry.key for entry in plan if entry.action == "prune"} == removed),
+        ("apply sends only the 14 changes", writes == 14 and all(r["status"] != "failed" for r in results.values())),
+        ("next plan has nothing to do", set(actions(replan)) == {"unchanged"}),
+    ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark manifest plan/diff time against object count")
+    parser.add_argument("--objects", type=str, default="250,500,1000,2000", help="Comma-separated object counts")
+    parser.add_argument("--namespaces", type=int, default=4, help="Namespaces the objects are spread over")
+    parser.add_argument("--latency", type=float, default=0.002, help="Fake API server latency per call in seconds")
+    args = parser.parse_args()
+
+    counts = [int(count) for count in args.objects.split(",")]
+    print(f"No-change plan, {args.namespaces} namespaces, API latency {args.latency * 1000:.0f} ms "
+          f"(C loader available: {yaml.__with_libyaml__})")
+    print(f"{'objects':>7}   {'baseline':>10} {'calls':>7}   {'load':>8} {'lists':>8} {'diff':>8} {'total':>8} {'calls':>6}   speedup")
+    checks = []
+    with tempfile.TemporaryDirectory() as directory:
+        for count in counts:
+            path, objects, fake, unchanged = measure(count, args, directory)
+            checks.append((f"{count} objects: no-change plan is clean and agrees with the baseline", unchanged))
+        checks += check_changes(path, objects, fake)
+
+    failed = 0
+    for label, passed in checks:
+        print(f"{'PASS' if passed else 'FAIL'}  {label}")
+        failed += not passed
+    sys.exit(1 if failed else 0)
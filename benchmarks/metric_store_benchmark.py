@@ -0,0 +1,94 @@
+"""Insert rate, range query latency and disk footprint of the local metric store.
+
+Writes `--samples` samples spread over `--series` series (one sample every
+`--step` seconds per series, ending now) to a store in a temporary directory,
+first one append() at a time and then with append_many() into a second store.
+Then times range queries of different widths and reports the disk footprint
+before and after downsampling everything older than a day.
+
+Usage:
+    python benchmarks/metric_store_benchmark.py [--samples 1000000] [--series 10]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from benchmarks.fakes import percentile
+from monitoring.metric_store import MetricStore, series_name
+
+MB = 1024 * 1024
+
+def make_series(series, samples_per_series, step, now):
+    timestamps = now - step * np.arange(samples_per_series, 0, -1, dtype=np.float64)
+    names = [series_name("cpu_usage", deployment_name=f"service-{i}") for i in range(series)]
+    return names, timestamps
+
+def insert_one_by_one(store, names, timestamps):
+    values = np.random.default_rng(0).random(len(timestamps)).tolist()
+    timestamp_list = timestamps.tolist()
+    start = time.perf_counter()
+    for name in names:
+        for timestamp, value in zip(timestamp_list, values):
+            store.append(name, value, timestamp)
+    store.flush()
+    return time.perf_counter() - start
+
+def insert_bulk(store, names, timestamps):
+    values = np.random.default_rng(0).random(len(timestamps), dtype=np.float32)
+    start = time.perf_counter()
+    for name in names:
+        store.append_many(name, timestamps, values)
+    return time.perf_counter() - start
+
+def time_queries(store, names, timestamps, window, resolution=None, queries=200):
+    latencies, returned = [], []
+    for _ in range(queries):
+        name = random.choice(names)
+        start = random.uniform(timestamps[0], max(timestamps[0], timestamps[-1] - window))
+        began = time.perf_counter()
+        result_timestamps, _ = store.query(name, start, start + window, resolution)
+        latencies.append(time.perf_counter() - began)
+        returned.append(len(result_timestamps))
+    return latencies, statistics.mean(returned)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the local metric store")
+    parser.add_argument("--samples", type=int, default=1000000, help="Total samples to insert")
+    parser.add_argument("--series", type=int, default=10, help="Number of series")
+    parser.add_argument("--step", type=float, default=15, help="Seconds between samples of a series")
+    args = parser.parse_args()
+
+    now = time.time()
+    names, timestamps = make_series(args.series, args.samples // args.series, args.step, now)
+    total = len(names) * len(timestamps)
+    print(f"Samples: {total} in {len(names)} series, covering {(timestamps[-1] - timestamps[0]) / 86400:.1f} days")
+
+    with tempfile.TemporaryDirectory() as root:
+        one_by_one = MetricStore(os.path.join(root, "append"), maintenance_interval=float("inf"))
+        elapsed = insert_one_by_one(one_by_one, names, timestamps)
+        print(f"append()        {total / elapsed:>12.0f} samples/s")
+
+        store = MetricStore(os.path.join(root, "bulk"), maintenance_interval=float("inf"))
+        elapsed = insert_bulk(store, names, timestamps)
+        print(f"append_many()   {total / elapsed:>12.0f} samples/s")
+
+        for label, window, resolution in (("1 hour", 3600, None), ("1 day", 86400, None),
+                                          ("7 days", 7 * 86400, None), ("7 days @ 5m", 7 * 86400, 300)):
+            latencies, returned = time_queries(store, names, timestamps, window, resolution)
+            print(f"query {label:<12} p50 {percentile(latencies, 0.5) * 1000:>7.3f} ms   "
+                  f"p99 {percentile(latencies, 0.99) * 1000:>7.3f} ms   {returned:>8.0f} points")
+
+        before = store.disk_usage()
+        print(f"disk footprint  {before / MB:>9.2f} MB ({before / total:.1f} bytes/sample)")
+        store.downsample_after = 86400
+        store.compact(now)
+        after = store.disk_usage()
+        print(f"downsampled     {after / MB:>9.2f} MB (older than 1 day at {store.downsample_resolution} s resolution)")
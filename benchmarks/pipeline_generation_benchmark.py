@@ -0,0 +1,70 @@
+"""CI file generation throughput for a large repository inventory.
+
+Writes a `--repositories` entry inventory (GitHub Actions and GitLab CI for
+every repository) to a temporary directory and reports files per second for:
+
+- format loop: the previous approach, WORKFLOW_TEMPLATE.format() and an
+  unconditional write per file, serially
+- first run: generate_pipeline() into an empty output directory
+- no-op rerun: the same inventory again, where every write is skipped
+- 1% changed: a rerun after changing the branch of 1% of the repositories
+
+Usage:
+    python benchmarks/pipeline_generation_benchmark.py [--repositories 10000] [--workers 4]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ci_cd.generator as generator
+
+def write_inventory(path, repositories, changed_every=0):
+    entries = []
+    for i in range(repositories):
+        branch = "release" if changed_every and i % changed_every == 0 else "main"
+        entries.append({"name": f"service-{i}", "branch": branch, "python_version": f"3.{9 + i % 4}"})
+    with open(path, "w") as inventory_file:
+        json.dump({"defaults": {"targets": ["github", "gitlab"]}, "repositories": entries}, inventory_file)
+
+def format_loop(inventory, output_dir):
+    for values in generator.load_inventory(inventory):
+        for target, template in (("github", generator.WORKFLOW_TEMPLATE), ("gitlab", generator.GITLAB_CI_TEMPLATE)):
+            path = generator.output_path(output_dir, target, values)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as output_file:
+                output_file.write(template.format(**values))
+
+def measure(label, files, run):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = run()
+    elapsed = time.perf_counter() - start
+    skipped = sum(1 for status in results.values() if status == "unchanged") if results else 0
+    print(f"{label:<14} {files / elapsed:>9.0f} files/s   {elapsed:>6.2f} s   skipped writes: {skipped:>6}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batch CI file generation")
+    parser.add_argument("--repositories", type=int, default=10000, help="Inventory entries")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Render processes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        inventory = os.path.join(root, "inventory.json")
+        write_inventory(inventory, args.repositories)
+        files = args.repositories * 2
+        print(f"Repositories: {args.repositories}, files: {files}, workers: {args.workers}")
+
+        measure("format loop", files, lambda: format_loop(inventory, os.path.join(root, "baseline")))
+        output_dir = os.path.join(root, "generated")
+        run = lambda: generator.generate_pipeline(inventory=inventory, output_dir=output_dir, max_workers=args.workers)
+        measure("first run", files, run)
+        measure("no-op rerun", files, run)
+        write_inventory(inventory, args.repositories, changed_every=100)
+        measure("1% changed", files, run)
@@ -0,0 +1,58 @@
+"""Prometheus round trips and wall time per scaling cycle, per-deployment vs batched.
+
+The per-deployment path calls get_prometheus_metric() for cpu_usage and
+memory_usage of every deployment (2N queries). The batched path calls
+fetch_deployment_metrics() once (one query per metric).
+
+Usage:
+    python benchmarks/prometheus_batch_benchmark.py [--deployments 500] [--cycles 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scaling.resource_manager as resource_manager
+from benchmarks.fakes import FakePrometheus, StubHTTPServer
+
+def per_deployment_cycle(deployment_names):
+    for deployment_name in deployment_names:
+        for metric_name in resource_manager.SCALING_METRICS:
+            resource_manager.get_prometheus_metric(metric_name, deployment_name)
+
+def batched_cycle(deployment_names):
+    resource_manager.fetch_deployment_metrics(deployment_names)
+
+def measure(cycle, deployment_names, cycles, prometheus):
+    queries_before = prometheus.queries
+    durations = []
+    for _ in range(cycles):
+        start = time.perf_counter()
+        cycle(deployment_names)
+        durations.append(time.perf_counter() - start)
+    return (prometheus.queries - queries_before) / cycles, statistics.median(durations)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched Prometheus queries")
+    parser.add_argument("--deployments", type=int, default=500, help="Number of tracked deployments")
+    parser.add_argument("--cycles", type=int, default=5, help="Number of scaling cycles to time")
+    parser.add_argument("--latency", type=float, default=0.002, help="Fake Prometheus latency per query in seconds")
+    args = parser.parse_args()
+
+    prometheus = FakePrometheus(latency=args.latency)
+    with StubHTTPServer(routes=prometheus.routes) as server:
+        resource_manager.PROMETHEUS_URL = server.url
+        deployment_names = [f"service-{i}" for i in range(args.deployments)]
+
+        # Both paths must agree before their timings mean anything
+        batched = resource_manager.fetch_deployment_metrics(deployment_names[:10])
+        for i, deployment_name in enumerate(batched["deployment"]):
+            assert batched["cpu_usage"][i] == resource_manager.get_prometheus_metric("cpu_usage", deployment_name)
+
+        print(f"Deployments: {args.deployments}, fake Prometheus latency: {args.latency * 1000:.1f} ms")
+        for label, cycle in (("per-deployment", per_deployment_cycle), ("batched", batched_cycle)):
+            round_trips, wall_time = measure(cycle, deployment_names, args.cycles, prometheus)
+            print(f"{label:<16} round trips per cycle: {round_trips:>6.0f}   wall time per cycle: {wall_time * 1000:>8.1f} ms")
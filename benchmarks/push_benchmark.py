@@ -0,0 +1,109 @@
+"""Multi-tag, multi-registry push benchmark against a fake docker client and registry.
+
+Creates `--images` local images that share their base layers, and pushes each
+one with `--tags` tags to an ECR repository (moto-mocked token) and a second
+registry. Reports wall time, layer uploads, manifest checks and ECR token
+requests for:
+
+- serial: one push at a time, without the manifest check
+- concurrent: push_images() with `--workers` workers into empty registries
+- re-push: the same release again, where every tag is skipped
+- 1 image changed: a re-push after one image got a new top layer
+
+Requires moto (pip install "moto[ecr]").
+
+Usage:
+    python benchmarks/push_benchmark.py [--images 20] [--tags 2] [--workers 8]
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moto import mock_aws
+
+import cloud.cloud_manager as cloud_manager
+import docker_dep.docker_manager as docker_manager
+from benchmarks.fakes import FakeDockerClient, FakeRegistry
+
+ECR_REGISTRY = "123456789012.dkr.ecr.us-east-1.amazonaws.com"
+MIRROR_REGISTRY = "registry.local"
+
+def make_release(docker_client, images, tags):
+    base_layers = [f"sha256:base{i:04d}" for i in range(3)]
+    pushes = []
+    for i in range(images):
+        docker_client.images.add(f"service-{i}:build", layers=base_layers + [f"sha256:deps{i % 4:04d}", f"sha256:app{i:05d}"])
+        pushes.append({"image": f"service-{i}:build", "tags": [f"v1.{t}" if t else "latest" for t in range(tags)],
+                       "repositories": [f"{ECR_REGISTRY}/service-{i}", f"{MIRROR_REGISTRY}/service-{i}"]})
+    return pushes
+
+def serial_push(pushes):
+    # Previous approach: tag and push every destination in turn, blocking until each push finishes
+    for push in pushes:
+        image = docker_manager.get_client().images.get(push["image"])
+        for repository in push["repositories"]:
+            auth_config = docker_manager.get_registry_auth(docker_manager.registry_of(repository))
+            for tag in push["tags"]:
+                image.tag(repository, tag)
+                list(docker_manager.get_client().api.push(repository, tag=tag, stream=True, decode=True, auth_config=auth_config))
+
+def run(label, push, registry, token_calls):
+    uploads, checks, tokens = registry.uploads, registry.manifest_checks, token_calls["GetAuthorizationToken"]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = push()
+    elapsed = time.perf_counter() - start
+    statuses = Counter(result["status"] for result in (results or {}).values())
+    print(f"{label:<16} wall time: {elapsed:>6.2f} s   layer uploads: {registry.uploads - uploads:>4}   "
+          f"manifest checks: {registry.manifest_checks - checks:>4}   ECR tokens: {token_calls['GetAuthorizationToken'] - tokens}"
+          + (f"   {dict(statuses)}" if statuses else ""))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent multi-tag image pushes")
+    parser.add_argument("--images", type=int, default=20, help="Number of images")
+    parser.add_argument("--tags", type=int, default=2, help="Tags per image and registry")
+    parser.add_argument("--workers", type=int, default=docker_manager.PUSH_WORKERS, help="Concurrent pushes")
+    parser.add_argument("--layer-time", type=float, default=0.05, help="Fake upload time per new layer in seconds")
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+
+    with mock_aws():
+        token_calls = Counter()
+
+        def count_and_extend(event_name, parsed, **kwargs):
+            # moto hands out tokens that expired in 2015, give them ECR's 12 hour lifetime
+            token_calls["GetAuthorizationToken"] += 1
+            expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=12)
+            for authorization in parsed.get("authorizationData", []):
+                authorization["expiresAt"] = expires_at
+
+        cloud_manager.get_ecr_client("us-east-1").meta.events.register("after-call.ecr.GetAuthorizationToken", count_and_extend)
+        destinations = args.images * args.tags * 2
+        print(f"Images: {args.images}, destinations: {destinations}, workers: {args.workers}, "
+              f"layer upload: {args.layer_time * 1000:.0f} ms")
+
+        for label, concurrent in (("serial", False), ("concurrent", True)):
+            registry = FakeRegistry(layer_time=args.layer_time, auth_required={ECR_REGISTRY})
+            docker_manager._client = FakeDockerClient(registry=registry)
+            cloud_manager._ecr_tokens.clear()
+            pushes = make_release(docker_manager._client, args.images, args.tags)
+            if concurrent:
+                run(label, lambda: docker_manager.push_images(pushes, max_workers=args.workers), registry, token_calls)
+            else:
+                run(label, lambda: serial_push(pushes), registry, token_calls)
+
+        run("re-push", lambda: docker_manager.push_images(pushes, max_workers=args.workers), registry, token_calls)
+        # A rebuild gives the image a new top layer and forgets its registry digests
+        rebuilt = docker_manager._client.images.images["service-0:build"].layers[:-1] + ["sha256:app-rebuilt"]
+        docker_manager._client.images.add("service-0:build", layers=rebuilt)
+        run("1 image changed", lambda: docker_manager.push_images(pushes, max_workers=args.workers), registry, token_calls)
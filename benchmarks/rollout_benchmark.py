@@ -0,0 +1,73 @@
+"""Batch rollout benchmark against a fake Kubernetes API server.
+
+Releases `--deployments` deployments spread over `--namespaces` namespaces,
+where each rollout completes `--rollout-time` seconds after it is applied.
+Compares a serial release (apply, then poll the deployment until it is ready,
+one at a time) with apply_deployments() (concurrent server-side applies and
+one watch per namespace), reporting wall time, API calls and rollout timings.
+Running it twice against the same cluster also shows that re-applying
+existing deployments works.
+
+Usage:
+    python benchmarks/rollout_benchmark.py [--deployments 60] [--namespaces 3]
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import kubernetes_dep.client_provider as client_provider
+import kubernetes_dep.kubernetes_manager as kubernetes_manager
+from benchmarks.fakes import FakeAppsV1Api, FakeKubernetes
+
+def release(deployments, namespaces, image):
+    manifests = []
+    for i in range(deployments):
+        manifest = kubernetes_manager.build_deployment_manifest(image, f"service-{i}")
+        manifest["metadata"]["namespace"] = f"team-{i % namespaces}"
+        manifests.append(manifest)
+    return manifests
+
+def serial_release(manifests, poll_interval):
+    api = client_provider.get_apps_api()
+    for manifest in manifests:
+        name, namespace = manifest["metadata"]["name"], manifest["metadata"]["namespace"]
+        generation = kubernetes_manager.apply_deployment(manifest).metadata.generation
+        while not kubernetes_manager.is_rolled_out(api.read_namespaced_deployment(name, namespace), generation):
+            time.sleep(poll_interval)
+
+def run(label, release_fn, fake):
+    calls_before = fake.total_calls
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = release_fn()
+    wall_time = time.perf_counter() - start
+    print(f"{label:<22} wall time: {wall_time:>7.2f} s   API calls: {fake.total_calls - calls_before:>5}")
+    if results:
+        rollouts = [result["rollout_seconds"] for result in results.values() if "rollout_seconds" in result]
+        statuses = {}
+        for result in results.values():
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+        print(f"{'':<22} {statuses}, rollout p50 {statistics.median(rollouts):.2f} s, max {max(rollouts):.2f} s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent deployment rollouts")
+    parser.add_argument("--deployments", type=int, default=60, help="Number of deployments to release")
+    parser.add_argument("--namespaces", type=int, default=3, help="Number of namespaces")
+    parser.add_argument("--latency", type=float, default=0.005, help="Fake API latency per call in seconds")
+    parser.add_argument("--rollout-time", type=float, default=0.5, help="Seconds for each rollout to complete")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="Poll interval for the serial release")
+    args = parser.parse_args()
+
+    fake = FakeKubernetes(latency=args.latency, rollout_time=args.rollout_time)
+    client_provider._apps_api = FakeAppsV1Api(fake)
+    print(f"Deployments: {args.deployments} in {args.namespaces} namespaces, rollout time {args.rollout_time:.2f} s")
+
+    run("serial apply + poll", lambda: serial_release(release(args.deployments, args.namespaces, "app:v1"), args.poll_interval), fake)
+    run("apply_deployments", lambda: kubernetes_manager.apply_deployments(release(args.deployments, args.namespaces, "app:v2")), fake)
+    run("apply_deployments (v3)", lambda: kubernetes_manager.apply_deployments(release(args.deployments, args.namespaces, "app:v3")), fake)
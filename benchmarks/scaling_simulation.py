@@ -0,0 +1,144 @@
+"""Replay metric traces through the scaling policies and compare how they react.
+
+A trace is a CSV file with a `timestamp` column and either
+- `load`: demand in replicas' worth of capacity at 100% usage, or
+- `cpu_usage`, `memory_usage` and `replicas`: usage recorded at a replica count.
+
+The simulator converts the trace into demand, evaluates the policy every
+`--interval` seconds, starts new replicas after `--startup-delay` seconds and
+feeds the policy the usage the ready replicas would see. For every policy it
+reports the number of scale events, time-to-capacity (how long the deployment
+stays below the replica count needed to keep usage at the thresholds) and
+replica-seconds spent. Without --trace, a synthetic spike/ramp trace is used.
+
+Usage:
+    python benchmarks/scaling_simulation.py [--trace trace.csv] [--interval 15]
+"""
+import argparse
+import csv
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scaling.resource_manager as resource_manager
+
+POLICIES = {
+    "threshold": lambda: resource_manager.ThresholdPolicy(),
+    "proportional": lambda: resource_manager.ProportionalPolicy(),
+    "proportional+linear": lambda: resource_manager.ProportionalPolicy(forecast="linear"),
+    "proportional+holt": lambda: resource_manager.ProportionalPolicy(forecast="holt"),
+}
+
+def load_trace(path):
+    """Read a trace CSV into a list of (timestamp, cpu_demand, memory_demand)."""
+    trace = []
+    with open(path, newline="") as trace_file:
+        for row in csv.DictReader(trace_file):
+            timestamp = float(row["timestamp"])
+            if "load" in row and row["load"] not in (None, ""):
+                load = float(row["load"])
+                trace.append((timestamp, load, load))
+            else:
+                replicas = float(row["replicas"])
+                trace.append((timestamp, float(row["cpu_usage"]) * replicas, float(row["memory_usage"]) * replicas))
+    return sorted(trace)
+
+def synthetic_trace(duration=7200, step=15, seed=7):
+    """A noisy trace with a sudden spike, a drop and a slow ramp, in replicas' worth of load."""
+    rng = random.Random(seed)
+    trace = []
+    for timestamp in range(0, duration, step):
+        minute = timestamp / 60
+        if 30 <= minute < 60:
+            load = 6.0
+        elif 80 <= minute < 100:
+            load = 1.2 + (minute - 80) * 0.25
+        elif 100 <= minute < 110:
+            load = 6.2
+        else:
+            load = 1.2
+        load *= 1 + rng.gauss(0, 0.08)
+        trace.append((float(timestamp), load, load * 0.8))
+    return trace
+
+def demand_at(trace, timestamp, cursor):
+    while cursor + 1 < len(trace) and trace[cursor + 1][0] <= timestamp:
+        cursor += 1
+    return trace[cursor][1], trace[cursor][2], cursor
+
+def simulate(policy, trace, interval, startup_delay, initial_replicas=1):
+    """Replay a trace through a policy and return summary statistics."""
+    start, end = trace[0][0], trace[-1][0]
+    spec_replicas = initial_replicas
+    pending = []  # Start times of replicas that are not ready yet
+    ready = initial_replicas
+    scale_events = 0
+    replica_seconds = 0.0
+    under_since = None
+    capacity_waits = []
+    cursor = 0
+
+    timestamp = start
+    while timestamp <= end:
+        ready += sum(1 for started in pending if started + startup_delay <= timestamp)
+        pending = [started for started in pending if started + startup_delay > timestamp]
+
+        cpu_demand, memory_demand, cursor = demand_at(trace, timestamp, cursor)
+        needed = min(resource_manager.MAX_REPLICAS, max(resource_manager.MIN_REPLICAS, math.ceil(max(
+            cpu_demand / resource_manager.CPU_THRESHOLD, memory_demand / resource_manager.MEMORY_THRESHOLD) - 1e-9)))
+        if ready < needed and under_since is None:
+            under_since = timestamp
+        elif ready >= needed and under_since is not None:
+            capacity_waits.append(timestamp - under_since)
+            under_since = None
+
+        cpu_usage = cpu_demand / max(ready, 1)
+        memory_usage = memory_demand / max(ready, 1)
+        desired = policy.desired_replicas("simulated", spec_replicas, cpu_usage, memory_usage, now=timestamp)
+        if desired != spec_replicas:
+            scale_events += 1
+            if desired > spec_replicas:
+                pending.extend([timestamp] * (desired - spec_replicas))
+            else:
+                # Scale down removes pending replicas first, then ready ones
+                removed = spec_replicas - desired
+                dropped = min(removed, len(pending))
+                pending = pending[:len(pending) - dropped]
+                ready -= removed - dropped
+            spec_replicas = desired
+
+        replica_seconds += spec_replicas * interval
+        timestamp += interval
+
+    if under_since is not None:
+        capacity_waits.append(end - under_since)
+    return {
+        "scale_events": scale_events,
+        "under_capacity_episodes": len(capacity_waits),
+        "mean_time_to_capacity_s": sum(capacity_waits) / len(capacity_waits) if capacity_waits else 0.0,
+        "max_time_to_capacity_s": max(capacity_waits, default=0.0),
+        "under_capacity_s": sum(capacity_waits),
+        "replica_hours": replica_seconds / 3600,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay metric traces through the scaling policies")
+    parser.add_argument("--trace", type=str, help="Trace CSV file, a synthetic trace is used when omitted")
+    parser.add_argument("--interval", type=float, default=15, help="Seconds between scaling decisions")
+    parser.add_argument("--startup-delay", type=float, default=30, help="Seconds until a new replica is ready")
+    parser.add_argument("--policy", choices=sorted(POLICIES), action="append", help="Policies to compare (default: all)")
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace) if args.trace else synthetic_trace()
+    print(f"Trace: {len(trace)} samples over {(trace[-1][0] - trace[0][0]) / 60:.0f} min, "
+          f"decision interval {args.interval:.0f} s, startup delay {args.startup_delay:.0f} s")
+    print(f"{'policy':<22}{'scale events':>13}{'episodes':>10}{'mean ttc (s)':>14}{'max ttc (s)':>13}"
+          f"{'under cap (s)':>15}{'replica-h':>11}")
+    for name in args.policy or POLICIES:
+        result = simulate(POLICIES[name](), trace, args.interval, args.startup_delay)
+        print(f"{name:<22}{result['scale_events']:>13}{result['under_capacity_episodes']:>10}"
+              f"{result['mean_time_to_capacity_s']:>14.0f}{result['max_time_to_capacity_s']:>13.0f}"
+              f"{result['under_capacity_s']:>15.0f}{result['replica_hours']:>11.2f}")
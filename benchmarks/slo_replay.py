@@ -0,0 +1,168 @@
+"""Replays synthetic health check streams through the SLO engine and checks its window math and alerts.
+
+Window math: feeds RollingWindows random streams (gaps longer than the
+window, late samples, bursts) and compares every total with a brute-force
+count over all samples kept in memory.
+
+Alerts: replays `--days` days of checks every `--interval` seconds for
+`--targets` deployments with a 99% objective:
+
+- flaky: healthy apart from isolated failed checks (`--blip-rate`)
+- outage: a 15 minute outage on the last day
+- slow burn: 3% of checks failing throughout
+
+and counts the alerts the SLO engine sends against the alerts the old
+per-sample check (check_deployment_health) would have sent. Also reports
+samples per second and memory per deployment.
+
+Exits with status 1 if any check fails.
+
+Usage:
+    python benchmarks/slo_replay.py [--targets 200] [--days 2] [--interval 60]
+
+tests/test_slo.py checks the window math and alert rules under pytest.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring.slo import SLOEngine, RollingWindow
+
+START = 1_700_000_000  # Replay start as a Unix timestamp
+OUTAGE = 15 * 60
+
+def check_window_math(rng, streams, samples):
+    """Compare RollingWindow totals with a brute-force count after every sample."""
+    mismatches = 0
+    for _ in range(streams):
+        length, bucket = rng.choice(((300, 10), (3600, 60), (86400, 3600)))
+        window = RollingWindow(length, bucket)
+        size = length // bucket
+        history = []
+        now = START + rng.uniform(0, bucket)
+        for _ in range(samples):
+            step = rng.choice((0, rng.uniform(0, bucket), rng.uniform(0, length / 4), rng.uniform(length, 2 * length)))
+            now += step
+            # Every so often a sample arrives late, stamped somewhere in the last window and a half
+            timestamp = now - rng.uniform(0, 1.5 * length) if rng.random() < 0.1 else now
+            bad = rng.random() < 0.3
+            window.add(timestamp, bad)
+            history.append((int(timestamp // bucket), bad))
+            head = max(number for number, _ in history)
+            inside = [bad for number, bad in history if head - size < number <= head]
+            if (window.total, window.bad) != (len(inside), sum(inside)):
+                mismatches += 1
+    return mismatches
+
+def make_targets(count, rng, days):
+    """Assign each target a failure pattern: flaky, outage or slow burn."""
+    targets = {}
+    for i in range(count):
+        if i % 20 == 0:
+            start = START + (days - 1) * 86400 + rng.uniform(3600, 86400 - 2 * OUTAGE)
+            targets[f"outage-{i}"] = ("outage", start)
+        elif i % 20 == 1:
+            targets[f"slow-burn-{i}"] = ("slow burn", None)
+        else:
+            targets[f"flaky-{i}"] = ("flaky", None)
+    return targets
+
+def healthy(pattern, timestamp, rng, blip_rate):
+    kind, outage_start = pattern
+    if kind == "outage" and outage_start <= timestamp < outage_start + OUTAGE:
+        return False
+    if kind == "slow burn":
+        return rng.random() >= 0.03
+    return rng.random() >= blip_rate
+
+def replay(engine, targets, rng, args):
+    """Feed every target's checks in time order; return alerts per target, per-sample alerts and timings."""
+    alerts = {name: [] for name in targets}
+    engine.notify = lambda name, message: alerts[name].append((now, message))
+    per_sample_alerts = 0
+    samples = 0
+    elapsed = 0.0
+    steps = int(args.days * 86400 // args.interval)
+    offsets = {name: rng.uniform(0, args.interval) for name in targets}
+    for step in range(steps):
+        for name, pattern in targets.items():
+            now = START + step * args.interval + offsets[name]
+            ok = healthy(pattern, now, rng, args.blip_rate)
+            if not ok:
+                per_sample_alerts += 1
+            start = time.perf_counter()
+            engine.record(name, ok, now)
+            elapsed += time.perf_counter() - start
+            samples += 1
+    return alerts, per_sample_alerts, samples, elapsed
+
+def tracker_memory(count):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    engine = SLOEngine()
+    for i in range(count):
+        engine.record(f"service-{i}", True, START)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename")) / count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay synthetic health check streams through the SLO engine")
+    parser.add_argument("--targets", type=int, default=200, help="Deployments to replay")
+    parser.add_argument("--days", type=float, default=2, help="Days of checks to replay")
+    parser.add_argument("--interval", type=float, default=60, help="Seconds between checks of one deployment")
+    parser.add_argument("--blip-rate", type=float, default=0.002, help="Fraction of flaky deployments' checks that fail")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the synthetic streams")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    mismatches = check_window_math(rng, streams=60, samples=300)
+    print(f"Window math: 60 random streams of 300 samples, {mismatches} totals differ from a brute-force count")
+
+    targets = make_targets(args.targets, rng, args.days)
+    engine = SLOEngine(objective=0.99)
+    with contextlib.redirect_stdout(io.StringIO()):
+        alerts, per_sample_alerts, samples, elapsed = replay(engine, targets, rng, args)
+    kinds = {kind: [name for name, pattern in targets.items() if pattern[0] == kind] for kind in ("flaky", "outage", "slow burn")}
+
+    def severities(names):
+        return [message.split(")")[0].split("(")[1] for name in names for _, message in alerts[name]]
+
+    outage_delays = []
+    for name in kinds["outage"]:
+        pages = [at for at, message in alerts[name] if message.startswith("ALERT (page)")]
+        if pages:
+            outage_delays.append(pages[0] - targets[name][1])
+    snapshot = engine.snapshot(START + args.days * 86400)
+    print(f"Replayed {samples} checks of {args.targets} deployments over {args.days} days: "
+          f"{samples / elapsed:,.0f} samples/s in the engine, {tracker_memory(1000) / 1024:.1f} KB per deployment")
+    print(f"  per-sample alerts (old check_deployment_health): {per_sample_alerts}")
+    print(f"  burn-rate alerts: {engine.stats['alerts']}, resolved: {engine.stats['resolved']} "
+          f"(flaky: {len(severities(kinds['flaky']))}, outage: {len(severities(kinds['outage']))}, "
+          f"slow burn: {len(severities(kinds['slow burn']))})")
+    if outage_delays:
+        print(f"  outage paged after {min(outage_delays) / 60:.1f}-{max(outage_delays) / 60:.1f} minutes")
+
+    checks = [
+        ("rolling windows match a brute-force count", mismatches == 0),
+        ("isolated failed checks never alert", not severities(kinds["flaky"])),
+        ("every outage pages within 15 minutes",
+         len(outage_delays) == len(kinds["outage"]) and all(0 <= delay <= OUTAGE for delay in outage_delays)),
+        ("slow burns open a ticket and never page",
+         all("ticket" in severities([name]) and "page" not in severities([name]) for name in kinds["slow burn"])),
+        ("flaky deployments stay within their budget",
+         all(snapshot[name]["budget_remaining"] > 0 for name in kinds["flaky"])),
+        ("slow burns overspend their budget", all(snapshot[name]["budget_remaining"] < 0 for name in kinds["slow burn"])),
+    ]
+    failed = 0
+    for label, passed in checks:
+        print(f"{'PASS' if passed else 'FAIL'}  {label}")
+        failed += not passed
+    sys.exit(1 if failed else 0)
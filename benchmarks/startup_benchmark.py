@@ -0,0 +1,100 @@
+"""Import-time and cold-start benchmark for the main.py subcommands.
+
+Each measurement runs in a fresh interpreter so that nothing is cached between
+runs. For every subcommand it records:
+
+- import_s: time to import the handler module (what the subcommand pays on top
+  of main.py itself)
+- cold_start_s: wall time of a fresh interpreter that imports main.py and
+  resolves the subcommand's handler with resolve_command(), as main() does
+  before running it; i.e. the startup cost of the CLI up to the handler call
+
+`main.py <command> --help` is not a usable stand-in: argparse exits before
+resolve_command(), so no handler module is imported.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from main import COMMANDS
+
+IMPORT_SNIPPET = (
+    "import time, importlib\n"
+    "start = time.perf_counter()\n"
+    "importlib.import_module({module!r})\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+DISPATCH_SNIPPET = (
+    "import sys\n"
+    "from main import resolve_command\n"
+    "sys.exit(0 if resolve_command({command!r}) else 1)\n"
+)
+
+def time_import(module_name):
+    """Import a module in a fresh interpreter and return the import time, or None on failure."""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module_name)],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+def time_cold_start(command):
+    """Resolve a subcommand's handler in a fresh interpreter and return the wall time, or None on failure."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", DISPATCH_SNIPPET.format(command=command)],
+        cwd=REPO_ROOT, capture_output=True,
+    )
+    if result.returncode != 0:
+        return None
+    return time.perf_counter() - start
+
+def median_or_none(samples):
+    samples = [s for s in samples if s is not None]
+    return statistics.median(samples) if samples else None
+
+def run_benchmark(runs):
+    """Measure import and cold-start times for every registered subcommand."""
+    results = {}
+    for command, (module_name, _) in COMMANDS.items():
+        import_times = [time_import(module_name) for _ in range(runs)]
+        cold_starts = [time_cold_start(command) for _ in range(runs)]
+        results[command] = {
+            "module": module_name,
+            "import_s": median_or_none(import_times),
+            "cold_start_s": median_or_none(cold_starts),
+        }
+    return results
+
+def print_report(results):
+    print(f"{'command':<12}{'module':<38}{'import (ms)':>14}{'cold start (ms)':>18}")
+    for command, row in results.items():
+        import_ms = f"{row['import_s'] * 1000:.1f}" if row["import_s"] is not None else "failed"
+        cold_ms = f"{row['cold_start_s'] * 1000:.1f}" if row["cold_start_s"] is not None else "failed"
+        print(f"{command:<12}{row['module']:<38}{import_ms:>14}{cold_ms:>18}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark subcommand import and startup time")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs per measurement")
+    parser.add_argument("--output", type=str, help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.runs)
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f"Results written to {args.output}")
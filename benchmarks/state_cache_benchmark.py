@@ -0,0 +1,124 @@
+"""Docker daemon calls saved by the event-fed container state cache, against a fake docker client.
+
+Runs `--rounds` rounds of what a status dashboard and the lifecycle commands
+do (a status lookup of every container, a label selection per team, a few
+log reads, stops and restarts) while replaying `--events` synthetic lifecycle
+events per round (containers created, started, dying and removed by other
+clients), first with direct daemon lookups and then with the state cache.
+Reports daemon calls by method and wall time, and checks that the cache
+converged to the fake daemon's actual state.
+
+Exits with status 1 if the cache ends up out of date.
+
+Usage:
+    python benchmarks/state_cache_benchmark.py [--containers 200] [--rounds 10] [--events 50]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docker
+import docker_dep.docker_manager as docker_manager
+from benchmarks.fakes import FakeDockerClient
+
+TEAMS = ("payments", "search", "checkout", "data")
+
+def make_fleet(containers, latency):
+    docker_client = FakeDockerClient(latency=latency)
+    for i in range(containers):
+        docker_client.containers.add(f"service-{i}", labels={"team": TEAMS[i % len(TEAMS)], "app": f"service-{i}"},
+                                     log_bytes=4096)
+    return docker_client
+
+def replay_events(docker_client, rng, count, next_id):
+    """Change containers the way other clients of the daemon would, emitting their events but no counted calls."""
+    collection = docker_client.containers
+    for _ in range(count):
+        names = list(collection.containers)
+        action = rng.choice(("create", "start", "die", "destroy"))
+        if action == "create" or not names:
+            name = f"job-{next_id}"
+            next_id += 1
+            collection.add(name, labels={"team": rng.choice(TEAMS), "app": "job"}, log_bytes=4096)
+            continue
+        container = collection.containers[rng.choice(names)]
+        if action == "destroy":
+            del collection.containers[container.name]
+            container._emit("destroy")
+        else:
+            container.status = "running" if action == "start" else "exited"
+            container._emit(action)
+    return next_id
+
+def run_round(docker_client, rng):
+    names = list(docker_client.containers.containers)
+    for name in names:
+        docker_manager.container_status(name)
+    for team in TEAMS:
+        docker_manager.select_containers(labels={"team": team}, status="running")
+    for name in rng.sample(names, min(5, len(names))):
+        try:
+            sum(1 for _ in docker_manager.stream_logs(name))
+        except docker.errors.NotFound:
+            pass
+    for name in rng.sample(names, min(2, len(names))):
+        docker_manager.stop_container(name, timeout=0)
+    docker_manager.restart_containers(pattern=rng.choice(names), timeout=0)
+
+def cache_mismatches(docker_client):
+    cache = docker_manager.get_state_cache()
+    actual = {name: container.status for name, container in docker_client.containers.containers.items()}
+    cached = {state.name: state.status for state in cache.find_containers()}
+    return {name for name in actual.keys() | cached.keys() if actual.get(name) != cached.get(name)}
+
+def measure(label, use_cache, args):
+    docker_client = make_fleet(args.containers, args.latency)
+    docker_manager._client = docker_client
+    docker_manager.USE_STATE_CACHE = use_cache
+    docker_client.calls.clear()
+    rng = random.Random(args.seed)
+    next_id = 0
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(args.rounds):
+            run_round(docker_client, rng)
+            next_id = replay_events(docker_client, rng, args.events, next_id)
+    wall_time = time.perf_counter() - start
+    print(f"{label:<8} daemon calls: {docker_client.total_calls:>6}   wall time: {wall_time:>6.2f} s")
+    print(f"{'':<8} {dict(sorted(docker_client.calls.items()))}")
+    if not use_cache:
+        return docker_client.total_calls, True
+
+    # Events reach the cache on its own thread; give the last ones a moment
+    deadline = time.monotonic() + 2
+    mismatches = cache_mismatches(docker_client)
+    while mismatches and time.monotonic() < deadline:
+        time.sleep(0.05)
+        mismatches = cache_mismatches(docker_client)
+    stats = docker_manager.get_state_cache().stats
+    print(f"{'':<8} events applied: {stats['events']}, lists: {stats['lists']}, "
+          f"containers out of date after the run: {len(mismatches)}")
+    docker_manager.get_state_cache().stop()
+    return docker_client.total_calls, not mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the event-fed Docker container state cache")
+    parser.add_argument("--containers", type=int, default=200, help="Number of containers")
+    parser.add_argument("--rounds", type=int, default=10, help="Rounds of dashboard and lifecycle calls")
+    parser.add_argument("--events", type=int, default=50, help="Synthetic lifecycle events replayed per round")
+    parser.add_argument("--latency", type=float, default=0.001, help="Fake daemon latency per call in seconds")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the synthetic events")
+    args = parser.parse_args()
+
+    print(f"Containers: {args.containers}, {args.rounds} rounds, {args.events} synthetic events per round")
+    direct_calls, _ = measure("direct", False, args)
+    cached_calls, consistent = measure("cached", True, args)
+    print(f"daemon calls saved: {direct_calls - cached_calls} ({1 - cached_calls / direct_calls:.1%})")
+    print(f"{'PASS' if consistent else 'FAIL'}  cache matches the daemon after the event stream")
+    sys.exit(0 if consistent else 1)
@@ -1,9 +1,23 @@
+import argparse
+import hashlib
+import json
 import os
+import re
+import string
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
 
 
 OUTPUT_DIR = "ci_cd/generated_workflows"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Batch generation settings
+INVENTORY_FILE = "inventory.yml"
+MANIFEST_FILE = ".generator-manifest.json"  # Content hashes of generated files, kept in the output directory
+RENDER_BATCH_SIZE = 250  # Files rendered per process pool task
+SERIAL_THRESHOLD = 500  # Smaller inventories are rendered in-process
+
 WORKFLOW_TEMPLATE = """
 name: {workflow_name}
 
@@ -38,6 +52,222 @@ jobs:
         run: {test_command}
 """
 
+GITLAB_CI_TEMPLATE = """
+image: python:{python_version}
+
+stages:
+  - build
+  - test
+
+workflow:
+  rules:
+    - if: $CI_COMMIT_BRANCH == "{branch}"
+    - if: $CI_PIPELINE_SOURCE == "merge_request_event" && $CI_MERGE_REQUEST_TARGET_BRANCH_NAME == "{branch}"
+
+before_script:
+  - {install_command}
+
+build:
+  stage: build
+  script:
+    - {build_command}
+
+test:
+  stage: test
+  script:
+    - {test_command}
+"""
+
+DEFAULT_VALUES = {
+    "workflow_name": "CI/CD Pipeline",
+    "branch": "main",
+    "python_version": "3.11",
+    "install_command": "pip install -r requirements.txt",
+    "build_command": "python -m compileall .",
+    "test_command": "pytest",
+}
+
+class CompiledTemplate:
+    """A str.format template parsed once, with the fields it needs checked before rendering."""
+
+    def __init__(self, source, name="template"):
+        self.name = name
+        self.source = source
+        self.fields = set()
+        for _, field_name, _, _ in string.Formatter().parse(source):
+            if field_name is not None:
+                if not field_name or field_name.isdigit():
+                    raise ValueError(f"Template '{name}' uses a positional field; use named fields such as {{branch}}")
+                self.fields.add(field_name.split(".")[0].split("[")[0])
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as template_file:
+            return cls(template_file.read(), name=path)
+
+    def render(self, values):
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"Template '{self.name}' needs {', '.join(sorted(missing))}")
+        return self.source.format_map(values)
+
+def repository_dir(output_dir, name):
+    """Return a repository's directory under `output_dir`; "org/repo" nests, but no name can leave `output_dir`."""
+    parts = [re.sub(r"[^\w.-]+", "_", part) for part in re.split(r"[\\/]+", str(name)) if part not in ("", ".", "..")]
+    return os.path.join(output_dir, *(parts or ["_"]))
+
+def output_path(output_dir, target, values):
+    """Return where a repository's file for a target ("github" or "gitlab") is written."""
+    directory = repository_dir(output_dir, values["name"])
+    if target == "gitlab":
+        return os.path.join(directory, ".gitlab-ci.yml")
+    file_name = re.sub(r"[^\w.-]+", "_", values["workflow_name"])
+    return os.path.join(directory, ".github", "workflows", f"{file_name}.yml")
+
+def load_inventory(path):
+    """Load a YAML or JSON inventory: optional "defaults" and a "repositories" list.
+
+    Every repository needs a "name"; any other template value it does not set
+    comes from the defaults. "targets" lists the files to generate ("github",
+    "gitlab") and "template" points to a custom template for the GitHub workflow.
+    """
+    with open(path) as inventory_file:
+        if path.endswith(".json"):
+            inventory = json.load(inventory_file)
+        else:
+            inventory = yaml.load(inventory_file, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+    if isinstance(inventory, list):
+        inventory = {"repositories": inventory}
+    defaults = {**DEFAULT_VALUES, "targets": ["github"], **(inventory.get("defaults") or {})}
+    repositories = []
+    for entry in inventory.get("repositories") or []:
+        if "name" not in entry:
+            raise ValueError(f"Inventory entry without a name: {entry}")
+        repositories.append({**defaults, **entry})
+    return repositories
+
+def _hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def _is_unchanged(path, content_hash, recorded):
+    """Check whether `path` already holds content with this hash, reading it only if the manifest can't tell."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    if recorded and recorded["size"] == stat.st_size and recorded["mtime_ns"] == stat.st_mtime_ns:
+        return recorded["hash"] == content_hash
+    with open(path, encoding="utf-8") as existing:
+        return _hash(existing.read()) == content_hash
+
+_worker_templates = None
+
+def _init_worker(templates):
+    global _worker_templates
+    _worker_templates = templates
+
+def _render_batch(jobs):
+    # Runs in pool workers (or in-process for small inventories)
+    results = []
+    for path, template_key, values, recorded in jobs:
+        try:
+            content = _worker_templates[template_key].render(values)
+            content_hash = _hash(content)
+            if _is_unchanged(path, content_hash, recorded):
+                status = "unchanged"
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w", encoding="utf-8") as output_file:
+                    output_file.write(content)
+                status = "written"
+            stat = os.stat(path)
+            results.append((path, status, {"hash": content_hash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}))
+        except Exception as e:
+            results.append((path, "failed", str(e)))
+    return results
+
+def generate_pipelines(repositories, output_dir=OUTPUT_DIR, template=None, max_workers=None):
+    """Render CI files for many repositories, writing only files whose content changed.
+
+    `template` is a path to a custom GitHub workflow template used instead of
+    WORKFLOW_TEMPLATE. Every template is compiled once up front and rendering
+    runs on a process pool for large inventories. Returns {path: status} with
+    status "written", "unchanged" or "failed"; a repository that fails does
+    not stop the others.
+    """
+    templates = {"github": CompiledTemplate(WORKFLOW_TEMPLATE, "github"), "gitlab": CompiledTemplate(GITLAB_CI_TEMPLATE, "gitlab")}
+    if template:
+        templates["github"] = CompiledTemplate.from_file(template)
+    # A repository's own template that cannot be loaded fails that repository only
+    broken_templates = {}
+    for values in repositories:
+        custom = values.get("template")
+        if custom and custom not in templates and custom not in broken_templates:
+            try:
+                templates[custom] = CompiledTemplate.from_file(custom)
+            except (OSError, ValueError) as e:
+                broken_templates[custom] = str(e)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    try:
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+
+    jobs = []
+    failures = []
+    for values in repositories:
+        targets = values.get("targets") or ["github"]
+        for target in [targets] if isinstance(targets, str) else targets:
+            template_key = (values.get("template") or "github") if target == "github" else target
+            if template_key in broken_templates:
+                failures.append((output_path(output_dir, target, values), "failed", broken_templates[template_key]))
+            elif template_key not in templates:
+                # There is no file to report it under, so it is reported under the repository's directory
+                failures.append((repository_dir(output_dir, values["name"]), "failed",
+                                 f"Unknown target '{target}' for repository '{values['name']}'"))
+            else:
+                path = output_path(output_dir, target, values)
+                jobs.append((path, template_key, values, manifest.get(path)))
+
+    batches = [jobs[i:i + RENDER_BATCH_SIZE] for i in range(0, len(jobs), RENDER_BATCH_SIZE)]
+    if len(jobs) < SERIAL_THRESHOLD or max_workers == 1:
+        _init_worker(templates)
+        batch_results = list(map(_render_batch, batches))
+    else:
+        # Templates are sent to each worker once, not with every batch
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(templates,)) as executor:
+            batch_results = list(executor.map(_render_batch, batches))
+
+    results = {}
+    for batch in [failures] + batch_results:
+        for path, status, detail in batch:
+            results[path] = status
+            if status == "failed":
+                print(f"Error generating '{path}': {detail}")
+            else:
+                manifest[path] = detail
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(manifest_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file)
+
+    counts = {}
+    for status in results.values():
+        counts[status] = counts.get(status, 0) + 1
+    print(f"Generated CI files for {len(repositories)} repositories: "
+          + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    return results
+
+def generate_pipeline(template=None, inventory=None, output_dir=None, max_workers=None):
+    """Generate CI files for every repository in an inventory file (INVENTORY_FILE by default)."""
+    try:
+        return generate_pipelines(load_inventory(inventory or INVENTORY_FILE), output_dir or OUTPUT_DIR, template, max_workers)
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        print(f"Error generating pipelines: {e}")
+        return None
+
 def get_user_input():
     """Prompts the user for input to fill in the CI/CD workflow template."""
     workflow_name = input("Enter the workflow name (e.g., CI/CD Pipeline): ")
@@ -71,4 +301,14 @@ def generate_workflow_file():
     print(f"Workflow file generated at: {output_file_path}")
 
 if __name__ == "__main__":
-    generate_workflow_file()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate CI/CD workflow files")
+    parser.add_argument("--inventory", type=str, help="YAML or JSON inventory of repositories; prompts for one workflow if omitted")
+    parser.add_argument("--template", type=str, help="Path to a custom GitHub workflow template")
+    parser.add_argument("--output-dir", type=str, default=OUTPUT_DIR, help="Directory to write generated files to")
+    parser.add_argument("--workers", type=int, help="Render processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    if args.inventory:
+        generate_pipeline(args.template, args.inventory, args.output_dir, args.workers)
+    else:
+        generate_workflow_file()
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+import boto3
+import botocore.session
+import yaml
+from botocore.config import Config
+from botocore.credentials import CredentialProvider, CredentialResolver, DeferredRefreshableCredentials
+from concurrent.futures import ThreadPoolExecutor
+from monitoring.instrumentation import track
+
+# Client pool settings
+AWS_TARGETS_FILE = os.getenv("AWS_TARGETS_FILE", "aws.yml")  # Accounts and regions that fan_out() runs across
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "32"))  # HTTP connections kept open per client
+AWS_MAX_ATTEMPTS = 10  # Adaptive retries back off client-side when AWS throttles us
+ASSUME_ROLE_SESSION_NAME = "devops-toolkit"
+ASSUME_ROLE_DURATION = 3600  # Seconds assumed-role credentials last; botocore refreshes them 15 minutes before expiry
+FANOUT_WORKERS = 18  # (account, region) targets an operation runs against at the same time
+
+CLIENT_CONFIG = Config(
+    max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+    retries={"mode": "adaptive", "max_attempts": AWS_MAX_ATTEMPTS},
+)
+
+# Sessions and clients are created on first use and shared by every thread.
+# Account None is the default credential chain.
+_accounts = {}  # account name -> {"role_arn": ..., "external_id": ...}
+_targets = None  # [(account, region)] loaded from AWS_TARGETS_FILE
+_sessions = {}  # account -> boto3 Session
+_clients = {}  # (account, region, service) -> client
+_lock = threading.RLock()
+
+def register_account(name, role_arn, external_id=None):
+    """Make an account available by name; its clients use credentials from assuming `role_arn`."""
+    with _lock:
+        _accounts[name] = {"role_arn": role_arn, "external_id": external_id}
+        _sessions.pop(name, None)
+        for key in [key for key in _clients if key[0] == name]:
+            del _clients[key]
+
+def load_targets(path=None):
+    """Load the accounts and regions to fan out across, registering every account with a role.
+
+    The file has a list of "regions" and a list of "accounts", each with a
+    "name", an optional "role_arn" (and "external_id") and optional "regions"
+    of its own. An account without a role uses the default credentials.
+    Without the file, the only target is the default account and region.
+    """
+    path = path or AWS_TARGETS_FILE
+    if not os.path.exists(path):
+        return [(None, None)]
+    with open(path) as targets_file:
+        spec = yaml.safe_load(targets_file) or {}
+    targets = []
+    for account in spec.get("accounts") or [{"name": None}]:
+        if account.get("role_arn"):
+            register_account(account["name"], account["role_arn"], account.get("external_id"))
+        for region in account.get("regions") or spec.get("regions") or [None]:
+            targets.append((account.get("name") if account.get("role_arn") else None, region))
+    return targets
+
+def get_targets():
+    """Return the (account, region) targets from AWS_TARGETS_FILE, loaded once."""
+    global _targets
+    with _lock:
+        if _targets is None:
+            _targets = load_targets()
+        return list(_targets)
+
+def find_account(account_id):
+    """Return the name of the registered account with this 12-digit ID, or None for the default account."""
+    get_targets()
+    with _lock:
+        for name, account in _accounts.items():
+            if account["role_arn"].split(":")[4] == account_id:
+                return name
+    return None
+
+def _assume_role_credentials(role_arn, external_id=None):
+    # Credentials are fetched on first use and refreshed by botocore before they expire
+    def refresh():
+        request = {"RoleArn": role_arn, "RoleSessionName": ASSUME_ROLE_SESSION_NAME, "DurationSeconds": ASSUME_ROLE_DURATION}
+        if external_id:
+            request["ExternalId"] = external_id
+        with track("assume_role", "sts"):
+            credentials = get_client("sts").assume_role(**request)["Credentials"]
+        return {
+            "access_key": credentials["AccessKeyId"],
+            "secret_key": credentials["SecretAccessKey"],
+            "token": credentials["SessionToken"],
+            "expiry_time": credentials["Expiration"].isoformat(),
+        }
+    return DeferredRefreshableCredentials(refresh_using=refresh, method="sts-assume-role")
+
+class _AssumeRoleProvider(CredentialProvider):
+    """The only link in a session's credential chain: credentials from assuming a role."""
+
+    METHOD = "sts-assume-role"
+
+    def __init__(self, role_arn, external_id=None):
+        super().__init__()
+        self.role_arn = role_arn
+        self.external_id = external_id
+
+    def load(self):
+        return _assume_role_credentials(self.role_arn, self.external_id)
+
+def get_session(account=None):
+    """Return the shared boto3 session for an account (the default credentials if None)."""
+    with _lock:
+        session = _sessions.get(account)
+        if session is None:
+            if account is None:
+                session = boto3.session.Session()
+            else:
+                if account not in _accounts:
+                    get_targets()
+                if account not in _accounts:
+                    raise KeyError(f"Unknown AWS account '{account}', add it to {AWS_TARGETS_FILE}")
+                botocore_session = botocore.session.get_session()
+                provider = _AssumeRoleProvider(_accounts[account]["role_arn"], _accounts[account]["external_id"])
+                botocore_session.register_component("credential_provider", CredentialResolver(providers=[provider]))
+                # Assumed roles act in the default account's region unless one is given
+                region = get_session().region_name
+                session = boto3.session.Session(botocore_session=botocore_session, region_name=region)
+            _sessions[account] = session
+        return session
+
+def get_client(service, region_name=None, account=None):
+    """Return the shared client for a service in a region (the default region if None) and account.
+
+    Clients are created once per (account, region, service), with a connection
+    pool of AWS_MAX_POOL_CONNECTIONS and adaptive retries, and are safe to use
+    from many threads.
+    """
+    key = (account, region_name, service)
+    client = _clients.get(key)
+    if client is None:
+        # Session objects are not thread safe, so clients are created under the lock
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = get_session(account).client(service, region_name=region_name, config=CLIENT_CONFIG)
+                _clients[key] = client
+    return client
+
+def fan_out(operation, targets=None, max_workers=FANOUT_WORKERS):
+    """Run operation(account, region) against every target concurrently.
+
+    `targets` defaults to get_targets(). Returns a result per (account, region)
+    with its "status" (ok or failed), "seconds", and the operation's "result"
+    or the "error".
+    """
+    targets = list(targets if targets is not None else get_targets())
+
+    def run(target):
+        start = time.perf_counter()
+        try:
+            result = operation(*target)
+        except Exception as e:
+            return {"status": "failed", "seconds": time.perf_counter() - start, "error": str(e)}
+        return {"status": "ok", "seconds": time.perf_counter() - start, "result": result}
+
+    if not targets:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(targets))) as executor:
+        results = dict(zip(targets, executor.map(run, targets)))
+    for (account, region), result in results.items():
+        if result["status"] == "failed":
+            print(f"Error in AWS account '{account or 'default'}', region '{region or 'default'}': {result['error']}")
+    return results
+
+def reset():
+    """Drop every session, client and loaded target, e.g. after the credentials or targets file changed."""
+    global _targets
+    with _lock:
+        _accounts.clear()
+        _sessions.clear()
+        _clients.clear()
+        _targets = None
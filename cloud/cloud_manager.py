@@ -1,85 +1,352 @@
-import boto3
-from google.cloud import container_v1
-from google.auth import exceptions
-from google.oauth2 import service_account
+import base64
+import hashlib
+import json
 import sys
 import os
+import threading
+import time
+from cloud import gke_clients
+from cloud.aws_clients import fan_out, get_client
+from concurrent.futures import ThreadPoolExecutor
+from monitoring.instrumentation import instrument, track
 
-# AWS Client Setup
-ecs_client = boto3.client("ecs")
-ecr_client = boto3.client("ecr")
+# AWS clients come from the shared pool in cloud.aws_clients, one per account,
+# region and service. Account and region None are the default credentials and region.
 
-# Google Cloud Client Setup
+# ECR registry authentication settings
+ECR_TOKEN_REFRESH_MARGIN = 300  # Seconds before expiry that a cached ECR token is replaced
+_ecr_tokens = {}  # (account, region) -> (Docker auth config, expiry as a Unix timestamp)
+_ecr_tokens_lock = threading.Lock()
+
+# ECS fleet deployment settings
+ECS_DESCRIBE_BATCH = 10  # Maximum services per DescribeServices call
+ECS_DEPLOY_WORKERS = 8  # Services updated at the same time
+ECS_UPDATE_RATE = 5  # UpdateService calls per second across all workers
+ECS_WAIT_DELAY = 15  # Seconds between services_stable waiter polls
+ECS_WAIT_ATTEMPTS = 40
+TASK_DEFINITION_HASH_TAG = "devops-toolkit:content-hash"
+
+_task_definitions = {}  # (account, region, family) -> (content hash, task definition ARN)
+_task_definition_locks = {}  # (account, region, family) -> lock, so concurrent deploys register a family once
+_task_definitions_lock = threading.Lock()
+
+# Google Cloud Client Setup (credentials and clients are shared, see cloud.gke_clients)
 GCP_PROJECT_ID = ""  # Replace with your GCP project ID
-GCP_ZONE = ""  # Replace with your GCP zone
+GCP_ZONE = ""  # Replace with your GCP zone or region
 GCP_CLUSTER_NAME = ""  # Replace with your GKE cluster name
 
-def deploy_to_aws_ecs(image_name, cluster_name, service_name, task_definition_name):
+def get_ecs_client(region_name=None, account=None):
+    """Return the shared ECS client for a region and account."""
+    return get_client("ecs", region_name, account)
+
+def get_ecr_client(region_name=None, account=None):
+    """Return the shared ECR client for a region and account."""
+    return get_client("ecr", region_name, account)
+
+def get_ecr_auth_config(region_name=None, account=None):
+    """Return a Docker auth config for an account's ECR registry in a region.
+
+    The authorization token is fetched once and reused by every push until it
+    is within ECR_TOKEN_REFRESH_MARGIN seconds of expiring.
+    """
+    with _ecr_tokens_lock:
+        cached = _ecr_tokens.get((account, region_name))
+        if cached is not None and cached[1] - ECR_TOKEN_REFRESH_MARGIN > time.time():
+            return cached[0]
+        with track("get_authorization_token", "ecr"):
+            authorization = get_ecr_client(region_name, account).get_authorization_token()["authorizationData"][0]
+        username, password = base64.b64decode(authorization["authorizationToken"]).decode().split(":", 1)
+        auth_config = {"username": username, "password": password, "serveraddress": authorization["proxyEndpoint"]}
+        _ecr_tokens[(account, region_name)] = (auth_config, authorization["expiresAt"].timestamp())
+        return auth_config
+
+class RateLimiter:
+    """Token bucket that lets at most `rate` calls per second through, across threads."""
+
+    def __init__(self, rate):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = rate
+        # A bucket smaller than one token would never let a call through
+        self._capacity = max(rate, 1)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def build_container_definitions(image_name, service_name):
+    """Build the container definitions for a single-container ECS service."""
+    return [
+        {
+            "name": service_name,
+            "image": image_name,
+            "cpu": 256,
+            "memory": 512,
+            "essential": True,
+        },
+    ]
+
+def task_definition_hash(family, container_definitions):
+    """Hash a task definition's content so identical definitions can be recognised."""
+    content = json.dumps({"family": family, "containerDefinitions": container_definitions}, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def get_or_register_task_definition(family, container_definitions, region_name=None, account=None):
+    """Return the ARN of a task definition with this content, registering a new revision only if needed.
+
+    The content hash is stored as a tag on each revision we register; if the
+    latest revision of the family carries the same hash, it is reused.
+    """
+    content_hash = task_definition_hash(family, container_definitions)
+    key = (account, region_name, family)
+    with _task_definitions_lock:
+        family_lock = _task_definition_locks.setdefault(key, threading.Lock())
+    with family_lock:
+        return _get_or_register_task_definition(key, container_definitions, content_hash)
+
+def _get_or_register_task_definition(key, container_definitions, content_hash):
+    account, region_name, family = key
+    with _task_definitions_lock:
+        cached = _task_definitions.get(key)
+    if cached and cached[0] == content_hash:
+        return cached[1]
+
+    ecs_client = get_ecs_client(region_name, account)
+    # A bare family name describes its latest ACTIVE revision (a familyPrefix list would also match "web-worker" for "web")
+    try:
+        latest = ecs_client.describe_task_definition(taskDefinition=family, include=["TAGS"])
+    except ecs_client.exceptions.ClientException:
+        latest = None  # No ACTIVE revision of the family yet
+    if latest is not None:
+        tags = {tag["key"]: tag["value"] for tag in latest.get("tags", [])}
+        if tags.get(TASK_DEFINITION_HASH_TAG) == content_hash:
+            arn = latest["taskDefinition"]["taskDefinitionArn"]
+            with _task_definitions_lock:
+                _task_definitions[key] = (content_hash, arn)
+            return arn
+
+    response = ecs_client.register_task_definition(
+        family=family,
+        containerDefinitions=container_definitions,
+        tags=[{"key": TASK_DEFINITION_HASH_TAG, "value": content_hash}],
+    )
+    arn = response["taskDefinition"]["taskDefinitionArn"]
+    with _task_definitions_lock:
+        _task_definitions[key] = (content_hash, arn)
+    return arn
+
+def deploy_to_aws_ecs(image_name, cluster_name, service_name, task_definition_name, region_name=None, account=None):
     """Deploy a Docker image to AWS ECS."""
     try:
-        # Register a new task definition
-        response = ecs_client.register_task_definition(
-            family=task_definition_name,
-            containerDefinitions=[
-                {
-                    "name": service_name,
-                    "image": image_name,
-                    "cpu": 256,
-                    "memory": 512,
-                    "essential": True,
-                },
-            ],
-        )
-        
-        # Create or update the service
-        ecs_client.update_service(
-            cluster=cluster_name,
-            service=service_name,
-            taskDefinition=task_definition_name,
-        )
+        with track("deploy_to_aws_ecs", "ecs"):
+            # Reuse the task definition revision if nothing changed
+            task_definition_arn = get_or_register_task_definition(
+                task_definition_name, build_container_definitions(image_name, service_name), region_name, account)
+
+            # Create or update the service
+            get_ecs_client(region_name, account).update_service(
+                cluster=cluster_name,
+                service=service_name,
+                taskDefinition=task_definition_arn,
+            )
         
         print(f"Service '{service_name}' updated in ECS cluster '{cluster_name}' with image '{image_name}'.")
+        return task_definition_arn
     except Exception as e:
         print(f"Error deploying to AWS ECS: {e}")
 
-def deploy_to_gke(image_name, deployment_name, namespace='default'):
-    """Deploy a Docker image to Google Kubernetes Engine."""
+@instrument("describe_services", "ecs")
+def describe_aws_services(cluster_name, service_names, region_name=None, account=None):
+    """Describe many ECS services, ECS_DESCRIBE_BATCH per call, and return them by name."""
+    services = {}
+    service_names = list(service_names)
+    for i in range(0, len(service_names), ECS_DESCRIBE_BATCH):
+        response = get_ecs_client(region_name, account).describe_services(cluster=cluster_name, services=service_names[i:i + ECS_DESCRIBE_BATCH])
+        for service in response.get("services", []):
+            services[service["serviceName"]] = service
+        for failure in response.get("failures", []):
+            print(f"Error describing ECS service '{failure.get('arn')}': {failure.get('reason')}")
+    return services
+
+@instrument("wait_for_services_stable", "ecs")
+def wait_for_services_stable(cluster_name, service_names, delay=ECS_WAIT_DELAY, max_attempts=ECS_WAIT_ATTEMPTS,
+                             region_name=None, account=None):
+    """Wait for ECS services to reach a steady state, one waiter per batch of services, run concurrently."""
+    service_names = list(service_names)
+    batches = [service_names[i:i + ECS_DESCRIBE_BATCH] for i in range(0, len(service_names), ECS_DESCRIBE_BATCH)]
+    if not batches:
+        return True
+    waiter = get_ecs_client(region_name, account).get_waiter("services_stable")
+
+    def wait_batch(batch):
+        waiter.wait(cluster=cluster_name, services=batch, WaiterConfig={"Delay": delay, "MaxAttempts": max_attempts})
+
+    stable = True
+    with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+        for batch, future in zip(batches, [executor.submit(wait_batch, batch) for batch in batches]):
+            try:
+                future.result()
+            except Exception as e:
+                stable = False
+                print(f"Error waiting for ECS services {', '.join(batch)} in cluster '{cluster_name}': {e}")
+    return stable
+
+def deploy_fleet_to_aws_ecs(deployments, max_workers=ECS_DEPLOY_WORKERS, update_rate=ECS_UPDATE_RATE, wait=False,
+                            region_name=None, account=None):
+    """Deploy many ECS services in one region and account concurrently.
+
+    Each deployment is a dict with "image", "cluster", "service" and
+    "task_definition" (the family). Task definitions are registered at most
+    once per distinct content, UpdateService calls are limited to
+    `update_rate` per second, and with `wait` the function returns only after
+    every cluster's services are stable. Returns a result per
+    (cluster, service) with its "status" and "task_definition" ARN. Use
+    fan_out() to deploy the same fleet to many regions and accounts.
+    """
+    limiter = RateLimiter(update_rate)
+
+    def deploy(deployment):
+        with track("deploy_to_aws_ecs", "ecs"):
+            task_definition_arn = get_or_register_task_definition(
+                deployment["task_definition"], build_container_definitions(deployment["image"], deployment["service"]),
+                region_name, account)
+            limiter.acquire()
+            get_ecs_client(region_name, account).update_service(
+                cluster=deployment["cluster"], service=deployment["service"], taskDefinition=task_definition_arn)
+        return task_definition_arn
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {(d["cluster"], d["service"]): executor.submit(deploy, d) for d in deployments}
+        for key, future in futures.items():
+            try:
+                results[key] = {"status": "updated", "task_definition": future.result()}
+            except Exception as e:
+                results[key] = {"status": "failed", "error": str(e)}
+                print(f"Error deploying ECS service '{key[1]}' in cluster '{key[0]}': {e}")
+
+    if wait:
+        by_cluster = {}
+        for (cluster_name, service_name), result in results.items():
+            if result["status"] == "updated":
+                by_cluster.setdefault(cluster_name, []).append(service_name)
+        for cluster_name, service_names in by_cluster.items():
+            stable = wait_for_services_stable(cluster_name, service_names, region_name=region_name, account=account)
+            status = "stable" if stable else "unstable"
+            for service_name in service_names:
+                results[(cluster_name, service_name)]["status"] = status
+
+    updated = sum(1 for result in results.values() if result["status"] != "failed")
+    print(f"Deployed {updated} of {len(results)} ECS services.")
+    return results
+
+def deploy_to_gke(image_name, deployment_name, namespace='default', replicas=1,
+                  project_id=None, location=None, cluster_name=None):
+    """Deploy a Docker image to Google Kubernetes Engine.
+
+    The Deployment is applied in-process with server-side apply, through a
+    Kubernetes client built from the cluster's cached endpoint and CA data.
+    The cluster defaults to GCP_PROJECT_ID, GCP_ZONE and GCP_CLUSTER_NAME.
+    """
+    # The GCP and Kubernetes SDKs are only needed for GKE deployments, so import them here
+    from kubernetes_dep.kubernetes_manager import apply_deployment, build_deployment_manifest
+
+    cluster_name = cluster_name or GCP_CLUSTER_NAME
     try:
-        credentials = service_account.Credentials.from_service_account_file("path/to/your/gcp-key.json")
-        client = container_v1.ClusterManagerClient(credentials=credentials)
-        
-        cluster = client.get_cluster(project_id=GCP_PROJECT_ID, zone=GCP_ZONE, cluster_id=GCP_CLUSTER_NAME)
-        print(f"Cluster '{GCP_CLUSTER_NAME}' retrieved for deployment.")
-        
-        # This part would involve kubectl for real deployments (here for setup demonstration)
-        print(f"Deploying '{deployment_name}' in GKE with image '{image_name}'.")
-        
+        from google.auth import exceptions
+        with track("deploy_to_gke", "gke"):
+            apps_api = gke_clients.get_apps_api(project_id or GCP_PROJECT_ID, location or GCP_ZONE, cluster_name)
+            applied = apply_deployment(build_deployment_manifest(image_name, deployment_name, replicas), namespace, apps_api)
+        print(f"Deployment '{deployment_name}' applied in GKE cluster '{cluster_name}' with image '{image_name}'.")
+        return applied
+    except ImportError as e:
+        print(f"google-auth is required for GKE deployments ({e}). "
+              "Install it with: pip install google-auth google-cloud-container")
     except exceptions.DefaultCredentialsError:
         print("Could not authenticate with GCP. Please check your credentials.")
     except Exception as e:
         print(f"Error deploying to GKE: {e}")
 
-def scale_aws_service(cluster_name, service_name, desired_count):
+def scale_aws_service(cluster_name, service_name, desired_count, region_name=None, account=None):
     """Scale an AWS ECS service to the desired count."""
     try:
-        ecs_client.update_service(
-            cluster=cluster_name,
-            service=service_name,
-            desiredCount=desired_count
-        )
+        with track("scale_aws_service", "ecs"):
+            get_ecs_client(region_name, account).update_service(
+                cluster=cluster_name,
+                service=service_name,
+                desiredCount=desired_count
+            )
         print(f"Scaled ECS service '{service_name}' in cluster '{cluster_name}' to {desired_count} instances.")
     except Exception as e:
         print(f"Error scaling AWS service: {e}")
 
-def get_aws_service_status(cluster_name, service_name):
+def get_aws_service_status(cluster_name, service_name, region_name=None, account=None):
     """Check the status of an AWS ECS service."""
     try:
-        response = ecs_client.describe_services(cluster=cluster_name, services=[service_name])
+        response = get_ecs_client(region_name, account).describe_services(cluster=cluster_name, services=[service_name])
         status = response['services'][0]['status']
         print(f"Service '{service_name}' in cluster '{cluster_name}' has status: {status}")
+        return status
     except Exception as e:
         print(f"Error checking status of AWS service: {e}")
 
+def get_aws_services_status(cluster_name, service_names, region_name=None, account=None):
+    """Check the status of many ECS services with batched DescribeServices calls."""
+    try:
+        services = describe_aws_services(cluster_name, service_names, region_name, account)
+        statuses = {name: service["status"] for name, service in services.items()}
+        for service_name, status in statuses.items():
+            print(f"Service '{service_name}' in cluster '{cluster_name}' has status: {status}")
+        return statuses
+    except Exception as e:
+        print(f"Error checking status of AWS services: {e}")
+
+def get_fleet_services_status(cluster_name, service_names, targets=None):
+    """Check the status of ECS services in every account and region at once.
+
+    `targets` is a list of (account, region) pairs, by default the ones in
+    aws_clients.AWS_TARGETS_FILE. Returns the status per (account, region,
+    service); services missing from a region are left out.
+    """
+    service_names = list(service_names)
+
+    def describe(account, region_name):
+        return describe_aws_services(cluster_name, service_names, region_name, account)
+
+    statuses = {}
+    for (account, region_name), result in fan_out(describe, targets).items():
+        for service_name, service in (result.get("result") or {}).items():
+            statuses[(account, region_name, service_name)] = service["status"]
+    for (account, region_name, service_name), status in sorted(statuses.items(), key=lambda item: str(item[0])):
+        print(f"Service '{service_name}' in cluster '{cluster_name}' "
+              f"({account or 'default'}/{region_name or 'default'}) has status: {status}")
+    return statuses
+
+def manage_cloud_resources(action, cluster_name=None, service_names=None):
+    """Run a cloud action from main.py.
+
+    "status" reports the ECS services of a cluster in every account and
+    region listed in aws_clients.AWS_TARGETS_FILE.
+    """
+    if action == "status":
+        if not cluster_name or not service_names:
+            print("Give the ECS cluster and the services to check.")
+            return None
+        return get_fleet_services_status(cluster_name, service_names)
+    print(f"Cloud action '{action}' is not implemented.")
+    return None
+
 if __name__ == "__main__":
     # Example interaction loop (for testing purposes)
     while True:
@@ -0,0 +1,124 @@
+import datetime
+import os
+import threading
+import time
+from monitoring.instrumentation import track
+
+# GKE connection settings
+GCP_CREDENTIALS_FILE = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")  # Service-account key; None uses application default credentials
+GCP_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+TOKEN_REFRESH_MARGIN = 300  # Seconds before expiry that the access token is refreshed
+CLUSTER_CACHE_TTL = 600  # Seconds a cluster's endpoint and CA certificate are reused before get_cluster is called again
+GKE_POOL_MAXSIZE = int(os.getenv("GKE_POOL_MAXSIZE", "32"))  # HTTP connections kept open to each cluster's API server
+
+# Credentials, the ClusterManagerClient and per-cluster Kubernetes clients are
+# created on first use and shared by every thread. The Google and Kubernetes
+# SDKs are imported only when a GKE deployment needs them.
+_credentials = None
+_cluster_manager = None
+_clusters = {}  # cluster path -> (endpoint, CA certificate, expiry as a monotonic time)
+_cluster_locks = {}  # cluster path -> lock, so concurrent deployments call get_cluster once
+_api_clients = {}  # cluster path -> (endpoint, CA certificate, ApiClient)
+_lock = threading.RLock()
+
+def cluster_path(project_id, location, cluster_name):
+    """Return the resource name of a cluster; `location` is a zone or a region."""
+    return f"projects/{project_id}/locations/{location}/clusters/{cluster_name}"
+
+def load_credentials():
+    """Load the GCP credentials from GCP_CREDENTIALS_FILE, or the application default credentials."""
+    if GCP_CREDENTIALS_FILE:
+        from google.oauth2 import service_account
+        return service_account.Credentials.from_service_account_file(GCP_CREDENTIALS_FILE, scopes=GCP_SCOPES)
+    import google.auth
+    credentials, _ = google.auth.default(scopes=GCP_SCOPES)
+    return credentials
+
+def create_cluster_manager(credentials):
+    """Create a ClusterManagerClient authenticated with `credentials`."""
+    from google.cloud import container_v1
+    return container_v1.ClusterManagerClient(credentials=credentials)
+
+def get_credentials():
+    """Return the shared GCP credentials, loading them on first use."""
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            _credentials = load_credentials()
+        return _credentials
+
+def get_token():
+    """Return an access token, refreshing it first if it is missing or within TOKEN_REFRESH_MARGIN of expiring."""
+    credentials = get_credentials()
+    with _lock:
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        expiry = credentials.expiry
+        if not credentials.token or (expiry is not None and (expiry - now).total_seconds() < TOKEN_REFRESH_MARGIN):
+            from google.auth.transport.requests import Request
+            with track("refresh_token", "gcp"):
+                credentials.refresh(Request())
+        return credentials.token
+
+def get_cluster_manager():
+    """Return the shared ClusterManagerClient, creating it on first use."""
+    global _cluster_manager
+    with _lock:
+        if _cluster_manager is None:
+            _cluster_manager = create_cluster_manager(get_credentials())
+        return _cluster_manager
+
+def get_cluster_info(project_id, location, cluster_name):
+    """Return a cluster's API endpoint and base64 CA certificate, calling get_cluster at most once per CLUSTER_CACHE_TTL."""
+    path = cluster_path(project_id, location, cluster_name)
+    with _lock:
+        cluster_lock = _cluster_locks.setdefault(path, threading.Lock())
+    with cluster_lock:
+        cached = _clusters.get(path)
+        if cached is not None and cached[2] > time.monotonic():
+            return cached[0], cached[1]
+        with track("get_cluster", "gke"):
+            cluster = get_cluster_manager().get_cluster(name=path)
+        endpoint, ca_certificate = cluster.endpoint, cluster.master_auth.cluster_ca_certificate
+        _clusters[path] = (endpoint, ca_certificate, time.monotonic() + CLUSTER_CACHE_TTL)
+        return endpoint, ca_certificate
+
+def _build_api_client(endpoint, ca_certificate):
+    import base64
+    from kubernetes import client
+
+    configuration = client.Configuration()
+    configuration.host = endpoint if "://" in endpoint else f"https://{endpoint}"
+    configuration.ca_cert_data = base64.b64decode(ca_certificate).decode()
+    configuration.connection_pool_maxsize = GKE_POOL_MAXSIZE
+    configuration.api_key_prefix["authorization"] = "Bearer"
+    configuration.api_key["authorization"] = get_token()
+    # Called before every request, so a long-lived client never sends an expired token
+    configuration.refresh_api_key_hook = lambda config: config.api_key.update(authorization=get_token())
+    return client.ApiClient(configuration)
+
+def get_api_client(project_id, location, cluster_name):
+    """Return a Kubernetes ApiClient for a GKE cluster, reused until the cluster's endpoint or CA changes."""
+    endpoint, ca_certificate = get_cluster_info(project_id, location, cluster_name)
+    path = cluster_path(project_id, location, cluster_name)
+    with _lock:
+        cached = _api_clients.get(path)
+        if cached is not None and cached[:2] == (endpoint, ca_certificate):
+            return cached[2]
+        api_client = _build_api_client(endpoint, ca_certificate)
+        _api_clients[path] = (endpoint, ca_certificate, api_client)
+        return api_client
+
+def get_apps_api(project_id, location, cluster_name):
+    """Return an AppsV1Api client for a GKE cluster."""
+    from kubernetes import client
+    return client.AppsV1Api(get_api_client(project_id, location, cluster_name))
+
+def reset():
+    """Drop the credentials, cluster data and clients, e.g. after switching service accounts."""
+    global _credentials, _cluster_manager
+    with _lock:
+        _credentials = _cluster_manager = None
+        _clusters.clear()
+        _cluster_locks.clear()
+        _api_clients.clear()
@@ -1,25 +1,40 @@
 import os
-import boto3
-from kubernetes import client, config
+import threading
+import time
 from base64 import b64decode
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from monitoring.instrumentation import track
 
 # Choose the configuration source: "aws" or "kubernetes"
 CONFIG_SOURCE = os.getenv("CONFIG_SOURCE", "aws")
 
-# AWS Secrets Manager client setup
-if CONFIG_SOURCE == "aws":
-    session = boto3.session.Session()
-    secrets_client = session.client(service_name="secretsmanager", region_name="us-west-2")  # Replace with your region
+# Secret cache settings
+CACHE_TTL = int(os.getenv("CONFIG_CACHE_TTL", "300"))  # Seconds a secret stays fresh
+CACHE_MAX_ENTRIES = int(os.getenv("CONFIG_CACHE_MAX_ENTRIES", "256"))  # 0 means unbounded
+CACHE_REFRESH_AHEAD = 0.8  # Refresh in the background once this fraction of the TTL has passed
+AWS_BATCH_SIZE = 20  # Maximum SecretIdList size for BatchGetSecretValue
+AWS_SECRETS_REGION = os.getenv("CONFIG_AWS_REGION")  # None uses the default region
+AWS_SECRETS_ACCOUNT = os.getenv("CONFIG_AWS_ACCOUNT")  # An account from aws.yml, None uses the default credentials
 
-# Kubernetes client setup for secrets
-elif CONFIG_SOURCE == "kubernetes":
-    config.load_kube_config()
-    k8s_client = client.CoreV1Api()
+# Clients are created on first use, and only the SDK for the configured source
+# is imported, so that importing this module stays cheap
+
+def get_secrets_client():
+    """Return the shared AWS Secrets Manager client for the configured region and account."""
+    from cloud.aws_clients import get_client
+    return get_client("secretsmanager", AWS_SECRETS_REGION, AWS_SECRETS_ACCOUNT)
+
+def get_k8s_client():
+    """Return the shared Kubernetes CoreV1Api client."""
+    from kubernetes_dep.client_provider import get_core_api
+    return get_core_api()
 
 def get_secret_aws(secret_name):
     """Retrieve a secret from AWS Secrets Manager."""
     try:
-        secret_value = secrets_client.get_secret_value(SecretId=secret_name)
+        with track("get_secret", "aws"):
+            secret_value = get_secrets_client().get_secret_value(SecretId=secret_name)
         secret_data = secret_value.get("SecretString")
         print(f"Retrieved secret '{secret_name}' from AWS.")
         return secret_data
@@ -29,24 +44,263 @@ def get_secret_aws(secret_name):
 
 def get_secret_kubernetes(secret_name, namespace="default"):
     """Retrieve a Kubernetes secret."""
+    from kubernetes import client
+    from kubernetes_dep.client_provider import get_object
+
     try:
-        secret = k8s_client.read_namespaced_secret(secret_name, namespace)
-        secret_data = {key: b64decode(value).decode("utf-8") for key, value in secret.data.items()}
+        with track("get_secret", "kubernetes"):
+            secret = get_object("Secret", secret_name, namespace)
+        secret_data = {key: b64decode(value).decode("utf-8") for key, value in (secret.data or {}).items()}
         print(f"Retrieved secret '{secret_name}' from Kubernetes.")
         return secret_data
     except client.exceptions.ApiException as e:
         print(f"Error retrieving Kubernetes secret: {e}")
         return None
 
-def get_config(config_name):
-    """Retrieve configuration based on the configured source."""
-    if CONFIG_SOURCE == "aws":
+def get_secrets_aws(secret_names):
+    """Retrieve many secrets from AWS Secrets Manager with BatchGetSecretValue."""
+    secrets = {}
+    secret_names = list(secret_names)
+    try:
+        for i in range(0, len(secret_names), AWS_BATCH_SIZE):
+            request = {"SecretIdList": secret_names[i:i + AWS_BATCH_SIZE]}
+            while True:
+                with track("get_secrets", "aws"):
+                    response = get_secrets_client().batch_get_secret_value(**request)
+                for secret_value in response.get("SecretValues", []):
+                    secrets[secret_value["Name"]] = secret_value.get("SecretString")
+                for error in response.get("Errors", []):
+                    print(f"Error retrieving AWS secret '{error.get('SecretId')}': {error.get('Message')}")
+                if not response.get("NextToken"):
+                    break
+                request["NextToken"] = response["NextToken"]
+        print(f"Retrieved {len(secrets)} secrets from AWS.")
+    except Exception as e:
+        print(f"Error retrieving AWS secrets: {e}")
+    return secrets
+
+def get_secrets_kubernetes(secret_names, namespace="default"):
+    """Retrieve many Kubernetes secrets from a single list of the namespace."""
+    from kubernetes import client
+    from kubernetes_dep.client_provider import list_objects
+
+    wanted = set(secret_names)
+    secrets = {}
+    try:
+        with track("get_secrets", "kubernetes"):
+            listed = list_objects("Secret", namespace)
+        for secret in listed:
+            if secret.metadata.name in wanted:
+                secrets[secret.metadata.name] = {key: b64decode(value).decode("utf-8") for key, value in (secret.data or {}).items()}
+        print(f"Retrieved {len(secrets)} secrets from Kubernetes.")
+    except client.exceptions.ApiException as e:
+        print(f"Error retrieving Kubernetes secrets: {e}")
+    return secrets
+
+class SecretCache:
+    """In-process TTL + LRU cache for secrets.
+
+    Concurrent misses for the same key share a single load. Entries that are
+    read after CACHE_REFRESH_AHEAD of their TTL has passed are refreshed in the
+    background, so hot secrets never expire in front of a caller. Failed loads
+    (None) are not cached, and neither are loads that were already running when
+    the cache was invalidated.
+    """
+
+    def __init__(self, loader, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, refresh_ahead=CACHE_REFRESH_AHEAD):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.refresh_ahead = refresh_ahead
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "load_errors": 0, "load_seconds": 0.0,
+                      "refreshes": 0, "evictions": 0}
+        self._entries = OrderedDict()  # key -> (value, loaded_at)
+        self._inflight = {}  # key -> Future of a load in progress
+        self._refreshing = set()
+        self._generation = 0  # Bumped by every invalidate(); loads started before it are not stored
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2)
+
+    def get(self, key):
+        """Return the cached value for a key, loading it on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, loaded_at = entry
+                age = time.monotonic() - loaded_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    if age >= self.ttl * self.refresh_ahead and key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._refresher.submit(self._refresh, key, self._generation)
+                    return value
+                del self._entries[key]
+
+            self.stats["misses"] += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                generation = self._generation
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = self._load(key, generation)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                # After an invalidate() the key may already belong to a newer load
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+    @property
+    def generation(self):
+        """The current invalidation generation; pass it to put() for a value fetched outside of get()."""
+        with self._lock:
+            return self._generation
+
+    def put(self, key, value, generation=None):
+        """Store a value for a key, evicting the least recently used entries if needed.
+
+        With a `generation`, the value is dropped if the cache was invalidated
+        since, because it may have been fetched before the change.
+        """
+        if value is None:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def peek(self, key):
+        """Return a fresh cached value without loading, counting a hit, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] >= self.ttl:
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def record_misses(self, count):
+        """Count misses that were loaded outside of get(), e.g. by a bulk fetch."""
+        with self._lock:
+            self.stats["misses"] += count
+
+    def invalidate(self, key=None):
+        """Drop one key from the cache, or everything when no key is given."""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            # A load in progress may have read the old value: let new callers start a fresh one
+            if key is None:
+                self._inflight.clear()
+            else:
+                self._inflight.pop(key, None)
+
+    def _load(self, key, generation):
+        start = time.perf_counter()
+        try:
+            value = self.loader(key)
+        finally:
+            with self._lock:
+                self.stats["loads"] += 1
+                self.stats["load_seconds"] += time.perf_counter() - start
+        if value is None:
+            with self._lock:
+                self.stats["load_errors"] += 1
+        self.put(key, value, generation)
+        return value
+
+    def _refresh(self, key, generation):
+        try:
+            self._load(key, generation)
+            with self._lock:
+                self.stats["refreshes"] += 1
+        except Exception as e:
+            print(f"Error refreshing cached secret {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+def _load_secret(key):
+    source, namespace, config_name = key
+    if source == "aws":
         return get_secret_aws(config_name)
-    elif CONFIG_SOURCE == "kubernetes":
-        return get_secret_kubernetes(config_name)
+    elif source == "kubernetes":
+        return get_secret_kubernetes(config_name, namespace)
+    print("Invalid CONFIG_SOURCE specified.")
+    return None
+
+secret_cache = SecretCache(_load_secret)
+
+def _cache_key(config_name, namespace):
+    return (CONFIG_SOURCE, namespace if CONFIG_SOURCE == "kubernetes" else None, config_name)
+
+def _copy(value):
+    # Kubernetes secrets are dicts, hand out copies so callers cannot modify the cache
+    return dict(value) if isinstance(value, dict) else value
+
+def get_config(config_name, namespace="default"):
+    """Retrieve configuration based on the configured source, served from the cache when fresh."""
+    with track("get_config", CONFIG_SOURCE):
+        return _copy(secret_cache.get(_cache_key(config_name, namespace)))
+
+def get_configs(config_names, namespace="default"):
+    """Retrieve many configurations at once, fetching all cache misses in a single bulk call."""
+    configs = {}
+    missing = []
+    for config_name in config_names:
+        value = secret_cache.peek(_cache_key(config_name, namespace))
+        if value is None:
+            missing.append(config_name)
+        else:
+            configs[config_name] = _copy(value)
+
+    if missing:
+        generation = secret_cache.generation
+        if CONFIG_SOURCE == "aws":
+            fetched = get_secrets_aws(missing)
+        elif CONFIG_SOURCE == "kubernetes":
+            fetched = get_secrets_kubernetes(missing, namespace)
+        else:
+            print("Invalid CONFIG_SOURCE specified.")
+            fetched = {}
+        secret_cache.record_misses(len(missing))
+        for config_name, value in fetched.items():
+            secret_cache.put(_cache_key(config_name, namespace), value, generation)
+            configs[config_name] = _copy(value)
+    return configs
+
+def invalidate_config(config_name=None, namespace="default"):
+    """Drop a configuration from the cache so the next read fetches it again, or clear the cache."""
+    if config_name is None:
+        secret_cache.invalidate()
     else:
-        print("Invalid CONFIG_SOURCE specified.")
-        return None
+        secret_cache.invalidate(_cache_key(config_name, namespace))
+
+def get_cache_stats():
+    """Return hit, miss and load latency counters for the secret cache."""
+    stats = dict(secret_cache.stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+    stats["avg_load_seconds"] = stats["load_seconds"] / stats["loads"] if stats["loads"] else 0.0
+    return stats
 
 if __name__ == "__main__":
     # Example usage for retrieving secrets/configurations
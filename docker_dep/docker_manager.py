@@ -1,29 +1,472 @@
 import docker
+import fnmatch
+import hashlib
+import json
 import os
+import re
 import sys
+import threading
 import time
+import yaml
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from docker.utils.build import exclude_paths
+from docker_dep.state_cache import StateCache
+from monitoring.instrumentation import instrument, track
+from monitoring.log_stream import iter_log_lines
 
-# Initialize the Docker client
-client = docker.from_env()
+# Build orchestration settings
+BUILD_WORKERS = 4  # Independent images built at the same time
+CONTEXT_HASH_LABEL = "devops-toolkit.context-hash"
+DOCKER_MANIFEST_FILE = "docker.yml"  # Builds and pushes used by manage_docker
+
+# Bulk container settings
+CONTAINER_WORKERS = 16  # Containers stopped, restarted or removed at the same time
+STOP_TIMEOUT = 10  # Seconds a container gets to exit after SIGTERM before it is killed
+
+# Push settings
+PUSH_WORKERS = 8  # Tags pushed at the same time
+ECR_REGISTRY_PATTERN = re.compile(r"^(\d{12})\.dkr\.ecr(?:-fips)?\.([a-z0-9-]+)\.amazonaws\.com(?:\.cn)?$")
+
+# State cache settings
+# The event-fed cache lists every container and image up front and keeps an events stream open, so a
+# one-shot command would pay more than it saves: it is off unless the process calls enable_state_cache().
+# DOCKER_STATE_CACHE=1 or 0 turns it on or off for every process.
+DOCKER_STATE_CACHE = os.getenv("DOCKER_STATE_CACHE", "")
+USE_STATE_CACHE = DOCKER_STATE_CACHE == "1"  # Serve container and image lookups from an event-fed cache
+
+# The Docker client and state cache are created on first use
+_client = None
+_state_cache = None
+_state_cache_lock = threading.Lock()
+
+def get_client():
+    """Return the shared Docker client, connecting to the daemon on first use."""
+    global _client
+    if _client is None:
+        _client = docker.from_env()
+    return _client
+
+def enable_state_cache():
+    """Serve container and image lookups from the state cache from now on, unless DOCKER_STATE_CACHE=0."""
+    global USE_STATE_CACHE
+    if DOCKER_STATE_CACHE != "0":
+        USE_STATE_CACHE = True
+
+def get_state_cache():
+    """Return the state cache for the shared client, starting it on first use or after the client was replaced."""
+    global _state_cache
+    docker_client = get_client()
+    with _state_cache_lock:
+        if _state_cache is None or _state_cache.client is not docker_client:
+            if _state_cache is not None:
+                _state_cache.stop()
+            _state_cache = StateCache(docker_client)
+            _state_cache.start()
+    return _state_cache
+
+def get_container(container_name):
+    """Return a container by name or ID, from the state cache when it is enabled.
+
+    Raises docker.errors.NotFound if the container does not exist.
+    """
+    if not USE_STATE_CACHE:
+        return get_client().containers.get(container_name)
+    cache = get_state_cache()
+    state = cache.get_container(container_name)
+    if state is None:
+        # Created after the last event the cache read, or does not exist
+        return get_client().containers.get(container_name)
+    return cache.model(state)
+
+def container_status(container_name):
+    """Return a container's status ("running", "exited", ...), or None if it does not exist."""
+    try:
+        return get_container(container_name).status
+    except docker.errors.NotFound:
+        return None
+
+def on_container_change(listener):
+    """Call listener(old, new) with ContainerStates whenever a container is created, changes status, or is removed.
+
+    The listener runs on the state cache's events thread; a process that
+    watches containers runs long enough for the cache to pay off, so its
+    lookups are served from the cache too.
+    """
+    enable_state_cache()
+    get_state_cache().add_listener(listener)
+
+def _print_build_log(image_name, line):
+    print(f"[{image_name}] {line}")
+
+@instrument("build_image", "docker")
+def stream_build(context_path, image_name, dockerfile=None, cache_from=None, buildargs=None, labels=None, on_log=_print_build_log):
+    """Build an image and pass every build log line to `on_log` as it arrives.
+
+    Raises docker.errors.BuildError if the build reports an error.
+    """
+    output = get_client().api.build(
+        path=context_path, tag=image_name, dockerfile=dockerfile, cache_from=cache_from,
+        buildargs=buildargs, labels=labels, rm=True, decode=True,
+    )
+    log = []
+    for chunk in output:
+        if "error" in chunk:
+            raise docker.errors.BuildError(chunk["error"], log)
+        log.append(chunk)
+        line = chunk.get("stream", "").rstrip()
+        if line:
+            on_log(image_name, line)
+    return log
 
 def build_image(dockerfile_path, image_name):
     """Build a Docker image from a specified Dockerfile."""
     try:
         print(f"Building Docker Image '{image_name}' from {dockerfile_path}...")
-        image, build_logs = client.images.build(path=dockerfile_path, tag=image_name)
+        stream_build(dockerfile_path, image_name)
         print(f"Image '{image_name}' built successfully.")
     except docker.errors.BuildError as build_err:
         print(f"Error building image: {build_err}")
     except docker.errors.APIError as api_err:
         print(f"Docker API error: {api_err}")
 
+def load_build_manifest(manifest_path):
+    """Load a build manifest from a JSON or YAML file.
+
+    The manifest is a list of builds, or a mapping with a "builds" list. Each
+    build has an image "name" and a "context" directory, and optionally a
+    "dockerfile", "cache_from" list and "buildargs". Relative contexts are
+    resolved against the manifest's directory.
+    """
+    with open(manifest_path) as manifest_file:
+        if manifest_path.endswith(".json"):
+            manifest = json.load(manifest_file)
+        else:
+            manifest = yaml.safe_load(manifest_file)
+    builds = manifest.get("builds", []) if isinstance(manifest, dict) else manifest
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    for build in builds:
+        build["context"] = os.path.join(base_dir, build["context"])
+    return builds
+
+def _normalize_image(image_name):
+    # "repo" and "repo:latest" name the same image, a digest reference is left alone
+    if "@" in image_name or ":" in image_name.rsplit("/", 1)[-1]:
+        return image_name
+    return f"{image_name}:latest"
+
+def parse_base_images(dockerfile_path):
+    """Return the images a Dockerfile builds FROM, excluding its own build stages."""
+    stages = set()
+    bases = []
+    with open(dockerfile_path) as dockerfile:
+        for line in dockerfile:
+            match = re.match(r"\s*FROM\s+(?:--\S+\s+)*(\S+)(?:\s+AS\s+(\S+))?", line, re.IGNORECASE)
+            if not match:
+                continue
+            image, stage = match.group(1), match.group(2)
+            if image.lower() not in stages:
+                bases.append(image)
+            if stage:
+                stages.add(stage.lower())
+    return bases
+
+def hash_build_context(context_path, dockerfile="Dockerfile", extra=""):
+    """Hash the files Docker would send for a build context, honouring .dockerignore."""
+    patterns = []
+    ignore_file = os.path.join(context_path, ".dockerignore")
+    if os.path.exists(ignore_file):
+        with open(ignore_file) as ignore:
+            patterns = [line.strip() for line in ignore if line.strip() and not line.startswith("#")]
+
+    digest = hashlib.sha256(extra.encode())
+    for relative_path in sorted(exclude_paths(context_path, patterns, dockerfile=dockerfile)):
+        full_path = os.path.join(context_path, relative_path)
+        if os.path.isdir(full_path):
+            continue
+        digest.update(relative_path.encode() + b"\0")
+        with open(full_path, "rb") as context_file:
+            for block in iter(lambda: context_file.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def _image_hash(image_name):
+    if USE_STATE_CACHE:
+        image = get_state_cache().get_image(image_name)
+        return image and image.labels.get(CONTEXT_HASH_LABEL)
+    try:
+        image = get_client().images.get(image_name)
+    except docker.errors.ImageNotFound:
+        return None
+    return (image.labels or {}).get(CONTEXT_HASH_LABEL)
+
+def build_images(builds, max_workers=BUILD_WORKERS, on_log=_print_build_log, force=False):
+    """Build many images, running independent builds concurrently.
+
+    Builds are ordered by their Dockerfile FROM lines: an image that builds
+    FROM another image in the list waits for it. Each context is hashed
+    (including its base images' hashes) and stored as an image label, so an
+    image whose context has not changed is skipped unless `force` is set. The
+    image's own tag is used as a build cache source along with any
+    "cache_from" entries. Returns a result per image name with its "status"
+    (built, skipped, failed or blocked), "seconds" and any "error".
+    """
+    builds = {_normalize_image(build["name"]): build for build in builds}
+    dependencies = {}
+    results = {}
+    for name, build in builds.items():
+        dockerfile = build.get("dockerfile", "Dockerfile")
+        try:
+            bases = parse_base_images(os.path.join(build["context"], dockerfile))
+        except (KeyError, OSError) as e:
+            # A broken entry fails on its own; its dependents are blocked below like after a build error
+            error = f"Missing build setting {e}" if isinstance(e, KeyError) else str(e)
+            results[name] = {"status": "failed", "seconds": 0.0, "error": error}
+            print(f"Error building image '{name}': {error}")
+            dependencies[name] = set()
+            continue
+        dependencies[name] = {_normalize_image(base) for base in bases} & set(builds)
+
+    hashes = {}
+    lock = threading.Lock()
+
+    def run_build(name):
+        build = builds[name]
+        dockerfile = build.get("dockerfile", "Dockerfile")
+        start = time.perf_counter()
+        base_hashes = ",".join(hashes[dependency] for dependency in sorted(dependencies[name]))
+        extra = json.dumps([dockerfile, build.get("buildargs") or {}, base_hashes], sort_keys=True)
+        context_hash = hash_build_context(build["context"], dockerfile, extra)
+        with lock:
+            hashes[name] = context_hash
+
+        if not force and _image_hash(name) == context_hash:
+            on_log(name, "Context unchanged, skipping build.")
+            return {"status": "skipped", "seconds": time.perf_counter() - start}
+
+        cache_from = [name] + list(build.get("cache_from", []))
+        stream_build(build["context"], name, dockerfile=dockerfile, cache_from=cache_from,
+                     buildargs=build.get("buildargs"), labels={CONTEXT_HASH_LABEL: context_hash}, on_log=on_log)
+        return {"status": "built", "seconds": time.perf_counter() - start}
+
+    remaining = {name: deps for name, deps in dependencies.items() if name not in results}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while remaining or running:
+            # Blocking one build can unblock the decision for its dependents, so repeat until stable
+            ready = True
+            while ready:
+                ready = [n for n, deps in remaining.items() if deps <= set(results)]
+                for name in ready:
+                    del remaining[name]
+                    failed = [dep for dep in dependencies[name] if results[dep]["status"] in ("failed", "blocked")]
+                    if failed:
+                        results[name] = {"status": "blocked", "seconds": 0.0, "error": f"Base image {failed[0]} was not built"}
+                    else:
+                        running[executor.submit(run_build, name)] = name
+            if not running:
+                if remaining:
+                    # Whatever is left waits on itself
+                    for name in remaining:
+                        results[name] = {"status": "failed", "seconds": 0.0, "error": "Circular FROM dependency"}
+                    remaining = {}
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                    print(f"Image '{name}' {results[name]['status']} in {results[name]['seconds']:.1f}s.")
+                except Exception as e:
+                    # Whatever went wrong fails this image only; its dependents are blocked on the next pass
+                    results[name] = {"status": "failed", "seconds": 0.0, "error": str(e)}
+                    print(f"Error building image '{name}': {e}")
+    return results
+
+def registry_of(repository):
+    """Return the registry host of a repository name, "docker.io" for Docker Hub names."""
+    first, _, rest = repository.partition("/")
+    if rest and ("." in first or ":" in first or first == "localhost"):
+        return first
+    return "docker.io"
+
+def get_registry_auth(registry):
+    """Return the auth config for pushing to a registry, or None to use the daemon's stored credentials.
+
+    ECR registries get a token from cloud_manager, which caches it until it expires.
+    """
+    match = ECR_REGISTRY_PATTERN.match(registry)
+    if match is None:
+        return None
+    # boto3 is only needed for ECR pushes
+    from cloud.aws_clients import find_account
+    from cloud.cloud_manager import get_ecr_auth_config
+    return get_ecr_auth_config(match.group(2), find_account(match.group(1)))
+
+def _print_push_progress(reference, event):
+    # Per-chunk upload progress would flood the output, print layer status changes only
+    status = event.get("status")
+    if status and status not in ("Preparing", "Waiting", "Pushing"):
+        layer = f"{event['id']}: " if "id" in event else ""
+        print(f"[{reference}] {layer}{status}")
+
+@instrument("push_image", "docker")
+def stream_push(repository, tag, auth_config=None, on_progress=_print_push_progress):
+    """Push a tag and pass every progress event to `on_progress` as it arrives.
+
+    Returns the pushed manifest "digest" and how many layers were uploaded
+    ("layers_pushed") or already in the registry ("layers_existing").
+    """
+    reference = f"{repository}:{tag}"
+    result = {"digest": None, "layers_pushed": 0, "layers_existing": 0}
+    for event in get_client().api.push(repository, tag=tag, stream=True, decode=True, auth_config=auth_config):
+        if "error" in event:
+            raise docker.errors.APIError(event["error"])
+        on_progress(reference, event)
+        status = event.get("status")
+        if status == "Pushed":
+            result["layers_pushed"] += 1
+        elif status == "Layer already exists":
+            result["layers_existing"] += 1
+        elif "aux" in event:
+            result["digest"] = event["aux"].get("Digest")
+    return result
+
+def remote_digest(reference, auth_config=None):
+    """Return the manifest digest a registry holds for a reference, or None if it has none."""
+    try:
+        return get_client().api.inspect_distribution(reference, auth_config=auth_config)["Descriptor"]["digest"]
+    except docker.errors.APIError:
+        return None
+
+def load_push_manifest(manifest_path):
+    """Load the "pushes" list of a JSON or YAML manifest (or a manifest that is just the list).
+
+    Each push names a local "image" and the "repositories" (or one
+    "repository") and "tags" to push it to; tags default to the image's own tag.
+    """
+    with open(manifest_path) as manifest_file:
+        if manifest_path.endswith(".json"):
+            manifest = json.load(manifest_file)
+        else:
+            manifest = yaml.safe_load(manifest_file)
+    return manifest.get("pushes", []) if isinstance(manifest, dict) else manifest
+
+def push_images(pushes, max_workers=PUSH_WORKERS, on_progress=_print_push_progress, force=False):
+    """Push many images, each to any number of repositories and tags, concurrently.
+
+    Registry credentials are resolved once per registry. Repositories are
+    pushed concurrently, and the tags of one repository one after another so
+    that only the first uploads layers. Before pushing, the destination's
+    manifest digest is compared with the digests the daemon recorded for the
+    local image, and a tag that already points at this image is skipped unless
+    `force` is set; the daemon itself skips layers the registry already has.
+    Returns a result per "repository:tag" with its
+    "status" (pushed, skipped or failed), "seconds", and for pushes the
+    "digest", "layers_pushed" and "layers_existing".
+    """
+    destinations = []
+    for push in pushes:
+        image_name = _normalize_image(push["image"])
+        repositories = push.get("repositories") or [push["repository"]]
+        tags = push.get("tags") or [image_name.rsplit(":", 1)[1]]
+        destinations.extend((image_name, repository, tags) for repository in repositories)
+
+    auth_configs = {}
+    for registry in {registry_of(repository) for _, repository, _ in destinations}:
+        try:
+            auth_configs[registry] = get_registry_auth(registry)
+        except Exception as e:
+            print(f"Error getting credentials for registry '{registry}': {e}")
+            auth_configs[registry] = None
+
+    def push_repository(image_name, repository, tags):
+        auth_config = auth_configs[registry_of(repository)]
+        image = get_client().images.get(image_name)
+        known = {digest.split("@", 1)[1] for digest in image.attrs.get("RepoDigests") or []
+                 if digest.split("@", 1)[0] == repository}
+        repository_results = {}
+        for tag in tags:
+            start = time.perf_counter()
+            reference = f"{repository}:{tag}"
+            try:
+                if not force and known and remote_digest(reference, auth_config) in known:
+                    on_progress(reference, {"status": "Manifest already exists, skipping push"})
+                    repository_results[reference] = {"status": "skipped", "seconds": time.perf_counter() - start}
+                    continue
+                image.tag(repository, tag)
+                result = stream_push(repository, tag, auth_config, on_progress)
+                repository_results[reference] = {"status": "pushed", "seconds": time.perf_counter() - start, **result}
+            except docker.errors.APIError as e:
+                repository_results[reference] = {"status": "failed", "seconds": time.perf_counter() - start, "error": str(e)}
+                print(f"Error pushing '{reference}': {e}")
+        return repository_results
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [(destination, executor.submit(push_repository, *destination)) for destination in destinations]
+        for (image_name, repository, tags), future in futures:
+            try:
+                results.update(future.result())
+            except docker.errors.APIError as e:
+                print(f"Error pushing '{image_name}' to '{repository}': {e}")
+                for tag in tags:
+                    results[f"{repository}:{tag}"] = {"status": "failed", "seconds": 0.0, "error": str(e)}
+
+    counts = {}
+    for result in results.values():
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    print(f"Push results for {len(results)} tags: " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    return results
+
+def manage_docker(action, manifest_path=None, pattern=None, labels=None, timeout=STOP_TIMEOUT, all_containers=False):
+    """Run a Docker action from main.py.
+
+    "build" and "push" work on the images listed in a manifest
+    (DOCKER_MANIFEST_FILE by default); "stop", "restart" and "remove" on the
+    containers selected by a name `pattern` and/or `labels`; "prune" removes
+    the stopped containers carrying `labels`, or every stopped container with
+    `all_containers`; "status" prints the status of the selected containers,
+    or of every container without a selector.
+    """
+    if action in ("build", "push"):
+        manifest_path = manifest_path or DOCKER_MANIFEST_FILE
+        try:
+            if action == "build":
+                return build_images(load_build_manifest(manifest_path))
+            return push_images(load_push_manifest(manifest_path))
+        except (OSError, ValueError, KeyError, yaml.YAMLError) as e:
+            print(f"Error loading Docker manifest '{manifest_path}': {e}")
+            return None
+
+    bulk_actions = {"stop": stop_containers, "restart": restart_containers, "remove": remove_containers}
+    try:
+        if action in bulk_actions:
+            # Without a selector every container on the host would match
+            if not pattern and not labels:
+                print(f"Select the containers to {action} with a name pattern or labels.")
+                return None
+            return bulk_actions[action](pattern, labels, timeout=timeout)
+        elif action == "prune":
+            return prune_containers(labels, all_containers=all_containers)
+        elif action == "status":
+            statuses = {container.name: container.status for container in select_containers(pattern, labels)}
+            for name, status in sorted(statuses.items()):
+                print(f"{name:<40} {status}")
+            return statuses
+    except docker.errors.APIError as e:
+        print(f"Docker API error: {e}")
+        return None
+    print(f"Unknown Docker action '{action}'.")
+    return None
 
-        
 def run_container(image_name, container_name, ports=None):
     """Run a Docker container from an image with optional port mapping."""
     try:
         print(f"Starting container from an image with optional port mapping")
-        container = client.containers.run(image_name, name=container_name, ports=ports, detach=True)
+        with track("run_container", "docker"):
+            container = get_client().containers.run(image_name, name=container_name, ports=ports, detach=True)
         print(f"Container '{container_name}' is now running.")
         return container
     except docker.errors.ContainerError as err:
@@ -34,11 +477,12 @@ def run_container(image_name, container_name, ports=None):
         print(f"Docker API error: {api_err}")
 
 
-def stop_container(container_name):
-    """Stop a running Docker container by name."""
+def stop_container(container_name, timeout=STOP_TIMEOUT):
+    """Stop a running Docker container by name, killing it after `timeout` seconds."""
     try:
-        container = client.containers.get(container_name)
-        container.stop()
+        with track("stop_container", "docker"):
+            container = get_container(container_name)
+            container.stop(timeout=timeout)
         print(f"Container '{container_name}' has been stopped. ")
     except docker.errors.NotFound as err:
         print(f"Container '{container_name}' not found.")
@@ -50,22 +494,152 @@ def stop_container(container_name):
 def remove_container(container_name):
     """Remove a stopped Docker container by name."""
     try:
-        container = client.containers.get(container_name)
-        container.remove
+        with track("remove_container", "docker"):
+            container = get_container(container_name)
+            container.remove()
         print(f"Container '{container_name}' has been removed.")
     except docker.errors.NotFound as err:
         print(f"Container '{container_name}' not found.")
     except docker.errors.APIError as api_err:
         print(f"Docker API error: {api_err}")
-        
 
+def _label_filters(labels):
+    # {"team": "ci", "ephemeral": None} -> ["team=ci", "ephemeral"]; a list is passed through
+    if isinstance(labels, dict):
+        return [key if value is None else f"{key}={value}" for key, value in labels.items()]
+    return [labels] if isinstance(labels, str) else list(labels)
 
-def get_logs(container_name):
+def select_containers(pattern=None, labels=None, status=None):
+    """Return the containers whose name matches the glob `pattern` and that carry every label in `labels`.
+
+    `labels` is a dict (a None value matches any value) or a list of "key" or
+    "key=value" strings. Label and status filtering is done by the daemon in
+    one list call, stopped containers included, or by the state cache
+    without asking the daemon when it is enabled.
+    """
+    if USE_STATE_CACHE:
+        cache = get_state_cache()
+        states = cache.find_containers(_label_filters(labels) if labels else None, status)
+        if pattern:
+            states = [state for state in states if fnmatch.fnmatchcase(state.name, pattern)]
+        return [cache.model(state) for state in states]
+
+    filters = {}
+    if labels:
+        filters["label"] = _label_filters(labels)
+    if status:
+        filters["status"] = status
+    containers = get_client().containers.list(all=True, filters=filters)
+    if pattern:
+        containers = [container for container in containers if fnmatch.fnmatchcase(container.name, pattern)]
+    return containers
+
+def _run_bulk(operation, containers, action, max_workers):
+    """Apply `action` to every container on a thread pool and return a result per container name."""
+    def run(container):
+        start = time.perf_counter()
+        try:
+            with track(operation, "docker"):
+                status = action(container)
+            return {"status": status, "seconds": time.perf_counter() - start}
+        except docker.errors.NotFound:
+            # Removed by someone else since it was listed
+            return {"status": "not found", "seconds": time.perf_counter() - start}
+        except docker.errors.APIError as e:
+            return {"status": "failed", "seconds": time.perf_counter() - start, "error": str(e)}
+
+    if not containers:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(containers))) as executor:
+        results = dict(zip([container.name for container in containers], executor.map(run, containers)))
+
+    counts = {}
+    for result in results.values():
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    print(f"Bulk {operation.split('_')[0]} of {len(results)} containers: "
+          + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    return results
+
+def stop_containers(pattern=None, labels=None, timeout=STOP_TIMEOUT, max_workers=CONTAINER_WORKERS):
+    """Stop every running container matching `pattern` and `labels` concurrently.
+
+    Each container gets `timeout` seconds after SIGTERM before it is killed.
+    Returns a result per container name with its "status" (stopped, not found
+    or failed), "seconds" and any "error".
+    """
+    def stop(container):
+        container.stop(timeout=timeout)
+        return "stopped"
+    return _run_bulk("stop_container", select_containers(pattern, labels, status="running"), stop, max_workers)
+
+def restart_containers(pattern=None, labels=None, timeout=STOP_TIMEOUT, max_workers=CONTAINER_WORKERS):
+    """Restart every container matching `pattern` and `labels` concurrently, with a `timeout` second grace period."""
+    def restart(container):
+        container.restart(timeout=timeout)
+        return "restarted"
+    return _run_bulk("restart_container", select_containers(pattern, labels), restart, max_workers)
+
+def remove_containers(pattern=None, labels=None, timeout=STOP_TIMEOUT, force=False, volumes=False, max_workers=CONTAINER_WORKERS):
+    """Remove every container matching `pattern` and `labels` concurrently.
+
+    Running containers are first stopped with a `timeout` second grace period,
+    or killed outright with `force`. `volumes` also removes their anonymous
+    volumes. Returns a result per container name like stop_containers().
+    """
+    def remove(container):
+        if container.status in ("running", "restarting", "paused") and not force:
+            container.stop(timeout=timeout)
+        try:
+            container.remove(v=volumes, force=force)
+        except docker.errors.APIError as e:
+            # The listed status can be stale: a container started since then refuses removal with 409 Conflict.
+            # Stopping one that has already exited answers 304, which is not an error.
+            if force or e.status_code != 409:
+                raise
+            container.stop(timeout=timeout)
+            container.remove(v=volumes, force=force)
+        return "removed"
+    return _run_bulk("remove_container", select_containers(pattern, labels), remove, max_workers)
+
+@instrument("prune_containers", "docker")
+def prune_containers(labels=None, until=None, all_containers=False):
+    """Remove every stopped container carrying `labels` (and created before `until`) in one daemon call.
+
+    Without `labels` every stopped container on the host would match, so
+    `all_containers` must be passed to prune them all. Returns the removed
+    container IDs as "removed" and the bytes freed as "space_reclaimed", or
+    None if nothing was selected.
+    """
+    if not labels and not all_containers:
+        print("Select the containers to prune with labels, or prune every stopped container with --all.")
+        return None
+    filters = {}
+    if labels:
+        filters["label"] = _label_filters(labels)
+    if until:
+        filters["until"] = until
+    response = get_client().containers.prune(filters=filters)
+    removed = response.get("ContainersDeleted") or []
+    print(f"Pruned {len(removed)} stopped containers, reclaimed {response.get('SpaceReclaimed', 0)} bytes.")
+    return {"removed": removed, "space_reclaimed": response.get("SpaceReclaimed", 0)}
+
+
+def stream_logs(container_name, since=None, tail="all", follow=False, pattern=None):
+    """Yield a container's log lines as they are read, without loading the whole log.
+
+    `since` is a datetime or UNIX timestamp, `tail` a number of lines or "all",
+    and `pattern` an optional regex lines must match.
+    """
+    container = get_container(container_name)
+    chunks = container.logs(stream=True, follow=follow, since=since, tail=tail)
+    return iter_log_lines(chunks, pattern)
+
+def get_logs(container_name, since=None, tail="all", follow=False, pattern=None):
     """Retrieve logs from a running or stopped container."""
     try:
-        container = client.containers.get(container_name)
-        logs = container.logs()
-        print(f"Logs for container '{container_name}':\n{logs.decode('utf-8')}")
+        print(f"Logs for container '{container_name}':")
+        for line in stream_logs(container_name, since=since, tail=tail, follow=follow, pattern=pattern):
+            print(line)
     except docker.errors.NotFound:
         print(f"Container '{container_name}' not found.")
     except docker.errors.APIError as api_err:
@@ -82,12 +656,20 @@ if __name__ == "__main__":
 
     # Sample interaction loop (for demonstration purposes)
     while True:
-        action = input("Enter action (build, run, stop, remove, logs, exit): ").strip().lower()
+        action = input("Enter action (build, build_manifest, push, run, stop, remove, logs, exit): ").strip().lower()
         
         if action == "build":
             dockerfile_path = input("Enter path to Dockerfile directory: ").strip()
             image_name = input("Enter image name: ").strip()
             build_image(dockerfile_path, image_name)
+
+        elif action == "build_manifest":
+            manifest_path = input("Enter path to build manifest (JSON or YAML): ").strip()
+            build_images(load_build_manifest(manifest_path))
+
+        elif action == "push":
+            manifest_path = input("Enter path to push manifest (JSON or YAML): ").strip()
+            push_images(load_push_manifest(manifest_path))
         
         elif action == "run":
             image_name = input("Enter image name to run: ").strip()
@@ -0,0 +1,247 @@
+import threading
+import time
+from collections import namedtuple
+
+import docker
+
+# State cache settings
+EVENTS_RETRY_DELAY = 1  # Seconds to wait after the events stream breaks before listing again
+
+ContainerState = namedtuple("ContainerState", ["id", "name", "image", "status", "labels"])
+ImageState = namedtuple("ImageState", ["id", "tags", "labels"])  # labels is None until the image is inspected
+
+# Container event action -> status of the container afterwards; other actions leave it unchanged
+_STATUS_AFTER = {"create": "created", "start": "running", "restart": "running", "unpause": "running",
+                 "pause": "paused", "die": "exited"}
+# Container event attributes that are not container labels
+_EVENT_ATTRIBUTES = {"name", "image", "exitCode", "signal", "oldName", "execDuration"}
+
+def _container_name(names):
+    # "Names" also lists link aliases such as "/web/db"; the container's own name has no second slash
+    names = names or ["/"]
+    return next((name[1:] for name in names if "/" not in name[1:]), names[0][1:])
+
+class StateCache:
+    """In-memory index of the daemon's containers and images, kept current from its events stream.
+
+    start() lists containers and images once; a background thread then applies
+    every container and image event from the time of that list on, so lookups
+    of containers by name, label or status never reach the daemon. Image events
+    only invalidate entries, which are inspected again on their next lookup. If
+    the events stream breaks, the cache lists again before resuming.
+
+    Listeners added with add_listener() are called as listener(old, new) with
+    two ContainerStates from the events thread whenever a container changes;
+    old is None for a new container and new is None for a removed one.
+    """
+
+    def __init__(self, docker_client):
+        self.client = docker_client
+        self.stats = {"lists": 0, "streams": 0, "events": 0, "image_inspects": 0}
+        self._containers = {}  # id -> ContainerState
+        self._names = {}  # name -> id
+        self._labels = {}  # "key" and "key=value" -> set of ids
+        self._statuses = {}  # status -> set of ids
+        self._images = {}  # id -> ImageState
+        self._tags = {}  # "repository:tag" -> image id
+        self._listeners = []
+        self._since = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._stream = None
+        self._thread = None
+
+    def start(self):
+        self._relist()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._stream is not None:
+            self._stream.close()
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def get_container(self, name_or_id):
+        """Return the ContainerState for a container name or ID, or None if the cache has not seen it."""
+        with self._lock:
+            container_id = self._names.get(name_or_id, name_or_id)
+            return self._containers.get(container_id)
+
+    def find_containers(self, labels=None, status=None):
+        """Return the ContainerStates carrying every label ("key" or "key=value") and in `status`, if given."""
+        with self._lock:
+            sets = [self._labels.get(label, set()) for label in labels or []]
+            if status:
+                sets.append(self._statuses.get(status, set()))
+            if not sets:
+                return list(self._containers.values())
+            # Intersect starting from the smallest set, so a rare label is cheap however many containers there are
+            sets.sort(key=len)
+            ids = sets[0].intersection(*sets[1:])
+            return [self._containers[container_id] for container_id in ids]
+
+    def model(self, state):
+        """Return a docker-py Container for a ContainerState without asking the daemon."""
+        return self.client.containers.prepare_model({
+            "Id": state.id, "Name": f"/{state.name}", "State": {"Status": state.status},
+            "Config": {"Image": state.image, "Labels": dict(state.labels)},
+        })
+
+    def get_image(self, reference):
+        """Return the ImageState for an image ID or "repository:tag", or None if the image does not exist.
+
+        An image first seen through an event is inspected once to learn its labels.
+        """
+        with self._lock:
+            image_id = self._tags.get(reference) or self._tags.get(f"{reference}:latest") or reference
+            image = self._images.get(image_id)
+        if image is not None and image.labels is not None:
+            return image
+        try:
+            attrs = self.client.api.inspect_image(reference)
+        except docker.errors.ImageNotFound:
+            return None
+        self.stats["image_inspects"] += 1
+        image = ImageState(attrs["Id"], tuple(attrs.get("RepoTags") or ()), (attrs.get("Config") or {}).get("Labels") or {})
+        with self._lock:
+            self._index_image(image)
+        return image
+
+    def _index_container(self, state):
+        self._containers[state.id] = state
+        self._names[state.name] = state.id
+        self._statuses.setdefault(state.status, set()).add(state.id)
+        for key, value in state.labels.items():
+            self._labels.setdefault(key, set()).add(state.id)
+            self._labels.setdefault(f"{key}={value}", set()).add(state.id)
+
+    def _unindex_container(self, state):
+        del self._containers[state.id]
+        if self._names.get(state.name) == state.id:
+            del self._names[state.name]
+        self._statuses[state.status].discard(state.id)
+        for key, value in state.labels.items():
+            self._labels[key].discard(state.id)
+            self._labels[f"{key}={value}"].discard(state.id)
+
+    def _index_image(self, image):
+        self._drop_image(image.id)
+        self._images[image.id] = image
+        for tag in image.tags:
+            old_id = self._tags.get(tag)
+            if old_id is not None and old_id != image.id:
+                self._untag(old_id, tag)
+            self._tags[tag] = image.id
+
+    def _drop_image(self, image_id):
+        image = self._images.pop(image_id, None)
+        if image is not None:
+            for tag in image.tags:
+                if self._tags.get(tag) == image_id:
+                    del self._tags[tag]
+
+    def _untag(self, image_id, tag):
+        image = self._images.get(image_id)
+        if image is not None:
+            self._images[image_id] = image._replace(tags=tuple(t for t in image.tags if t != tag))
+
+    def _relist(self):
+        since = time.time()
+        containers = self.client.api.containers(all=True)
+        images = self.client.api.images()
+        with self._lock:
+            previous = self._containers
+            self._containers, self._names, self._labels, self._statuses = {}, {}, {}, {}
+            for summary in containers:
+                self._index_container(ContainerState(summary["Id"], _container_name(summary.get("Names")), summary.get("Image"),
+                                                     summary.get("State"), summary.get("Labels") or {}))
+            self._images, self._tags = {}, {}
+            for summary in images:
+                tags = tuple(tag for tag in summary.get("RepoTags") or () if tag != "<none>:<none>")
+                self._index_image(ImageState(summary["Id"], tags, summary.get("Labels") or {}))
+            self._since = since
+            current = self._containers
+        self.stats["lists"] += 1
+        # After a broken stream, report what changed while no events were read
+        if self.stats["lists"] > 1:
+            for container_id in previous.keys() | current.keys():
+                if previous.get(container_id) != current.get(container_id):
+                    self._notify(previous.get(container_id), current.get(container_id))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self._since is None:
+                    self._relist()
+                self._stream = self.client.events(since=self._since, filters={"type": ["container", "image"]}, decode=True)
+                self.stats["streams"] += 1
+                for event in self._stream:
+                    self._apply(event)
+                    if self._stop.is_set():
+                        break
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                print(f"Error reading Docker events: {e}")
+                self._stop.wait(EVENTS_RETRY_DELAY)
+            # The stream ended or broke, events may have been missed
+            self._since = None
+
+    def _apply(self, event):
+        self.stats["events"] += 1
+        actor = event.get("Actor") or {}
+        attributes = actor.get("Attributes") or {}
+        # Actions such as "exec_start: sh -c ..." carry details after a colon
+        action = (event.get("Action") or event.get("status") or "").split(":", 1)[0]
+        if event.get("Type") == "image":
+            self._apply_image(action, actor.get("ID") or event.get("id"), attributes)
+            return
+
+        container_id = actor.get("ID") or event.get("id")
+        with self._lock:
+            old = self._containers.get(container_id)
+            if action == "destroy":
+                new = None
+            elif action == "rename" and old is not None:
+                new = old._replace(name=attributes.get("name", old.name))
+            elif action in _STATUS_AFTER and (old is not None or attributes.get("name")):
+                labels = {key: value for key, value in attributes.items() if key not in _EVENT_ATTRIBUTES}
+                new = (old or ContainerState(container_id, attributes.get("name"), attributes.get("image"), None, labels))
+                new = new._replace(status=_STATUS_AFTER[action])
+            else:
+                return
+            if new == old:
+                return
+            if old is not None:
+                self._unindex_container(old)
+            if new is not None:
+                self._index_container(new)
+        self._notify(old, new)
+
+    def _apply_image(self, action, actor_id, attributes):
+        with self._lock:
+            if action == "tag":
+                # A rebuilt image takes the tag over from the old one; its labels are read on the next lookup
+                tag = attributes.get("name")
+                image = self._images.get(actor_id) or ImageState(actor_id, (), None)
+                self._index_image(image._replace(tags=image.tags + (tag,)) if tag and tag not in image.tags else image)
+            elif action in ("untag", "delete"):
+                self._drop_image(actor_id)
+            elif action in ("pull", "load", "import"):
+                # The actor is the reference, which may now name a different image
+                image_id = self._tags.pop(attributes.get("name") or actor_id, None)
+                if image_id is not None:
+                    self._drop_image(image_id)
+
+    def _notify(self, old, new):
+        for listener in list(self._listeners):
+            try:
+                listener(old, new)
+            except Exception as e:
+                print(f"Error in container state listener: {e}")
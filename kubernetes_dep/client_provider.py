@@ -0,0 +1,244 @@
+from kubernetes import client, config, watch
+import os
+import threading
+
+# Client settings
+POOL_MAXSIZE = int(os.getenv("KUBE_POOL_MAXSIZE", "32"))  # HTTP connections kept open to the API server
+# Watch-fed caches need list/watch permissions and hold every object of a kind, which only pays off
+# in long-running processes: they are off unless the process calls enable_informers(), as the daemon does.
+# KUBE_INFORMERS=1 or 0 turns them on or off for every process.
+KUBE_INFORMERS = os.getenv("KUBE_INFORMERS", "")
+USE_INFORMERS = KUBE_INFORMERS == "1"  # Serve reads from watch-fed caches
+WATCH_TIMEOUT = 300  # Seconds before a watch is renewed from the last resourceVersion
+WATCH_RETRY_DELAY = 1  # Seconds to wait after a failed watch before trying again
+
+# Shared clients and informers, created on first use
+_config_loaded = False
+_api_client = None
+_apps_api = None
+_core_api = None
+_informers = {}  # (kind, namespace) -> Informer
+_starting = {}  # (kind, namespace) -> lock held while its informer does the first list
+_forbidden = set()  # (kind, namespace) we may not list, so get_object() reads directly
+_lock = threading.Lock()
+
+def load_config():
+    """Load the kubeconfig file to connect to the cluster, once per process."""
+    global _config_loaded
+    if not _config_loaded:
+        config.load_kube_config()
+        _config_loaded = True
+
+def get_api_client():
+    """Return the shared ApiClient, with its connection pool sized for concurrent callers."""
+    global _api_client
+    if _api_client is None:
+        load_config()
+        configuration = client.Configuration.get_default_copy()
+        configuration.connection_pool_maxsize = POOL_MAXSIZE
+        _api_client = client.ApiClient(configuration)
+    return _api_client
+
+def get_apps_api():
+    """Return the shared AppsV1Api client, creating it on first use."""
+    global _apps_api
+    if _apps_api is None:
+        _apps_api = client.AppsV1Api(get_api_client())
+    return _apps_api
+
+def get_core_api():
+    """Return the shared CoreV1Api client, creating it on first use."""
+    global _core_api
+    if _core_api is None:
+        _core_api = client.CoreV1Api(get_api_client())
+    return _core_api
+
+def matches_labels(labels, label_selector):
+    """Check labels against an equality-based selector such as "app=web,tier!=cache"."""
+    if not label_selector:
+        return True
+    labels = labels or {}
+    for requirement in label_selector.split(","):
+        requirement = requirement.strip()
+        if "!=" in requirement:
+            key, value = requirement.split("!=", 1)
+            if labels.get(key.strip()) == value.strip():
+                return False
+        elif "=" in requirement:
+            key, value = requirement.replace("==", "=").split("=", 1)
+            if labels.get(key.strip()) != value.strip():
+                return False
+        elif requirement not in labels:
+            return False
+    return True
+
+class Informer:
+    """In-memory copy of one kind of object in a namespace, kept current with list+watch.
+
+    The first list happens in start(); a background thread then watches from
+    the list's resourceVersion and applies every change. If the watch falls too
+    far behind (410 Gone), the informer lists again. Cached objects are shared
+    between callers and must be treated as read-only.
+    """
+
+    def __init__(self, list_function, namespace):
+        self.list_function = list_function
+        self.namespace = namespace
+        self.stats = {"lists": 0, "watches": 0, "events": 0}
+        self._objects = {}
+        self._resource_version = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watch = None
+        self._thread = None
+
+    def start(self):
+        self._relist()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watch is not None:
+            self._watch.stop()
+
+    def get(self, name):
+        with self._lock:
+            return self._objects.get(name)
+
+    def list(self, label_selector=None):
+        with self._lock:
+            objects = list(self._objects.values())
+        return [obj for obj in objects if matches_labels(obj.metadata.labels, label_selector)]
+
+    def _relist(self):
+        result = self.list_function(self.namespace)
+        with self._lock:
+            self._objects = {obj.metadata.name: obj for obj in result.items}
+            self._resource_version = result.metadata.resource_version
+        self.stats["lists"] += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self._resource_version is None:
+                    self._relist()
+                self._watch = watch.Watch()
+                self.stats["watches"] += 1
+                for event in self._watch.stream(self.list_function, self.namespace, resource_version=self._resource_version,
+                                                timeout_seconds=WATCH_TIMEOUT, allow_watch_bookmarks=True):
+                    self._apply(event)
+                    if self._stop.is_set():
+                        break
+            except client.exceptions.ApiException as e:
+                if e.status == 410:
+                    # Our resourceVersion is too old, start over from a fresh list
+                    self._resource_version = None
+                else:
+                    print(f"Error watching namespace '{self.namespace}': {e}")
+                    self._stop.wait(WATCH_RETRY_DELAY)
+            except Exception as e:
+                print(f"Error watching namespace '{self.namespace}': {e}")
+                self._stop.wait(WATCH_RETRY_DELAY)
+
+    def _apply(self, event):
+        self.stats["events"] += 1
+        if event["type"] == "BOOKMARK":
+            self._resource_version = event["raw_object"]["metadata"]["resourceVersion"]
+            return
+        obj = event["object"]
+        with self._lock:
+            if event["type"] == "DELETED":
+                self._objects.pop(obj.metadata.name, None)
+            else:
+                self._objects[obj.metadata.name] = obj
+            self._resource_version = obj.metadata.resource_version
+
+# Per kind: (API getter, list method, read method)
+_KINDS = {
+    "Deployment": (get_apps_api, "list_namespaced_deployment", "read_namespaced_deployment"),
+    "Pod": (get_core_api, "list_namespaced_pod", "read_namespaced_pod"),
+    "Secret": (get_core_api, "list_namespaced_secret", "read_namespaced_secret"),
+}
+
+def enable_informers():
+    """Serve reads from informers from now on, unless KUBE_INFORMERS=0; for long-running processes."""
+    global USE_INFORMERS
+    if KUBE_INFORMERS != "0":
+        USE_INFORMERS = True
+
+def get_informer(kind, namespace):
+    """Return the informer for a kind ("Deployment", "Pod" or "Secret") in a namespace, starting it on first use."""
+    key = (kind, namespace)
+    with _lock:
+        informer = _informers.get(key)
+        if informer is not None:
+            return informer
+        starting = _starting.get(key)
+        if starting is None:
+            starting = _starting[key] = threading.Lock()
+    # The first list runs outside _lock, so other kinds and namespaces are not held up behind it;
+    # callers for the same key wait on its own lock and then find the started informer
+    with starting:
+        with _lock:
+            informer = _informers.get(key)
+        if informer is None:
+            get_api, list_method, _ = _KINDS[kind]
+            informer = Informer(getattr(get_api(), list_method), namespace)
+            informer.start()
+            with _lock:
+                _informers[key] = informer
+                _starting.pop(key, None)
+    return informer
+
+def get_object(kind, name, namespace):
+    """Read one object, from the informer cache when informers are enabled.
+
+    Raises ApiException with status 404 if the object does not exist.
+    """
+    get_api, _, read_method = _KINDS[kind]
+    if not USE_INFORMERS or (kind, namespace) in _forbidden:
+        return getattr(get_api(), read_method)(name, namespace)
+    try:
+        informer = get_informer(kind, namespace)
+    except client.exceptions.ApiException as e:
+        if e.status != 403:
+            raise
+        # Allowed to get objects of this kind but not to list or watch them: read directly from now on
+        _forbidden.add((kind, namespace))
+        return getattr(get_api(), read_method)(name, namespace)
+    obj = informer.get(name)
+    if obj is None:
+        raise client.exceptions.ApiException(status=404, reason=f"{kind} '{name}' not found in namespace '{namespace}'")
+    return obj
+
+def list_objects(kind, namespace, label_selector=None):
+    """List objects of a kind in a namespace, from the informer cache when informers are enabled.
+
+    Needs list permission either way; where the informer is forbidden the
+    namespace is listed directly, so the caller sees the API server's 403.
+    """
+    get_api, list_method, _ = _KINDS[kind]
+    if not USE_INFORMERS or (kind, namespace) in _forbidden:
+        return getattr(get_api(), list_method)(namespace, label_selector=label_selector).items
+    try:
+        informer = get_informer(kind, namespace)
+    except client.exceptions.ApiException as e:
+        if e.status != 403:
+            raise
+        # Not allowed to watch this kind: list directly from now on, as get_object() reads directly
+        _forbidden.add((kind, namespace))
+        return getattr(get_api(), list_method)(namespace, label_selector=label_selector).items
+    return informer.list(label_selector)
+
+def reset():
+    """Stop all informers and drop the shared clients, e.g. after switching clusters."""
+    global _config_loaded, _api_client, _apps_api, _core_api
+    with _lock:
+        for informer in _informers.values():
+            informer.stop()
+        _informers.clear()
+        _starting.clear()
+        _forbidden.clear()
+        _config_loaded = False
+        _api_client = _apps_api = _core_api = None
@@ -1,39 +1,223 @@
-from kubernetes import client, config
+from concurrent.futures import ThreadPoolExecutor
+from kubernetes import client, watch
+from kubernetes_dep.client_provider import get_apps_api, get_core_api, get_object, list_objects
+from kubernetes_dep.manifest_plan import FIELD_MANAGER, apply_plan, plan_manifests, print_plan
+from monitoring.instrumentation import instrument, track
+from monitoring.log_stream import CHUNK_SIZE, MAX_BUFFERED_LINES, fan_in, iter_log_lines
+import time
+import yaml
 
-# Load the kubeconfig file to connect to the cluster
-config.load_kube_config()
+# Batch apply settings
+APPLY_WORKERS = 8  # Deployments applied at the same time
+ROLLOUT_TIMEOUT = 600  # Seconds to wait for deployments to become ready
+
+def build_deployment_manifest(image_name, deployment_name, replicas=1):
+    """Build a single-container Deployment manifest for an image."""
+    labels = {"app": deployment_name}
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": {"name": deployment_name, "labels": labels},
+        "spec": {
+            "replicas": replicas,
+            "selector": {"matchLabels": labels},
+            "template": {
+                "metadata": {"labels": labels},
+                "spec": {"containers": [{"name": deployment_name, "image": image_name}]},
+            },
+        },
+    }
+
+def load_deployment_manifests(manifest_path):
+    """Load every Deployment from a (multi-document) YAML manifest file."""
+    with open(manifest_path) as manifest_file:
+        return [doc for doc in yaml.safe_load_all(manifest_file) if doc and doc.get("kind") == "Deployment"]
+
+def _live_replicas(apps_api, name, namespace):
+    # The informer cache answers for the kubeconfig cluster; other clusters are read directly
+    try:
+        if apps_api is None:
+            deployment = get_object("Deployment", name, namespace)
+        else:
+            deployment = apps_api.read_namespaced_deployment(name, namespace)
+    except client.exceptions.ApiException as e:
+        if e.status == 404:
+            return None
+        raise
+    return deployment.spec.replicas
+
+@instrument("apply_deployment", "kubernetes")
+def apply_deployment(manifest, namespace='default', apps_api=None):
+    """Create or update a deployment with server-side apply and return the applied object.
+
+    The manifest's replica count is only used to create the deployment. Once
+    it exists, replicas belong to whoever scales it (the ScalingReconciler,
+    an HPA, kubectl scale), so the live count is applied in its place and a
+    re-deploy never resets it. `apps_api` targets another cluster than the
+    kubeconfig one, e.g. a GKE cluster.
+    """
+    metadata = manifest["metadata"]
+    name, namespace = metadata["name"], metadata.get("namespace", namespace)
+    spec = manifest.get("spec") or {}
+    if "replicas" in spec:
+        # Leaving replicas out would not do: server-side apply deletes a field its only owner stops sending
+        replicas = _live_replicas(apps_api, name, namespace)
+        if replicas is not None:
+            manifest = {**manifest, "spec": {**spec, "replicas": replicas}}
+    return (apps_api or get_apps_api()).patch_namespaced_deployment(
+        name, namespace, manifest,
+        field_manager=FIELD_MANAGER, force=True, _content_type="application/apply-patch+yaml",
+    )
 
 def create_deployment(image_name, deployment_name, namespace='default'):
-    """Create a deployment in the specified namespace."""
+    """Create a deployment in the specified namespace, or update it if it already exists."""
     try:
-        # Define the container spec
-        container = client.V1Container(name=deployment_name, image=image_name)
-        
-        # Define the pod template spec
-        template = client.V1PodTemplateSpec(metadata=client.V1ObjectMeta(labels={"app": deployment_name}),
-                                            spec=client.V1PodSpec(containers=[container]))
-        
-        #Define the deployment spec
-        spec = client.V1DeploymentSpec(replicas=1, template=template)
-        
-        #Create a deployment
-        deployment = client.V1Deployment(api_version="apps/v1", kind="Deployment",
-                                         metadata=client.V1ObjectMeta(name=deployment_name),
-                                         spec=spec)
-        
-        api = client.AppsV1Api()
-        api.create_namespaced_deployment(namespace=namespace, body=deployment)
+        apply_deployment(build_deployment_manifest(image_name, deployment_name), namespace)
         print(f"Deployment '{deployment_name}' created successfully in namespace '{namespace}'.")
     except Exception as e:
         print(f"Error creating deployment: {e}")
-        
+
+def is_rolled_out(deployment, generation):
+    """Check whether a deployment has finished rolling out `generation`, like kubectl rollout status."""
+    status = deployment.status
+    if status is None or (status.observed_generation or 0) < generation:
+        return False
+    replicas = deployment.spec.replicas if deployment.spec.replicas is not None else 1
+    updated = status.updated_replicas or 0
+    return updated >= replicas and (status.replicas or 0) <= updated and (status.available_replicas or 0) >= updated
+
+def _watch_rollouts(namespace, pending, deadline):
+    # One watch stream per namespace reports every deployment in it
+    api = get_apps_api()
+    ready = {}
+    resource_version = None
+    while pending and time.monotonic() < deadline:
+        kwargs = {"timeout_seconds": max(1, int(deadline - time.monotonic()))}
+        if resource_version:
+            kwargs["resource_version"] = resource_version
+        stream = watch.Watch()
+        try:
+            for event in stream.stream(api.list_namespaced_deployment, namespace, **kwargs):
+                deployment = event["object"]
+                resource_version = deployment.metadata.resource_version
+                name = deployment.metadata.name
+                if name in pending and event["type"] != "DELETED" and is_rolled_out(deployment, pending[name]):
+                    ready[name] = time.monotonic()
+                    del pending[name]
+                    if not pending:
+                        stream.stop()
+                        break
+        except client.exceptions.ApiException as e:
+            if e.status != 410:
+                raise
+            # Our resourceVersion is too old, start over from a fresh list
+            resource_version = None
+    return ready
+
+@instrument("wait_for_rollouts", "kubernetes")
+def wait_for_rollouts(generations, timeout=ROLLOUT_TIMEOUT):
+    """Wait for deployments to roll out, with one watch per namespace.
+
+    `generations` maps (namespace, name) to the generation to wait for. Returns
+    the monotonic time each deployment became ready; deployments that did not
+    finish within `timeout` are missing from the result.
+    """
+    deadline = time.monotonic() + timeout
+    by_namespace = {}
+    for (namespace, name), generation in generations.items():
+        by_namespace.setdefault(namespace, {})[name] = generation
+
+    ready = {}
+    if not by_namespace:
+        return ready
+    with ThreadPoolExecutor(max_workers=len(by_namespace)) as executor:
+        futures = {namespace: executor.submit(_watch_rollouts, namespace, pending, deadline)
+                   for namespace, pending in by_namespace.items()}
+        for namespace, future in futures.items():
+            try:
+                for name, ready_at in future.result().items():
+                    ready[(namespace, name)] = ready_at
+            except Exception as e:
+                print(f"Error watching rollouts in namespace '{namespace}': {e}")
+    return ready
+
+def apply_deployments(specs, namespace='default', max_workers=APPLY_WORKERS, wait=True, timeout=ROLLOUT_TIMEOUT):
+    """Apply many deployments concurrently and optionally wait for them to roll out.
+
+    `specs` are Deployment manifests (dicts, e.g. from load_deployment_manifests)
+    or (image_name, deployment_name) pairs. Manifests without a namespace go to
+    `namespace`. Returns a result per (namespace, name) with its "status"
+    (applied, ready, timeout or failed), "apply_seconds" and "rollout_seconds"
+    (from the apply finishing to the deployment being ready).
+    """
+    manifests = [spec if isinstance(spec, dict) else build_deployment_manifest(*spec) for spec in specs]
+    results = {}
+    applied_at = {}
+    generations = {}
+
+    def apply_one(manifest):
+        start = time.monotonic()
+        deployment = apply_deployment(manifest, namespace)
+        return deployment, start, time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for manifest in manifests:
+            key = (manifest["metadata"].get("namespace", namespace), manifest["metadata"]["name"])
+            futures[key] = executor.submit(apply_one, manifest)
+        for key, future in futures.items():
+            try:
+                deployment, started, finished = future.result()
+            except Exception as e:
+                results[key] = {"status": "failed", "error": str(e)}
+                print(f"Error applying deployment '{key[1]}' in namespace '{key[0]}': {e}")
+                continue
+            results[key] = {"status": "applied", "apply_seconds": finished - started}
+            applied_at[key] = finished
+            generations[key] = deployment.metadata.generation or 0
+
+    if wait:
+        ready = wait_for_rollouts(generations, timeout)
+        for key in generations:
+            if key in ready:
+                results[key].update(status="ready", rollout_seconds=ready[key] - applied_at[key])
+            else:
+                results[key]["status"] = "timeout"
+
+    for (deployment_namespace, name), result in results.items():
+        timing = f" in {result['rollout_seconds']:.1f}s" if "rollout_seconds" in result else ""
+        print(f"Deployment '{name}' in namespace '{deployment_namespace}': {result['status']}{timing}")
+    return results
+
+def deploy_kubernetes(manifest_path, namespace='default', prune=False, dry_run=False):
+    """Plan the objects in a manifest file or directory against the cluster and apply only what changed.
+
+    Prints the plan (create, update, unchanged, prune) first; with `dry_run`
+    nothing is applied. Objects the toolkit manages that are no longer in the
+    manifests are deleted only with `prune`.
+    """
+    if not manifest_path:
+        print("No manifest given. Pass the path to a manifest file or directory with --deploy.")
+        return None
+    try:
+        _, plan = plan_manifests(manifest_path, namespace)
+    except Exception as e:
+        print(f"Error planning manifests: {e}")
+        return None
+    counts = print_plan(plan, prune)
+    if dry_run or counts["create"] + counts["update"] + (counts["prune"] if prune else 0) == 0:
+        return {}
+    return apply_plan(plan, prune)
+
 def scale_deployment(deployment_name, replicas, namespace='default'):
     """Scale a deployment to the specified number of replicas."""
     try:
-     api = client.AppsV1Api()
-     deployment = api.read_namespaced_deployment(deployment_name, namespace)
-     deployment.spec.replicas = replicas
-     api.patch_namespaced_deployment(deployment_name, namespace, deployment)   
+        # A merge patch on the scale subresource sends only the replica count
+        with track("scale_deployment", "kubernetes"):
+            get_apps_api().patch_namespaced_deployment_scale(
+                deployment_name, namespace, {"spec": {"replicas": replicas}},
+                _content_type="application/merge-patch+json",
+            )
     except Exception as e:
         print(f"Error scalling deployment: {e}")
         
@@ -42,22 +226,41 @@ def scale_deployment(deployment_name, replicas, namespace='default'):
 def delete_deployment(deployment_name, namespace='default'):
     """Delete a deployment in the specified namespace."""
     try:
-        api = client.AppsV1Api()
-        api.delete_namespaced_deployment(deployment_name, namespace)
+        api = get_apps_api()
+        with track("delete_deployment", "kubernetes"):
+            api.delete_namespaced_deployment(deployment_name, namespace)
         print(f"Deployment  '{deployment_name}' deleted successfully.")
     except Exception as e:
         print(f"Error deleting deployment: {e}")
 
 
-def get_pod_logs(deployment_name, namespace='default'):
-    """Get logs from the pods in the specified deployment."""
+def stream_pod_logs(pod_name, namespace='default', since_seconds=None, tail_lines=None, follow=False, pattern=None, container=None):
+    """Yield a pod's log lines as they are read, without loading the whole log."""
+    api = get_core_api()
+    response = api.read_namespaced_pod_log(
+        pod_name, namespace, container=container, follow=follow, since_seconds=since_seconds,
+        tail_lines=tail_lines, _preload_content=False,
+    )
     try:
-        api = client.CoreV1Api()
-        pods = api.list_namespaced_pod(namespace, label_selector=f'app={deployment_name}')
+        yield from iter_log_lines(response.stream(CHUNK_SIZE), pattern)
+    finally:
+        response.release_conn()
 
-        for pod in pods.items:
-            logs = api.read_namespaced_pod_log(pod.metadata.name, namespace)
-            print(f"Logs for pod '{pod.metadata.name}':\n{logs}")
+def stream_deployment_logs(deployment_name, namespace='default', since_seconds=None, tail_lines=None,
+                           follow=False, pattern=None, max_buffered=MAX_BUFFERED_LINES):
+    """Yield (pod name, line) pairs from all pods of a deployment, read concurrently."""
+    pods = list_objects("Pod", namespace, label_selector=f'app={deployment_name}')
+    sources = {
+        pod.metadata.name: stream_pod_logs(pod.metadata.name, namespace, since_seconds, tail_lines, follow, pattern)
+        for pod in pods
+    }
+    return fan_in(sources, max_buffered)
+
+def get_pod_logs(deployment_name, namespace='default', since_seconds=None, tail_lines=None, follow=False, pattern=None):
+    """Get logs from the pods in the specified deployment."""
+    try:
+        for pod_name, line in stream_deployment_logs(deployment_name, namespace, since_seconds, tail_lines, follow, pattern):
+            print(f"[{pod_name}] {line}")
     except Exception as e:
         print(f"Error retrieving logs: {e}")
         
@@ -65,17 +268,22 @@ def get_pod_logs(deployment_name, namespace='default'):
 if __name__ == "__main__":
     # Example usage:
     # create_deployment("my_image", "my_deployment")
+    # apply_deployments([("my_image", "my_deployment"), ("other_image", "other_deployment")])
     # scale_deployment("my_deployment", 3)
     # delete_deployment("my_deployment")
     # get_pod_logs("my_deployment")
 
     while True:
-        action = input("Enter action (create, scale, delete, logs, exit): ").strip().lower()
+        action = input("Enter action (create, apply, scale, delete, logs, exit): ").strip().lower()
         
         if action == "create":
             image_name = input("Enter Docker image name: ").strip()
             deployment_name = input("Enter deployment name: ").strip()
             create_deployment(image_name, deployment_name)
+
+        elif action == "apply":
+            manifest_path = input("Enter path to the deployment manifest: ").strip()
+            apply_deployments(load_deployment_manifests(manifest_path))
         
         elif action == "scale":
             deployment_name = input("Enter deployment name to scale: ").strip()
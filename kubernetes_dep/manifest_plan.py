@@ -0,0 +1,297 @@
+import base64
+import copy
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from kubernetes.utils import parse_quantity
+from kubernetes_dep.client_provider import get_apps_api, get_core_api
+from monitoring.instrumentation import track
+import yaml
+
+# Manifest plan settings
+FIELD_MANAGER = "devops-toolkit"  # Field manager name for server-side apply, and the managed-by label value
+MANAGED_BY_LABEL = "app.kubernetes.io/managed-by"  # Objects carrying this label are ours, and pruned when removed from the manifests
+HASH_ANNOTATION = "devops-toolkit/content-hash"  # Hash of the manifest an object was last applied from
+LIST_WORKERS = 8  # (kind, namespace) lists fetched at the same time
+APPLY_WORKERS = 8  # Objects applied or pruned at the same time
+MANIFEST_EXTENSIONS = (".yaml", ".yml")
+
+# libyaml's loader is several times faster than the pure-Python one on large manifests
+_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Per kind: (API getter, method suffix), e.g. list_namespaced_<suffix> and patch_namespaced_<suffix>
+_KINDS = {
+    "Deployment": (get_apps_api, "deployment"),
+    "StatefulSet": (get_apps_api, "stateful_set"),
+    "DaemonSet": (get_apps_api, "daemon_set"),
+    "Service": (get_core_api, "service"),
+    "ConfigMap": (get_core_api, "config_map"),
+    "Secret": (get_core_api, "secret"),
+    "ServiceAccount": (get_core_api, "service_account"),
+}
+
+# Kinds whose spec.replicas an autoscaler changes at runtime, so a different live count is not drift
+_SCALED_KINDS = ("Deployment", "StatefulSet")
+
+# Maps of resource quantities, which the server may return in another spelling, e.g. cpu: 0.5 as "500m"
+_QUANTITY_FIELDS = ("limits", "requests")
+
+# Metadata the API server sets, which never belongs in a desired object
+_SERVER_METADATA = ("uid", "resourceVersion", "generation", "creationTimestamp", "managedFields", "selfLink")
+
+# action is create, update, unchanged or prune; reason says why an update is needed ("changed" or "drift")
+PlanEntry = namedtuple("PlanEntry", ["action", "key", "reason", "manifest"])
+
+def manifest_files(path):
+    """Return the manifest files under `path`: the file itself, or every YAML file in a directory tree."""
+    if not os.path.isdir(path):
+        return [path]
+    files = []
+    for directory, subdirectories, names in os.walk(path):
+        subdirectories.sort()
+        files.extend(os.path.join(directory, name) for name in sorted(names) if name.endswith(MANIFEST_EXTENSIONS))
+    return files
+
+def iter_manifest_objects(path):
+    """Yield every object in a manifest file or directory, one YAML document at a time.
+
+    Empty documents are skipped and the items of a "List" are yielded on
+    their own.
+    """
+    for file_path in manifest_files(path):
+        with open(file_path) as manifest_file:
+            for document in yaml.load_all(manifest_file, Loader=_LOADER):
+                if not document:
+                    continue
+                if document.get("kind") == "List":
+                    yield from (item for item in document.get("items") or [] if item)
+                else:
+                    yield document
+
+def _drop_empty(value):
+    if isinstance(value, dict):
+        return {key: _drop_empty(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [_drop_empty(item) for item in value]
+    return value
+
+def normalize(obj, namespace='default'):
+    """Return the object as it should be applied: without server fields, nulls and status, in a namespace.
+
+    Secret stringData is folded into base64 data, as the API server stores it,
+    and the object is labelled as managed by the toolkit.
+    """
+    obj = _drop_empty(copy.deepcopy(obj))
+    obj.pop("status", None)
+    metadata = obj.setdefault("metadata", {})
+    for field in _SERVER_METADATA:
+        metadata.pop(field, None)
+    # Manifests exported from the cluster carry the hash of their last apply
+    (metadata.get("annotations") or {}).pop(HASH_ANNOTATION, None)
+    metadata.setdefault("namespace", namespace)
+    metadata.setdefault("labels", {})[MANAGED_BY_LABEL] = FIELD_MANAGER
+    if obj.get("kind") == "Secret" and "stringData" in obj:
+        data = obj.setdefault("data", {})
+        for key, value in obj.pop("stringData").items():
+            data[key] = base64.b64encode(str(value).encode()).decode()
+    return obj
+
+def content_hash(obj):
+    """Hash a normalized object's content, independent of key order."""
+    content = json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def object_key(obj):
+    """Return an object's (kind, namespace, name)."""
+    metadata = obj["metadata"]
+    return obj["kind"], metadata.get("namespace"), metadata["name"]
+
+def load_desired_objects(path, namespace='default'):
+    """Load, normalize and hash every supported object in the manifests.
+
+    Returns {(kind, namespace, name): normalized object}, each carrying its
+    content hash in the HASH_ANNOTATION annotation. Objects of unsupported
+    kinds are reported and skipped; a later duplicate replaces an earlier one.
+    """
+    desired = {}
+    for obj in iter_manifest_objects(path):
+        kind, name = obj.get("kind"), (obj.get("metadata") or {}).get("name")
+        if kind not in _KINDS or not name:
+            print(f"Skipping {kind or 'object without a kind'} '{name}': not a supported namespaced kind.")
+            continue
+        obj = normalize(obj, namespace)
+        # The hash covers the object without its own annotation, so it is stable
+        obj["metadata"].setdefault("annotations", {})[HASH_ANNOTATION] = content_hash(obj)
+        key = object_key(obj)
+        if key in desired:
+            print(f"Duplicate {kind} '{name}' in namespace '{key[1]}', using the last definition.")
+        desired[key] = obj
+    return desired
+
+def _list_live(kind, namespace):
+    # The raw JSON is decoded directly; building client models for every object costs more than the diff
+    get_api, suffix = _KINDS[kind]
+    response = getattr(get_api(), f"list_namespaced_{suffix}")(namespace, _preload_content=False)
+    return json.loads(response.data)["items"]
+
+def fetch_live_objects(scopes, max_workers=LIST_WORKERS):
+    """List the live objects of each (kind, namespace) in `scopes`, with one list call per scope.
+
+    Returns {(kind, namespace, name): object as a dict}.
+    """
+    scopes = sorted(set(scopes))
+    live = {}
+    if not scopes:
+        return live
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(scopes))) as executor:
+        for (kind, namespace), items in zip(scopes, executor.map(lambda scope: _list_live(*scope), scopes)):
+            for obj in items:
+                live[(kind, namespace, obj["metadata"]["name"])] = obj
+    return live
+
+def _same_quantity(desired, live):
+    try:
+        return parse_quantity(desired) == parse_quantity(live)
+    except (ValueError, TypeError):
+        return False
+
+def matches_live(desired, live, quantities=False):
+    """Check that every field set in `desired` has the same value in `live`; fields the server added are ignored.
+
+    Values in resource limits and requests are compared as quantities, so
+    "1Gi" matches "1024Mi".
+    """
+    if isinstance(desired, dict):
+        return isinstance(live, dict) and all(key in live and matches_live(value, live[key], quantities or key in _QUANTITY_FIELDS)
+                                              for key, value in desired.items())
+    if isinstance(desired, list):
+        return isinstance(live, list) and len(desired) == len(live) and all(map(matches_live, desired, live))
+    # The server returns ports and other scalars in its own spelling, e.g. 1 as "1"
+    if desired == live or str(desired) == str(live):
+        return True
+    return quantities and _same_quantity(desired, live)
+
+def _without_scaled_replicas(obj):
+    spec = obj.get("spec")
+    if obj.get("kind") not in _SCALED_KINDS or not isinstance(spec, dict) or "replicas" not in spec:
+        return obj
+    return dict(obj, spec={key: value for key, value in spec.items() if key != "replicas"})
+
+def _with_live_replicas(obj, live):
+    # Leaving replicas out would not do: server-side apply deletes a field its only owner stops sending
+    spec, live_spec = obj.get("spec"), live.get("spec") or {}
+    if obj.get("kind") not in _SCALED_KINDS or not isinstance(spec, dict) or "replicas" not in spec \
+            or live_spec.get("replicas") is None:
+        return obj
+    return dict(obj, spec=dict(spec, replicas=live_spec["replicas"]))
+
+def plan_objects(desired, live):
+    """Compare the desired objects with the live ones and return the plan as a list of PlanEntry.
+
+    An object is unchanged if it was last applied from the same content and
+    its live fields still match; if only the live fields differ, someone
+    changed it outside the manifests and it is updated to undo the drift.
+    The replica count of a Deployment or StatefulSet belongs to whoever
+    scales it once the object exists, as in apply_deployment(): it is not
+    checked for drift, and updates carry the live count instead of the
+    manifest's.
+    Live objects managed by the toolkit that are no longer in the manifests
+    are pruned.
+    """
+    plan = []
+    for key, obj in sorted(desired.items()):
+        current = live.get(key)
+        if current is None:
+            plan.append(PlanEntry("create", key, None, obj))
+            continue
+        applied_hash = ((current.get("metadata") or {}).get("annotations") or {}).get(HASH_ANNOTATION)
+        if applied_hash != obj["metadata"]["annotations"][HASH_ANNOTATION]:
+            plan.append(PlanEntry("update", key, "changed", _with_live_replicas(obj, current)))
+        elif not matches_live(_without_scaled_replicas(obj), current):
+            plan.append(PlanEntry("update", key, "drift", _with_live_replicas(obj, current)))
+        else:
+            plan.append(PlanEntry("unchanged", key, None, obj))
+    for key, obj in sorted(live.items()):
+        labels = (obj.get("metadata") or {}).get("labels") or {}
+        if key not in desired and labels.get(MANAGED_BY_LABEL) == FIELD_MANAGER:
+            plan.append(PlanEntry("prune", key, None, None))
+    return plan
+
+def print_plan(plan, prune=False):
+    """Print the objects a plan changes and a one-line summary."""
+    counts = {"create": 0, "update": 0, "unchanged": 0, "prune": 0}
+    symbols = {"create": "+", "update": "~", "prune": "-"}
+    for entry in plan:
+        counts[entry.action] += 1
+        if entry.action == "unchanged":
+            continue
+        kind, namespace, name = entry.key
+        reason = f" ({entry.reason})" if entry.reason else ""
+        skipped = " (skipped, pass --prune to delete)" if entry.action == "prune" and not prune else ""
+        print(f"  {symbols[entry.action]} {entry.action} {kind} '{name}' in namespace '{namespace}'{reason}{skipped}")
+    print(f"Plan: {counts['create']} to create, {counts['update']} to update, {counts['unchanged']} unchanged, "
+          f"{counts['prune']} to prune.")
+    return counts
+
+def _apply_entry(entry):
+    kind, namespace, name = entry.key
+    get_api, suffix = _KINDS[kind]
+    api = get_api()
+    if entry.action == "prune":
+        getattr(api, f"delete_namespaced_{suffix}")(name, namespace)
+    else:
+        getattr(api, f"patch_namespaced_{suffix}")(
+            name, namespace, entry.manifest, field_manager=FIELD_MANAGER, force=True,
+            _content_type="application/apply-patch+yaml", _preload_content=False,
+        )
+
+def apply_plan(plan, prune=False, max_workers=APPLY_WORKERS):
+    """Apply the creates and updates in a plan with server-side apply, and delete its prunes if `prune`.
+
+    Unchanged objects are not sent. Returns a result per (kind, namespace, name)
+    with its "action", "status" (applied, pruned or failed), "seconds" and any
+    "error".
+    """
+    entries = [entry for entry in plan if entry.action in ("create", "update") or (prune and entry.action == "prune")]
+
+    def run(entry):
+        start = time.perf_counter()
+        try:
+            _apply_entry(entry)
+        except Exception as e:
+            return {"action": entry.action, "status": "failed", "seconds": time.perf_counter() - start, "error": str(e)}
+        status = "pruned" if entry.action == "prune" else "applied"
+        return {"action": entry.action, "status": status, "seconds": time.perf_counter() - start}
+
+    results = {}
+    if not entries:
+        return results
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(entries))) as executor:
+        for entry, result in zip(entries, executor.map(run, entries)):
+            results[entry.key] = result
+    for (kind, namespace, name), result in results.items():
+        if result["status"] == "failed":
+            print(f"Error applying {kind} '{name}' in namespace '{namespace}': {result['error']}")
+    failed = sum(result["status"] == "failed" for result in results.values())
+    print(f"Applied {len(results) - failed} of {len(results)} changes.")
+    return results
+
+def plan_manifests(path, namespace='default'):
+    """Load the manifests at `path`, fetch the live objects they cover and return (desired objects, plan).
+
+    Live objects are listed once for every kind in the manifests in every
+    namespace in them, which is also the scope of pruning: an object whose
+    kind no longer appears in the manifests at all is not pruned.
+    """
+    with track("load_manifests", "kubernetes"):
+        desired = load_desired_objects(path, namespace)
+    kinds = {kind for kind, _, _ in desired}
+    namespaces = {object_namespace for _, object_namespace, _ in desired}
+    with track("list_live_objects", "kubernetes"):
+        live = fetch_live_objects((kind, object_namespace) for kind in kinds for object_namespace in namespaces)
+    with track("plan_manifests", "kubernetes"):
+        plan = plan_objects(desired, live)
+    return desired, plan
@@ -1,66 +1,137 @@
 import argparse
-from ci_cd.generator import generate_pipeline
-from cloud.cloud_manager import manage_cloud_resources
-from docker_dep.docker_manager import manage_docker
-from kubernetes_dep.kubernetes_manager import deploy_kubernetes
-from monitoring.monitor import start_monitoring
-from notification.alert_manager import send_alerts
-from scaling.resource_manager import manage_resources
-from config.config_manager import get_config
- 
-def main():
+import importlib
+import sys
+
+# Subcommand registry: each entry names the module and function that handle the
+# command. Modules are imported only when their subcommand runs, so that
+# `config` or `notify` do not pay for the boto3, GCP, Docker and Kubernetes SDKs.
+COMMANDS = {
+    'ci_cd': ('ci_cd.generator', 'generate_pipeline'),
+    'cloud': ('cloud.cloud_manager', 'manage_cloud_resources'),
+    'docker': ('docker_dep.docker_manager', 'manage_docker'),
+    'k8s': ('kubernetes_dep.kubernetes_manager', 'deploy_kubernetes'),
+    'monitor': ('monitoring.monitor', 'start_monitoring'),
+    'notify': ('notification.alert_manager', 'send_alerts'),
+    'resources': ('scaling.resource_manager', 'manage_resources'),
+    'config': ('config.config_manager', 'get_config'),
+    'daemon': ('orchestration.daemon', 'run_daemon'),
+}
+
+def resolve_command(command):
+    """Import the module for a subcommand and return its handler function."""
+    module_name, function_name = COMMANDS[command]
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        print(f"Error loading '{command}' command: {e}")
+        return None
+
+    handler = getattr(module, function_name, None)
+    if handler is None:
+        print(f"Command '{command}' is not available: {module_name}.{function_name} is not implemented.")
+    return handler
+
+def build_parser():
+    """Build the argument parser for all subcommands."""
     parser = argparse.ArgumentParser(description="Automated DevOps Toolkit")
     subparsers = parser.add_subparsers(dest='command', required=True)
 
+    # Options every subcommand accepts
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--profile', choices=['cpu', 'memory'], help='Profile the command with cProfile (cpu) or tracemalloc (memory)')
+    common.add_argument('--profile-output', type=str, help='Also write the raw profile (pstats file or tracemalloc snapshot) here')
+    common.add_argument('--no-summary', action='store_true', help='Do not print the operation timing summary on exit')
+
     # CI/CD Generator
-    ci_cd_parser = subparsers.add_parser('ci_cd', help='Generate CI/CD configuration')
+    ci_cd_parser = subparsers.add_parser('ci_cd', parents=[common], help='Generate CI/CD configuration')
     ci_cd_parser.add_argument('--template', type=str, help='Path to the CI/CD template file')
+    ci_cd_parser.add_argument('--inventory', type=str, help='YAML or JSON inventory of repositories (default: inventory.yml)')
+    ci_cd_parser.add_argument('--output-dir', type=str, help='Directory to write generated files to')
+    ci_cd_parser.add_argument('--workers', type=int, help='Render processes (default: one per CPU)')
 
     # Cloud Manager
-    cloud_parser = subparsers.add_parser('cloud', help='Manage cloud resources')
-    cloud_parser.add_argument('--action', type=str, choices=['create', 'delete'], help='Action to perform on cloud resources')
+    cloud_parser = subparsers.add_parser('cloud', parents=[common], help='Manage cloud resources')
+    cloud_parser.add_argument('--action', type=str, choices=['create', 'delete', 'status'], help='Action to perform on cloud resources')
+    cloud_parser.add_argument('--cluster', type=str, help='ECS cluster to check')
+    cloud_parser.add_argument('--service', action='append', help='ECS service to check; repeat for several')
 
     # Docker Manager
-    docker_parser = subparsers.add_parser('docker', help='Manage Docker images and containers')
-    docker_parser.add_argument('--action', type=str, choices=['build', 'push'], help='Action to perform on Docker images')
+    docker_parser = subparsers.add_parser('docker', parents=[common], help='Manage Docker images and containers')
+    docker_parser.add_argument('--action', type=str, choices=['build', 'push', 'stop', 'restart', 'remove', 'prune', 'status'], help='Action to perform on Docker images or containers')
+    docker_parser.add_argument('--manifest', type=str, help='YAML or JSON manifest of builds and pushes (default: docker.yml)')
+    docker_parser.add_argument('--pattern', type=str, help='Glob matched against container names, e.g. "ci-*"')
+    docker_parser.add_argument('--label', action='append', help='Container label "key" or "key=value"; repeat to require several')
+    docker_parser.add_argument('--timeout', type=int, default=10, help='Seconds containers get to stop before they are killed')
+    docker_parser.add_argument('--all', action='store_true', help='With prune, remove every stopped container on the host')
 
     # Kubernetes Manager
-    kubernetes_parser = subparsers.add_parser('k8s', help='Deploy applications to Kubernetes')
-    kubernetes_parser.add_argument('--deploy', type=str, help='Path to the Kubernetes manifest')
+    kubernetes_parser = subparsers.add_parser('k8s', parents=[common], help='Deploy applications to Kubernetes')
+    kubernetes_parser.add_argument('--deploy', type=str, help='Path to the Kubernetes manifest file or directory')
+    kubernetes_parser.add_argument('--namespace', type=str, default='default', help='Namespace for objects that do not set one')
+    kubernetes_parser.add_argument('--prune', action='store_true', help='Delete objects the toolkit manages that are no longer in the manifests')
+    kubernetes_parser.add_argument('--dry-run', action='store_true', help='Print the plan without applying it')
 
     # Monitoring
-    monitoring_parser = subparsers.add_parser('monitor', help='Start monitoring services')
+    monitoring_parser = subparsers.add_parser('monitor', parents=[common], help='Start monitoring services')
 
     # Notification
-    notification_parser = subparsers.add_parser('notify', help='Send alerts')
+    notification_parser = subparsers.add_parser('notify', parents=[common], help='Send alerts')
     notification_parser.add_argument('--message', type=str, help='Alert message to send')
 
     # Resource Management
-    resource_parser = subparsers.add_parser('resources', help='Manage resources and auto-scaling')
+    resource_parser = subparsers.add_parser('resources', parents=[common], help='Manage resources and auto-scaling')
 
     # Configuration Management
-    config_parser = subparsers.add_parser('config', help='Retrieve configurations and secrets')
+    config_parser = subparsers.add_parser('config', parents=[common], help='Retrieve configurations and secrets')
     config_parser.add_argument('--name', type=str, help='Name of the configuration or secret to retrieve')
 
-    args = parser.parse_args()
+    # Daemon
+    daemon_parser = subparsers.add_parser('daemon', parents=[common], help='Run health checks, auto-scaling and alerting in one process')
+    daemon_parser.add_argument('--config', type=str, help='Path to the daemon configuration (default: daemon.yml)')
+    daemon_parser.add_argument('--metrics-port', type=int, help='Port for the Prometheus metrics endpoint (default: 8000)')
+
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    handler = resolve_command(args.command)
+    if handler is None:
+        return 1
+
+    # Imported after the handler so the import does not count against startup
+    from monitoring.instrumentation import print_summary, profile
+
+    try:
+        with profile(args.profile, args.profile_output):
+            run_command(args, handler)
+    finally:
+        if not args.no_summary:
+            print_summary()
+    return 0
 
+def run_command(args, handler):
+    """Call a subcommand's handler with its arguments."""
     if args.command == 'ci_cd':
-        generate_pipeline(args.template)
+        handler(args.template, args.inventory, args.output_dir, args.workers)
     elif args.command == 'cloud':
-        manage_cloud_resources(args.action)
+        handler(args.action, args.cluster, args.service)
     elif args.command == 'docker':
-        manage_docker(args.action)
+        handler(args.action, args.manifest, args.pattern, args.label, args.timeout, args.all)
     elif args.command == 'k8s':
-        deploy_kubernetes(args.deploy)
+        handler(args.deploy, args.namespace, args.prune, args.dry_run)
     elif args.command == 'monitor':
-        start_monitoring()
+        handler()
     elif args.command == 'notify':
-        send_alerts(args.message)
+        handler(args.message)
     elif args.command == 'resources':
-        manage_resources()
+        handler()
     elif args.command == 'config':
-        config_data = get_config(args.name)
+        config_data = handler(args.name)
         print(f"Retrieved configuration: {config_data}")
+    elif args.command == 'daemon':
+        handler(args.config, args.metrics_port)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
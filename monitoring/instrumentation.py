@@ -0,0 +1,241 @@
+import bisect
+import contextlib
+import functools
+import inspect
+import sys
+import threading
+import time
+
+# Latency buckets in seconds, from a cached secret read up to an ECS rollout
+OPERATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Profiling settings
+PROFILE_MODES = ("cpu", "memory")
+PROFILE_TOP = 25  # Functions or allocation sites shown in a profile report
+PROFILE_FRAMES = 10  # Stack frames tracemalloc keeps per allocation
+
+_operations = {}  # (operation, backend) -> OperationStats
+_operations_lock = threading.Lock()
+_collector_registered = False
+
+class OperationStats:
+    """Latency histogram and error count of one operation against one backend."""
+
+    __slots__ = ("operation", "backend", "count", "errors", "total", "max", "buckets", "_lock")
+
+    def __init__(self, operation, backend):
+        self.operation = operation
+        self.backend = backend
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(OPERATION_BUCKETS) + 1)  # The last bucket is +Inf
+        self._lock = threading.Lock()
+
+    def observe(self, duration, failed=False):
+        index = bisect.bisect_left(OPERATION_BUCKETS, duration)
+        with self._lock:
+            self.count += 1
+            self.total += duration
+            self.buckets[index] += 1
+            if duration > self.max:
+                self.max = duration
+            if failed:
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            return self.count, self.errors, self.total, self.max, list(self.buckets)
+
+    def quantile(self, fraction):
+        """Return the upper bound of the bucket holding the given quantile (0-1), capped at the maximum."""
+        count, _, _, maximum, buckets = self.snapshot()
+        rank = fraction * count
+        seen = 0
+        for bound, bucket_count in zip(OPERATION_BUCKETS, buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, maximum)
+        return maximum
+
+def get_operation(operation, backend):
+    """Return the stats for an operation against a backend, creating them on first use."""
+    key = (operation, backend)
+    stats = _operations.get(key)
+    if stats is None:
+        with _operations_lock:
+            stats = _operations.setdefault(key, OperationStats(operation, backend))
+    return stats
+
+class track:
+    """Context manager that times a block as one call of `operation` against `backend`.
+
+    An exception leaving the block counts as an error; place the block inside
+    any try/except that swallows errors so they are still counted.
+    """
+
+    __slots__ = ("_stats", "_start")
+
+    def __init__(self, operation, backend):
+        self._stats = get_operation(operation, backend)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._stats.observe(time.perf_counter() - self._start, exc_type is not None and issubclass(exc_type, Exception))
+        return False
+
+def instrument(operation, backend):
+    """Decorator that times every call of a function or coroutine function, counting raised errors."""
+    def decorator(function):
+        stats = get_operation(operation, backend)
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = await function(*args, **kwargs)
+                except Exception:
+                    stats.observe(time.perf_counter() - start, True)
+                    raise
+                stats.observe(time.perf_counter() - start)
+                return result
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            except Exception:
+                stats.observe(time.perf_counter() - start, True)
+                raise
+            stats.observe(time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
+
+def get_operation_stats():
+    """Return a summary per (operation, backend): calls, errors, total, mean, p95 and max in seconds."""
+    summary = {}
+    for key, stats in list(_operations.items()):
+        count, errors, total, maximum, _ = stats.snapshot()
+        if count:
+            summary[key] = {"calls": count, "errors": errors, "total": total, "mean": total / count,
+                            "p95": stats.quantile(0.95), "max": maximum}
+    return summary
+
+def format_summary():
+    """Format the operation stats as a table, slowest operations (by total time) first."""
+    summary = get_operation_stats()
+    if not summary:
+        return ""
+    lines = [f"{'operation':<28} {'backend':<12} {'calls':>7} {'errors':>7} {'total s':>9} "
+             f"{'mean ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+    for (operation, backend), stats in sorted(summary.items(), key=lambda item: -item[1]["total"]):
+        lines.append(f"{operation:<28} {backend:<12} {stats['calls']:>7} {stats['errors']:>7} {stats['total']:>9.3f} "
+                     f"{stats['mean'] * 1000:>9.1f} {stats['p95'] * 1000:>9.1f} {stats['max'] * 1000:>9.1f}")
+    return "\n".join(lines)
+
+def print_summary():
+    """Print the operation stats, if any operation ran."""
+    report = format_summary()
+    if report:
+        print("Operation summary (p95 is a histogram bucket bound):")
+        print(report)
+
+def reset_stats():
+    """Forget every recorded operation."""
+    with _operations_lock:
+        for stats in _operations.values():
+            with stats._lock:
+                stats.count = stats.errors = 0
+                stats.total = stats.max = 0.0
+                stats.buckets = [0] * (len(OPERATION_BUCKETS) + 1)
+
+class OperationCollector:
+    """prometheus_client collector exporting the operation stats as a histogram and an error counter."""
+
+    def collect(self):
+        from prometheus_client.core import CounterMetricFamily, HistogramMetricFamily
+
+        durations = HistogramMetricFamily("toolkit_operation_duration_seconds", "Duration of toolkit operations",
+                                          labels=["operation", "backend"])
+        errors = CounterMetricFamily("toolkit_operation_errors", "Toolkit operations that raised an error",
+                                     labels=["operation", "backend"])
+        for (operation, backend), stats in list(_operations.items()):
+            count, error_count, total, _, buckets = stats.snapshot()
+            cumulative, seen = [], 0
+            for bound, bucket_count in zip(OPERATION_BUCKETS + (float("inf"),), buckets):
+                seen += bucket_count
+                cumulative.append(("+Inf" if bound == float("inf") else str(bound), seen))
+            durations.add_metric([operation, backend], cumulative, total)
+            errors.add_metric([operation, backend], error_count)
+        yield durations
+        yield errors
+
+def register_collector(registry=None):
+    """Export the operation stats from the Prometheus registry; call it where a metrics server is started."""
+    global _collector_registered
+    from prometheus_client import REGISTRY
+
+    with _operations_lock:
+        if not _collector_registered:
+            (registry or REGISTRY).register(OperationCollector())
+            _collector_registered = True
+
+@contextlib.contextmanager
+def profile(mode=None, output=None, top=PROFILE_TOP):
+    """Profile the enclosed block and print a report when it exits.
+
+    "cpu" runs cProfile and reports the functions with the most cumulative
+    time (for the calling thread; work on pool threads shows up as the call
+    waiting for it). "memory" runs tracemalloc and reports the allocation
+    sites holding the most memory at exit plus the peak. With `output`, the
+    raw pstats file or tracemalloc snapshot is also written there. A mode of
+    None profiles nothing.
+    """
+    if mode is None:
+        yield
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode '{mode}', expected one of {', '.join(PROFILE_MODES)}")
+
+    if mode == "cpu":
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            if output:
+                profiler.dump_stats(output)
+            print(f"CPU profile, top {top} functions by cumulative time:")
+            pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(top)
+    else:
+        import tracemalloc
+
+        tracemalloc.start(PROFILE_FRAMES)
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot = snapshot.filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ))
+            if output:
+                snapshot.dump(output)
+            print(f"Memory profile: {current / 1048576:.1f} MB traced at exit, {peak / 1048576:.1f} MB peak. "
+                  f"Top {top} allocation sites:")
+            for statistic in snapshot.statistics("lineno")[:top]:
+                print(f"  {statistic}")
@@ -0,0 +1,92 @@
+import queue
+import re
+import threading
+
+# Streaming log settings
+CHUNK_SIZE = 64 * 1024  # Bytes read from a log stream at a time
+MAX_LINE_BYTES = 1024 * 1024  # Longer lines are split so one line cannot grow without bound
+MAX_BUFFERED_LINES = 1000  # Lines buffered per fan-in before producers block
+
+_DONE = object()
+
+def iter_lines(chunks, max_line_bytes=MAX_LINE_BYTES):
+    """Split a stream of byte chunks into lines without holding more than one partial line."""
+    pending = b""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if len(line) > max_line_bytes:
+                yield from _split_long(line, max_line_bytes)
+            else:
+                yield line
+        while len(pending) > max_line_bytes:
+            yield pending[:max_line_bytes]
+            pending = pending[max_line_bytes:]
+    if pending:
+        yield pending
+
+def _split_long(line, max_line_bytes):
+    for start in range(0, len(line), max_line_bytes):
+        yield line[start:start + max_line_bytes]
+
+def iter_log_lines(chunks, pattern=None, max_line_bytes=MAX_LINE_BYTES):
+    """Yield decoded log lines from byte chunks, keeping only lines matching `pattern` if given.
+
+    The regex is applied to the raw bytes, so lines that are filtered out are
+    never decoded.
+    """
+    matcher = re.compile(pattern.encode() if isinstance(pattern, str) else pattern).search if pattern else None
+    for line in iter_lines(chunks, max_line_bytes):
+        if matcher is None or matcher(line):
+            yield line.rstrip(b"\r").decode("utf-8", errors="replace")
+
+def fan_in(sources, max_buffered=MAX_BUFFERED_LINES):
+    """Merge many line iterators into one, yielding (tag, line) pairs as lines arrive.
+
+    `sources` maps a tag (e.g. a pod name) to an iterator. Each source is read
+    on its own thread into a shared queue of at most `max_buffered` lines, so
+    fast sources block instead of buffering when the consumer falls behind.
+    Closing the returned generator stops the readers.
+    """
+    lines = queue.Queue(maxsize=max_buffered)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                lines.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read(tag, source):
+        try:
+            for line in source:
+                if not put((tag, line)):
+                    break
+        except Exception as e:
+            put((tag, f"Error reading logs: {e}"))
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+            put(_DONE)
+
+    threads = [threading.Thread(target=read, args=(tag, source), daemon=True) for tag, source in sources.items()]
+    for thread in threads:
+        thread.start()
+
+    try:
+        remaining = len(threads)
+        while remaining:
+            item = lines.get()
+            if item is _DONE:
+                remaining -= 1
+            else:
+                yield item
+    finally:
+        stop.set()
@@ -1,37 +1,206 @@
+import atexit
+import gzip
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import shutil
+import sys
+import threading
+import time
 
 # Set up a basic logging configuration
 LOG_DIRECTORY = "logs"
 os.makedirs(LOG_DIRECTORY, exist_ok=True)
 
-def setup_logger(name, log_file, level=logging.INFO):
-    """Set up a logger with the specified name, log file, and level."""
+# Log writer settings
+LOG_BATCH_SIZE = 512  # Lines buffered before they are written in one call
+LOG_FLUSH_INTERVAL = 1.0  # Seconds before a partial batch is written anyway
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))  # Rotate the file past this size
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))  # Compressed rotated files kept per log
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listeners = {}  # log file path -> (queue, QueueListener)
+_setup_lock = threading.Lock()
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that hands the record over as-is.
+
+    The stock handler formats the message on the calling thread; records are
+    only passed between threads here, so formatting is left to the listener.
+    """
+
+    def prepare(self, record):
+        return record
+
+class BatchingFileHandler(logging.Handler):
+    """Append formatted lines to a file in batches, rotating and compressing it by size.
+
+    Lines are written once `batch_size` are buffered or `flush_interval`
+    seconds have passed. Rotated files are gzip-compressed on a background
+    thread and only `backup_count` of them are kept.
+    """
+
+    def __init__(self, path, batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL,
+                 max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
+        super().__init__()
+        self.path = path
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._buffer = []
+        self._stream = None
+        self._size = os.path.getsize(path) if os.path.exists(path) else 0
+        self._compressors = []
+        self._stopped = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, args=(flush_interval,), daemon=True)
+        self._flusher.start()
+
+    def emit(self, record):
+        try:
+            line = self.format(record) + "\n"
+        except Exception:
+            self.handleError(record)
+            return
+        with self.lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.batch_size:
+                self._write()
+
+    def flush(self):
+        with self.lock:
+            self._write()
+
+    def _flush_periodically(self, interval):
+        while not self._stopped.wait(interval):
+            self.flush()
+
+    def _write(self):
+        if not self._buffer:
+            return
+        data = "".join(self._buffer)
+        self._buffer.clear()
+        if self._stream is None:
+            self._stream = open(self.path, "a", encoding="utf-8")
+        self._stream.write(data)
+        self._stream.flush()
+        self._size += len(data.encode("utf-8"))  # The limit is in bytes, not characters
+        if self.max_bytes and self._size >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._stream.close()
+        self._stream = None
+        self._size = 0
+        rotated = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 1_000_000_000:09d}"
+        os.replace(self.path, rotated)
+        self._compressors = [thread for thread in self._compressors if thread.is_alive()]
+        compressor = threading.Thread(target=self._compress, args=(rotated,), daemon=True)
+        compressor.start()
+        self._compressors.append(compressor)
+
+    def _compress(self, rotated):
+        try:
+            with open(rotated, "rb") as source, gzip.open(rotated + ".gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(rotated)
+            directory, base = os.path.split(self.path)
+            backups = sorted(name for name in os.listdir(directory or ".")
+                             if name.startswith(base + ".") and name.endswith(".gz"))
+            for name in backups[:max(len(backups) - self.backup_count, 0)]:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass  # Another compressor already removed it
+        except OSError as e:
+            print(f"Error compressing rotated log '{rotated}': {e}", file=sys.stderr)
+
+    def close(self):
+        self._stopped.set()
+        self.flush()
+        for compressor in self._compressors:
+            compressor.join()
+        with self.lock:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+        super().close()
+
+def setup_logger(name, log_file, level=logging.INFO, console_format=None):
+    """Set up a logger with the specified name, log file, and level.
+
+    Records are put on a queue and written as JSON lines by a background
+    listener, so logging calls do not wait on the disk. Loggers sharing a log
+    file share one listener. Calling this again for the same name returns the
+    existing logger instead of adding another handler. With `console_format`,
+    the listener also echoes each record to stdout in that format.
+    """
     logger = logging.getLogger(name)
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    
-    file_handler = logging.FileHandler(os.path.join(LOG_DIRECTORY, log_file))
-    file_handler.setFormatter(formatter)
-    
-    logger.setLevel(level)
-    logger.addHandler(file_handler)
-    
+    with _setup_lock:
+        if any(isinstance(handler, LazyQueueHandler) for handler in logger.handlers):
+            return logger
+
+        path = os.path.join(LOG_DIRECTORY, log_file)
+        if path not in _listeners:
+            file_handler = BatchingFileHandler(path)
+            file_handler.setFormatter(JsonLinesFormatter())
+            handlers = [file_handler]
+            if console_format:
+                console_handler = logging.StreamHandler(sys.stdout)
+                console_handler.setFormatter(logging.Formatter(console_format))
+                handlers.append(console_handler)
+            log_queue = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            _listeners[path] = (log_queue, listener)
+
+        logger.setLevel(level)
+        logger.addHandler(LazyQueueHandler(_listeners[path][0]))
     return logger
 
+def shutdown_logging():
+    """Stop every listener, writing out anything still queued or buffered."""
+    with _setup_lock:
+        for _, listener in _listeners.values():
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+        _listeners.clear()
+
+atexit.register(shutdown_logging)
+
 # Example loggers for container and cloud operations
-container_logger = setup_logger("container_logger", "container.log")
-cloud_logger = setup_logger("cloud_logger", "cloud.log")
+container_logger = setup_logger("container_logger", "container.log", console_format="Logged container event: %(message)s")
+cloud_logger = setup_logger("cloud_logger", "cloud.log", console_format="Logged cloud event: %(message)s")
 
 # Example usage
-def log_container_event(event_message):
-    container_logger.info(event_message)
-    print(f"Logged container event: {event_message}")
+def log_container_event(event_message, **fields):
+    container_logger.info(event_message, extra=fields)
 
-def log_cloud_event(event_message):
-    cloud_logger.info(event_message)
-    print(f"Logged cloud event: {event_message}")
+def log_cloud_event(event_message, **fields):
+    cloud_logger.info(event_message, extra=fields)
 
 # Testing the logger
 if __name__ == "__main__":
-    log_container_event("Container started successfully.")
+    log_container_event("Container started successfully.", container="web")
     log_cloud_event("Cloud deployment created.")
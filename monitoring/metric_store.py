@@ -0,0 +1,294 @@
+import atexit
+import glob
+import os
+import threading
+import time
+from array import array
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+# Metric store settings
+# Kept in the per-user state directory so that runs from different working directories share one history
+METRIC_STORE_DIR = os.getenv("METRIC_STORE_DIR") or os.path.join(
+    os.getenv("XDG_STATE_HOME") or os.path.expanduser("~/.local/state"), "devops-toolkit", "metrics")
+SEGMENT_DURATION = 24 * 3600  # Seconds covered by one segment
+SEGMENT_SAMPLES = 1 << 20  # Samples per segment before a new one is started early
+FLUSH_SAMPLES = 4096  # Buffered samples per series before they are written out
+FLUSH_INTERVAL = 10  # Seconds before buffered samples are written out anyway
+RETENTION = int(os.getenv("METRIC_RETENTION", str(30 * 24 * 3600)))  # Seconds of history kept
+DOWNSAMPLE_AFTER = int(os.getenv("METRIC_DOWNSAMPLE_AFTER", str(24 * 3600)))  # Older segments are downsampled
+DOWNSAMPLE_RESOLUTION = 60  # Seconds per sample in downsampled segments
+MAINTENANCE_INTERVAL = 3600  # Seconds between retention/downsampling passes
+
+TIMESTAMP_DTYPE = np.dtype("<f8")  # Seconds since the epoch
+VALUE_DTYPE = np.dtype("<f4")
+
+_metric_store = None
+_metric_store_lock = threading.Lock()
+
+def series_name(metric_name, **labels):
+    """Build a series name such as 'cpu_usage{deployment_name="web"}' from a metric and its labels."""
+    if not labels:
+        return metric_name
+    return metric_name + "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+def bucket_mean(timestamps, values, resolution):
+    """Average samples into `resolution`-second buckets, returning bucket start times and means."""
+    if not len(timestamps):
+        return timestamps, values
+    buckets = np.floor(timestamps / resolution) * resolution
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    sums = np.add.reduceat(values.astype(np.float64), starts)
+    counts = np.diff(np.r_[starts, len(values)])
+    return buckets[starts], (sums / counts).astype(VALUE_DTYPE)
+
+class _Segment:
+    """One pair of append-only column files: <start>.ts (float64 timestamps) and <start>.val (float32 values)."""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        name = os.path.basename(prefix)
+        self.start = int(name.split("-")[0]) / 1000
+        self.resolution = int(name.split("-r")[1]) if "-r" in name else None
+        self.count = min(self._size(".ts") // TIMESTAMP_DTYPE.itemsize, self._size(".val") // VALUE_DTYPE.itemsize)
+
+    def _size(self, suffix):
+        try:
+            return os.path.getsize(self.prefix + suffix)
+        except FileNotFoundError:
+            return 0
+
+    def repair(self):
+        # A crash between the two column writes leaves one column longer; cut it back
+        for suffix, dtype in ((".ts", TIMESTAMP_DTYPE), (".val", VALUE_DTYPE)):
+            if self._size(suffix) != self.count * dtype.itemsize:
+                with open(self.prefix + suffix, "r+b") as column:
+                    column.truncate(self.count * dtype.itemsize)
+
+    def append(self, timestamps, values):
+        with open(self.prefix + ".ts", "ab") as column:
+            column.write(timestamps.tobytes())
+        with open(self.prefix + ".val", "ab") as column:
+            column.write(values.tobytes())
+        self.count += len(timestamps)
+
+    def columns(self):
+        """Return memory-mapped (timestamps, values) arrays for the segment."""
+        if not self.count:
+            return np.empty(0, TIMESTAMP_DTYPE), np.empty(0, VALUE_DTYPE)
+        return (np.memmap(self.prefix + ".ts", TIMESTAMP_DTYPE, mode="r", shape=(self.count,)),
+                np.memmap(self.prefix + ".val", VALUE_DTYPE, mode="r", shape=(self.count,)))
+
+    def end(self):
+        return float(self.columns()[0][-1]) if self.count else self.start
+
+    def remove(self):
+        for suffix in (".ts", ".val"):
+            try:
+                os.remove(self.prefix + suffix)
+            except FileNotFoundError:
+                pass
+
+class MetricStore:
+    """Embedded, append-only time-series store for float metrics.
+
+    Each series is a directory of segments, each covering up to
+    `segment_duration` seconds, and each segment is two column
+    files (float64 timestamps, float32 values) that are read back through
+    memory maps. Appends are buffered per series and written in batches.
+    Segments older than `downsample_after` seconds are rewritten as
+    `downsample_resolution`-second means, and segments older than `retention`
+    seconds are deleted. Timestamps within a series should not go backwards;
+    a sample older than the previous one is stored at the previous timestamp.
+    """
+
+    def __init__(self, root=METRIC_STORE_DIR, segment_duration=SEGMENT_DURATION, segment_samples=SEGMENT_SAMPLES,
+                 flush_samples=FLUSH_SAMPLES, flush_interval=FLUSH_INTERVAL, retention=RETENTION, downsample_after=DOWNSAMPLE_AFTER,
+                 downsample_resolution=DOWNSAMPLE_RESOLUTION, maintenance_interval=MAINTENANCE_INTERVAL):
+        self.root = root
+        self.segment_duration = segment_duration
+        self.segment_samples = segment_samples
+        self.flush_samples = flush_samples
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.downsample_after = downsample_after
+        self.downsample_resolution = downsample_resolution
+        self.maintenance_interval = maintenance_interval
+        self._buffers = {}  # series -> (array of timestamps, array of values)
+        self._last_timestamp = {}
+        self._segments = {}  # series -> list of _Segment, oldest first
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._last_maintenance = 0.0
+        os.makedirs(root, exist_ok=True)
+
+    def append(self, series, value, timestamp=None):
+        """Record one sample for a series."""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            buffer = self._buffers.get(series)
+            if buffer is None:
+                buffer = self._buffers[series] = (array("d"), array("f"))
+            last = self._last_timestamp.get(series)
+            if last is not None and timestamp < last:
+                timestamp = last
+            self._last_timestamp[series] = timestamp
+            buffer[0].append(timestamp)
+            buffer[1].append(value)
+            full = len(buffer[0]) >= self.flush_samples
+        if full or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def append_many(self, series, timestamps, values):
+        """Record many samples for a series at once."""
+        with self._lock:
+            buffer = self._buffers.get(series)
+            if buffer is None:
+                buffer = self._buffers[series] = (array("d"), array("f"))
+            buffer[0].frombytes(np.ascontiguousarray(timestamps, dtype=TIMESTAMP_DTYPE).tobytes())
+            buffer[1].frombytes(np.ascontiguousarray(values, dtype=VALUE_DTYPE).tobytes())
+            if len(buffer[0]):
+                self._last_timestamp[series] = buffer[0][-1]
+        self.flush()
+
+    def flush(self):
+        """Write out every buffered sample, and run maintenance if it is due."""
+        with self._write_lock:
+            with self._lock:
+                buffers, self._buffers = self._buffers, {}
+                self._last_flush = time.monotonic()
+            for series, (timestamps, values) in buffers.items():
+                self._write(series, np.frombuffer(timestamps, TIMESTAMP_DTYPE), np.frombuffer(values, VALUE_DTYPE))
+            if time.time() - self._last_maintenance >= self.maintenance_interval:
+                self._maintain(time.time())
+
+    def _series_dir(self, series):
+        return os.path.join(self.root, quote(series, safe=""))
+
+    def _load_segments(self, series):
+        segments = self._segments.get(series)
+        if segments is None:
+            prefixes = sorted(path[:-3] for path in glob.glob(os.path.join(glob.escape(self._series_dir(series)), "*.ts")))
+            segments = self._segments[series] = [_Segment(prefix) for prefix in prefixes]
+            if segments:
+                segments[-1].repair()
+        return segments
+
+    def _write(self, series, timestamps, values):
+        # Called with _write_lock held
+        segments = self._load_segments(series)
+        offset = 0
+        while offset < len(timestamps):
+            active = segments[-1] if segments else None
+            if active is None or active.resolution is not None or active.count >= self.segment_samples \
+                    or timestamps[offset] >= active.start + self.segment_duration:
+                os.makedirs(self._series_dir(series), exist_ok=True)
+                active = _Segment(os.path.join(self._series_dir(series), f"{int(timestamps[offset] * 1000):015d}"))
+                segments.append(active)
+            end = offset + min(len(timestamps) - offset, self.segment_samples - active.count)
+            end = offset + int(np.searchsorted(timestamps[offset:end], active.start + self.segment_duration, "left"))
+            active.append(timestamps[offset:end], values[offset:end])
+            offset = end
+
+    def series(self):
+        """Return the names of all stored series."""
+        with self._lock:
+            buffered = set(self._buffers)
+        stored = {unquote(name) for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name))}
+        return sorted(stored | buffered)
+
+    def query(self, series, start=None, end=None, resolution=None):
+        """Return (timestamps, values) NumPy arrays for samples with start <= timestamp <= end.
+
+        With `resolution`, samples are averaged into buckets of that many seconds.
+        """
+        start = -np.inf if start is None else start
+        end = np.inf if end is None else end
+        timestamp_parts, value_parts = [], []
+        with self._write_lock:
+            segments = list(self._load_segments(series))
+            for i, segment in enumerate(segments):
+                next_start = segments[i + 1].start if i + 1 < len(segments) else np.inf
+                if segment.start > end or next_start < start:
+                    continue
+                timestamps, values = segment.columns()
+                lo, hi = np.searchsorted(timestamps, start, "left"), np.searchsorted(timestamps, end, "right")
+                timestamp_parts.append(np.array(timestamps[lo:hi]))
+                value_parts.append(np.array(values[lo:hi]))
+            # Read the buffer before releasing the write lock so a flush cannot move samples in between
+            with self._lock:
+                buffer = self._buffers.get(series)
+                if buffer is not None:
+                    timestamps = np.array(buffer[0], dtype=TIMESTAMP_DTYPE)
+                    values = np.array(buffer[1], dtype=VALUE_DTYPE)
+        if buffer is not None:
+            mask = (timestamps >= start) & (timestamps <= end)
+            timestamp_parts.append(timestamps[mask])
+            value_parts.append(values[mask])
+
+        timestamps = np.concatenate(timestamp_parts) if timestamp_parts else np.empty(0, TIMESTAMP_DTYPE)
+        values = np.concatenate(value_parts) if value_parts else np.empty(0, VALUE_DTYPE)
+        if resolution:
+            return bucket_mean(timestamps, values, resolution)
+        return timestamps, values
+
+    def compact(self, now=None):
+        """Downsample and expire old segments now."""
+        self.flush()
+        with self._write_lock:
+            self._maintain(time.time() if now is None else now)
+
+    def _maintain(self, now):
+        # Called with _write_lock held
+        self._last_maintenance = now
+        for name in os.listdir(self.root):
+            if not os.path.isdir(os.path.join(self.root, name)):
+                continue
+            series = unquote(name)
+            segments = self._load_segments(series)
+            kept = []
+            for i, segment in enumerate(segments):
+                is_active = i == len(segments) - 1
+                segment_end = segment.end()
+                if segment_end < now - self.retention:
+                    segment.remove()
+                    continue
+                if not is_active and segment.resolution is None and segment_end < now - self.downsample_after:
+                    segment = self._downsample(segment)
+                kept.append(segment)
+            if kept:
+                self._segments[series] = kept
+                continue
+            # Nothing left of the series; the next append creates its directory again
+            self._segments.pop(series, None)
+            try:
+                os.rmdir(self._series_dir(series))
+            except OSError:
+                pass
+
+    def _downsample(self, segment):
+        timestamps, values = bucket_mean(*segment.columns(), self.downsample_resolution)
+        name = os.path.basename(segment.prefix)
+        downsampled = _Segment(os.path.join(os.path.dirname(segment.prefix), f"{name}-r{self.downsample_resolution}"))
+        downsampled.remove()
+        downsampled.append(timestamps, values)
+        segment.remove()
+        return downsampled
+
+    def disk_usage(self):
+        """Return the bytes used by all segment files."""
+        return sum(os.path.getsize(path) for path in glob.glob(os.path.join(glob.escape(self.root), "*", "*.*")))
+
+    def close(self):
+        self.flush()
+
+def get_metric_store():
+    """Return the process-wide MetricStore in METRIC_STORE_DIR, creating it on first use."""
+    global _metric_store
+    with _metric_store_lock:
+        if _metric_store is None:
+            _metric_store = MetricStore()
+            atexit.register(_metric_store.close)
+    return _metric_store
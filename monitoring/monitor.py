@@ -1,44 +1,173 @@
-from prometheus_client import start_http_server, Gauge
-import time
+from prometheus_client import start_http_server, Counter, Gauge
+import asyncio
+import random
+import aiohttp
 import requests
-from notification.alert_manager import check_deployment_health
+from monitoring.instrumentation import register_collector, track
+from monitoring.metric_store import get_metric_store, series_name
+from monitoring.slo import get_slo_engine
+from monitoring.slo import register_collector as register_slo_collector
 
 # Define Prometheus metrics
 deployment_health_gauge = Gauge("deployment_health", "Health status of deployments", ["deployment_name"])
+skipped_checks_counter = Counter("health_checks_skipped", "Health checks not run because no slot freed up before they were due",
+                                 ["deployment_name"])
+
+# Health check scheduling parameters
+CHECK_INTERVAL = 60  # Seconds between checks of the same target
+CHECK_TIMEOUT = 5  # Upper bound for a single health check
+CHECK_CONCURRENCY = 100  # Maximum number of checks in flight
+CHECK_JITTER = 0.1  # Fraction of the interval used to spread checks out
+
+def record_health(health_status, deployment_name):
+    """Publish a health check result, keep it in the metric store and count it against the deployment's SLO."""
+    deployment_health_gauge.labels(deployment_name=deployment_name).set(health_status)
+    get_metric_store().append(series_name("deployment_health", deployment_name=deployment_name), health_status)
+
+    # Alerts come from the error budget burn rate, not from a single failed check
+    get_slo_engine().record(deployment_name, health_status > 0)
 
 def monitor_health(url, deployment_name):
     """Basic health check for a deployment."""
     try:
         response = requests.get(url, timeout=5)
         health_status = 1 if response.status_code == 200 else 0
-        deployment_health_gauge.labels(deployment_name=deployment_name).set(health_status)
-        
-        # Trigger alert if health status is unhealthy
-        check_deployment_health(health_status, deployment_name)
-        
+        record_health(health_status, deployment_name)
+
         print(f"Deployment '{deployment_name}' is healthy." if health_status else f"Deployment '{deployment_name}' is unhealthy.")
     except requests.RequestException:
-        deployment_health_gauge.labels(deployment_name=deployment_name).set(0)
-        check_deployment_health(0, deployment_name)
+        record_health(0, deployment_name)
         print(f"Deployment '{deployment_name}' failed health check.")
 
+class HealthCheckScheduler:
+    """Run health checks for many deployments concurrently on one event loop.
+
+    Targets map a deployment name to either a URL or a dict with a "url" and an
+    optional per-target "interval". All checks share one pooled, keep-alive HTTP
+    session, at most `concurrency` checks are in flight at a time, and no check
+    runs past the moment its next run is due.
+    """
+
+    def __init__(self, targets, interval=CHECK_INTERVAL, timeout=CHECK_TIMEOUT,
+                 concurrency=CHECK_CONCURRENCY, jitter=CHECK_JITTER, verbose=True):
+        self.targets = {}
+        for deployment_name, target in targets.items():
+            if isinstance(target, str):
+                target = {"url": target}
+            self.targets[deployment_name] = {"url": target["url"], "interval": target.get("interval", interval)}
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self.verbose = verbose
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        """Create the shared HTTP session and the concurrency limit."""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=0, keepalive_timeout=self.timeout * 2)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def close(self):
+        """Close the shared HTTP session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def check(self, deployment_name, deadline=None):
+        """Check one deployment, giving up at `deadline` (event loop time) at the latest.
+
+        Returns 1 or 0, or None if waiting for a free slot used up the time
+        until the deadline. A check that never ran says nothing about the
+        deployment, so it is only counted in health_checks_skipped and not
+        recorded against its SLO.
+        """
+        loop = asyncio.get_running_loop()
+        url = self.targets[deployment_name]["url"]
+
+        async with self._semaphore:
+            # Time spent waiting for a free slot counts against the deadline
+            timeout = self.timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline - loop.time())
+
+            if timeout <= 0:
+                skipped_checks_counter.labels(deployment_name=deployment_name).inc()
+                if self.verbose:
+                    print(f"Health check of deployment '{deployment_name}' skipped, no check slot before it was due.")
+                return None
+            try:
+                with track("health_check", "http"):
+                    async with self._session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                        health_status = 1 if response.status == 200 else 0
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                health_status = 0
+
+        # Alerting is synchronous, keep it off the event loop
+        await loop.run_in_executor(None, record_health, health_status, deployment_name)
+        if self.verbose:
+            print(f"Deployment '{deployment_name}' is healthy." if health_status else f"Deployment '{deployment_name}' failed health check.")
+        return health_status
+
+    async def run_sweep(self, deadline=None):
+        """Check every target once and return a mapping of deployment name to health status (None if skipped)."""
+        await self.open()
+        names = list(self.targets)
+        results = await asyncio.gather(*(self.check(name, deadline) for name in names))
+        return dict(zip(names, results))
+
+    async def _run_target(self, deployment_name, stop_event):
+        loop = asyncio.get_running_loop()
+        interval = self.targets[deployment_name]["interval"]
+        spread = interval * self.jitter
+
+        # Spread the first checks over the jitter window to avoid a thundering herd
+        await asyncio.sleep(random.uniform(0, spread))
+        while not stop_event.is_set():
+            next_run = loop.time() + interval + random.uniform(-spread, spread)
+            await self.check(deployment_name, deadline=next_run)
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=max(0, next_run - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self, stop_event=None):
+        """Check every target on its own interval until `stop_event` is set."""
+        stop_event = stop_event or asyncio.Event()
+        await self.open()
+        try:
+            await asyncio.gather(*(self._run_target(name, stop_event) for name in self.targets))
+        finally:
+            await self.close()
+
 def start_monitoring_server():
     """Start Prometheus HTTP server for metrics collection."""
+    register_collector()
+    register_slo_collector()
     start_http_server(8000)
     print("Prometheus monitoring server started on port 8000")
 
-if __name__ == "__main__":
-    # Start Prometheus server
+# Sample URLs for health monitoring
+DEPLOYMENT_URLS = {
+    "example_service": "http://example.com/health",
+    "another_service": "http://another-service.com/health",
+}
+
+def start_monitoring(deployment_urls=None):
+    """Serve Prometheus metrics and check every deployment on its own interval until interrupted."""
     start_monitoring_server()
+    try:
+        asyncio.run(HealthCheckScheduler(deployment_urls or DEPLOYMENT_URLS).run())
+    except KeyboardInterrupt:
+        print("Monitoring stopped.")
 
-    # Sample URLs for health monitoring
-    deployment_urls = {
-        "example_service": "http://example.com/health",
-        "another_service": "http://another-service.com/health",
-    }
-
-    # Basic loop to monitor each deployment periodically
-    while True:
-        for deployment_name, url in deployment_urls.items():
-            monitor_health(url, deployment_name)
-        time.sleep(60)  # Run every 60 seconds
+if __name__ == "__main__":
+    start_monitoring()
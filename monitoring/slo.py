@@ -0,0 +1,265 @@
+import os
+import threading
+import time
+from array import array
+
+# SLO settings
+SLO_OBJECTIVE = float(os.getenv("SLO_OBJECTIVE", "0.99"))  # Fraction of health checks that must pass
+# Window name -> (length, bucket) in seconds; each window is a ring of length / bucket counters
+SLO_WINDOWS = {
+    "5m": (300, 10),
+    "1h": (3600, 60),
+    "30d": (30 * 24 * 3600, 3600),
+}
+SLO_BUDGET_WINDOW = "30d"  # Window the error budget is measured over
+# Alert rules: (severity, long window, short window, burn rate, minimum checks). A rule fires
+# when both windows burn the budget at least this many times faster than the objective
+# allows, once the long window holds the minimum number of checks (so the first failures
+# of a new deployment do not alert); the short window makes it stop soon after they stop.
+BURN_RATE_ALERTS = (
+    ("page", "1h", "5m", 14.4, 10),  # 2% of the 30 day budget spent in an hour
+    ("ticket", "30d", "1h", 1.0, 720),  # On course to spend the whole budget; 12 hours of checks a minute
+)
+SLO_RESOLVE_AFTER = 3600  # Seconds a rule must stay quiet before it is resolved and may alert again
+
+_slo_engine = None
+_slo_engine_lock = threading.Lock()
+_collector_registered = False
+_collector_lock = threading.Lock()
+
+class RollingWindow:
+    """Good/total check counts over the last `length` seconds, in constant memory.
+
+    Counts are kept in a ring of `length / bucket` buckets plus running sums, so
+    adding a sample and reading the totals are O(1); moving to a new bucket
+    clears the buckets that fell out of the window, which is amortized O(1) per
+    bucket of elapsed time. Samples older than the window are ignored.
+    """
+
+    __slots__ = ("length", "bucket", "_size", "_totals", "_bad", "_head", "total", "bad")
+
+    def __init__(self, length, bucket):
+        self.length = length
+        self.bucket = bucket
+        self._size = max(1, int(length // bucket))
+        # 32-bit counters: a 30 day window of 1 hour buckets takes under 6 KB per deployment
+        self._totals = array("I", bytes(self._size * 4))
+        self._bad = array("I", bytes(self._size * 4))
+        self._head = None  # Number of the newest bucket, counted from the epoch
+        self.total = 0
+        self.bad = 0
+
+    def advance(self, timestamp):
+        """Move the window forward to `timestamp`, dropping buckets that left it."""
+        number = int(timestamp // self.bucket)
+        if self._head is None:
+            self._head = number
+            return
+        if number <= self._head:
+            return
+        if number - self._head >= self._size:
+            for index in range(self._size):
+                self._totals[index] = self._bad[index] = 0
+            self.total = self.bad = 0
+        else:
+            for stale in range(self._head + 1, number + 1):
+                index = stale % self._size
+                self.total -= self._totals[index]
+                self.bad -= self._bad[index]
+                self._totals[index] = self._bad[index] = 0
+        self._head = number
+
+    def add(self, timestamp, bad=False):
+        """Count one check at `timestamp`."""
+        self.advance(timestamp)
+        number = int(timestamp // self.bucket)
+        if number <= self._head - self._size:
+            return
+        index = number % self._size
+        self._totals[index] += 1
+        self.total += 1
+        if bad:
+            self._bad[index] += 1
+            self.bad += 1
+
+    def error_rate(self, now=None):
+        """Return the fraction of failed checks in the window, 0 if there were none."""
+        if now is not None:
+            self.advance(now)
+        return self.bad / self.total if self.total else 0.0
+
+class SLOTracker:
+    """Rolling availability of one deployment over every window in SLO_WINDOWS."""
+
+    __slots__ = ("objective", "windows")
+
+    def __init__(self, objective=SLO_OBJECTIVE, windows=None):
+        self.objective = objective
+        self.windows = {name: RollingWindow(length, bucket) for name, (length, bucket) in (windows or SLO_WINDOWS).items()}
+
+    def record(self, healthy, timestamp):
+        for window in self.windows.values():
+            window.add(timestamp, not healthy)
+
+    def burn_rate(self, window, now=None):
+        """Return how many times faster than the objective allows the budget burned over a window."""
+        allowed = 1 - self.objective
+        error_rate = self.windows[window].error_rate(now)
+        return error_rate / allowed if allowed > 0 else (float("inf") if error_rate else 0.0)
+
+    def availability(self, window, now=None):
+        return 1 - self.windows[window].error_rate(now)
+
+    def budget_remaining(self, now=None):
+        """Return the fraction of the error budget left in SLO_BUDGET_WINDOW; negative once it is overspent."""
+        return 1 - self.burn_rate(SLO_BUDGET_WINDOW, now)
+
+class SLOEngine:
+    """Availability SLOs for many deployments, fed one health check result at a time.
+
+    Each result updates the deployment's rolling windows and evaluates the
+    BURN_RATE_ALERTS rules for it, both in O(1). An alert is sent when a rule
+    starts firing, never for a single failed check; it is resolved, and may
+    alert again, only once it has not held for SLO_RESOLVE_AFTER seconds, so
+    a steady slow burn does not alert every time its short window dips.
+    """
+
+    def __init__(self, objective=SLO_OBJECTIVE, windows=None, alert_rules=BURN_RATE_ALERTS, notify=None):
+        self.objective = objective
+        self.windows = windows or SLO_WINDOWS
+        self.alert_rules = alert_rules
+        self.notify = notify  # notify(deployment_name, message); defaults to the shared alert dispatcher
+        self.stats = {"samples": 0, "alerts": 0, "resolved": 0}
+        self._trackers = {}
+        self._objectives = {}
+        self._firing = {}  # deployment name -> {severity: time its rule last held}
+        self._lock = threading.Lock()
+
+    def set_objective(self, deployment_name, objective):
+        """Use a different objective for one deployment."""
+        with self._lock:
+            self._objectives[deployment_name] = objective
+            tracker = self._trackers.get(deployment_name)
+            if tracker is not None:
+                tracker.objective = objective
+
+    def tracker(self, deployment_name):
+        with self._lock:
+            tracker = self._trackers.get(deployment_name)
+            if tracker is None:
+                tracker = SLOTracker(self._objectives.get(deployment_name, self.objective), self.windows)
+                self._trackers[deployment_name] = tracker
+            return tracker
+
+    def record(self, deployment_name, healthy, timestamp=None):
+        """Count a health check result and return the alert rules that started firing because of it."""
+        timestamp = time.time() if timestamp is None else timestamp
+        tracker = self.tracker(deployment_name)
+        with self._lock:
+            tracker.record(healthy, timestamp)
+            self.stats["samples"] += 1
+            firing = self._evaluate(tracker, timestamp)
+            active = self._firing.get(deployment_name, {})
+            started = [rule for rule in firing if rule[0] not in active]
+            for rule in firing:
+                active[rule[0]] = timestamp
+            resolved = [severity for severity, held in active.items() if timestamp - held >= SLO_RESOLVE_AFTER]
+            for severity in resolved:
+                del active[severity]
+            if active:
+                self._firing[deployment_name] = active
+            else:
+                self._firing.pop(deployment_name, None)
+            self.stats["resolved"] += len(resolved)
+            self.stats["alerts"] += len(started)
+            messages = [f"ALERT ({severity}): Deployment '{deployment_name}' is burning its error budget "
+                        f"{tracker.burn_rate(short_window):.1f}x faster than its {tracker.objective:.2%} objective "
+                        f"allows (over {long_window} and {short_window})."
+                        for severity, long_window, short_window, _, _ in started]
+        for message in messages:
+            self._notify(deployment_name, message)
+        for severity in resolved:
+            print(f"Deployment '{deployment_name}' is no longer burning its error budget ({severity} resolved).")
+        return started
+
+    def _evaluate(self, tracker, now):
+        return [rule for rule in self.alert_rules
+                if tracker.windows[rule[1]].total >= rule[4]
+                and tracker.burn_rate(rule[1], now) >= rule[3] and tracker.burn_rate(rule[2], now) >= rule[3]]
+
+    def _notify(self, deployment_name, message):
+        print(message)
+        if self.notify is not None:
+            self.notify(deployment_name, message)
+        else:
+            from notification.alert_manager import get_alert_dispatcher
+            get_alert_dispatcher().submit(deployment_name, message)
+
+    def firing(self, deployment_name):
+        """Return the severities currently firing for a deployment."""
+        with self._lock:
+            return tuple(self._firing.get(deployment_name, ()))
+
+    def snapshot(self, now=None):
+        """Return {deployment name: {"objective", "budget_remaining", "availability", "burn_rate"}} as of `now`."""
+        now = time.time() if now is None else now
+        with self._lock:
+            trackers = list(self._trackers.items())
+            report = {}
+            for deployment_name, tracker in trackers:
+                report[deployment_name] = {
+                    "objective": tracker.objective,
+                    "budget_remaining": tracker.budget_remaining(now),
+                    "availability": {window: tracker.availability(window, now) for window in tracker.windows},
+                    "burn_rate": {window: tracker.burn_rate(window, now) for window in tracker.windows},
+                }
+        return report
+
+class SLOCollector:
+    """prometheus_client collector exporting the shared engine's SLO gauges when they are scraped."""
+
+    def collect(self):
+        from prometheus_client.core import GaugeMetricFamily
+
+        objective = GaugeMetricFamily("slo_objective", "Availability objective of a deployment", labels=["deployment_name"])
+        budget = GaugeMetricFamily("slo_error_budget_remaining", f"Fraction of the {SLO_BUDGET_WINDOW} error budget left",
+                                   labels=["deployment_name"])
+        availability = GaugeMetricFamily("slo_availability", "Fraction of passing health checks over a window",
+                                         labels=["deployment_name", "window"])
+        burn_rate = GaugeMetricFamily("slo_burn_rate", "Error budget burn rate over a window",
+                                      labels=["deployment_name", "window"])
+        for deployment_name, report in get_slo_engine().snapshot().items():
+            objective.add_metric([deployment_name], report["objective"])
+            budget.add_metric([deployment_name], report["budget_remaining"])
+            for window, value in report["availability"].items():
+                availability.add_metric([deployment_name, window], value)
+            for window, value in report["burn_rate"].items():
+                burn_rate.add_metric([deployment_name, window], value)
+        yield objective
+        yield budget
+        yield availability
+        yield burn_rate
+
+def get_slo_engine():
+    """Return the shared SLO engine, creating it on first use."""
+    global _slo_engine
+    with _slo_engine_lock:
+        if _slo_engine is None:
+            _slo_engine = SLOEngine()
+    return _slo_engine
+
+def set_slo_engine(engine):
+    """Use a different SLOEngine for all subsequent health check results."""
+    global _slo_engine
+    with _slo_engine_lock:
+        _slo_engine = engine
+
+def register_collector(registry=None):
+    """Export the SLO gauges from the Prometheus registry; call it where a metrics server is started."""
+    global _collector_registered
+    from prometheus_client import REGISTRY
+
+    with _collector_lock:
+        if not _collector_registered:
+            (registry or REGISTRY).register(SLOCollector())
+            _collector_registered = True
@@ -1,51 +1,333 @@
+import atexit
+import queue
 import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
+from monitoring.instrumentation import track
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 import os
 
 # Configuration for Slack
 SLACK_TOKEN = ""  # your Slack token
-slack_client = WebClient(token=SLACK_TOKEN)
+_slack_client = None
 
 # Configuration for Email
 SMTP_SERVER = ""  # your SMTP server
 SMTP_PORT = 0  # your SMTP port
 EMAIL_USERNAME = "" # your email username
 EMAIL_PASSWORD = "" # your email password
+SMTP_USE_TLS = True  # Run STARTTLS after connecting
+SMTP_TIMEOUT = 10  # Seconds
+
+# Configuration for the background alert dispatcher
+ALERT_BATCH_WINDOW = 5  # Seconds to collect alerts before sending them
+ALERT_REPEAT_INTERVAL = 300  # Seconds before the same deployment is alerted again
+SLACK_WORKERS = 4  # Concurrent Slack requests per batch
+SLACK_MAX_RETRIES = 5  # Retries for rate-limited Slack requests
+SLACK_BACKOFF = 1  # Initial backoff in seconds when Slack sends no Retry-After
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_slack_client():
+    """Return the shared Slack client, creating it on first use."""
+    global _slack_client
+    if _slack_client is None:
+        _slack_client = WebClient(token=SLACK_TOKEN)
+    return _slack_client
 
 def send_slack_alert(message, channel="#alerts"):
     """Send a notification to a Slack channel."""
     try:
-        response = slack_client.chat_postMessage(channel=channel, text=message)
+        with track("send_slack_alert", "slack"):
+            response = get_slack_client().chat_postMessage(channel=channel, text=message)
         print(f"Slack alert sent to {channel}: {message}")
     except SlackApiError as e:
         print(f"Error sending Slack message: {e.response['error']}")
 
-def send_email_alert(subject, body, to_email):
-    """Send an email notification."""
+def build_email(subject, body, to_email):
+    """Build an email message for an alert."""
     msg = MIMEText(body)
     msg["Subject"] = subject
     msg["From"] = EMAIL_USERNAME
     msg["To"] = to_email
+    return msg
+
+def send_email_alert(subject, body, to_email):
+    """Send an email notification."""
+    msg = build_email(subject, body, to_email)
 
     try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
+        with track("send_email_alert", "smtp"), smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+            if SMTP_USE_TLS:
+                server.starttls()
+            if EMAIL_USERNAME:
+                server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
             server.sendmail(EMAIL_USERNAME, to_email, msg.as_string())
         print(f"Email alert sent to {to_email}: {subject}")
     except Exception as e:
         print(f"Error sending email: {e}")
 
+class AlertDispatcher:
+    """Send alerts from a background thread so that callers never block on Slack or SMTP.
+
+    Alerts are collected for `batch_window` seconds and deduplicated by
+    deployment, keeping the latest message. A deployment that was alerted less
+    than `repeat_interval` seconds ago is not alerted again on that channel;
+    a failed send does not count as alerted. Each batch is sent
+    to Slack concurrently, backing off when Slack rate-limits us, and by email
+    over a single SMTP session that is kept open between batches.
+
+    With `background=False` no thread is started; the owner calls
+    dispatch_pending() on its own schedule instead.
+    """
+
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(self, batch_window=ALERT_BATCH_WINDOW, repeat_interval=ALERT_REPEAT_INTERVAL,
+                 channel="#alerts", to_email="admin@example.com", slack_client=None,
+                 smtp_server=None, smtp_port=None, use_tls=None, slack_workers=SLACK_WORKERS, background=True):
+        self.batch_window = batch_window
+        self.repeat_interval = repeat_interval
+        self.channel = channel
+        self.to_email = to_email
+        self.slack_client = slack_client
+        self.smtp_server = smtp_server if smtp_server is not None else SMTP_SERVER
+        self.smtp_port = smtp_port if smtp_port is not None else SMTP_PORT
+        self.use_tls = use_tls if use_tls is not None else SMTP_USE_TLS
+        self.background = background
+        self.stats = {"submitted": 0, "suppressed": 0, "slack_sent": 0, "email_sent": 0,
+                      "slack_retries": 0, "smtp_connections": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._last_sent = {}
+        self._smtp = None
+        self._thread = None
+        self._thread_lock = threading.Lock()  # So concurrent first submits start one thread
+        self._slack_workers = slack_workers
+        self._slack_executor = None
+
+    def start(self):
+        """Start the background dispatch thread; a stopped dispatcher can be started again."""
+        with self._thread_lock:
+            if self._thread is None and self.background:
+                self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, deployment_name, message):
+        """Queue an alert for a deployment and return immediately."""
+        self.start()
+        self._queue.put((deployment_name, message))
+
+    def flush(self, timeout=None):
+        """Send everything queued so far and wait until it has been sent."""
+        if not self.background:
+            self.dispatch_pending()
+            return True
+        # Without a running thread nobody would take the marker off the queue
+        self.start()
+        done = threading.Event()
+        self._queue.put((self._FLUSH, done))
+        return done.wait(timeout)
+
+    def stop(self):
+        """Send any pending alerts, then stop the dispatch thread and close the SMTP session."""
+        with self._thread_lock:
+            if self._thread is not None:
+                self._queue.put((self._STOP, None))
+                self._thread.join()
+                self._thread = None
+            elif not self.background:
+                self.dispatch_pending()
+            # The pool is created again on the next dispatch, so alerts submitted after stop() are still sent
+            if self._slack_executor is not None:
+                self._slack_executor.shutdown()
+                self._slack_executor = None
+            self._close_smtp()
+
+    def dispatch_pending(self):
+        """Send everything queued so far from the calling thread, deduplicated as one batch."""
+        pending = {}
+        flushed = []
+        while True:
+            try:
+                key, value = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if key is self._FLUSH:
+                flushed.append(value)
+            elif key is not self._STOP:
+                self._count("submitted")
+                pending[key] = value
+        self._dispatch(pending)
+        for done in flushed:
+            done.set()
+
+    def _count(self, stat):
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def _run(self):
+        pending = {}
+        batch_deadline = None
+        while True:
+            timeout = None if batch_deadline is None else max(0, batch_deadline - time.monotonic())
+            try:
+                key, value = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                key, value = None, None
+
+            if key is None or key is self._FLUSH or key is self._STOP:
+                # An unexpected error loses this batch but must not kill the thread and hang every flush()
+                try:
+                    self._dispatch(pending)
+                except Exception as e:
+                    print(f"Error dispatching alerts: {e}")
+                    self._count("errors")
+                pending, batch_deadline = {}, None
+                if key is self._FLUSH:
+                    value.set()
+                elif key is self._STOP:
+                    return
+                continue
+
+            # Deduplicate by deployment, the latest message wins
+            self._count("submitted")
+            if not pending:
+                batch_deadline = time.monotonic() + self.batch_window
+            pending[key] = value
+
+    def _dispatch(self, pending):
+        now = time.monotonic()
+        slack_messages = []
+        email_messages = []
+        for deployment_name, message in pending.items():
+            # Repeats are tracked per channel, so a send that failed on one channel is not suppressed there
+            due = [channel for channel in ("slack", "email")
+                   if now - self._last_sent.get((channel, deployment_name), -self.repeat_interval) >= self.repeat_interval]
+            if not due:
+                self._count("suppressed")
+                continue
+            if "slack" in due:
+                slack_messages.append((deployment_name, message))
+            if "email" in due:
+                email_messages.append((deployment_name, message))
+
+        # Slack requests run on the pool while emails go out over the shared SMTP session
+        if slack_messages and self._slack_executor is None:
+            self._slack_executor = ThreadPoolExecutor(max_workers=self._slack_workers)
+        slack_results = [(deployment_name, self._slack_executor.submit(self._send_slack, message))
+                         for deployment_name, message in slack_messages]
+        for deployment_name, message in email_messages:
+            if self._send_email("Deployment Health Alert", message):
+                self._last_sent[("email", deployment_name)] = time.monotonic()
+        for deployment_name, result in slack_results:
+            if result.result():
+                self._last_sent[("slack", deployment_name)] = time.monotonic()
+
+    def _send_slack(self, message):
+        slack_client = self.slack_client or get_slack_client()
+        delay = SLACK_BACKOFF
+        for attempt in range(SLACK_MAX_RETRIES + 1):
+            try:
+                with track("send_slack_alert", "slack"):
+                    slack_client.chat_postMessage(channel=self.channel, text=message)
+                self._count("slack_sent")
+                return True
+            except SlackApiError as e:
+                if e.response.status_code != 429 or attempt == SLACK_MAX_RETRIES:
+                    print(f"Error sending Slack message: {e.response['error']}")
+                    self._count("errors")
+                    return False
+                headers = e.response.headers
+                retry_after = headers.get("Retry-After") or headers.get("retry-after")
+                self._count("slack_retries")
+                time.sleep(float(retry_after) if retry_after else delay)
+                delay *= 2
+            except Exception as e:
+                print(f"Error sending Slack message: {e}")
+                self._count("errors")
+                return False
+
+    def _smtp_session(self):
+        if self._smtp is None:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=SMTP_TIMEOUT)
+            if self.use_tls:
+                server.starttls()
+            if EMAIL_USERNAME:
+                server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
+            self._smtp = server
+            self._count("smtp_connections")
+        return self._smtp
+
+    def _close_smtp(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _send_email(self, subject, body):
+        msg = build_email(subject, body, self.to_email)
+        # Retry once on a fresh connection if the server dropped the idle session, which shows up as
+        # SMTPServerDisconnected or as a plain socket error (reset, broken pipe); server replies are not retried
+        for attempt in range(2):
+            try:
+                with track("send_email_alert", "smtp"):
+                    self._smtp_session().sendmail(EMAIL_USERNAME, self.to_email, msg.as_string())
+                self._count("email_sent")
+                return True
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+                print(f"Error sending email: {e}")
+                self._close_smtp()
+                break
+            except OSError as e:
+                self._close_smtp()
+                if attempt:
+                    print(f"Error sending email: {e}")
+            except Exception as e:
+                print(f"Error sending email: {e}")
+                self._close_smtp()
+                break
+        self._count("errors")
+        return False
+
+def get_alert_dispatcher():
+    """Return the shared alert dispatcher, starting it on first use."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AlertDispatcher()
+            _dispatcher.start()
+            atexit.register(_dispatcher.stop)
+    return _dispatcher
+
+def set_alert_dispatcher(dispatcher):
+    """Use a different AlertDispatcher for all subsequent alerts, e.g. one driven by a scheduler."""
+    global _dispatcher
+    with _dispatcher_lock:
+        _dispatcher = dispatcher
+
 def check_deployment_health(health_status, deployment_name, alert_threshold=0):
-    """Check the health of a deployment and send an alert if below the threshold."""
+    """Check the health of a deployment and queue an alert if below the threshold."""
     if health_status <= alert_threshold:
         message = f"ALERT: Deployment '{deployment_name}' is unhealthy!"
-        send_slack_alert(message)
-        send_email_alert(subject="Deployment Health Alert", body=message, to_email="admin@example.com")
+        get_alert_dispatcher().submit(deployment_name, message)
         print(message)
 
+def send_alerts(message, to_email="admin@example.com"):
+    """Send an alert message to Slack and email."""
+    if not message:
+        print("No alert message specified.")
+        return
+    send_slack_alert(message)
+    send_email_alert(subject="DevOps Toolkit Alert", body=message, to_email=to_email)
+
 if __name__ == "__main__":
     # Example alerts based on sample data
     deployment_name = "example_deployment"
@@ -0,0 +1,232 @@
+import asyncio
+import inspect
+import json
+import math
+import signal
+import yaml
+from prometheus_client import Counter, Gauge, start_http_server
+from monitoring.instrumentation import register_collector
+from monitoring.slo import register_collector as register_slo_collector
+
+# Daemon settings
+DAEMON_CONFIG_FILE = "daemon.yml"
+METRICS_PORT = 8000  # The one Prometheus endpoint for every job in the daemon
+SHUTDOWN_TIMEOUT = 30  # Seconds running jobs get to finish after a shutdown signal
+
+# Prometheus metrics for the scheduler itself
+job_runs_counter = Counter("daemon_job_runs", "Completed runs of a daemon job", ["job"])
+job_failures_counter = Counter("daemon_job_failures", "Runs of a daemon job that raised an error", ["job"])
+job_overruns_counter = Counter("daemon_job_overruns", "Runs of a daemon job still going when the next run was due", ["job"])
+job_duration_gauge = Gauge("daemon_job_last_duration_seconds", "Duration of the last run of a daemon job", ["job"])
+
+class PeriodicJob:
+    """A job run every `interval` seconds; blocking jobs run on the loop's thread pool."""
+
+    def __init__(self, name, function, interval, blocking=False):
+        self.name = name
+        self.function = function
+        self.interval = interval
+        self.blocking = blocking
+        self.stats = {"runs": 0, "failures": 0, "overruns": 0, "skipped": 0}
+        self.last_duration = None
+
+class JobScheduler:
+    """Run periodic jobs on one event loop until stopped.
+
+    Async jobs are called with the loop time their next run is due, so they can
+    bound their own work; blocking jobs are called without arguments on the
+    loop's default executor. A job never runs concurrently with itself: a run
+    that is still going when the next one is due counts as an overrun, and the
+    runs it missed are skipped rather than queued. Services are coroutine
+    functions that keep their own schedule and are called once with the stop
+    event. On shutdown, running jobs and services get SHUTDOWN_TIMEOUT seconds
+    to finish before cleanups run in reverse order.
+    """
+
+    def __init__(self, shutdown_timeout=SHUTDOWN_TIMEOUT):
+        self.jobs = []
+        self.services = []
+        self.shutdown_timeout = shutdown_timeout
+        self._cleanups = []
+
+    def add_job(self, name, function, interval, blocking=False):
+        job = PeriodicJob(name, function, interval, blocking)
+        self.jobs.append(job)
+        return job
+
+    def add_service(self, name, function):
+        """Run `function(stop_event)` alongside the jobs; it should return soon after the event is set."""
+        self.services.append((name, function))
+
+    def add_cleanup(self, function):
+        """Register a function (or coroutine function) to call once the jobs have stopped."""
+        self._cleanups.append(function)
+
+    async def _run_once(self, job, deadline):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            if job.blocking:
+                await loop.run_in_executor(None, job.function)
+            else:
+                await job.function(deadline)
+            job.stats["runs"] += 1
+            job_runs_counter.labels(job=job.name).inc()
+        except Exception as e:
+            job.stats["failures"] += 1
+            job_failures_counter.labels(job=job.name).inc()
+            print(f"Error in daemon job '{job.name}': {e}")
+        job.last_duration = loop.time() - started
+        job_duration_gauge.labels(job=job.name).set(job.last_duration)
+
+    async def _run_job(self, job, stop_event):
+        loop = asyncio.get_running_loop()
+        next_run = loop.time()
+        while not stop_event.is_set():
+            deadline = next_run + job.interval
+            await self._run_once(job, deadline)
+            finished = loop.time()
+            if finished > deadline:
+                missed = math.ceil((finished - next_run) / job.interval) - 1
+                job.stats["overruns"] += 1
+                job.stats["skipped"] += missed
+                job_overruns_counter.labels(job=job.name).inc()
+                print(f"Daemon job '{job.name}' overran: took {job.last_duration:.1f}s with a {job.interval}s interval, "
+                      f"skipping {missed} run(s).")
+                deadline = next_run + (missed + 1) * job.interval
+            next_run = deadline
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=max(0, next_run - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_service(self, name, function, stop_event):
+        try:
+            await function(stop_event)
+        except Exception as e:
+            print(f"Error in daemon service '{name}': {e}")
+
+    async def run(self, stop_event=None):
+        """Run every job and service until `stop_event` is set, then shut down gracefully."""
+        stop_event = stop_event or asyncio.Event()
+        tasks = [asyncio.create_task(self._run_job(job, stop_event), name=job.name) for job in self.jobs]
+        tasks += [asyncio.create_task(self._run_service(name, function, stop_event), name=name)
+                  for name, function in self.services]
+        try:
+            await stop_event.wait()
+        finally:
+            stop_event.set()
+            if tasks:
+                _, unfinished = await asyncio.wait(tasks, timeout=self.shutdown_timeout)
+                for task in unfinished:
+                    print(f"Daemon job '{task.get_name()}' did not stop within {self.shutdown_timeout}s, cancelling it.")
+                    task.cancel()
+            loop = asyncio.get_running_loop()
+            for cleanup in reversed(self._cleanups):
+                try:
+                    if inspect.iscoroutinefunction(cleanup):
+                        await cleanup()
+                    else:
+                        await loop.run_in_executor(None, cleanup)
+                except Exception as e:
+                    print(f"Error during daemon shutdown: {e}")
+
+def load_daemon_config(path):
+    """Load the daemon configuration from a YAML or JSON file."""
+    with open(path) as config_file:
+        if path.endswith(".json"):
+            return json.load(config_file)
+        return yaml.safe_load(config_file) or {}
+
+def build_scheduler(daemon_config):
+    """Create a JobScheduler with the health check, scaling and alert jobs a configuration asks for.
+
+    The configuration has optional "health_checks" (targets, interval and the
+    SLO objective, which a target given as a dict can override),
+    "scaling" (deployments as "name" or "namespace/name", namespace, interval,
+    prometheus_url) and "alerts" (batch_window, repeat_interval, channel,
+    to_email) sections.
+    """
+    from monitoring.metric_store import get_metric_store
+    from monitoring.monitor import CHECK_INTERVAL, HealthCheckScheduler
+    from monitoring.slo import SLO_OBJECTIVE, SLOEngine, set_slo_engine
+    import notification.alert_manager as alert_manager
+
+    scheduler = JobScheduler(daemon_config.get("shutdown_timeout", SHUTDOWN_TIMEOUT))
+
+    # Alerts are batched by the scheduler instead of a dispatcher thread
+    alerts = daemon_config.get("alerts") or {}
+    dispatcher = alert_manager.AlertDispatcher(
+        batch_window=alerts.get("batch_window", alert_manager.ALERT_BATCH_WINDOW),
+        repeat_interval=alerts.get("repeat_interval", alert_manager.ALERT_REPEAT_INTERVAL),
+        channel=alerts.get("channel", "#alerts"), to_email=alerts.get("to_email", "admin@example.com"),
+        background=False,
+    )
+    alert_manager.set_alert_dispatcher(dispatcher)
+    scheduler.add_job("alerts", dispatcher.dispatch_pending, dispatcher.batch_window, blocking=True)
+    scheduler.add_cleanup(dispatcher.stop)
+    scheduler.add_cleanup(get_metric_store().close)
+
+    health_checks = daemon_config.get("health_checks") or {}
+    if health_checks.get("targets"):
+        interval = health_checks.get("interval", CHECK_INTERVAL)
+        # Check results alert through the error budget burn rate against each target's objective
+        slo_engine = SLOEngine(health_checks.get("objective", SLO_OBJECTIVE))
+        for deployment_name, target in health_checks["targets"].items():
+            if isinstance(target, dict) and "objective" in target:
+                slo_engine.set_objective(deployment_name, target["objective"])
+        set_slo_engine(slo_engine)
+        # Each target keeps its own interval and jitter rather than being checked in one sweep
+        checks = HealthCheckScheduler(health_checks["targets"], interval=interval, verbose=False)
+        scheduler.add_service("health_checks", checks.run)
+        scheduler.add_cleanup(checks.close)
+
+    scaling_config = daemon_config.get("scaling") or {}
+    if scaling_config.get("deployments"):
+        import kubernetes_dep.client_provider as client_provider
+        import scaling.resource_manager as resource_manager
+
+        # The daemon runs long enough for watch-fed caches to pay off
+        client_provider.enable_informers()
+        if scaling_config.get("prometheus_url"):
+            resource_manager.PROMETHEUS_URL = scaling_config["prometheus_url"]
+        deployments = [tuple(d.split("/", 1)) if "/" in d else d for d in scaling_config["deployments"]]
+        reconciler = resource_manager.ScalingReconciler(deployments, scaling_config.get("namespace"))
+        interval = scaling_config.get("interval", resource_manager.SCALING_INTERVAL)
+        scheduler.add_job("scaling", reconciler.reconcile, interval, blocking=True)
+        scheduler.add_cleanup(client_provider.reset)
+        scheduler.add_cleanup(reconciler.close)
+    return scheduler
+
+async def serve(daemon_config, stop_event=None):
+    """Run the daemon's jobs until SIGINT/SIGTERM or `stop_event`."""
+    loop = asyncio.get_running_loop()
+    stop_event = stop_event or asyncio.Event()
+    for shutdown_signal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(shutdown_signal, stop_event.set)
+        except (NotImplementedError, RuntimeError, ValueError):
+            pass  # No signal handlers on Windows or outside the main thread
+    scheduler = build_scheduler(daemon_config)
+    print(f"Daemon started with jobs: {', '.join([job.name for job in scheduler.jobs] + [name for name, _ in scheduler.services])}")
+    await scheduler.run(stop_event)
+    print("Daemon stopped.")
+    return scheduler
+
+def run_daemon(config_path=None, metrics_port=None):
+    """Run health checks, auto-scaling and alerting from one process with one metrics endpoint."""
+    try:
+        daemon_config = load_daemon_config(config_path or DAEMON_CONFIG_FILE)
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        print(f"Error loading daemon configuration: {e}")
+        return None
+    metrics_port = metrics_port or daemon_config.get("metrics_port", METRICS_PORT)
+    if metrics_port:
+        register_collector()
+        register_slo_collector()
+        start_http_server(metrics_port)
+        print(f"Prometheus metrics served on port {metrics_port}")
+    return asyncio.run(serve(daemon_config))
+
+if __name__ == "__main__":
+    run_daemon()
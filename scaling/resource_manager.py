@@ -1,75 +1,449 @@
-from kubernetes import client, config
+from kubernetes_dep.client_provider import get_apps_api, get_object, list_objects
+from monitoring.instrumentation import instrument, register_collector, track
+from monitoring.metric_store import get_metric_store, series_name
 from prometheus_client import Gauge, start_http_server
+from requests.adapters import HTTPAdapter
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+import math
+import re
 import requests
+import threading
 import time
 
-# Initialize Kubernetes client
-config.load_kube_config()
-k8s_apps_v1 = client.AppsV1Api()
-
 # Define scaling parameters
 NAMESPACE = ""  #your Kubernetes namespace
+DEPLOYMENT_NAMES = []  #your Kubernetes deployment names
 MIN_REPLICAS = 1
 MAX_REPLICAS = 10
 CPU_THRESHOLD = 0.75  # Scale up if CPU usage exceeds 75%
 MEMORY_THRESHOLD = 0.75  # Scale up if memory usage exceeds 75%
 
+# Prometheus settings
+PROMETHEUS_URL = "http://localhost:9090"  # Replace with actual Prometheus server URL
+PROMETHEUS_TIMEOUT = 10  # Seconds
+PROMETHEUS_POOL_SIZE = 4
+SCALING_METRICS = ("cpu_usage", "memory_usage")
+
+# Reconciler settings
+SCALING_INTERVAL = 60  # Seconds between reconcile cycles
+SCALING_WORKERS = 16  # Deployments decided and patched in parallel
+METRICS_PORT = 8001
+HISTORY_SIZE = 120  # Samples of metric history kept per deployment
+
+_prometheus_session = None
+
 # Prometheus Gauges for monitoring
 cpu_usage_gauge = Gauge("cpu_usage", "Current CPU usage of deployment", ["deployment_name"])
 memory_usage_gauge = Gauge("memory_usage", "Current memory usage of deployment", ["deployment_name"])
 
-def get_prometheus_metric(metric_name, deployment_name):
-    """Query Prometheus for a specific metric related to a deployment."""
-    query = f'{metric_name}{{deployment="{deployment_name}"}}'
-    url = f"http://localhost:9090/api/v1/query"  # Replace with actual Prometheus server URL
-    response = requests.get(url, params={"query": query})
-    
+def get_prometheus_session():
+    """Return the shared, connection-pooled HTTP session for Prometheus queries."""
+    global _prometheus_session
+    if _prometheus_session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=PROMETHEUS_POOL_SIZE, pool_maxsize=PROMETHEUS_POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _prometheus_session = session
+    return _prometheus_session
+
+def _deployment_matcher(deployment_names):
+    # Build an anchored regex for the names, escaped once for RE2 and once for the PromQL string
+    pattern = "|".join(re.escape(name) for name in deployment_names)
+    return pattern.replace("\\", "\\\\").replace('"', '\\"')
+
+def _deployment_keys(deployments):
+    # Names are in NAMESPACE, pairs are (namespace, name)
+    return [d if isinstance(d, tuple) else (NAMESPACE, d) for d in deployments]
+
+def get_prometheus_metrics(metric_name, deployments):
+    """Query Prometheus once for a metric across many deployments, averaged per deployment.
+
+    Deployments are given as names in NAMESPACE or as (namespace, name) pairs;
+    the result maps (namespace, name) to the value, so deployments with the
+    same name in different namespaces are kept apart. Series without a
+    namespace label are returned under ("", name). Deployments without data,
+    and every deployment when the query fails, are left out.
+    """
+    keys = _deployment_keys(deployments)
+    if not keys:
+        return {}
+    namespaces = sorted({namespace for namespace, _ in keys})
+    names = sorted({name for _, name in keys})
+    # The empty alternative also matches series without a namespace label, for exporters that do not set one
+    selector = f'namespace=~"{_deployment_matcher(namespaces)}|",deployment=~"{_deployment_matcher(names)}"'
+    query = f'avg by (namespace, deployment) ({metric_name}{{{selector}}})'
+    url = f"{PROMETHEUS_URL}/api/v1/query"
+    try:
+        # POST keeps long selectors out of the URL
+        with track("query_metrics", "prometheus"):
+            response = get_prometheus_session().post(url, data={"query": query}, timeout=PROMETHEUS_TIMEOUT)
+    except requests.RequestException as e:
+        print(f"Error querying Prometheus for '{metric_name}': {e}")
+        return {}
+
+    values = {}
     if response.status_code == 200:
-        results = response.json().get("data", {}).get("result", [])
-        if results:
-            return float(results[0]["value"][1])
-    return 0.0
+        for result in response.json().get("data", {}).get("result", []):
+            labels = result.get("metric", {})
+            if "deployment" in labels:
+                values[(labels.get("namespace", ""), labels["deployment"])] = float(result["value"][1])
+    else:
+        print(f"Prometheus query for '{metric_name}' failed with status {response.status_code}")
+    return values
+
+def _metric_value(values, key):
+    # A series without a namespace label stands for the deployment name in any namespace
+    value = values.get(key)
+    return values.get(("", key[1])) if value is None else value
+
+def get_prometheus_metric(metric_name, deployment_name, namespace=None):
+    """Query Prometheus for a specific metric related to a deployment, None if there is no data."""
+    key = (namespace or NAMESPACE, deployment_name)
+    return _metric_value(get_prometheus_metrics(metric_name, [key]), key)
+
+def fetch_deployment_metrics(deployments, metric_names=SCALING_METRICS):
+    """Fetch every metric for all deployments with one query per metric.
 
-def scale_deployment(deployment_name, replicas):
+    Deployments are names in NAMESPACE or (namespace, name) pairs. Returns a
+    columnar result: "namespace" and "deployment" columns and one column per
+    metric, aligned by index. Deployments without data, for instance while
+    Prometheus is unreachable, get None rather than a value that reads as idle.
+    """
+    keys = _deployment_keys(deployments)
+    columns = {"namespace": [namespace for namespace, _ in keys], "deployment": [name for _, name in keys]}
+    for metric_name in metric_names:
+        values = get_prometheus_metrics(metric_name, keys)
+        columns[metric_name] = [_metric_value(values, key) for key in keys]
+    return columns
+
+@instrument("scale_deployment", "kubernetes")
+def scale_deployment(deployment_name, replicas, namespace=None):
     """Scale a Kubernetes deployment to the specified number of replicas."""
-    current_deployment = k8s_apps_v1.read_namespaced_deployment(deployment_name, NAMESPACE)
-    current_deployment.spec.replicas = replicas
-    k8s_apps_v1.patch_namespaced_deployment(deployment_name, NAMESPACE, current_deployment)
+    # A merge patch on the scale subresource sends only the replica count
+    get_apps_api().patch_namespaced_deployment_scale(
+        deployment_name, namespace or NAMESPACE, {"spec": {"replicas": replicas}},
+        _content_type="application/merge-patch+json",
+    )
     print(f"Scaled deployment '{deployment_name}' to {replicas} replicas.")
 
-def check_and_scale_deployment(deployment_name):
-    """Monitor resource usage and auto-scale deployment if thresholds are exceeded."""
-    # Get current CPU and memory usage from Prometheus
-    cpu_usage = get_prometheus_metric("cpu_usage", deployment_name)
-    memory_usage = get_prometheus_metric("memory_usage", deployment_name)
+@instrument("list_deployments", "kubernetes")
+def get_replica_counts(namespace=None):
+    """Return the replica count of every deployment in a namespace, from the shared deployment cache."""
+    deployments = list_objects("Deployment", namespace or NAMESPACE)
+    return {deployment.metadata.name: deployment.spec.replicas for deployment in deployments}
+
+class MetricHistory:
+    """Fixed-capacity ring buffer of (timestamp, value) samples backed by compact arrays."""
+
+    def __init__(self, capacity=HISTORY_SIZE):
+        self.capacity = capacity
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, value):
+        self.timestamps[self._next] = timestamp
+        self.values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def samples(self, since=None):
+        """Return the samples oldest first, optionally only those at or after `since`."""
+        first = (self._next - self._size) % self.capacity
+        samples = []
+        for i in range(self._size):
+            index = (first + i) % self.capacity
+            if since is None or self.timestamps[index] >= since:
+                samples.append((self.timestamps[index], self.values[index]))
+        return samples
+
+def utilization(cpu_usage, memory_usage):
+    """Return usage relative to the scaling thresholds, 1.0 meaning exactly at target."""
+    return max(cpu_usage / CPU_THRESHOLD, memory_usage / MEMORY_THRESHOLD)
+
+class ScalingPolicy:
+    """Base class for scaling policies used by check_and_scale_deployment()."""
+
+    def desired_replicas(self, deployment_key, current_replicas, cpu_usage, memory_usage, now=None):
+        """Return the replica count the deployment should have.
+
+        `cpu_usage` or `memory_usage` is None when Prometheus has no data for
+        the deployment.
+        """
+        raise NotImplementedError
+
+class ThresholdPolicy(ScalingPolicy):
+    """Move one replica at a time when a single sample crosses the thresholds."""
+
+    def desired_replicas(self, deployment_key, current_replicas, cpu_usage, memory_usage, now=None):
+        # Without data there is nothing to decide on
+        if cpu_usage is None or memory_usage is None:
+            return current_replicas
+
+        # Scale up if either CPU or memory usage exceeds threshold and replicas are below MAX_REPLICAS
+        if (cpu_usage > CPU_THRESHOLD or memory_usage > MEMORY_THRESHOLD) and current_replicas < MAX_REPLICAS:
+            return min(current_replicas + 1, MAX_REPLICAS)
+
+        # Scale down if CPU and memory usage are below thresholds and replicas are above MIN_REPLICAS
+        if cpu_usage < CPU_THRESHOLD and memory_usage < MEMORY_THRESHOLD and current_replicas > MIN_REPLICAS:
+            return max(current_replicas - 1, MIN_REPLICAS)
+
+        return current_replicas
+
+class _DeploymentState:
+    def __init__(self, history_size):
+        self.raw = MetricHistory(history_size)
+        self.smoothed = MetricHistory(history_size)
+        self.recommendations = MetricHistory(history_size)
+        self.ewma = None
+        self.last_scale = None
+
+class ProportionalPolicy(ScalingPolicy):
+    """Smoothed, proportional scaling in the style of the Kubernetes HPA.
+
+    Utilization (see utilization()) is smoothed with an EWMA or a rolling
+    window mean, and the target is ceil(current * utilization), left alone
+    while utilization is within `tolerance` of the target. Scale-ups use the
+    lowest and scale-downs the highest recommendation of their stabilization
+    window, and cooldowns space out consecutive scale events. With
+    forecast="linear" or "holt", the utilization expected `forecast_horizon`
+    seconds ahead is used when it is higher, so capacity is added ahead of load.
+    """
+
+    def __init__(self, smoothing="ewma", alpha=0.5, window=300, tolerance=0.1,
+                 scale_up_stabilization=0, scale_down_stabilization=300,
+                 scale_up_cooldown=0, scale_down_cooldown=60,
+                 forecast=None, forecast_horizon=120, trend_beta=0.3, history_size=HISTORY_SIZE):
+        if smoothing not in ("ewma", "window"):
+            raise ValueError(f"Unknown smoothing '{smoothing}'")
+        if forecast not in (None, "linear", "holt"):
+            raise ValueError(f"Unknown forecast '{forecast}'")
+        self.smoothing = smoothing
+        self.alpha = alpha
+        self.window = window
+        self.tolerance = tolerance
+        self.scale_up_stabilization = scale_up_stabilization
+        self.scale_down_stabilization = scale_down_stabilization
+        self.scale_up_cooldown = scale_up_cooldown
+        self.scale_down_cooldown = scale_down_cooldown
+        self.forecast = forecast
+        self.forecast_horizon = forecast_horizon
+        self.trend_beta = trend_beta
+        self.history_size = history_size
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _state(self, deployment_key):
+        with self._lock:
+            state = self._states.get(deployment_key)
+            if state is None:
+                state = self._states[deployment_key] = _DeploymentState(self.history_size)
+            return state
+
+    def _smooth(self, state, now, value):
+        if self.smoothing == "ewma":
+            state.ewma = value if state.ewma is None else self.alpha * value + (1 - self.alpha) * state.ewma
+            return state.ewma
+        samples = state.raw.samples(since=now - self.window)
+        return sum(v for _, v in samples) / len(samples)
+
+    def _predict(self, state, now):
+        samples = state.smoothed.samples(since=now - self.window)
+        if len(samples) < 2:
+            return samples[-1][1] if samples else 0.0
+
+        if self.forecast == "linear":
+            # Least-squares line through the window, evaluated at the horizon
+            count = len(samples)
+            mean_t = sum(t for t, _ in samples) / count
+            mean_v = sum(v for _, v in samples) / count
+            variance = sum((t - mean_t) ** 2 for t, _ in samples)
+            slope = sum((t - mean_t) * (v - mean_v) for t, v in samples) / variance if variance else 0.0
+            return mean_v + slope * (now + self.forecast_horizon - mean_t)
+
+        # Holt's linear trend method over the window
+        step = (samples[-1][0] - samples[0][0]) / (len(samples) - 1) or 1.0
+        level, trend = samples[0][1], samples[1][1] - samples[0][1]
+        for _, value in samples[1:]:
+            previous_level = level
+            level = self.alpha * value + (1 - self.alpha) * (level + trend)
+            trend = self.trend_beta * (level - previous_level) + (1 - self.trend_beta) * trend
+        return level + trend * (self.forecast_horizon / step)
+
+    def desired_replicas(self, deployment_key, current_replicas, cpu_usage, memory_usage, now=None):
+        # No data is not zero load: record nothing, so an outage cannot pull the fleet down to MIN_REPLICAS
+        if cpu_usage is None or memory_usage is None:
+            return current_replicas
+        now = time.time() if now is None else now
+        state = self._state(deployment_key)
+
+        value = utilization(cpu_usage, memory_usage)
+        state.raw.append(now, value)
+        load = self._smooth(state, now, value)
+        state.smoothed.append(now, load)
+        if self.forecast:
+            load = max(load, self._predict(state, now))
+
+        base = max(current_replicas, 1)
+        recommendation = current_replicas if abs(load - 1) <= self.tolerance else math.ceil(base * load)
+        recommendation = min(max(recommendation, MIN_REPLICAS), MAX_REPLICAS)
+        state.recommendations.append(now, recommendation)
+
+        desired = current_replicas
+        if recommendation > current_replicas:
+            window = state.recommendations.samples(since=now - self.scale_up_stabilization)
+            desired = max(current_replicas, int(min(r for _, r in window)))
+            if state.last_scale is not None and now - state.last_scale < self.scale_up_cooldown:
+                desired = current_replicas
+        elif recommendation < current_replicas:
+            window = state.recommendations.samples(since=now - self.scale_down_stabilization)
+            desired = min(current_replicas, int(max(r for _, r in window)))
+            if state.last_scale is not None and now - state.last_scale < self.scale_down_cooldown:
+                desired = current_replicas
+
+        if desired != current_replicas:
+            state.last_scale = now
+        return desired
+
+# The policy used by check_and_scale_deployment(), replace it with set_scaling_policy()
+scaling_policy = ProportionalPolicy()
+
+def set_scaling_policy(policy):
+    """Use a different ScalingPolicy for all subsequent scaling decisions."""
+    global scaling_policy
+    scaling_policy = policy
+
+# Default for usage values check_and_scale_deployment() should fetch itself; None means Prometheus has no data
+_UNSET = object()
+
+@instrument("scale_decision", "kubernetes")
+def check_and_scale_deployment(deployment_name, cpu_usage=_UNSET, memory_usage=_UNSET, current_replicas=None, namespace=None):
+    """Monitor resource usage and auto-scale deployment if thresholds are exceeded.
+
+    Usage values and the replica count that are not passed in are fetched from
+    Prometheus and the Kubernetes API. Usage passed as None, or that Prometheus
+    has no data for, is left to the scaling policy, which keeps the replica
+    count. Returns the resulting replica count.
+    """
+    namespace = namespace or NAMESPACE
+    if cpu_usage is _UNSET or memory_usage is _UNSET:
+        metrics = fetch_deployment_metrics([(namespace, deployment_name)])
+        if cpu_usage is _UNSET:
+            cpu_usage = metrics["cpu_usage"][0]
+        if memory_usage is _UNSET:
+            memory_usage = metrics["memory_usage"][0]
     
     # Update Prometheus Gauges
-    cpu_usage_gauge.labels(deployment_name=deployment_name).set(cpu_usage)
-    memory_usage_gauge.labels(deployment_name=deployment_name).set(memory_usage)
+    if cpu_usage is not None:
+        cpu_usage_gauge.labels(deployment_name=deployment_name).set(cpu_usage)
+    if memory_usage is not None:
+        memory_usage_gauge.labels(deployment_name=deployment_name).set(memory_usage)
     
     # Fetch the current replica count
-    deployment = k8s_apps_v1.read_namespaced_deployment(deployment_name, NAMESPACE)
-    current_replicas = deployment.spec.replicas
-    
-    # Scale up if either CPU or memory usage exceeds threshold and replicas are below MAX_REPLICAS
-    if (cpu_usage > CPU_THRESHOLD or memory_usage > MEMORY_THRESHOLD) and current_replicas < MAX_REPLICAS:
-        new_replicas = min(current_replicas + 1, MAX_REPLICAS)
-        scale_deployment(deployment_name, new_replicas)
-    
-    # Scale down if CPU and memory usage are below thresholds and replicas are above MIN_REPLICAS
-    elif cpu_usage < CPU_THRESHOLD and memory_usage < MEMORY_THRESHOLD and current_replicas > MIN_REPLICAS:
-        new_replicas = max(current_replicas - 1, MIN_REPLICAS)
-        scale_deployment(deployment_name, new_replicas)
-
-def start_scaling_monitor(deployment_name):
-    """Start the auto-scaling monitor for a deployment."""
-    start_http_server(8001)  # Start a Prometheus server for tracking metrics
-    print("Scaling monitor server started on port 8001")
-    
-    while True:
-        check_and_scale_deployment(deployment_name)
-        time.sleep(60)  # Check every 60 seconds
+    if current_replicas is None:
+        deployment = get_object("Deployment", deployment_name, namespace)
+        current_replicas = deployment.spec.replicas
+
+    new_replicas = scaling_policy.desired_replicas(f"{namespace}/{deployment_name}", current_replicas, cpu_usage, memory_usage)
+    if new_replicas != current_replicas:
+        scale_deployment(deployment_name, new_replicas, namespace)
+
+    # Keep the history locally so trends can be read without querying Prometheus again
+    store = get_metric_store()
+    now = time.time()
+    for metric_name, value in (("cpu_usage", cpu_usage), ("memory_usage", memory_usage), ("replicas", new_replicas)):
+        if value is None:
+            continue
+        store.append(series_name(metric_name, namespace=namespace, deployment_name=deployment_name), value, now)
+    return new_replicas
+
+class ScalingReconciler:
+    """Reconcile the replica counts of many deployments from one process.
+
+    Deployments are given as names in NAMESPACE or as (namespace, name) pairs.
+    Each cycle makes one Prometheus query per metric, one deployment list per
+    namespace, and then decides and patches every deployment on a bounded
+    worker pool.
+    """
+
+    def __init__(self, deployments, namespace=None, max_workers=SCALING_WORKERS):
+        namespace = namespace or NAMESPACE
+        self.deployments = [d if isinstance(d, tuple) else (namespace, d) for d in deployments]
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @instrument("reconcile", "kubernetes")
+    def reconcile(self):
+        """Run one scaling cycle and return the resulting replica count per (namespace, name)."""
+        metrics = fetch_deployment_metrics(self.deployments)
+        usage = {key: (metrics["cpu_usage"][i], metrics["memory_usage"][i])
+                 for i, key in enumerate(zip(metrics["namespace"], metrics["deployment"]))}
+
+        replica_counts = {}
+        for namespace in {namespace for namespace, _ in self.deployments}:
+            try:
+                replica_counts[namespace] = get_replica_counts(namespace)
+            except Exception as e:
+                print(f"Error listing deployments in namespace '{namespace}': {e}")
+                replica_counts[namespace] = {}
+
+        futures = {}
+        for namespace, name in self.deployments:
+            current_replicas = replica_counts[namespace].get(name)
+            if current_replicas is None:
+                print(f"Deployment '{name}' not found in namespace '{namespace}'.")
+                continue
+            cpu_usage, memory_usage = usage[(namespace, name)]
+            futures[(namespace, name)] = self._executor.submit(
+                check_and_scale_deployment, name, cpu_usage, memory_usage, current_replicas, namespace)
+
+        results = {}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                print(f"Error scaling deployment '{key[1]}': {e}")
+        return results
+
+    def run(self, interval=SCALING_INTERVAL, stop_event=None):
+        """Reconcile every `interval` seconds until `stop_event` is set."""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            self.reconcile()
+            stop_event.wait(interval)
+
+    def close(self):
+        self._executor.shutdown()
+
+def start_scaling_monitor(deployment_names, metrics_port=METRICS_PORT, interval=SCALING_INTERVAL):
+    """Start the auto-scaling monitor for one or more deployments.
+
+    Pass metrics_port=None when the process already serves Prometheus metrics.
+    """
+    if isinstance(deployment_names, str):
+        deployment_names = [deployment_names]
+    if metrics_port:
+        register_collector()
+        start_http_server(metrics_port)  # Start a Prometheus server for tracking metrics
+        print(f"Scaling monitor server started on port {metrics_port}")
+
+    ScalingReconciler(deployment_names).run(interval)
+
+def manage_resources(deployment_names=None):
+    """Run the auto-scaling monitor for DEPLOYMENT_NAMES until interrupted."""
+    deployment_names = deployment_names or DEPLOYMENT_NAMES
+    if not deployment_names:
+        print("No deployments configured for auto-scaling; set DEPLOYMENT_NAMES in scaling/resource_manager.py.")
+        return
+    try:
+        start_scaling_monitor(deployment_names)
+    except KeyboardInterrupt:
+        print("Auto-scaling monitor stopped.")
 
 if __name__ == "__main__":
-    deployment_name = ""  #your Kubernetes deployment name
-    start_scaling_monitor(deployment_name)
+    manage_resources()
@@ -0,0 +1,85 @@
+"""Shared fixtures for the test suite: the stand-ins from benchmarks/fakes.py, started per test."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from benchmarks.fakes import FakePrometheus, FakeSlack, StubHTTPServer, StubSMTPServer
+
+@pytest.fixture
+def slack():
+    """A FakeSlack served over HTTP; point a WebClient at `slack.base_url`."""
+    fake = FakeSlack()
+    with StubHTTPServer(routes=fake.routes) as server:
+        fake.base_url = f"{server.url}/api/"
+        yield fake
+
+@pytest.fixture
+def smtp():
+    with StubSMTPServer() as server:
+        yield server
+
+@pytest.fixture
+def prometheus(monkeypatch):
+    """A FakePrometheus served over HTTP, with the scaler pointed at it."""
+    import scaling.resource_manager as resource_manager
+
+    fake = FakePrometheus()
+    with StubHTTPServer(routes=fake.routes) as server:
+        monkeypatch.setattr(resource_manager, "PROMETHEUS_URL", server.url)
+        fake.url = server.url
+        yield fake
+
+@pytest.fixture
+def metric_store(monkeypatch, tmp_path):
+    """A MetricStore in a temporary directory, returned by get_metric_store() for the test."""
+    import monitoring.metric_store as metric_store
+
+    store = metric_store.MetricStore(str(tmp_path / "metrics"))
+    monkeypatch.setattr(metric_store, "_metric_store", store)
+    yield store
+    store.close()
+
+@pytest.fixture
+def docker(monkeypatch):
+    """A FakeDockerClient behind the shared Docker client and its state cache."""
+    import docker_dep.docker_manager as docker_manager
+    from benchmarks.fakes import FakeDockerClient
+
+    fake = FakeDockerClient()
+    monkeypatch.setattr(docker_manager, "_client", fake)
+    yield fake
+    if docker_manager._state_cache is not None:
+        docker_manager._state_cache.stop()
+        docker_manager._state_cache = None
+
+@pytest.fixture
+def aws(monkeypatch):
+    """Mock every AWS API with moto, with the shared sessions and clients created inside the mock."""
+    mock_aws = pytest.importorskip("moto").mock_aws
+
+    import cloud.aws_clients as aws_clients
+
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+    with mock_aws():
+        aws_clients.reset()
+        yield
+    aws_clients.reset()
+
+@pytest.fixture
+def kubernetes(monkeypatch):
+    """A FakeKubernetes behind the shared Kubernetes clients, read directly rather than through informers."""
+    import kubernetes_dep.client_provider as client_provider
+    from benchmarks.fakes import FakeAppsV1Api, FakeCoreV1Api, FakeKubernetes
+
+    fake = FakeKubernetes()
+    monkeypatch.setattr(client_provider, "USE_INFORMERS", False)
+    client_provider.reset()
+    client_provider._apps_api, client_provider._core_api = FakeAppsV1Api(fake), FakeCoreV1Api(fake)
+    yield fake
+    client_provider.reset()
@@ -0,0 +1,151 @@
+import smtplib
+import threading
+import time
+
+import pytest
+from slack_sdk import WebClient
+
+import notification.alert_manager as alert_manager
+
+@pytest.fixture
+def dispatcher(slack, smtp):
+    dispatcher = alert_manager.AlertDispatcher(
+        batch_window=0.05, repeat_interval=300, slack_client=WebClient(base_url=slack.base_url),
+        smtp_server="127.0.0.1", smtp_port=smtp.port, use_tls=False)
+    yield dispatcher
+    dispatcher.stop()
+
+def test_submitted_alerts_are_sent_to_slack_and_email(dispatcher, slack, smtp):
+    dispatcher.submit("web", "ALERT: web is down")
+    dispatcher.submit("api", "ALERT: api is down")
+    assert dispatcher.flush(timeout=5)
+    assert sorted(slack.messages) == ["ALERT: api is down", "ALERT: web is down"]
+    assert len(smtp.messages) == 2
+    assert dispatcher.stats["slack_sent"] == dispatcher.stats["email_sent"] == 2
+
+def test_flush_before_anything_was_submitted_returns(dispatcher):
+    assert dispatcher.flush(timeout=2)
+
+def test_alerts_in_one_batch_are_deduplicated_keeping_the_latest(dispatcher, slack, smtp):
+    for sample in range(5):
+        dispatcher.submit("web", f"ALERT: web is down ({sample})")
+    dispatcher.flush(timeout=5)
+    assert slack.messages == ["ALERT: web is down (4)"]
+    assert len(smtp.messages) == 1
+
+def test_repeats_within_the_repeat_interval_are_suppressed(dispatcher, slack, smtp):
+    dispatcher.submit("web", "ALERT: web is down")
+    dispatcher.flush(timeout=5)
+    dispatcher.submit("web", "ALERT: web is still down")
+    dispatcher.flush(timeout=5)
+    assert slack.messages == ["ALERT: web is down"]
+    assert len(smtp.messages) == 1
+    assert dispatcher.stats["suppressed"] == 1
+
+def test_a_failed_send_does_not_suppress_the_next_alert(dispatcher, slack, smtp):
+    slack.failure_rate = smtp.failure_rate = 1.0
+    dispatcher.submit("web", "ALERT: web is down")
+    dispatcher.flush(timeout=5)
+    assert dispatcher.stats["errors"] == 2
+
+    slack.failure_rate = smtp.failure_rate = 0.0
+    dispatcher.submit("web", "ALERT: web is still down")
+    dispatcher.flush(timeout=5)
+    assert slack.messages == ["ALERT: web is still down"]
+    assert len(smtp.messages) == 1
+    assert dispatcher.stats["suppressed"] == 0
+
+def test_rate_limited_slack_requests_are_retried(dispatcher, slack):
+    slack.rate_limit_every = 2
+    for i in range(6):
+        dispatcher.submit(f"service-{i}", f"ALERT: service-{i} is down")
+    dispatcher.flush(timeout=10)
+    assert len(slack.messages) == 6
+    assert dispatcher.stats["slack_retries"] > 0
+    assert dispatcher.stats["errors"] == 0
+
+def test_one_smtp_session_is_reused_across_batches(dispatcher, smtp):
+    for i in range(3):
+        dispatcher.submit(f"service-{i}", f"ALERT: service-{i} is down")
+        dispatcher.flush(timeout=5)
+    assert len(smtp.messages) == 3
+    assert smtp.connections == 1
+    assert dispatcher.stats["smtp_connections"] == 1
+
+class DroppedSession:
+    """An SMTP session the server closed while it was idle."""
+
+    def sendmail(self, *args):
+        raise ConnectionResetError("Connection reset by peer")
+
+    def quit(self):
+        raise smtplib.SMTPServerDisconnected("not connected")
+
+def test_a_dropped_idle_smtp_session_is_reopened(dispatcher, smtp):
+    dispatcher._smtp = DroppedSession()
+    dispatcher.submit("web", "ALERT: web is down")
+    dispatcher.flush(timeout=5)
+    assert len(smtp.messages) == 1
+    assert dispatcher.stats["errors"] == 0
+
+def test_without_a_background_thread_the_owner_dispatches(slack, smtp):
+    dispatcher = alert_manager.AlertDispatcher(
+        slack_client=WebClient(base_url=slack.base_url), smtp_server="127.0.0.1", smtp_port=smtp.port,
+        use_tls=False, background=False)
+    dispatcher.submit("web", "ALERT: web is down")
+    assert slack.messages == []
+    dispatcher.dispatch_pending()
+    assert slack.messages == ["ALERT: web is down"]
+    dispatcher.stop()
+
+def test_alerts_submitted_after_stop_are_still_sent(dispatcher, slack, smtp):
+    dispatcher.submit("web", "ALERT: web is down")
+    dispatcher.stop()
+    dispatcher.submit("api", "ALERT: api is down")
+    assert dispatcher.flush(timeout=5)
+    assert sorted(slack.messages) == ["ALERT: api is down", "ALERT: web is down"]
+    assert len(smtp.messages) == 2
+
+def test_an_unexpected_dispatch_error_does_not_stop_the_thread(dispatcher, slack, monkeypatch):
+    original = dispatcher._dispatch
+    calls = []
+
+    def fail_once(pending):
+        calls.append(pending)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        original(pending)
+
+    monkeypatch.setattr(dispatcher, "_dispatch", fail_once)
+    dispatcher.submit("web", "ALERT: web is down")
+    assert dispatcher.flush(timeout=5)
+    dispatcher.submit("api", "ALERT: api is down")
+    assert dispatcher.flush(timeout=5)
+    assert slack.messages == ["ALERT: api is down"]
+    assert dispatcher.stats["errors"] == 1
+
+def test_concurrent_first_submits_start_one_thread(dispatcher, slack, monkeypatch):
+    started = []
+    thread_class = alert_manager.threading.Thread
+
+    class CountingThread(thread_class):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if self.name == "alert-dispatcher":
+                started.append(self)
+                time.sleep(0.01)  # Widen the window between the check and the assignment
+    monkeypatch.setattr(alert_manager.threading, "Thread", CountingThread)
+
+    barrier = threading.Barrier(8)
+
+    def submit(i):
+        barrier.wait()
+        dispatcher.submit(f"service-{i}", f"ALERT: service-{i} is down")
+    submitters = [thread_class(target=submit, args=(i,)) for i in range(8)]
+    for thread in submitters:
+        thread.start()
+    for thread in submitters:
+        thread.join()
+    assert dispatcher.flush(timeout=5)
+    assert len(started) == 1
+    assert len(slack.messages) == 8
@@ -0,0 +1,138 @@
+import datetime
+
+import pytest
+from botocore.stub import Stubber
+
+import cloud.aws_clients as aws_clients
+
+ROLE_ARN = "arn:aws:iam::111111111111:role/devops-toolkit"
+
+@pytest.fixture
+def assume_role_calls(aws):
+    """Count AssumeRole calls made through the default account's STS client."""
+    calls = []
+    aws_clients.get_client("sts").meta.events.register(
+        "provide-client-params.sts.AssumeRole", lambda **kwargs: calls.append(kwargs["params"]))
+    return calls
+
+def test_accounts_use_assumed_role_credentials(assume_role_calls):
+    aws_clients.register_account("production", ROLE_ARN, external_id="toolkit")
+    session = aws_clients.get_session("production")
+    # Nothing is assumed until the credentials are first needed
+    assert assume_role_calls == []
+
+    identity = aws_clients.get_client("sts", account="production").get_caller_identity()
+    assert identity["Account"] == "111111111111"
+    assert ":assumed-role/devops-toolkit/" in identity["Arn"]
+    assert session.get_credentials().method == "sts-assume-role"
+    assert len(assume_role_calls) == 1
+    assert assume_role_calls[0]["RoleArn"] == ROLE_ARN
+    assert assume_role_calls[0]["ExternalId"] == "toolkit"
+
+def test_clients_of_an_account_share_its_credentials(assume_role_calls):
+    aws_clients.register_account("production", ROLE_ARN)
+    for region in ("us-east-1", "eu-west-1"):
+        aws_clients.get_client("ecs", region_name=region, account="production").list_clusters()
+    assert aws_clients.get_client("ecs", account="production") is aws_clients.get_client("ecs", account="production")
+    assert len(assume_role_calls) == 1
+
+def test_the_default_account_does_not_assume_a_role(assume_role_calls):
+    identity = aws_clients.get_client("sts").get_caller_identity()
+    assert ":assumed-role/" not in identity["Arn"]
+    assert assume_role_calls == []
+
+def test_unknown_accounts_are_rejected(aws, monkeypatch, tmp_path):
+    monkeypatch.setattr(aws_clients, "AWS_TARGETS_FILE", str(tmp_path / "aws.yml"))
+    with pytest.raises(KeyError):
+        aws_clients.get_session("staging")
+
+def test_load_targets(aws, tmp_path):
+    path = tmp_path / "aws.yml"
+    path.write_text(
+        "regions: [us-east-1, eu-west-1]\n"
+        "accounts:\n"
+        "  - name: default\n"
+        f"  - name: production\n    role_arn: {ROLE_ARN}\n    regions: [us-west-2]\n")
+    assert aws_clients.load_targets(str(path)) == [(None, "us-east-1"), (None, "eu-west-1"), ("production", "us-west-2")]
+    assert aws_clients.find_account("111111111111") == "production"
+
+# The tests below stub AWS with botocore's Stubber instead of moto, so they check the exact requests made
+
+@pytest.fixture
+def stubbed(monkeypatch, tmp_path):
+    """Fresh shared clients with fake default credentials and no targets file; stub clients with Stubber."""
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+    monkeypatch.setattr(aws_clients, "AWS_TARGETS_FILE", str(tmp_path / "aws.yml"))
+    aws_clients.reset()
+    yield
+    aws_clients.reset()
+
+def assume_role_response(access_key, expires_in):
+    expiration = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=expires_in)
+    return {"Credentials": {"AccessKeyId": access_key, "SecretAccessKey": "secret-access-key",
+                            "SessionToken": "session-token", "Expiration": expiration}}
+
+def test_clients_are_cached_per_account_region_and_service(stubbed):
+    aws_clients.register_account("production", ROLE_ARN)
+    client = aws_clients.get_client("ecs", "eu-west-1", "production")
+    assert aws_clients.get_client("ecs", "eu-west-1", "production") is client
+    others = [aws_clients.get_client("ecs", "us-west-2", "production"), aws_clients.get_client("ecr", "eu-west-1", "production"),
+              aws_clients.get_client("ecs", "eu-west-1")]
+    assert len({id(other) for other in [client] + others}) == 4
+    assert set(aws_clients._clients) == {("production", "eu-west-1", "ecs"), ("production", "us-west-2", "ecs"),
+                                         ("production", "eu-west-1", "ecr"), (None, "eu-west-1", "ecs")}
+    assert client.meta.region_name == "eu-west-1"
+    assert client.meta.config.max_pool_connections == aws_clients.AWS_MAX_POOL_CONNECTIONS
+    assert client.meta.config.retries["mode"] == "adaptive"
+
+    # Registering the account again drops its clients, and only its clients
+    aws_clients.register_account("production", ROLE_ARN)
+    assert set(aws_clients._clients) == {(None, "eu-west-1", "ecs")}
+    assert aws_clients.get_client("ecs", "eu-west-1", "production") is not client
+
+def test_assumed_role_credentials_are_refreshed_before_they_expire(stubbed):
+    sts = Stubber(aws_clients.get_client("sts"))
+    expected = {"RoleArn": ROLE_ARN, "RoleSessionName": aws_clients.ASSUME_ROLE_SESSION_NAME,
+                "DurationSeconds": aws_clients.ASSUME_ROLE_DURATION, "ExternalId": "toolkit"}
+    # The first credentials expire inside botocore's 15 minute refresh window, the next ones do not
+    sts.add_response("assume_role", assume_role_response("ASIAFIRST0000000", 600), expected)
+    sts.add_response("assume_role", assume_role_response("ASIASECOND000000", 3600), expected)
+    with sts:
+        aws_clients.register_account("production", ROLE_ARN, external_id="toolkit")
+        credentials = aws_clients.get_session("production").get_credentials()
+        assert credentials.method == "sts-assume-role"
+        assert credentials.get_frozen_credentials().access_key == "ASIAFIRST0000000"
+        assert credentials.get_frozen_credentials().access_key == "ASIASECOND000000"
+        assert credentials.get_frozen_credentials().access_key == "ASIASECOND000000"
+        sts.assert_no_pending_responses()
+
+def test_fan_out_merges_results_and_errors_across_accounts_and_regions(stubbed):
+    aws_clients.register_account("production", ROLE_ARN)
+    targets = [(account, region) for account in (None, "production") for region in ("us-east-1", "eu-west-1")]
+    stubbers = []
+    for account, region in targets:
+        stubber = Stubber(aws_clients.get_client("ecs", region, account))
+        if (account, region) == ("production", "eu-west-1"):
+            stubber.add_client_error("list_clusters", service_error_code="AccessDeniedException",
+                                     service_message="Not allowed in eu-west-1.")
+        else:
+            stubber.add_response("list_clusters", {"clusterArns": [f"arn:aws:ecs:{region}:1:cluster/{account or 'default'}"]})
+        stubber.activate()
+        stubbers.append(stubber)
+
+    results = aws_clients.fan_out(
+        lambda account, region: aws_clients.get_client("ecs", region, account).list_clusters()["clusterArns"], targets)
+
+    assert set(results) == set(targets)
+    failed = results[("production", "eu-west-1")]
+    assert failed["status"] == "failed"
+    assert "Not allowed in eu-west-1." in failed["error"]
+    for account, region in targets[:3]:
+        assert results[(account, region)]["status"] == "ok"
+        assert results[(account, region)]["result"] == [f"arn:aws:ecs:{region}:1:cluster/{account or 'default'}"]
+    assert all(result["seconds"] >= 0 for result in results.values())
+    for stubber in stubbers:
+        stubber.assert_no_pending_responses()
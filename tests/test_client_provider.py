@@ -0,0 +1,101 @@
+import threading
+import time
+
+from kubernetes.client.exceptions import ApiException
+
+import kubernetes_dep.client_provider as client_provider
+from benchmarks.fakes import FakeCoreV1Api
+from config.config_manager import get_secret_kubernetes
+
+def add_secret(fake, name, namespace="default", value="czNjcjN0"):
+    fake.store("Secret", {"metadata": {"name": name, "namespace": namespace}, "data": {"password": value}})
+
+def test_one_shot_reads_do_not_list_or_watch(kubernetes):
+    add_secret(kubernetes, "db")
+    assert get_secret_kubernetes("db") == {"password": "s3cr3t"}
+    assert dict(kubernetes.calls) == {"read_namespaced_secret": 1}
+    assert client_provider._informers == {}
+
+def test_enable_informers_serves_reads_from_the_cache(kubernetes, monkeypatch):
+    monkeypatch.setattr(client_provider, "KUBE_INFORMERS", "")
+    add_secret(kubernetes, "db")
+    client_provider.enable_informers()
+    for _ in range(3):
+        assert get_secret_kubernetes("db") == {"password": "s3cr3t"}
+    assert kubernetes.calls["list_namespaced_secret"] >= 1
+    assert "read_namespaced_secret" not in kubernetes.calls
+
+def test_kube_informers_0_overrides_enable_informers(kubernetes, monkeypatch):
+    monkeypatch.setattr(client_provider, "KUBE_INFORMERS", "0")
+    client_provider.enable_informers()
+    assert client_provider.USE_INFORMERS is False
+
+class NoListCoreV1Api(FakeCoreV1Api):
+    """A service account that may get secrets but not list or watch them."""
+
+    def list_namespaced_secret(self, namespace, **kwargs):
+        self.fake.call("list_namespaced_secret")
+        raise ApiException(status=403, reason="Forbidden")
+
+def test_falls_back_to_a_direct_read_when_listing_is_forbidden(kubernetes, monkeypatch):
+    monkeypatch.setattr(client_provider, "USE_INFORMERS", True)
+    client_provider._core_api = NoListCoreV1Api(kubernetes)
+    add_secret(kubernetes, "db")
+    assert get_secret_kubernetes("db") == {"password": "s3cr3t"}
+    assert get_secret_kubernetes("db") == {"password": "s3cr3t"}
+    # The forbidden list is tried once, then the namespace is read directly
+    assert dict(kubernetes.calls) == {"list_namespaced_secret": 1, "read_namespaced_secret": 2}
+
+class ListOnceCoreV1Api(FakeCoreV1Api):
+    """A service account whose first list of secrets, the informer's, is forbidden."""
+
+    def list_namespaced_secret(self, namespace, **kwargs):
+        if not self.fake.calls["list_namespaced_secret"]:
+            self.fake.call("list_namespaced_secret")
+            raise ApiException(status=403, reason="Forbidden")
+        return super().list_namespaced_secret(namespace, **kwargs)
+
+def test_falls_back_to_a_direct_list_when_the_informer_is_forbidden(kubernetes, monkeypatch):
+    monkeypatch.setattr(client_provider, "USE_INFORMERS", True)
+    client_provider._core_api = ListOnceCoreV1Api(kubernetes)
+    add_secret(kubernetes, "db")
+    for _ in range(2):
+        assert [secret.metadata.name for secret in client_provider.list_objects("Secret", "default")] == ["db"]
+    # The informer is tried once, then the namespace is listed directly
+    assert kubernetes.calls["list_namespaced_secret"] == 3
+    assert client_provider._informers == {}
+
+class SlowListCoreV1Api(FakeCoreV1Api):
+    """Holds the first list of namespace "slow" until `release` is set."""
+
+    def __init__(self, fake):
+        super().__init__(fake)
+        self.listing = threading.Event()
+        self.release = threading.Event()
+
+    def list_namespaced_secret(self, namespace, **kwargs):
+        if namespace == "slow" and not kwargs.get("watch"):
+            self.listing.set()
+            self.release.wait(5)
+        return super().list_namespaced_secret(namespace, **kwargs)
+
+def test_a_slow_first_list_does_not_block_other_namespaces(kubernetes, monkeypatch):
+    monkeypatch.setattr(client_provider, "USE_INFORMERS", True)
+    core_api = client_provider._core_api = SlowListCoreV1Api(kubernetes)
+    add_secret(kubernetes, "db", namespace="slow")
+    add_secret(kubernetes, "db", namespace="fast")
+
+    results = {}
+    slow = threading.Thread(target=lambda: results.update(slow=get_secret_kubernetes("db", "slow")))
+    slow.start()
+    try:
+        assert core_api.listing.wait(5)
+        start = time.monotonic()
+        assert get_secret_kubernetes("db", "fast") == {"password": "s3cr3t"}
+        assert time.monotonic() - start < 2
+        assert "slow" not in results
+    finally:
+        core_api.release.set()
+        slow.join(5)
+    assert results["slow"] == {"password": "s3cr3t"}
+    assert set(client_provider._informers) == {("Secret", "slow"), ("Secret", "fast")}
@@ -0,0 +1,140 @@
+import functools
+import sys
+import time
+from collections import Counter
+
+import boto3
+import pytest
+
+import cloud.cloud_manager as cloud_manager
+
+CLUSTER = "test"
+
+@pytest.fixture
+def ecs(aws, monkeypatch):
+    """Moto ECS with one cluster and services "web" and "web-worker"; yields the ECS API calls made by the toolkit."""
+    monkeypatch.setattr(cloud_manager, "_task_definitions", {})
+    monkeypatch.setattr(cloud_manager, "_task_definition_locks", {})
+    setup = boto3.client("ecs")
+    setup.create_cluster(clusterName=CLUSTER)
+    initial = setup.register_task_definition(
+        family="initial", containerDefinitions=[{"name": "app", "image": "app:0", "memory": 512}])
+    for service in ("web", "web-worker"):
+        setup.create_service(cluster=CLUSTER, serviceName=service, desiredCount=1,
+                             taskDefinition=initial["taskDefinition"]["taskDefinitionArn"])
+    calls = Counter()
+    cloud_manager.get_ecs_client().meta.events.register(
+        "before-call.ecs.*", lambda event_name, **kwargs: calls.update([event_name.rsplit(".", 1)[-1]]))
+    yield calls
+
+def deploy(image, service="web"):
+    return cloud_manager.deploy_to_aws_ecs(image, CLUSTER, service, service)
+
+def forget_local_cache():
+    cloud_manager._task_definitions.clear()
+
+def test_the_first_deploy_registers_a_task_definition(ecs):
+    arn = deploy("web:1")
+    assert arn.endswith("task-definition/web:1")
+    assert ecs["RegisterTaskDefinition"] == 1
+    service = boto3.client("ecs").describe_services(cluster=CLUSTER, services=["web"])["services"][0]
+    assert service["taskDefinition"] == arn
+
+def test_an_unchanged_task_definition_is_reused(ecs):
+    first = deploy("web:1")
+    forget_local_cache()  # As in a new process
+    assert deploy("web:1") == first
+    assert ecs["RegisterTaskDefinition"] == 1
+    assert ecs["DescribeTaskDefinition"] == 2
+
+def test_reuse_within_a_process_needs_no_describe(ecs):
+    deploy("web:1")
+    deploy("web:1")
+    assert ecs["RegisterTaskDefinition"] == 1
+    assert ecs["DescribeTaskDefinition"] == 1
+
+def test_a_changed_image_registers_a_new_revision(ecs):
+    deploy("web:1")
+    forget_local_cache()
+    assert deploy("web:2").endswith("task-definition/web:2")
+    assert ecs["RegisterTaskDefinition"] == 2
+
+def test_a_family_sharing_the_prefix_does_not_force_a_new_revision(ecs):
+    first = deploy("web:1")
+    deploy("worker:1", service="web-worker")
+    forget_local_cache()
+    assert deploy("web:1") == first
+    assert ecs["RegisterTaskDefinition"] == 2  # web and web-worker once each
+
+def test_a_missing_service_is_reported_and_returns_none(ecs, capsys):
+    assert deploy("web:1", service="missing") is None
+    assert "Error deploying to AWS ECS" in capsys.readouterr().out
+
+def test_a_gke_deploy_without_google_auth_says_what_to_install(monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, "google.auth", None)
+    assert cloud_manager.deploy_to_gke("web:1", "web", project_id="project", location="zone", cluster_name="cluster") is None
+    assert "google-auth is required for GKE deployments" in capsys.readouterr().out
+
+def create_services(names, cluster=CLUSTER, desired_count=1):
+    setup = boto3.client("ecs")
+    setup.create_cluster(clusterName=cluster)
+    initial = setup.register_task_definition(
+        family="initial", containerDefinitions=[{"name": "app", "image": "app:0", "memory": 512}])
+    for name in names:
+        setup.create_service(cluster=cluster, serviceName=name, desiredCount=desired_count,
+                             taskDefinition=initial["taskDefinition"]["taskDefinitionArn"])
+
+def fleet(names, cluster=CLUSTER):
+    return [{"image": f"{name}:1", "cluster": cluster, "service": name, "task_definition": name} for name in names]
+
+def test_services_are_described_in_batches_of_ten(ecs):
+    names = [f"service-{i}" for i in range(25)]
+    create_services(names)
+    services = cloud_manager.describe_aws_services(CLUSTER, names)
+    assert sorted(services) == sorted(names)
+    assert ecs["DescribeServices"] == 3
+
+def test_fleet_updates_are_held_to_the_update_rate(ecs):
+    names = [f"service-{i}" for i in range(12)]
+    create_services(names)
+    update_times = []
+    cloud_manager.get_ecs_client().meta.events.register(
+        "before-call.ecs.UpdateService", lambda **kwargs: update_times.append(time.monotonic()))
+    results = cloud_manager.deploy_fleet_to_aws_ecs(fleet(names), max_workers=8, update_rate=4)
+    assert {result["status"] for result in results.values()} == {"updated"}
+    update_times.sort()
+    # A burst of `update_rate` calls, then one call every 1/update_rate seconds
+    for i, at in enumerate(update_times):
+        assert at - update_times[0] >= (i + 1 - 4) / 4 - 0.05
+
+def test_a_failed_service_does_not_stop_the_others(ecs):
+    results = cloud_manager.deploy_fleet_to_aws_ecs(fleet(["web", "missing", "web-worker"]))
+    assert results[(CLUSTER, "missing")]["status"] == "failed"
+    assert results[(CLUSTER, "missing")]["error"]
+    assert results[(CLUSTER, "web")]["status"] == results[(CLUSTER, "web-worker")]["status"] == "updated"
+    assert ecs["UpdateService"] == 3
+
+def test_waiting_reports_stable_and_unstable_clusters(ecs, monkeypatch):
+    # Moto runs no tasks, so only services that want none ever look stable to the waiter
+    create_services(["idle", "idle-worker"], cluster="idle", desired_count=0)
+    monkeypatch.setattr(cloud_manager, "wait_for_services_stable",
+                        functools.partial(cloud_manager.wait_for_services_stable, delay=0, max_attempts=2))
+    results = cloud_manager.deploy_fleet_to_aws_ecs(
+        fleet(["idle", "idle-worker"], cluster="idle") + fleet(["web"]) + fleet(["missing"]), wait=True)
+    assert results[("idle", "idle")]["status"] == results[("idle", "idle-worker")]["status"] == "stable"
+    assert results[(CLUSTER, "web")]["status"] == "unstable"
+    assert results[(CLUSTER, "missing")]["status"] == "failed"
+
+def test_a_fractional_rate_lets_calls_through_at_that_rate():
+    limiter = cloud_manager.RateLimiter(0.8)
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start < 0.1
+    # The next call waits for a whole token, 1.25 s at 0.8 calls per second
+    limiter.acquire()
+    assert 1.15 <= time.monotonic() - start < 2
+
+@pytest.mark.parametrize("rate", [0, -1])
+def test_a_rate_that_is_not_positive_is_rejected(rate):
+    with pytest.raises(ValueError):
+        cloud_manager.RateLimiter(rate)
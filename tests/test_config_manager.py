@@ -0,0 +1,139 @@
+import threading
+import time
+
+import boto3
+import pytest
+
+import config.config_manager as config_manager
+
+@pytest.fixture
+def secrets(aws, monkeypatch):
+    """Secrets Manager with a fresh secret cache in front of it; yields a boto3 client for setting secrets up."""
+    monkeypatch.setattr(config_manager, "CONFIG_SOURCE", "aws")
+    cache = config_manager.SecretCache(config_manager._load_secret, ttl=60, max_entries=256)
+    monkeypatch.setattr(config_manager, "secret_cache", cache)
+    yield boto3.client("secretsmanager")
+    cache._refresher.shutdown()
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_reads_within_the_ttl_are_served_from_the_cache(secrets):
+    secrets.create_secret(Name="db", SecretString="v1")
+    assert config_manager.get_config("db") == "v1"
+    secrets.put_secret_value(SecretId="db", SecretString="v2")
+    assert config_manager.get_config("db") == "v1"
+    stats = config_manager.get_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["loads"]) == (1, 1, 1)
+
+def test_expired_entries_are_loaded_again(secrets):
+    config_manager.secret_cache.ttl = 0.1
+    secrets.create_secret(Name="db", SecretString="v1")
+    assert config_manager.get_config("db") == "v1"
+    secrets.put_secret_value(SecretId="db", SecretString="v2")
+    time.sleep(0.15)
+    assert config_manager.get_config("db") == "v2"
+    assert config_manager.get_cache_stats()["loads"] == 2
+
+def test_least_recently_used_entries_are_evicted(secrets):
+    config_manager.secret_cache.max_entries = 2
+    for name in ("a", "b", "c"):
+        secrets.create_secret(Name=name, SecretString=name)
+    config_manager.get_config("a")
+    config_manager.get_config("b")
+    config_manager.get_config("a")  # b is now the least recently used
+    config_manager.get_config("c")
+    assert config_manager.secret_cache.stats["evictions"] == 1
+    assert config_manager.secret_cache.peek(("aws", None, "a")) == "a"
+    assert config_manager.secret_cache.peek(("aws", None, "b")) is None
+
+def test_failed_loads_are_not_cached(secrets):
+    assert config_manager.get_config("missing") is None
+    secrets.create_secret(Name="missing", SecretString="now there")
+    assert config_manager.get_config("missing") == "now there"
+
+def test_concurrent_misses_share_one_load():
+    release = threading.Event()
+    calls = []
+
+    def loader(key):
+        calls.append(key)
+        release.wait(5)
+        return "value"
+
+    cache = config_manager.SecretCache(loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("key"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: cache.stats["misses"] == 8)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["value"] * 8
+    assert calls == ["key"]
+
+def test_entries_read_late_in_their_ttl_are_refreshed_in_the_background(secrets):
+    cache = config_manager.secret_cache
+    cache.ttl, cache.refresh_ahead = 0.5, 0.2
+    secrets.create_secret(Name="db", SecretString="v1")
+    assert config_manager.get_config("db") == "v1"
+    secrets.put_secret_value(SecretId="db", SecretString="v2")
+    time.sleep(0.15)
+    assert config_manager.get_config("db") == "v1"  # Still fresh, served while the refresh runs
+    wait_for(lambda: cache.stats["refreshes"] == 1)
+    assert config_manager.get_config("db") == "v2"
+    assert cache.stats["misses"] == 1
+
+def test_invalidated_entries_are_loaded_again(secrets):
+    secrets.create_secret(Name="db", SecretString="v1")
+    config_manager.get_config("db")
+    secrets.put_secret_value(SecretId="db", SecretString="v2")
+    config_manager.invalidate_config("db")
+    assert config_manager.get_config("db") == "v2"
+    secrets.put_secret_value(SecretId="db", SecretString="v3")
+    config_manager.invalidate_config()
+    assert config_manager.get_config("db") == "v3"
+
+def test_a_load_that_raced_an_invalidate_is_not_stored():
+    started, release = threading.Event(), threading.Event()
+    values = iter(["stale", "fresh"])
+
+    def loader(key):
+        value = next(values)
+        if value == "stale":
+            started.set()
+            release.wait(5)
+        return value
+
+    cache = config_manager.SecretCache(loader)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(cache.get("key")))
+    thread.start()
+    started.wait(5)
+    cache.invalidate("key")
+    release.set()
+    thread.join()
+    assert result == ["stale"]
+    assert cache.peek("key") is None
+    assert cache.get("key") == "fresh"
+
+def test_bulk_reads_page_past_the_batch_size_and_skip_missing_secrets(secrets):
+    names = [f"service-{i}" for i in range(45)]
+    for name in names[:40]:
+        secrets.create_secret(Name=name, SecretString=f"{name}-secret")
+    requests = []
+    config_manager.get_secrets_client().meta.events.register(
+        "before-call.secrets-manager.BatchGetSecretValue", lambda params, **kwargs: requests.append(params))
+
+    configs = config_manager.get_configs(names)
+    assert configs == {name: f"{name}-secret" for name in names[:40]}
+    assert len(requests) == 3  # 45 names in batches of at most 20
+
+    # Cached secrets are not fetched again, only the missing ones are
+    configs = config_manager.get_configs(names)
+    assert len(configs) == 40
+    assert len(requests) == 4
@@ -0,0 +1,159 @@
+import asyncio
+import contextlib
+import io
+import time
+import urllib.request
+
+from prometheus_client import start_http_server
+from slack_sdk import WebClient
+
+import monitoring.slo as slo
+import notification.alert_manager as alert_manager
+import orchestration.daemon as daemon
+from benchmarks.fakes import StubHTTPServer, free_port, minimum_alert_duration
+from monitoring.instrumentation import register_collector
+
+INTERVAL = 0.25
+
+def run_scheduler(scheduler, seconds):
+    async def run():
+        stop_event = asyncio.Event()
+        task = asyncio.create_task(scheduler.run(stop_event))
+        await asyncio.sleep(seconds)
+        stop_event.set()
+        await task
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        asyncio.run(run())
+    return output.getvalue()
+
+def test_an_overrun_skips_the_runs_it_missed():
+    scheduler = daemon.JobScheduler()
+    durations = iter([2.5 * 0.2])
+
+    async def slow_once(deadline):
+        await asyncio.sleep(next(durations, 0))
+    job = scheduler.add_job("slow", slow_once, 0.2)
+    output = run_scheduler(scheduler, 1.0)
+    assert job.stats["overruns"] == 1
+    assert job.stats["skipped"] == 2
+    assert job.stats["runs"] >= 2
+    assert "Daemon job 'slow' overran" in output
+
+def test_a_job_that_ignores_stop_is_cancelled_after_the_shutdown_timeout():
+    scheduler = daemon.JobScheduler(shutdown_timeout=0.2)
+    cancelled, cleanups = [], []
+
+    async def stuck(deadline):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(time.monotonic())
+            raise
+
+    async def close_async():
+        cleanups.append("async")
+    scheduler.add_job("stuck", stuck, 0.1)
+    scheduler.add_cleanup(lambda: cleanups.append("first"))
+    scheduler.add_cleanup(close_async)
+    scheduler.add_cleanup(lambda: cleanups.append("last"))
+
+    start = time.monotonic()
+    output = run_scheduler(scheduler, 0.1)
+    assert "did not stop within 0.2s, cancelling it" in output
+    assert len(cancelled) == 1
+    assert 0.25 <= cancelled[0] - start < 5
+    assert cleanups == ["last", "async", "first"]
+
+async def run_daemon_for(daemon_config, duration, metrics_url):
+    stop_event = asyncio.Event()
+    task = asyncio.create_task(daemon.serve(daemon_config, stop_event))
+    await asyncio.sleep(duration)
+    # Scrape while the daemon is running, as Prometheus would
+    loop = asyncio.get_running_loop()
+    metrics = await loop.run_in_executor(None, lambda: urllib.request.urlopen(metrics_url, timeout=5).read().decode())
+    stop_event.set()
+    return await task, metrics
+
+def test_health_targets_keep_their_own_interval_and_jitter(metric_store, monkeypatch):
+    from monitoring.monitor import HealthCheckScheduler
+
+    monkeypatch.setattr(alert_manager, "_dispatcher", None)
+    monkeypatch.setattr(slo, "_slo_engine", None)
+    checked = {}
+
+    async def check(self, deployment_name, deadline=None):
+        checked.setdefault(deployment_name, []).append(time.monotonic())
+        return 1
+    monkeypatch.setattr(HealthCheckScheduler, "check", check)
+
+    targets = {f"steady-{i}": "http://127.0.0.1:1/health" for i in range(5)}
+    targets["fast"] = {"url": "http://127.0.0.1:1/health", "interval": 0.1}
+    scheduler = daemon.build_scheduler({"health_checks": {"interval": 0.5, "targets": targets}})
+    run_scheduler(scheduler, 1.2)
+
+    assert len(checked["fast"]) >= 8
+    assert all(2 <= len(checked[f"steady-{i}"]) <= 4 for i in range(5))
+    # Jitter spreads targets with the same interval instead of checking them in lockstep
+    first_checks = sorted(checked[f"steady-{i}"][0] for i in range(5))
+    assert first_checks[-1] - first_checks[0] > 0.005
+
+def test_daemon_end_to_end(kubernetes, prometheus, slack, smtp, metric_store, monkeypatch):
+    deployments = [f"service-{i}" for i in range(8)]
+    hot = set(deployments[:2])
+    prometheus.values = {"cpu_usage": {name: 0.95 if name in hot else 0.5 for name in deployments},
+                         "memory_usage": {name: 0.5 for name in deployments}}
+    for name in deployments:
+        kubernetes.store_deployment({
+            "apiVersion": "apps/v1", "kind": "Deployment",
+            "metadata": {"name": name, "namespace": "default", "labels": {"app": name}},
+            "spec": {"replicas": 2, "selector": {"matchLabels": {"app": name}},
+                     "template": {"metadata": {"labels": {"app": name}}, "spec": {"containers": [{"name": name, "image": "busybox"}]}}},
+        })
+    monkeypatch.setattr(alert_manager, "_slack_client", WebClient(base_url=slack.base_url))
+    monkeypatch.setattr(alert_manager, "SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setattr(alert_manager, "SMTP_PORT", smtp.port)
+    monkeypatch.setattr(alert_manager, "SMTP_USE_TLS", False)
+    monkeypatch.setattr(alert_manager, "_dispatcher", None)
+
+    metrics_port = free_port()
+    register_collector()
+    slo.register_collector()
+    start_http_server(metrics_port, addr="127.0.0.1")
+
+    with StubHTTPServer() as targets:
+        health_targets = {name: f"{targets.url}/health/{name}" for name in deployments}
+        health_targets["down-service"] = f"http://127.0.0.1:{free_port()}/health"
+        daemon_config = {
+            "shutdown_timeout": 10,
+            "health_checks": {"interval": INTERVAL, "targets": health_targets},
+            "scaling": {"interval": INTERVAL, "namespace": "default", "deployments": deployments,
+                        "prometheus_url": prometheus.url},
+            "alerts": {"batch_window": INTERVAL},
+        }
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            scheduler, metrics = asyncio.run(run_daemon_for(
+                daemon_config, minimum_alert_duration(INTERVAL), f"http://127.0.0.1:{metrics_port}/metrics"))
+
+    # Health history for every target, with the down target recorded as unhealthy
+    stored = set(metric_store.series())
+    assert all(f'deployment_health{{deployment_name="{name}"}}' in stored for name in health_targets)
+    assert not metric_store.query('deployment_health{deployment_name="down-service"}')[1].any()
+
+    # Hot deployments were scaled up through the scale subresource
+    replicas = {name: kubernetes.get("Deployment", "default", name)["spec"]["replicas"] for name in deployments}
+    assert all(replicas[name] > 2 for name in hot)
+    assert kubernetes.calls.get("patch_namespaced_deployment_scale", 0) > 0
+
+    # The down target was alerted on Slack and by email, and no healthy one was
+    assert any("down-service" in (text or "") for text in slack.messages)
+    assert any(b"down-service" in message for message in smtp.messages)
+    assert not any(f"'{name}'" in (text or "") for text in slack.messages for name in deployments)
+
+    # One endpoint serves health, SLO, scaling, scheduler and operation metrics
+    for name in ("deployment_health{", "slo_burn_rate{", "cpu_usage{", "daemon_job_runs_total{",
+                 'toolkit_operation_duration_seconds_count{backend="http",operation="health_check"}'):
+        assert name in metrics
+
+    assert all(job.stats["runs"] > 0 for job in scheduler.jobs)
+    assert all(job.stats["failures"] == 0 for job in scheduler.jobs)
+    assert "Daemon stopped." in output.getvalue()
@@ -0,0 +1,329 @@
+import datetime
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+import cloud.cloud_manager as cloud_manager
+import docker_dep.docker_manager as docker_manager
+from benchmarks.fakes import FakeContainer, FakeRegistry
+
+@pytest.fixture(params=[True, False], ids=["state-cache", "daemon"])
+def containers(docker, monkeypatch, request):
+    """Two CI containers, one running and one exited, and an unrelated exited container."""
+    monkeypatch.setattr(docker_manager, "USE_STATE_CACHE", request.param)
+    docker.containers.add("ci-1", labels={"ci-run": "1"})
+    docker.containers.add("ci-2", status="exited", labels={"ci-run": "1"})
+    docker.containers.add("database", status="exited", labels={"team": "payments"})
+    return docker
+
+def test_prune_requires_labels_or_all(containers):
+    assert docker_manager.manage_docker("prune") is None
+    assert docker_manager.prune_containers() is None
+    assert "containers.prune" not in containers.calls
+    assert set(containers.containers.containers) == {"ci-1", "ci-2", "database"}
+
+def test_prune_removes_only_stopped_labelled_containers(containers):
+    result = docker_manager.manage_docker("prune", labels=["ci-run=1"])
+    assert len(result["removed"]) == 1
+    assert set(containers.containers.containers) == {"ci-1", "database"}
+
+def test_prune_all(containers):
+    result = docker_manager.manage_docker("prune", all_containers=True)
+    assert len(result["removed"]) == 2
+    assert set(containers.containers.containers) == {"ci-1"}
+
+def test_bulk_actions_require_a_selector(containers):
+    for action in ("stop", "restart", "remove"):
+        assert docker_manager.manage_docker(action) is None
+    assert containers.containers.containers["ci-1"].status == "running"
+
+def test_remove_stops_running_containers_first(containers):
+    results = docker_manager.manage_docker("remove", labels=["ci-run=1"], timeout=0)
+    assert {name: result["status"] for name, result in results.items()} == {"ci-1": "removed", "ci-2": "removed"}
+    assert set(containers.containers.containers) == {"database"}
+
+class RestartedContainer(FakeContainer):
+    """Listed as exited, then started again by its restart policy just before it is removed."""
+
+    restarted = False
+
+    def remove(self, **kwargs):
+        if not self.restarted:
+            self.restarted = True
+            self.status = "running"
+        return super().remove(**kwargs)
+
+def test_remove_tolerates_a_stale_status(containers):
+    container = containers.containers.containers["worker"] = RestartedContainer(
+        containers, "worker", status="exited", labels={"ci-run": "2"})
+    container._emit("create")
+    results = docker_manager.remove_containers(labels=["ci-run=2"], timeout=0)
+    assert results == {"worker": {"status": "removed", "seconds": results["worker"]["seconds"]}}
+    assert containers.calls["stop"] == 1
+    assert "worker" not in containers.containers.containers
+
+def test_stop_only_touches_running_containers(containers):
+    results = docker_manager.stop_containers(pattern="ci-*", timeout=0)
+    assert list(results) == ["ci-1"]
+    assert containers.containers.containers["ci-1"].status == "exited"
+    assert containers.calls["stop"] == 1
+
+def test_removed_elsewhere_is_reported_as_not_found(containers):
+    selected = docker_manager.select_containers(labels=["ci-run=1"])
+    del containers.containers.containers["ci-2"]
+
+    def remove(container):
+        container.remove(force=True)
+        return "removed"
+    results = docker_manager._run_bulk("remove_container", selected, remove, 4)
+    assert results["ci-2"]["status"] == "not found"
+    assert results["ci-1"]["status"] == "removed"
+
+def write_context(root, name, dockerfile):
+    context = root / name
+    context.mkdir()
+    (context / "Dockerfile").write_text(dockerfile)
+    (context / "app.py").write_text(f"print({name!r})\n")
+    return {"name": f"registry.local/{name}", "context": str(context)}
+
+@pytest.fixture
+def release(docker, tmp_path):
+    """A base image, two runtimes FROM it and a service FROM each runtime, built 0.1 s apiece."""
+    docker.build_time = 0.1
+    return [
+        write_context(tmp_path, "base", "FROM python:3.11-slim\n"),
+        write_context(tmp_path, "runtime-a", "FROM registry.local/base AS build\nRUN make\nFROM build\n"),
+        write_context(tmp_path, "runtime-b", "FROM registry.local/base:latest\n"),
+        write_context(tmp_path, "service-a", "FROM --platform=linux/amd64 registry.local/runtime-a\n"),
+        write_context(tmp_path, "service-b", "FROM registry.local/runtime-b\n"),
+    ]
+
+def build(builds, **kwargs):
+    """Build and return (results, [(time, image, line)] of every log line)."""
+    lines = []
+    results = docker_manager.build_images(builds, on_log=lambda name, line: lines.append((time.monotonic(), name, line)),
+                                          **kwargs)
+    return results, lines
+
+def finished(lines, name):
+    return next(at for at, image, line in lines if image == name and line.startswith("Successfully tagged"))
+
+def test_builds_follow_from_lines(release):
+    results, lines = build(release, max_workers=4)
+    assert {name: result["status"] for name, result in results.items()} == {
+        f"registry.local/{name}:latest": "built" for name in ("base", "runtime-a", "runtime-b", "service-a", "service-b")}
+    base = finished(lines, "registry.local/base:latest")
+    for runtime in ("a", "b"):
+        runtime_done = finished(lines, f"registry.local/runtime-{runtime}:latest")
+        started = min(at for at, image, _ in lines if image == f"registry.local/runtime-{runtime}:latest")
+        assert started >= base
+        assert min(at for at, image, _ in lines if image == f"registry.local/service-{runtime}:latest") >= runtime_done
+
+def test_independent_builds_run_concurrently_up_to_the_cap(docker, tmp_path):
+    docker.build_time = 0.2
+    builds = [write_context(tmp_path, f"service-{i}", "FROM python:3.11-slim\n") for i in range(6)]
+    active, peak = [0], [0]
+    build_api = docker.api.build
+
+    def counting_build(**kwargs):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        yield from build_api(**kwargs)
+        active[0] -= 1
+    docker.api.build = counting_build
+
+    start = time.monotonic()
+    results, _ = build(builds, max_workers=3)
+    assert {result["status"] for result in results.values()} == {"built"}
+    assert peak[0] == 3
+    # Two rounds of three builds, not six in a row
+    assert time.monotonic() - start < 6 * 0.2
+
+def test_logs_stream_while_the_build_runs(release):
+    _, lines = build(release[:1])
+    steps = [at for at, _, line in lines if line.startswith("Step")]
+    assert len(steps) == 5
+    assert finished(lines, "registry.local/base:latest") - steps[0] >= 0.05
+
+def test_cache_hints_are_passed(release, docker, monkeypatch):
+    calls = []
+    build_api = docker.api.build
+    monkeypatch.setattr(docker.api, "build", lambda **kwargs: calls.append(kwargs) or build_api(**kwargs))
+    release[1]["cache_from"] = ["registry.local/runtime-a:cache"]
+    build(release[:2])
+    cache_from = {call["tag"]: call["cache_from"] for call in calls}
+    assert cache_from["registry.local/base:latest"] == ["registry.local/base:latest"]
+    assert cache_from["registry.local/runtime-a:latest"] == ["registry.local/runtime-a:latest", "registry.local/runtime-a:cache"]
+    assert all(docker_manager.CONTEXT_HASH_LABEL in call["labels"] for call in calls)
+
+@pytest.mark.parametrize("state_cache", [True, False])
+def test_unchanged_contexts_are_skipped(release, docker, monkeypatch, tmp_path, state_cache):
+    monkeypatch.setattr(docker_manager, "USE_STATE_CACHE", state_cache)
+    build(release)
+    builds_before = docker.calls["build"]
+    results, _ = build(release)
+    assert {result["status"] for result in results.values()} == {"skipped"}
+    assert docker.calls["build"] == builds_before
+
+    # A change to a runtime rebuilds it and the service built FROM it, nothing else
+    (tmp_path / "runtime-a" / "app.py").write_text("print('changed')\n")
+    results, _ = build(release)
+    assert sorted(name for name, result in results.items() if result["status"] == "built") == [
+        "registry.local/runtime-a:latest", "registry.local/service-a:latest"]
+    results, _ = build(release, force=True)
+    assert {result["status"] for result in results.values()} == {"built"}
+
+def test_a_failed_base_blocks_its_dependents(release, docker, monkeypatch):
+    build_api = docker.api.build
+
+    def failing_build(**kwargs):
+        if kwargs["tag"] == "registry.local/runtime-a:latest":
+            return iter([{"stream": "Step 1/1 : RUN make\n"}, {"error": "make: *** No rule to make target"}])
+        return build_api(**kwargs)
+    monkeypatch.setattr(docker.api, "build", failing_build)
+    results, _ = build(release)
+    assert results["registry.local/runtime-a:latest"]["status"] == "failed"
+    assert results["registry.local/service-a:latest"]["status"] == "blocked"
+    assert results["registry.local/service-b:latest"]["status"] == "built"
+
+@pytest.mark.parametrize("error", [docker_manager.docker.errors.DockerException("no daemon"), ValueError("bad build arg")])
+def test_an_unexpected_build_error_fails_only_that_image(release, docker, monkeypatch, error):
+    build_api = docker.api.build
+
+    def failing_build(**kwargs):
+        if kwargs["tag"] == "registry.local/runtime-b:latest":
+            raise error
+        return build_api(**kwargs)
+    monkeypatch.setattr(docker.api, "build", failing_build)
+    results, _ = build(release)
+    assert results["registry.local/runtime-b:latest"] == {"status": "failed", "seconds": 0.0, "error": str(error)}
+    assert results["registry.local/service-b:latest"]["status"] == "blocked"
+    assert {results[f"registry.local/{name}:latest"]["status"] for name in ("base", "runtime-a", "service-a")} == {"built"}
+
+@pytest.mark.parametrize("broken", [{"dockerfile": "Dockerfile.missing"}, {"context": None}])
+def test_a_broken_manifest_entry_fails_on_its_own(release, broken):
+    release[1].update(broken)
+    if release[1]["context"] is None:
+        del release[1]["context"]
+    results, _ = build(release)
+    assert results["registry.local/runtime-a:latest"]["status"] == "failed"
+    assert results["registry.local/runtime-a:latest"]["error"]
+    assert results["registry.local/service-a:latest"]["status"] == "blocked"
+    assert {results[f"registry.local/{name}:latest"]["status"] for name in ("base", "runtime-b", "service-b")} == {"built"}
+
+def test_circular_from_lines_fail(docker, tmp_path):
+    builds = [write_context(tmp_path, "a", "FROM registry.local/b\n"), write_context(tmp_path, "b", "FROM registry.local/a\n")]
+    results, _ = build(builds)
+    assert {result["status"] for result in results.values()} == {"failed"}
+    assert docker.calls["build"] == 0
+
+ECR_REGISTRY = "123456789012.dkr.ecr.us-east-1.amazonaws.com"
+
+@pytest.fixture
+def ecr_tokens(aws, monkeypatch):
+    """Count ECR token requests; moto's tokens get the lifetime in `expires_in` (ECR's 12 hours by default)."""
+    monkeypatch.setattr(cloud_manager, "_ecr_tokens", {})
+    requests = Counter(expires_in=12 * 3600)
+
+    def count_and_extend(parsed, **kwargs):
+        requests["GetAuthorizationToken"] += 1
+        expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=requests["expires_in"])
+        for authorization in parsed.get("authorizationData", []):
+            authorization["expiresAt"] = expires_at
+
+    cloud_manager.get_ecr_client("us-east-1").meta.events.register("after-call.ecr.GetAuthorizationToken", count_and_extend)
+    return requests
+
+@pytest.fixture
+def pushes(docker):
+    """Two images sharing a base layer, each pushed with two tags to ECR (which requires auth) and a mirror."""
+    docker.registry = FakeRegistry(layer_time=0.05, auth_required={ECR_REGISTRY})
+    for name in ("api", "worker"):
+        docker.images.add(f"{name}:build", layers=["sha256:base0000", f"sha256:{name}0000"])
+    return [{"image": f"{name}:build", "tags": ["v1", "latest"],
+             "repositories": [f"{ECR_REGISTRY}/{name}", f"registry.local/{name}"]} for name in ("api", "worker")]
+
+def quiet_push(release, **kwargs):
+    return docker_manager.push_images(release, on_progress=lambda reference, event: None, **kwargs)
+
+def test_ecr_token_is_fetched_once_and_cached_until_it_expires(pushes, ecr_tokens):
+    quiet_push(pushes)
+    quiet_push(pushes, force=True)
+    assert ecr_tokens["GetAuthorizationToken"] == 1
+
+    cloud_manager._ecr_tokens.clear()
+    ecr_tokens["expires_in"] = cloud_manager.ECR_TOKEN_REFRESH_MARGIN - 10
+    quiet_push(pushes, force=True)
+    quiet_push(pushes, force=True)
+    assert ecr_tokens["GetAuthorizationToken"] == 3
+
+def test_push_uploads_each_layer_once_per_registry(docker, pushes, ecr_tokens):
+    results = quiet_push(pushes, max_workers=1)
+    assert {result["status"] for result in results.values()} == {"pushed"}
+    assert len(results) == 8
+    # The shared base layer goes to each registry once, and the second tag of a repository uploads nothing
+    assert docker.registry.uploads == 6
+    for repository in (f"{ECR_REGISTRY}/api", "registry.local/api"):
+        assert results[f"{repository}:v1"]["layers_pushed"] + results[f"{repository}:v1"]["layers_existing"] == 2
+        assert (results[f"{repository}:latest"]["layers_pushed"], results[f"{repository}:latest"]["layers_existing"]) == (0, 2)
+        assert results[f"{repository}:latest"]["digest"] == docker.registry.manifests[f"{repository}:latest"]
+
+def test_repositories_are_pushed_concurrently(docker, pushes, ecr_tokens):
+    in_flight, most = [0], [0]
+    lock = threading.Lock()
+    push = docker.api._push
+
+    def counting_push(repository, tag, auth_config):
+        with lock:
+            in_flight[0] += 1
+            most[0] = max(most[0], in_flight[0])
+        try:
+            yield from push(repository, tag, auth_config)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    docker.api._push = counting_push
+    quiet_push(pushes, max_workers=4)
+    assert most[0] == 4
+
+def test_progress_is_streamed_per_tag(docker, pushes, ecr_tokens):
+    events = []
+    docker_manager.push_images(pushes[:1], on_progress=lambda reference, event: events.append((reference, event)))
+    statuses = [event.get("status") for reference, event in events if reference == "registry.local/api:v1"]
+    assert statuses.count("Pushing") == 8
+    assert statuses.index("Pushing") < statuses.index("Pushed")
+    assert {reference for reference, _ in events} == {f"{repository}:{tag}" for repository in (f"{ECR_REGISTRY}/api", "registry.local/api")
+                                                       for tag in ("v1", "latest")}
+
+def test_tags_already_in_the_registry_are_skipped(docker, pushes, ecr_tokens):
+    quiet_push(pushes)
+    push_calls, uploads = docker.calls["push"], docker.registry.uploads
+    results = quiet_push(pushes)
+    assert {result["status"] for result in results.values()} == {"skipped"}
+    assert docker.calls["push"] == push_calls and docker.registry.uploads == uploads
+    assert docker.calls["inspect_distribution"] == 8
+
+    # A rebuilt image has new digests, so it is pushed again, with only its new layer uploaded
+    docker.images.add("api:build", layers=["sha256:base0000", "sha256:api0001"])
+    results = quiet_push(pushes)
+    assert {reference for reference, result in results.items() if result["status"] == "pushed"} == {
+        f"{repository}:{tag}" for repository in (f"{ECR_REGISTRY}/api", "registry.local/api") for tag in ("v1", "latest")}
+    assert docker.registry.uploads == uploads + 2
+
+def test_force_pushes_without_checking_the_registry(docker, pushes, ecr_tokens):
+    quiet_push(pushes)
+    checks = docker.calls["inspect_distribution"]
+    results = quiet_push(pushes, force=True)
+    assert {result["status"] for result in results.values()} == {"pushed"}
+    assert docker.calls["inspect_distribution"] == checks
+
+def test_a_failed_registry_does_not_stop_the_others(docker, pushes, ecr_tokens):
+    docker.registry.auth_required.add("registry.local")
+    results = quiet_push(pushes)
+    assert {reference for reference, result in results.items() if result["status"] == "failed"} == {
+        f"registry.local/{name}:{tag}" for name in ("api", "worker") for tag in ("v1", "latest")}
+    assert all(result["status"] == "pushed" for reference, result in results.items() if reference.startswith(ECR_REGISTRY))
+    assert "no basic auth credentials" in results["registry.local/api:v1"]["error"]
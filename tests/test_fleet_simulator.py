@@ -0,0 +1,153 @@
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from kubernetes.client.exceptions import ApiException
+
+import cloud.aws_clients as aws_clients
+import config.config_manager as config_manager
+import monitoring.metric_store as metric_store
+import monitoring.slo as slo
+import notification.alert_manager as alert_manager
+import scaling.resource_manager as resource_manager
+from benchmarks import fleet_simulator
+from benchmarks.fakes import FakeAWS, FakeAppsV1Api, FakeKubernetes, StubHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def fleet_args(**settings):
+    defaults = {"deployments": 6, "workers": 4, "rounds": 2, "latency": 0.0, "failure_rate": 0.0, "down": 0.0,
+                "trace_memory": False}
+    return argparse.Namespace(**dict(defaults, **settings))
+
+@pytest.fixture
+def make_fleet(monkeypatch):
+    """Build Fleets wired into the shared clients, and put the clients back afterwards."""
+    for module, name in ((resource_manager, "PROMETHEUS_URL"), (config_manager, "CONFIG_SOURCE"),
+                         (slo, "_slo_engine"), (alert_manager, "_dispatcher"), (metric_store, "_metric_store")):
+        monkeypatch.setattr(module, name, getattr(module, name))
+    aws_clients.reset()
+    with contextlib.ExitStack() as stack:
+        yield lambda args: fleet_simulator.Fleet(args, stack)
+    aws_clients.reset()
+    config_manager.invalidate_config()
+
+def test_fake_http_latency_and_failures():
+    import requests
+
+    with StubHTTPServer(latency=0.05) as slow, StubHTTPServer(failure_rate=1.0) as failing:
+        start = time.perf_counter()
+        assert requests.get(f"{slow.url}/health").status_code == 200
+        assert time.perf_counter() - start >= 0.05
+        assert requests.get(f"{failing.url}/health").status_code == 500
+        assert (slow.requests, failing.requests) == (1, 1)
+
+def test_fake_kubernetes_latency_and_failures():
+    kubernetes = FakeKubernetes(latency=0.05)
+    apps_api = FakeAppsV1Api(kubernetes)
+    apps_api.add_deployment("api", "default")
+    start = time.perf_counter()
+    apps_api.read_namespaced_deployment("api", "default")
+    assert time.perf_counter() - start >= 0.05
+
+    kubernetes.failure_rate = 1.0
+    with pytest.raises(ApiException) as raised:
+        apps_api.read_namespaced_deployment("api", "default")
+    assert raised.value.status == 500
+
+def test_fake_aws_failures(monkeypatch):
+    import boto3
+    from botocore.exceptions import ClientError
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    aws = FakeAWS(failure_rate=1.0)
+    aws.add_secret("db", "{}")
+    client = aws.attach(boto3.client("secretsmanager", region_name="us-east-1"))
+    with pytest.raises(ClientError) as raised:
+        client.get_secret_value(SecretId="db")
+    assert raised.value.response["Error"]["Code"] == "ServerException"
+    aws.failure_rate = 0.0
+    assert client.get_secret_value(SecretId="db")["SecretString"] == "{}"
+    assert aws.calls["GetSecretValue"] == 2
+
+@pytest.mark.parametrize("scenario", fleet_simulator.SCENARIOS)
+def test_every_scenario_runs_cleanly_without_injected_failures(make_fleet, scenario):
+    args = fleet_args()
+    fleet = make_fleet(args)
+    report = fleet_simulator.run_scenario(scenario, fleet, args)
+    assert report["calls"] == len(fleet_simulator.SCENARIO_CALLS[scenario](fleet, args))
+    assert report["failed"] == 0
+    assert report["throughput"] > 0
+    assert report["latency_ms"]["p50"] <= report["latency_ms"]["p99"] <= report["latency_ms"]["max"]
+    assert report["backend_calls"]
+    json.dumps(report)
+
+def test_down_endpoints_page(make_fleet):
+    args = fleet_args(rounds=slo.BURN_RATE_ALERTS[0][4], down=0.34)
+    fleet = make_fleet(args)
+    report = fleet_simulator.run_scenario("health", fleet, args)
+    assert len(fleet.down) == 2
+    assert {name for name in fleet.names if "page" in fleet.slo_engine.firing(name)} == fleet.down
+    assert report["alerts_sent"]["slack"] >= 1 and report["alerts_sent"]["email"] >= 1
+
+def test_injected_failures_are_reported(make_fleet):
+    args = fleet_args(failure_rate=1.0)
+    fleet = make_fleet(args)
+    report = fleet_simulator.run_scenario("scaling", fleet, args)
+    assert report["failed"] == report["calls"] == args.deployments * args.rounds
+
+def report(throughput, p99, **args):
+    return {"created": "2026-01-01T00:00:00+00:00", "args": dict({"deployments": 200}, **args),
+            "scenarios": {"health": {"throughput": throughput, "latency_ms": {"p99": p99}}}}
+
+@pytest.mark.parametrize("throughput, p99, regressed", [
+    (1000, 10.0, False),
+    (800, 12.0, False),  # Within the 25% tolerance
+    (700, 10.0, True),
+    (1000, 13.0, True),
+])
+def test_compare_flags_regressions_beyond_the_tolerance(throughput, p99, regressed, capsys):
+    regressions = fleet_simulator.compare(report(1000, 10.0), report(throughput, p99), tolerance=0.25)
+    assert regressions == (["health"] if regressed else [])
+    assert ("REGRESSION" in capsys.readouterr().out) is regressed
+
+def test_compare_notes_changed_settings_and_skips_new_scenarios(capsys):
+    current = report(1000, 10.0, deployments=50)
+    current["scenarios"]["config"] = {"throughput": 1.0, "latency_ms": {"p99": 1000.0}}
+    assert fleet_simulator.compare(report(1000, 10.0), current, tolerance=0.25) == []
+    out = capsys.readouterr().out
+    assert "different settings for deployments" in out
+    assert "config" not in out
+
+def simulate(*args):
+    return subprocess.run([sys.executable, "benchmarks/fleet_simulator.py", "--deployments", "4", "--rounds", "1",
+                           "--scenarios", "config,k8s_deploy", "--latency", "0", "--failure-rate", "0", *args],
+                          cwd=REPO_ROOT, capture_output=True, text=True)
+
+def test_reports_written_by_one_run_are_compared_by_the_next(tmp_path):
+    first, second = tmp_path / "first.json", tmp_path / "second.json"
+    assert simulate("--output", str(first)).returncode == 0
+    saved = json.loads(first.read_text())
+    assert set(saved["scenarios"]) == {"config", "k8s_deploy"}
+    assert saved["args"]["deployments"] == 4 and "output" not in saved["args"]
+    assert saved["scenarios"]["config"]["calls"] == 4 and saved["scenarios"]["k8s_deploy"]["calls"] == 8
+
+    # Against a much faster earlier run, the same settings now count as a regression
+    for scenario in saved["scenarios"].values():
+        scenario["throughput"] *= 100
+    first.write_text(json.dumps(saved))
+    result = simulate("--output", str(second), "--compare", str(first))
+    assert result.returncode == 1
+    assert "FAIL  no throughput or p99 latency regression" in result.stdout
+    assert json.loads(second.read_text())["scenarios"].keys() == saved["scenarios"].keys()
+
+def test_unknown_scenarios_are_rejected():
+    result = simulate("--scenarios", "health,nope")
+    assert result.returncode == 2
+    assert "unknown scenarios: nope" in result.stderr
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+import ci_cd.generator as generator
+
+def inventory(count, **overrides):
+    repositories = [{**generator.DEFAULT_VALUES, "targets": ["github", "gitlab"], "name": f"service-{i}"}
+                    for i in range(count)]
+    for repository in repositories:
+        repository.update(overrides)
+    return repositories
+
+def read_tree(root):
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name != generator.MANIFEST_FILE:
+                path = os.path.join(directory, name)
+                with open(path, encoding="utf-8") as generated:
+                    files[os.path.relpath(path, root)] = generated.read()
+    return files
+
+def test_a_pool_run_writes_the_same_files_as_a_serial_run(tmp_path, monkeypatch):
+    repositories = inventory(40)
+    serial = generator.generate_pipelines(repositories, str(tmp_path / "serial"), max_workers=1)
+    monkeypatch.setattr(generator, "SERIAL_THRESHOLD", 0)
+    monkeypatch.setattr(generator, "RENDER_BATCH_SIZE", 7)
+    pooled = generator.generate_pipelines(repositories, str(tmp_path / "pool"), max_workers=2)
+    assert set(serial.values()) == set(pooled.values()) == {"written"}
+    assert len(serial) == len(pooled) == 80
+    assert read_tree(tmp_path / "serial") == read_tree(tmp_path / "pool")
+
+def test_unchanged_repositories_are_skipped_through_the_manifest(tmp_path, monkeypatch):
+    output_dir = str(tmp_path)
+    repositories = inventory(5)
+    generator.generate_pipelines(repositories, output_dir)
+    reads = []
+    real_open = open
+
+    def counting_open(path, *args, **kwargs):
+        if str(path).endswith(".yml"):
+            reads.append(path)
+        return real_open(path, *args, **kwargs)
+    monkeypatch.setattr("builtins.open", counting_open)
+    repositories[2]["branch"] = "develop"
+    results = generator.generate_pipelines(repositories, output_dir)
+    monkeypatch.undo()
+
+    changed = {generator.output_path(output_dir, target, repositories[2]) for target in ("github", "gitlab")}
+    assert {path for path, status in results.items() if status == "written"} == changed
+    assert sum(status == "unchanged" for status in results.values()) == 8
+    # The manifest's sizes and mtimes vouch for the unchanged files, so only the rewritten ones are opened
+    assert set(reads) == changed
+
+def test_a_bad_entry_does_not_stop_the_others(tmp_path):
+    output_dir = str(tmp_path)
+    repositories = inventory(3, targets=["github"])
+    repositories[0]["template"] = str(tmp_path / "missing-template.yml")
+    repositories[1]["targets"] = ["jenkins"]
+    broken_template = tmp_path / "broken.yml"
+    broken_template.write_text("name: {workflow_name}\nruns: {unknown_field}\n")
+    repositories.append({**repositories[2], "name": "service-3", "template": str(broken_template)})
+    results = generator.generate_pipelines(repositories, output_dir)
+
+    assert results[generator.output_path(output_dir, "github", repositories[0])] == "failed"
+    assert results[generator.repository_dir(output_dir, "service-1")] == "failed"
+    assert results[generator.output_path(output_dir, "github", repositories[3])] == "failed"
+    good = generator.output_path(output_dir, "github", repositories[2])
+    assert results[good] == "written"
+    assert os.path.exists(good)
+
+@pytest.mark.parametrize("name, expected", [
+    ("acme/web", os.path.join("acme", "web")),
+    ("../../etc", "etc"),
+    ("/etc/cron.d", os.path.join("etc", "cron.d")),
+    ("..", "_"),
+])
+def test_repository_names_cannot_leave_the_output_directory(tmp_path, name, expected):
+    output_dir = str(tmp_path / "out")
+    results = generator.generate_pipelines([{**generator.DEFAULT_VALUES, "name": name, "targets": ["gitlab"]}], output_dir)
+    assert list(results) == [os.path.join(output_dir, expected, ".gitlab-ci.yml")]
+    assert os.path.exists(os.path.join(output_dir, expected, ".gitlab-ci.yml"))
@@ -0,0 +1,126 @@
+import contextlib
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+# deploy_to_gke and the token refresh import google-auth even with fake credentials
+pytest.importorskip("google.auth")
+
+import cloud.cloud_manager as cloud_manager
+import cloud.gke_clients as gke_clients
+from benchmarks.fakes import FakeClusterManager, FakeGoogleCredentials, FakeKubeAPIServer, StubHTTPServer
+
+PROJECT, LOCATION = "toolkit-project", "europe-west1"
+CLUSTERS = ("prod-a", "prod-b")
+
+class GKE:
+    """Fake GKE clusters behind a fake ClusterManagerClient, with credentials whose tokens the API servers check."""
+
+    def __init__(self, servers, token_lifetime):
+        self.issued = {}
+        self.token_lifetime = token_lifetime
+        self.api_servers = {name: api_server for name, (_, api_server) in servers.items()}
+        self.cluster_manager = FakeClusterManager({gke_clients.cluster_path(PROJECT, LOCATION, name): server.url
+                                                   for name, (server, _) in servers.items()})
+        self.counts = Counter()
+        for api_server in self.api_servers.values():
+            api_server.authorize = FakeGoogleCredentials(issued=self.issued).is_valid_token
+
+    def load_credentials(self):
+        self.counts["credential loads"] += 1
+        return FakeGoogleCredentials(lifetime=self.token_lifetime, issued=self.issued)
+
+    def create_cluster_manager(self, credentials):
+        self.counts["cluster managers"] += 1
+        return self.cluster_manager
+
+    def remote_calls(self):
+        return Counter(self.counts, token_refreshes=len(self.issued), get_cluster=self.cluster_manager.calls["get_cluster"],
+                       api_requests=sum(api_server.requests for api_server in self.api_servers.values()))
+
+    @property
+    def rejected(self):
+        return sum(api_server.rejected for api_server in self.api_servers.values())
+
+    def deploy_batch(self, deployments, version="v1"):
+        """Deploy a batch spread over both clusters and return the remote calls it made."""
+        before = self.remote_calls()
+        for i in range(deployments):
+            assert cloud_manager.deploy_to_gke(f"app:{version}", f"service-{i}", replicas=2, project_id=PROJECT,
+                                               location=LOCATION, cluster_name=CLUSTERS[i % len(CLUSTERS)])
+        after = self.remote_calls()
+        return {key: after[key] - before[key] for key in after}
+
+@pytest.fixture
+def gke(monkeypatch):
+    with contextlib.ExitStack() as stack:
+        servers = {}
+        for name in CLUSTERS:
+            api_server = FakeKubeAPIServer()
+            servers[name] = (stack.enter_context(StubHTTPServer(routes=api_server.routes)), api_server)
+        fake = GKE(servers, token_lifetime=3600)
+        monkeypatch.setattr(gke_clients, "load_credentials", fake.load_credentials)
+        monkeypatch.setattr(gke_clients, "create_cluster_manager", fake.create_cluster_manager)
+        gke_clients.reset()
+        yield fake
+        gke_clients.reset()
+
+def test_a_batch_shares_credentials_clients_and_cluster_data(gke):
+    calls = gke.deploy_batch(10)
+    # Two requests per deployment (read the live replicas, then apply) and nothing else per deployment
+    assert calls == {"credential loads": 1, "cluster managers": 1, "token_refreshes": 1, "get_cluster": 2, "api_requests": 20}
+    assert gke.deploy_batch(10, "v2") == {"credential loads": 0, "cluster managers": 0, "token_refreshes": 0,
+                                          "get_cluster": 0, "api_requests": 20}
+    applied = {(cluster, name): deployment["spec"]["template"]["spec"]["containers"][0]["image"]
+               for cluster, api_server in gke.api_servers.items() for (_, name), deployment in api_server.deployments.items()}
+    assert applied == {(CLUSTERS[i % 2], f"service-{i}"): "app:v2" for i in range(10)}
+    assert gke.rejected == 0
+
+def test_the_api_client_is_reused(gke):
+    first = gke_clients.get_api_client(PROJECT, LOCATION, "prod-a")
+    assert gke_clients.get_api_client(PROJECT, LOCATION, "prod-a") is first
+    assert gke_clients.get_api_client(PROJECT, LOCATION, "prod-b") is not first
+
+def test_the_token_is_refreshed_before_it_expires(gke, monkeypatch):
+    monkeypatch.setattr(gke_clients, "TOKEN_REFRESH_MARGIN", 1.0)
+    gke.token_lifetime = 1.5
+    assert gke.deploy_batch(2)["token_refreshes"] == 1
+    assert gke.deploy_batch(2)["token_refreshes"] == 0
+    # Within the margin of expiring: the long-lived client picks up a new token before its next request
+    time.sleep(0.6)
+    assert gke.deploy_batch(2)["token_refreshes"] == 1
+    assert gke.rejected == 0
+
+def test_cluster_data_is_cached_for_the_ttl(gke, monkeypatch):
+    monkeypatch.setattr(gke_clients, "CLUSTER_CACHE_TTL", 0.3)
+    assert gke.deploy_batch(4)["get_cluster"] == 2
+    assert gke.deploy_batch(4)["get_cluster"] == 0
+    time.sleep(0.4)
+    assert gke.deploy_batch(4)["get_cluster"] == 2
+
+def test_a_moved_endpoint_gets_a_new_client_after_the_ttl(gke, monkeypatch):
+    monkeypatch.setattr(gke_clients, "CLUSTER_CACHE_TTL", 0.2)
+    first = gke_clients.get_api_client(PROJECT, LOCATION, "prod-a")
+    path = gke_clients.cluster_path(PROJECT, LOCATION, "prod-a")
+    gke.cluster_manager.clusters[path] = gke.cluster_manager.clusters[gke_clients.cluster_path(PROJECT, LOCATION, "prod-b")]
+    assert gke_clients.get_api_client(PROJECT, LOCATION, "prod-a") is first
+    time.sleep(0.3)
+    moved = gke_clients.get_api_client(PROJECT, LOCATION, "prod-a")
+    assert moved is not first
+    assert moved.configuration.host == gke.cluster_manager.clusters[path]
+
+def test_concurrent_deployments_call_get_cluster_once(gke):
+    gke.cluster_manager.latency = 0.1
+    threads = [threading.Thread(target=gke_clients.get_cluster_info, args=(PROJECT, LOCATION, "prod-a")) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert gke.cluster_manager.calls["get_cluster"] == 1
+    assert gke.counts == {"credential loads": 1, "cluster managers": 1}
+
+def test_an_unknown_cluster_is_reported(gke, capsys):
+    assert cloud_manager.deploy_to_gke("app:v1", "service", project_id=PROJECT, location=LOCATION, cluster_name="gone") is None
+    assert "Error deploying to GKE" in capsys.readouterr().out
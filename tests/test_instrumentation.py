@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import pytest
+from prometheus_client import CollectorRegistry
+
+import main
+from monitoring import instrumentation
+from monitoring.instrumentation import OperationCollector, get_operation, get_operation_stats, instrument, profile, track
+
+def test_track_times_blocks_and_counts_errors():
+    with track("test_track", "fake"):
+        time.sleep(0.01)
+    with pytest.raises(KeyError):
+        with track("test_track", "fake"):
+            raise KeyError("missing")
+    stats = get_operation_stats()[("test_track", "fake")]
+    assert stats["calls"] == 2 and stats["errors"] == 1
+    assert stats["max"] >= 0.01
+
+def test_instrument_wraps_functions_and_coroutines():
+    @instrument("test_instrument", "fake")
+    def double(value):
+        if value is None:
+            raise ValueError("no value")
+        return value * 2
+
+    @instrument("test_instrument_async", "fake")
+    async def double_later(value):
+        await asyncio.sleep(0)
+        return value * 2
+
+    assert double(2) == 4
+    with pytest.raises(ValueError):
+        double(None)
+    assert asyncio.run(double_later(3)) == 6
+    assert double.__name__ == "double"
+    summary = get_operation_stats()
+    assert (summary[("test_instrument", "fake")]["calls"], summary[("test_instrument", "fake")]["errors"]) == (2, 1)
+    assert summary[("test_instrument_async", "fake")]["calls"] == 1
+
+def test_histogram_buckets_and_quantiles():
+    stats = get_operation("test_histogram", "fake")
+    for duration in [0.002] * 90 + [0.3] * 10:
+        stats.observe(duration)
+    assert stats.quantile(0.5) == 0.005
+    assert stats.quantile(0.95) == 0.3  # The 0.5 s bucket bound, capped at the slowest call
+    assert stats.buckets[instrumentation.OPERATION_BUCKETS.index(0.005)] == 90
+
+def test_collector_exports_a_histogram_and_an_error_counter():
+    stats = get_operation("test_export", "fake")
+    stats.observe(0.003)
+    stats.observe(20.0, failed=True)
+    registry = CollectorRegistry()
+    registry.register(OperationCollector())
+    labels = {"operation": "test_export", "backend": "fake"}
+    assert registry.get_sample_value("toolkit_operation_duration_seconds_bucket", dict(labels, le="0.005")) == 1
+    assert registry.get_sample_value("toolkit_operation_duration_seconds_bucket", dict(labels, le="+Inf")) == 2
+    assert registry.get_sample_value("toolkit_operation_duration_seconds_count", labels) == 2
+    assert registry.get_sample_value("toolkit_operation_errors_total", labels) == 1
+
+@pytest.mark.parametrize("mode, heading", [("cpu", "CPU profile"), ("memory", "Memory profile")])
+def test_profile_reports_and_writes_output(mode, heading, tmp_path, capsys):
+    output = tmp_path / f"{mode}.prof"
+    with profile(mode, str(output), top=5):
+        sorted(str(i) for i in range(10000))
+    assert heading in capsys.readouterr().out
+    assert output.stat().st_size > 0
+
+def test_profile_rejects_unknown_modes():
+    with pytest.raises(ValueError):
+        with profile("wall"):
+            pass
+
+def test_main_profiles_the_command_and_prints_the_summary(monkeypatch, capsys):
+    def run_command(args, handler):
+        with track("test_main_command", "fake"):
+            pass
+    monkeypatch.setattr(main, "run_command", run_command)
+    assert main.main(["config", "--name", "db", "--profile", "cpu"]) == 0
+    out = capsys.readouterr().out
+    assert "CPU profile" in out
+    assert "Operation summary" in out and "test_main_command" in out
+
+    assert main.main(["config", "--name", "db", "--no-summary"]) == 0
+    assert "Operation summary" not in capsys.readouterr().out
+
+def per_call(function, calls=20000):
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+def test_instrumentation_overhead_is_small():
+    def noop():
+        return None
+
+    def tracked():
+        with track("test_overhead_block", "fake"):
+            return None
+
+    bare = per_call(noop)
+    # A few microseconds per call, against the milliseconds of any real backend call
+    assert per_call(instrument("test_overhead", "fake")(noop)) - bare < 10e-6
+    assert per_call(tracked) - bare < 10e-6
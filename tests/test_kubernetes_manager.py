@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+import kubernetes_dep.client_provider as client_provider
+import kubernetes_dep.kubernetes_manager as kubernetes_manager
+
+def replicas(fake, name, namespace="default"):
+    return fake.get("Deployment", namespace, name)["spec"]["replicas"]
+
+def image(fake, name, namespace="default"):
+    return fake.get("Deployment", namespace, name)["spec"]["template"]["spec"]["containers"][0]["image"]
+
+def test_a_new_deployment_gets_the_manifest_replicas(kubernetes):
+    manifest = kubernetes_manager.build_deployment_manifest("web:1", "web", replicas=3)
+    kubernetes_manager.apply_deployment(manifest)
+    assert replicas(kubernetes, "web") == 3
+
+@pytest.mark.parametrize("informers", [False, True])
+def test_redeploying_keeps_the_replicas_set_by_the_scaler(kubernetes, monkeypatch, informers):
+    monkeypatch.setattr(client_provider, "USE_INFORMERS", informers)
+    kubernetes_manager.create_deployment("web:1", "web")
+    client_provider.get_apps_api().patch_namespaced_deployment_scale(
+        "web", "default", {"spec": {"replicas": 6}}, _content_type="application/merge-patch+json")
+    if informers:
+        # Wait for the informer to see the scale-up, as a later deploy would
+        informer = client_provider.get_informer("Deployment", "default")
+        deadline = time.monotonic() + 5
+        while getattr(informer.get("web"), "spec", None) is None or informer.get("web").spec.replicas != 6:
+            assert time.monotonic() < deadline, "the informer never saw the scale-up"
+            time.sleep(0.01)
+
+    kubernetes_manager.create_deployment("web:2", "web")
+    assert image(kubernetes, "web") == "web:2"
+    assert replicas(kubernetes, "web") == 6
+
+def test_bulk_apply_keeps_live_replicas(kubernetes):
+    client_provider.get_apps_api().add_deployment("api", replicas=4)
+    results = kubernetes_manager.apply_deployments([("api:2", "api"), ("worker:1", "worker")], wait=False)
+    assert {status["status"] for status in results.values()} == {"applied"}
+    assert replicas(kubernetes, "api") == 4
+    assert replicas(kubernetes, "worker") == 1
+    assert image(kubernetes, "api") == "api:2"
+
+def spread(count, namespaces, image="app:1"):
+    manifests = []
+    for i in range(count):
+        manifest = kubernetes_manager.build_deployment_manifest(image, f"service-{i}")
+        manifest["metadata"]["namespace"] = f"team-{i % namespaces}"
+        manifests.append(manifest)
+    return manifests
+
+def test_apply_waits_until_deployments_are_ready(kubernetes):
+    kubernetes.rollout_time = 0.2
+    results = kubernetes_manager.apply_deployments(spread(4, 2), timeout=5)
+    assert {result["status"] for result in results.values()} == {"ready"}
+    assert all(result["rollout_seconds"] >= 0.15 for result in results.values())
+    for namespace, name in results:
+        assert kubernetes.get("Deployment", namespace, name)["status"]["availableReplicas"] == 1
+
+def test_a_deployment_that_never_becomes_ready_times_out(kubernetes, monkeypatch):
+    kubernetes.rollout_time = 0.1
+    finish_rollout = kubernetes._finish_rollout
+    monkeypatch.setattr(kubernetes, "_finish_rollout",
+                        lambda namespace, name, generation: name != "stuck" and finish_rollout(namespace, name, generation))
+    start = time.monotonic()
+    results = kubernetes_manager.apply_deployments([("web:1", "web"), ("stuck:1", "stuck")], timeout=1)
+    assert results[("default", "web")]["status"] == "ready"
+    assert results[("default", "stuck")]["status"] == "timeout"
+    assert "rollout_seconds" not in results[("default", "stuck")]
+    assert time.monotonic() - start < 3
+
+def test_one_watch_is_opened_per_namespace(kubernetes):
+    kubernetes.rollout_time = 0.2
+    results = kubernetes_manager.apply_deployments(spread(9, 3), wait=False)
+    generations = {key: kubernetes.get("Deployment", *key)["metadata"]["generation"] for key in results}
+    calls_before = kubernetes.total_calls
+    ready = kubernetes_manager.wait_for_rollouts(generations, timeout=5)
+    assert set(ready) == set(generations)
+    # Three watches and no per-deployment polling
+    assert kubernetes.total_calls - calls_before == 3
@@ -0,0 +1,92 @@
+import itertools
+import threading
+import time
+import tracemalloc
+
+import kubernetes_dep.client_provider as client_provider
+import kubernetes_dep.kubernetes_manager as kubernetes_manager
+import docker_dep.docker_manager as docker_manager
+from monitoring.log_stream import fan_in, iter_lines, iter_log_lines
+
+MB = 1024 * 1024
+
+def test_lines_are_split_across_chunks():
+    assert list(iter_lines([b"a", b"b\nc", b"", b"d\n\ne"])) == [b"ab", b"cd", b"", b"e"]
+
+def test_long_lines_are_split():
+    assert list(iter_lines([b"x" * 10, b"x" * 5 + b"\nend"], max_line_bytes=4)) == [b"xxxx", b"xxxx", b"xxxx", b"xxx", b"end"]
+
+def test_pattern_filters_before_decoding():
+    chunks = ["ok status=200\r\nbad status=500 café\n".encode(), b"\xffstatus=500\n"]
+    assert list(iter_log_lines(chunks, pattern=r"status=5\d\d")) == ["bad status=500 café", "�status=500"]
+    assert list(iter_log_lines(chunks)) == ["ok status=200", "bad status=500 café", "�status=500"]
+
+def peak_memory(consume):
+    tracemalloc.start()
+    try:
+        consume()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def test_container_logs_stream_in_flat_memory(docker):
+    docker.containers.add("small", log_bytes=8 * MB)
+    docker.containers.add("big", log_bytes=128 * MB)
+    counts = {}
+
+    def consume(name):
+        counts[name] = sum(1 for _ in docker_manager.stream_logs(name, pattern="status=200"))
+    small, big = peak_memory(lambda: consume("small")), peak_memory(lambda: consume("big"))
+    assert counts["big"] > 15 * counts["small"]
+    # Sixteen times the log, not sixteen times the memory
+    assert big < 2 * MB
+    assert big < 2 * small + 256 * 1024
+
+def test_container_log_options_are_passed_to_the_daemon(docker, monkeypatch):
+    container = docker.containers.add("web", log_bytes=1024)
+    calls = []
+    logs = container.logs
+    monkeypatch.setattr(container, "logs", lambda **kwargs: calls.append(kwargs) or logs(**kwargs))
+    lines = list(docker_manager.stream_logs("web", since=1700000000, tail=50, follow=True))
+    assert lines and calls == [{"stream": True, "follow": True, "since": 1700000000, "tail": 50}]
+
+def test_fan_in_tags_every_line():
+    sources = {"a": iter(["1", "2"]), "b": iter(["3"]), "c": iter([])}
+    assert sorted(fan_in(sources)) == [("a", "1"), ("a", "2"), ("b", "3")]
+
+def test_fan_in_applies_backpressure():
+    produced = itertools.count()
+    source = (next(produced) for _ in itertools.count())
+    merged = fan_in({"fast": source}, max_buffered=10)
+    assert [line for _, line in itertools.islice(merged, 5)] == [0, 1, 2, 3, 4]
+    time.sleep(0.2)
+    # The reader blocks on the full queue instead of running ahead
+    assert next(produced) <= 5 + 10 + 2
+    merged.close()
+
+def test_closing_fan_in_stops_and_closes_the_sources():
+    closed = threading.Event()
+
+    def endless():
+        try:
+            while True:
+                yield "line"
+        finally:
+            closed.set()
+    merged = fan_in({"pod": endless()}, max_buffered=2)
+    next(merged)
+    merged.close()
+    assert closed.wait(2)
+
+def test_deployment_logs_fan_in_across_its_pods(kubernetes):
+    core_api = client_provider.get_core_api()
+    core_api.log_bytes = 64 * 1024
+    for name in ("web-1", "web-2", "web-3"):
+        core_api.add_pod(name, labels={"app": "web"})
+    core_api.add_pod("worker-1", labels={"app": "worker"})
+
+    lines = list(kubernetes_manager.stream_deployment_logs("web", tail_lines=10, pattern="status=200"))
+    per_pod = {pod: sum(1 for name, _ in lines if name == pod) for pod in ("web-1", "web-2", "web-3")}
+    assert len(set(per_pod.values())) == 1 and per_pod["web-1"] > 0
+    assert {name for name, _ in lines} == {"web-1", "web-2", "web-3"}
+    assert kubernetes.calls["read_namespaced_pod_log"] == 3
@@ -0,0 +1,92 @@
+import gzip
+import json
+import logging
+import os
+
+import pytest
+
+import monitoring.logger as logger_module
+from monitoring.logger import BatchingFileHandler, JsonLinesFormatter
+
+@pytest.fixture
+def log_dir(monkeypatch, tmp_path):
+    """Loggers set up by the test write under a temporary LOG_DIRECTORY, with listeners of their own."""
+    monkeypatch.setattr(logger_module, "LOG_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(logger_module, "_listeners", {})
+    yield tmp_path
+    logger_module.shutdown_logging()
+
+def make_handler(path, **kwargs):
+    handler = BatchingFileHandler(str(path), batch_size=1, flush_interval=60, **kwargs)
+    handler.setFormatter(JsonLinesFormatter())
+    return handler
+
+def record(message):
+    return logging.LogRecord("test", logging.INFO, __file__, 0, message, None, None)
+
+def rotated(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".gz"))
+
+def test_files_rotate_at_the_size_limit_and_are_compressed(tmp_path):
+    handler = make_handler(tmp_path / "app.log", max_bytes=1000, backup_count=10)
+    line_size = len(JsonLinesFormatter().format(record("event 00")).encode()) + 1
+    for i in range(30):
+        handler.emit(record(f"event {i:02d}"))
+    handler.close()
+
+    backups = rotated(tmp_path)
+    assert len(backups) >= 2
+    for name in backups:
+        with gzip.open(tmp_path / name, "rb") as backup:
+            # Rotated by the line that reached the limit
+            assert 1000 <= len(backup.read()) < 1000 + line_size
+    assert os.path.getsize(tmp_path / "app.log") < 1000
+    # Uncompressed rotated files are removed once their .gz is written
+    assert sorted(os.listdir(tmp_path)) == sorted(backups + ["app.log"])
+    lines = []
+    for name in backups:
+        with gzip.open(tmp_path / name, "rt", encoding="utf-8") as backup:
+            lines += [json.loads(line)["message"] for line in backup]
+    with open(tmp_path / "app.log", encoding="utf-8") as current:
+        lines += [json.loads(line)["message"] for line in current]
+    assert lines == [f"event {i:02d}" for i in range(30)]
+
+def test_only_backup_count_rotated_files_are_kept(tmp_path):
+    handler = make_handler(tmp_path / "app.log", max_bytes=1, backup_count=2)
+    for i in range(6):
+        handler.emit(record(f"event {i}"))
+    handler.close()
+    backups = rotated(tmp_path)
+    assert len(backups) == 2
+    with gzip.open(tmp_path / backups[-1], "rt", encoding="utf-8") as backup:
+        assert json.loads(backup.read())["message"] == "event 5"
+
+def test_the_size_limit_counts_bytes_not_characters(tmp_path):
+    handler = BatchingFileHandler(str(tmp_path / "app.log"), batch_size=1, flush_interval=60, max_bytes=200)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    # 151 characters, 301 bytes
+    handler.emit(record("é" * 150))
+    handler.close()
+    assert len(rotated(tmp_path)) == 1
+
+def test_setting_up_a_logger_twice_adds_one_handler(log_dir):
+    first = logger_module.setup_logger("test_logger", "test.log")
+    second = logger_module.setup_logger("test_logger", "test.log")
+    assert first is second
+    assert sum(isinstance(handler, logger_module.LazyQueueHandler) for handler in first.handlers) == 1
+    # A second logger on the same file shares its listener
+    logger_module.setup_logger("other_logger", "test.log")
+    assert list(logger_module._listeners) == [os.path.join(str(log_dir), "test.log")]
+    for name in ("test_logger", "other_logger"):
+        logging.getLogger(name).handlers.clear()
+
+def test_shutdown_writes_out_everything_queued(log_dir):
+    log = logger_module.setup_logger("drain_logger", "drain.log")
+    for i in range(2000):
+        log.info("event %d", i, extra={"index": i})
+    logger_module.shutdown_logging()
+    log.handlers.clear()
+    with open(log_dir / "drain.log", encoding="utf-8") as log_file:
+        entries = [json.loads(line) for line in log_file]
+    assert [entry["index"] for entry in entries] == list(range(2000))
+    assert entries[0]["message"] == "event 0"
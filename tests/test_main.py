@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from main import COMMANDS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def imported_after(code):
+    """Run code in a fresh interpreter and return the top-level packages it imported."""
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys\n{code}\nprint(' '.join(sorted({{m.split('.')[0] for m in sys.modules}})))"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    return set(result.stdout.split())
+
+def test_main_imports_no_subcommand_module():
+    imported = imported_after("import main")
+    assert not imported & {module_name.split(".")[0] for module_name, _ in COMMANDS.values()}
+    assert not imported & {"boto3", "kubernetes", "docker", "slack_sdk", "prometheus_client", "numpy"}
+
+@pytest.mark.parametrize("command", ["config", "ci_cd"])
+def test_resolving_a_command_imports_only_its_module(command):
+    imported = imported_after(f"from main import resolve_command\nassert resolve_command({command!r})")
+    other_modules = {module_name.split(".")[0] for name, (module_name, _) in COMMANDS.items() if name != command}
+    assert COMMANDS[command][0].split(".")[0] in imported
+    assert not imported & (other_modules - {"monitoring"})
+
+@pytest.mark.parametrize("command", sorted(COMMANDS))
+def test_every_command_resolves(command):
+    from main import resolve_command
+
+    assert callable(resolve_command(command))
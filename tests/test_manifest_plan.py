@@ -0,0 +1,117 @@
+import copy
+
+import pytest
+import yaml
+
+import kubernetes_dep.client_provider as client_provider
+import kubernetes_dep.manifest_plan as manifest_plan
+
+DEPLOYMENT = {
+    "apiVersion": "apps/v1", "kind": "Deployment", "metadata": {"name": "web", "namespace": "default"},
+    "spec": {"replicas": 2, "selector": {"matchLabels": {"app": "web"}}, "template": {
+        "metadata": {"labels": {"app": "web"}},
+        "spec": {"containers": [{
+            "name": "web", "image": "web:1", "env": [{"name": "WORKERS", "value": "1.0"}],
+            "resources": {"requests": {"cpu": "0.5", "memory": "1Gi"}, "limits": {"cpu": "1", "memory": "2Gi"}},
+        }]},
+    }},
+}
+CONFIG_MAP = {"apiVersion": "v1", "kind": "ConfigMap", "metadata": {"name": "web-config"}, "data": {"mode": "fast"}}
+
+def container(obj):
+    return obj["spec"]["template"]["spec"]["containers"][0]
+
+@pytest.mark.parametrize("desired, live", [
+    (0.5, "500m"), ("1Gi", "1024Mi"), (1, "1"), ("2", "2000m"), ("128974848", "123Mi"),
+])
+def test_equal_quantities_match(desired, live):
+    assert manifest_plan.matches_live({"resources": {"limits": {"cpu": desired}}}, {"resources": {"limits": {"cpu": live}}})
+
+def test_different_quantities_do_not_match():
+    assert not manifest_plan.matches_live({"limits": {"memory": "1Gi"}}, {"limits": {"memory": "1000Mi"}})
+
+def test_only_resource_values_are_compared_as_quantities():
+    assert not manifest_plan.matches_live({"env": [{"value": "1.0"}]}, {"env": [{"value": "1"}]})
+    assert not manifest_plan.matches_live({"limits": {"cpu": "one"}}, {"limits": {"cpu": "1"}})
+
+@pytest.fixture
+def manifests(kubernetes, tmp_path):
+    """Write manifests with write(*objects) and return their path."""
+    path = tmp_path / "manifests.yml"
+
+    def write(*objects):
+        path.write_text(yaml.safe_dump_all([copy.deepcopy(obj) for obj in objects]))
+        return str(path)
+    return write
+
+def plan_and_apply(path, prune=False):
+    _, plan = manifest_plan.plan_manifests(path)
+    manifest_plan.apply_plan(plan, prune=prune)
+    return {entry.key: (entry.action, entry.reason) for entry in plan}
+
+def test_server_spelling_and_scaling_are_not_drift(kubernetes, manifests):
+    path = manifests(DEPLOYMENT, CONFIG_MAP)
+    assert plan_and_apply(path) == {("ConfigMap", "default", "web-config"): ("create", None),
+                                    ("Deployment", "default", "web"): ("create", None)}
+
+    # The API server answers with its own quantity spelling, and an autoscaler scales the deployment
+    live = kubernetes.get("Deployment", "default", "web")
+    container(live)["resources"] = {"requests": {"cpu": "500m", "memory": "1024Mi"}, "limits": {"cpu": "1", "memory": "2Gi"}}
+    kubernetes.store_deployment(live, spec_changed=False)
+    scale("web", 7)
+
+    _, plan = manifest_plan.plan_manifests(path)
+    assert {entry.action for entry in plan} == {"unchanged"}
+
+def test_drift_is_detected_and_undone(kubernetes, manifests):
+    path = manifests(DEPLOYMENT)
+    plan_and_apply(path)
+    live = kubernetes.get("Deployment", "default", "web")
+    container(live)["resources"]["limits"]["memory"] = "4Gi"
+    kubernetes.store_deployment(live)
+
+    assert plan_and_apply(path) == {("Deployment", "default", "web"): ("update", "drift")}
+    assert container(kubernetes.get("Deployment", "default", "web"))["resources"]["limits"]["memory"] == "2Gi"
+
+def scale(name, replicas):
+    client_provider.get_apps_api().patch_namespaced_deployment_scale(
+        name, "default", {"spec": {"replicas": replicas}}, _content_type="application/merge-patch+json")
+
+def test_updates_keep_the_scaled_replica_count(kubernetes, manifests):
+    plan_and_apply(manifests(DEPLOYMENT))
+    scale("web", 7)
+    changed = copy.deepcopy(DEPLOYMENT)
+    container(changed)["image"] = "web:2"
+    assert plan_and_apply(manifests(changed)) == {("Deployment", "default", "web"): ("update", "changed")}
+    live = kubernetes.get("Deployment", "default", "web")
+    assert (container(live)["image"], live["spec"]["replicas"]) == ("web:2", 7)
+
+def test_undoing_drift_keeps_the_scaled_replica_count(kubernetes, manifests):
+    path = manifests(DEPLOYMENT)
+    plan_and_apply(path)
+    scale("web", 5)
+    live = kubernetes.get("Deployment", "default", "web")
+    live["metadata"].setdefault("annotations", {})["team"] = "payments"
+    container(live)["image"] = "web:debug"
+    kubernetes.store_deployment(live)
+    assert plan_and_apply(path) == {("Deployment", "default", "web"): ("update", "drift")}
+    live = kubernetes.get("Deployment", "default", "web")
+    assert (container(live)["image"], live["spec"]["replicas"]) == ("web:1", 5)
+
+def test_the_manifest_replicas_are_only_used_to_create(kubernetes, manifests):
+    plan_and_apply(manifests(DEPLOYMENT))
+    assert kubernetes.get("Deployment", "default", "web")["spec"]["replicas"] == 2
+    scaled = copy.deepcopy(DEPLOYMENT)
+    scaled["spec"]["replicas"] = 4
+    assert plan_and_apply(manifests(scaled)) == {("Deployment", "default", "web"): ("update", "changed")}
+    assert kubernetes.get("Deployment", "default", "web")["spec"]["replicas"] == 2
+
+def test_removed_objects_are_pruned_only_when_asked(kubernetes, manifests):
+    other_config_map = dict(CONFIG_MAP, metadata={"name": "other-config"})
+    plan_and_apply(manifests(DEPLOYMENT, CONFIG_MAP, other_config_map))
+    # Pruning covers the kinds still in the manifests
+    path = manifests(DEPLOYMENT, other_config_map)
+    assert plan_and_apply(path)[("ConfigMap", "default", "web-config")] == ("prune", None)
+    assert ("ConfigMap", "default", "web-config") in kubernetes.objects
+    plan_and_apply(path, prune=True)
+    assert ("ConfigMap", "default", "web-config") not in kubernetes.objects
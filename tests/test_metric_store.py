@@ -0,0 +1,87 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from monitoring.metric_store import MetricStore, series_name
+
+DAY = 24 * 3600
+# The next hour: the store runs maintenance against the clock on its first flush, which must not touch test data
+START = (time.time() // 3600 + 1) * 3600
+SERIES = series_name("deployment_health", deployment_name="web")
+
+@pytest.fixture
+def store(tmp_path):
+    store = MetricStore(str(tmp_path / "metrics"), segment_duration=3600, flush_interval=3600,
+                        maintenance_interval=10 * DAY, retention=7 * DAY, downsample_after=DAY, downsample_resolution=60)
+    yield store
+    store.close()
+
+def segment_files(store, series=SERIES):
+    return sorted(os.listdir(store._series_dir(series)))
+
+def test_samples_are_read_back_across_segment_boundaries(store):
+    timestamps = START + np.arange(0, 3 * 3600, 10.0)
+    values = np.arange(len(timestamps), dtype=np.float32)
+    store.append_many(SERIES, timestamps[:500], values[:500])
+    for timestamp, value in zip(timestamps[500:], values[500:]):
+        store.append(SERIES, value, timestamp)
+    # Part of the data is still buffered and is returned with what was written
+    assert len(store._buffers.get(SERIES, ([], []))[0]) > 0
+    queried = store.query(SERIES)
+    np.testing.assert_array_equal(queried[0], timestamps)
+    np.testing.assert_array_equal(queried[1], values)
+
+    store.flush()
+    assert len(segment_files(store)) == 2 * 3  # Three hourly segments, two column files each
+    start, end = START + 3000, START + 4000
+    queried = store.query(SERIES, start, end)
+    inside = (timestamps >= start) & (timestamps <= end)
+    np.testing.assert_array_equal(queried[0], timestamps[inside])
+    np.testing.assert_array_equal(queried[1], values[inside])
+
+def test_a_reopened_store_reads_persisted_samples(store):
+    store.append_many(SERIES, START + np.arange(100.0), np.ones(100))
+    store.append("other", 2.5, START)
+    store.close()
+    reopened = MetricStore(store.root)
+    assert reopened.series() == sorted(["other", SERIES])
+    timestamps, values = reopened.query(SERIES)
+    np.testing.assert_array_equal(timestamps, START + np.arange(100.0))
+    assert values.sum() == 100
+    assert list(reopened.query("other")[1]) == [2.5]
+    # Appending after a reopen continues the last segment
+    reopened.append_many(SERIES, [START + 100], [1.0])
+    assert len(reopened.query(SERIES)[0]) == 101
+
+def test_compact_downsamples_old_segments(store):
+    timestamps = START + np.arange(0, 2 * 3600, 1.0)
+    store.append_many(SERIES, timestamps, np.where(timestamps % 2 == 0, 0.0, 1.0))
+    store.append(SERIES, 1.0, START + 2 * DAY)
+    store.compact(now=START + 2 * DAY)
+
+    files = segment_files(store)
+    assert sum(name.endswith("-r60.ts") for name in files) == 2
+    timestamps, values = store.query(SERIES, START, START + 2 * 3600)
+    assert len(timestamps) == 120  # One mean per minute
+    np.testing.assert_allclose(values, 0.5)
+    # The active segment is never downsampled
+    assert store.query(SERIES, START + 2 * DAY)[0].tolist() == [START + 2 * DAY]
+
+def test_retention_deletes_old_segments_and_empty_series(store):
+    store.append_many(SERIES, START + np.arange(0, 3600, 60.0), np.ones(60))
+    store.append_many("recent", [START + 9 * DAY], [1.0])
+    store.append_many(SERIES, [START + 9 * DAY - 10], [1.0])
+    store.compact(now=START + 9 * DAY)
+    assert store.query(SERIES)[0].tolist() == [START + 9 * DAY - 10]
+
+    # A series with nothing inside the retention period loses its directory too
+    store.append_many("stale", [START], [1.0])
+    store.compact(now=START + 9 * DAY)
+    assert not os.path.exists(store._series_dir("stale"))
+    assert store.series() == sorted(["recent", SERIES])
+    assert store.query("stale")[0].size == 0
+    # and comes back on the next append
+    store.append_many("stale", [START + 9 * DAY], [3.0])
+    assert store.query("stale")[1].tolist() == [3.0]
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+import monitoring.slo as slo
+from benchmarks.fakes import StubHTTPServer
+from monitoring.monitor import HealthCheckScheduler
+
+@pytest.fixture
+def slo_engine(monkeypatch, metric_store):
+    engine = slo.SLOEngine(notify=lambda deployment_name, message: None)
+    monkeypatch.setattr(slo, "_slo_engine", engine)
+    return engine
+
+def skipped(deployment_name):
+    return REGISTRY.get_sample_value("health_checks_skipped_total", {"deployment_name": deployment_name}) or 0
+
+async def sweep(targets, **kwargs):
+    async with HealthCheckScheduler(targets, verbose=False, **kwargs) as scheduler:
+        return await scheduler.run_sweep()
+
+def test_sweep_records_every_result(slo_engine, metric_store):
+    with StubHTTPServer() as server:
+        results = asyncio.run(sweep({"web": f"{server.url}/health", "down": "http://127.0.0.1:1/health"}))
+    assert results == {"web": 1, "down": 0}
+    assert slo_engine.stats["samples"] == 2
+    metric_store.flush()
+    assert list(metric_store.query('deployment_health{deployment_name="down"}')[1]) == [0]
+
+def test_checks_that_never_ran_are_not_counted_against_the_slo(slo_engine):
+    async def run(url):
+        loop = asyncio.get_running_loop()
+        async with HealthCheckScheduler({"first": url, "second": url}, verbose=False, concurrency=1) as scheduler:
+            # "first" holds the only slot until the deadline, so "second" never gets to run
+            return await scheduler.run_sweep(deadline=loop.time() + 0.2)
+
+    before = skipped("second")
+    with StubHTTPServer(latency=1.0) as server:
+        results = asyncio.run(run(f"{server.url}/health"))
+    assert results == {"first": 0, "second": None}
+    assert skipped("second") == before + 1
+    assert slo_engine.stats["samples"] == 1
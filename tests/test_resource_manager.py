@@ -0,0 +1,132 @@
+import pytest
+
+import kubernetes_dep.client_provider as client_provider
+import scaling.resource_manager as resource_manager
+from benchmarks.fakes import FakeAppsV1Api
+
+@pytest.fixture
+def cluster(kubernetes, prometheus, metric_store, monkeypatch):
+    """Deployments "hot" (busy) and "idle" in two namespaces, scaled one replica at a time."""
+    monkeypatch.setattr(resource_manager, "scaling_policy", resource_manager.ThresholdPolicy())
+    prometheus.values = {"cpu_usage": {"hot": 0.9, "idle": 0.1}, "memory_usage": {"hot": 0.5, "idle": 0.1}}
+    apps_api = client_provider.get_apps_api()
+    for namespace in ("team-a", "team-b"):
+        apps_api.add_deployment("hot", namespace, replicas=2)
+        apps_api.add_deployment("idle", namespace, replicas=3)
+    return kubernetes
+
+def reconcile(deployments):
+    reconciler = resource_manager.ScalingReconciler(deployments, max_workers=4)
+    try:
+        return reconciler.reconcile()
+    finally:
+        reconciler.close()
+
+def test_reconcile_scales_every_deployment(cluster):
+    targets = [(namespace, name) for namespace in ("team-a", "team-b") for name in ("hot", "idle")]
+    assert reconcile(targets) == {("team-a", "hot"): 3, ("team-a", "idle"): 2,
+                                  ("team-b", "hot"): 3, ("team-b", "idle"): 2}
+    assert cluster.get("Deployment", "team-b", "hot")["spec"]["replicas"] == 3
+    assert cluster.get("Deployment", "team-b", "idle")["spec"]["replicas"] == 2
+
+def test_reconcile_batches_reads(cluster, prometheus):
+    targets = [(namespace, name) for namespace in ("team-a", "team-b") for name in ("hot", "idle")]
+    reconcile(targets)
+    # One query per metric, one list per namespace, and a patch only for the deployments that change
+    assert prometheus.queries == len(resource_manager.SCALING_METRICS)
+    assert dict(cluster.calls) == {"list_namespaced_deployment": 2, "patch_namespaced_deployment_scale": 4}
+
+def test_reconcile_matches_the_per_deployment_path(cluster):
+    targets = [("team-a", "hot"), ("team-a", "idle")]
+    serial = {(namespace, name): resource_manager.check_and_scale_deployment(name, namespace=namespace)
+              for namespace, name in targets}
+    assert serial == {("team-a", "hot"): 3, ("team-a", "idle"): 2}
+    # Put the replica counts back and let the reconciler make the same decisions
+    apps_api = client_provider.get_apps_api()
+    apps_api.add_deployment("hot", "team-a", replicas=2)
+    apps_api.add_deployment("idle", "team-a", replicas=3)
+    assert reconcile(targets) == serial
+
+def test_missing_deployments_are_skipped(cluster):
+    assert reconcile([("team-a", "hot"), ("team-a", "gone")]) == {("team-a", "hot"): 3}
+
+def test_a_failing_namespace_does_not_stop_the_others(cluster, monkeypatch):
+    class FailingAppsV1Api(FakeAppsV1Api):
+        def list_namespaced_deployment(self, namespace, **kwargs):
+            if namespace == "team-a":
+                raise RuntimeError("connection refused")
+            return super().list_namespaced_deployment(namespace, **kwargs)
+
+    monkeypatch.setattr(client_provider, "_apps_api", FailingAppsV1Api(cluster))
+    assert reconcile([("team-a", "hot"), ("team-b", "hot")]) == {("team-b", "hot"): 3}
+
+def test_decisions_are_recorded_in_the_metric_store(cluster, metric_store):
+    reconcile([("team-a", "hot")])
+    metric_store.flush()
+    _, values = metric_store.query(resource_manager.series_name("replicas", namespace="team-a", deployment_name="hot"))
+    assert list(values) == [3]
+
+def test_same_named_deployments_in_different_namespaces_get_their_own_metrics(cluster, prometheus):
+    prometheus.values = {"cpu_usage": {("team-a", "hot"): 0.9, ("team-b", "hot"): 0.1},
+                         "memory_usage": {("team-a", "hot"): 0.1, ("team-b", "hot"): 0.1}}
+    metrics = resource_manager.fetch_deployment_metrics([("team-a", "hot"), ("team-b", "hot")])
+    assert metrics == {"namespace": ["team-a", "team-b"], "deployment": ["hot", "hot"],
+                       "cpu_usage": [0.9, 0.1], "memory_usage": [0.1, 0.1]}
+    assert reconcile([("team-a", "hot"), ("team-b", "hot")]) == {("team-a", "hot"): 3, ("team-b", "hot"): 1}
+
+def test_names_without_a_namespace_are_in_the_default_namespace(cluster, prometheus, monkeypatch):
+    monkeypatch.setattr(resource_manager, "NAMESPACE", "team-b")
+    prometheus.values = {"cpu_usage": {("team-a", "hot"): 0.1, ("team-b", "hot"): 0.9}}
+    assert resource_manager.get_prometheus_metric("cpu_usage", "hot") == 0.9
+    assert resource_manager.get_prometheus_metric("cpu_usage", "hot", namespace="team-a") == 0.1
+
+def test_missing_data_is_none_rather_than_zero(cluster, prometheus):
+    prometheus.values = {"cpu_usage": {("team-a", "hot"): 0.9, ("team-a", "idle"): None}}
+    metrics = resource_manager.fetch_deployment_metrics([("team-a", "hot"), ("team-a", "idle")])
+    assert metrics["cpu_usage"] == [0.9, None]
+    assert resource_manager.get_prometheus_metric("cpu_usage", "idle", namespace="team-a") is None
+
+def test_a_prometheus_outage_reads_as_no_data(cluster, prometheus, capsys):
+    prometheus.failure_rate = 1.0
+    metrics = resource_manager.fetch_deployment_metrics([("team-a", "hot"), ("team-b", "idle")])
+    assert metrics["cpu_usage"] == metrics["memory_usage"] == [None, None]
+    assert "failed with status 503" in capsys.readouterr().out
+
+def test_series_without_a_namespace_label_are_used(cluster, prometheus):
+    prometheus.namespaced = False
+    prometheus.values = {"cpu_usage": {"hot": 0.9, "idle": 0.1}}
+    metrics = resource_manager.fetch_deployment_metrics([("team-a", "hot"), ("team-b", "idle")])
+    assert metrics["cpu_usage"] == [0.9, 0.1]
+    assert resource_manager.get_prometheus_metric("cpu_usage", "hot", namespace="team-b") == 0.9
+
+def test_the_threshold_policy_keeps_replicas_without_data(cluster, prometheus, metric_store):
+    prometheus.values["cpu_usage"]["idle"] = None
+    assert resource_manager.check_and_scale_deployment("idle", namespace="team-a") == 3
+    assert "patch_namespaced_deployment_scale" not in cluster.calls
+    metric_store.flush()
+    _, values = metric_store.query(resource_manager.series_name("cpu_usage", namespace="team-a", deployment_name="idle"))
+    assert list(values) == []
+
+@pytest.fixture
+def proportional(cluster, monkeypatch):
+    """The proportional policy with no stabilization or cooldown, so any scale-down would happen at once."""
+    policy = resource_manager.ProportionalPolicy(scale_down_stabilization=0, scale_down_cooldown=0)
+    monkeypatch.setattr(resource_manager, "scaling_policy", policy)
+    return policy
+
+def test_a_prometheus_outage_does_not_scale_the_fleet_down(proportional, cluster, prometheus):
+    targets = [(namespace, name) for namespace in ("team-a", "team-b") for name in ("hot", "idle")]
+    prometheus.failure_rate = 1.0
+    for _ in range(5):
+        assert reconcile(targets) == {("team-a", "hot"): 2, ("team-a", "idle"): 3, ("team-b", "hot"): 2, ("team-b", "idle"): 3}
+    assert "patch_namespaced_deployment_scale" not in cluster.calls
+    # Nothing from the outage is in the history the policy smooths over
+    assert all(len(state.raw) == 0 for state in proportional._states.values())
+
+def test_the_proportional_policy_resumes_after_an_outage(proportional):
+    assert proportional.desired_replicas("team-a/api", 4, 0.75, 0.3, now=0) == 4
+    assert proportional.desired_replicas("team-a/api", 4, None, 0.3, now=60) == 4
+    assert proportional.desired_replicas("team-a/api", 4, 0.75, None, now=120) == 4
+    assert len(proportional._states["team-a/api"].raw) == 1
+    # Load doubles once data is back, and the outage did not dilute it
+    assert proportional.desired_replicas("team-a/api", 4, 1.5, 0.3, now=180) == 6
@@ -0,0 +1,117 @@
+import random
+
+import pytest
+
+from monitoring.slo import RollingWindow, SLOEngine, SLOTracker
+
+START = 1_700_000_000  # A Unix timestamp on a bucket boundary of every window
+
+def test_samples_roll_over_into_new_buckets():
+    window = RollingWindow(60, 10)
+    window.add(START + 5)
+    window.add(START + 15, bad=True)
+    window.add(START + 55)
+    assert (window.total, window.bad) == (3, 1)
+    # Six buckets later the first one has left the window
+    window.advance(START + 65)
+    assert (window.total, window.bad) == (2, 1)
+    window.advance(START + 75)
+    assert (window.total, window.bad) == (1, 0)
+
+def test_samples_expire_after_a_gap_longer_than_the_window():
+    window = RollingWindow(60, 10)
+    for offset in range(0, 60, 5):
+        window.add(START + offset, bad=offset % 10 == 0)
+    assert (window.total, window.bad) == (12, 6)
+    assert window.error_rate(START + 1000) == 0.0
+    assert (window.total, window.bad) == (0, 0)
+
+def test_late_samples_count_only_while_inside_the_window():
+    window = RollingWindow(60, 10)
+    window.add(START + 65)
+    window.add(START + 5, bad=True)  # Its bucket has already left the window
+    window.add(START + 15, bad=True)
+    assert (window.total, window.bad) == (2, 1)
+
+def test_random_streams_match_a_brute_force_count():
+    rng = random.Random(7)
+    for _ in range(30):
+        length, bucket = rng.choice(((300, 10), (3600, 60), (86400, 3600)))
+        window = RollingWindow(length, bucket)
+        size = length // bucket
+        history = []
+        now = START + rng.uniform(0, bucket)
+        for _ in range(200):
+            now += rng.choice((0, rng.uniform(0, bucket), rng.uniform(0, length / 4), rng.uniform(length, 2 * length)))
+            # Every so often a sample arrives late, stamped somewhere in the last window and a half
+            timestamp = now - rng.uniform(0, 1.5 * length) if rng.random() < 0.1 else now
+            bad = rng.random() < 0.3
+            window.add(timestamp, bad)
+            history.append((int(timestamp // bucket), bad))
+            head = max(number for number, _ in history)
+            inside = [bad for number, bad in history if head - size < number <= head]
+            assert (window.total, window.bad) == (len(inside), sum(inside))
+
+def record(tracker, failures, total, start=START, every=60):
+    """Record `total` checks `every` seconds apart, the first `failures` of them failed."""
+    for i in range(total):
+        tracker.record(i >= failures, start + i * every)
+    return start + (total - 1) * every
+
+def test_error_budget():
+    tracker = SLOTracker(objective=0.99)
+    now = record(tracker, 5, 1000)
+    assert tracker.availability("30d", now) == pytest.approx(0.995)
+    assert tracker.burn_rate("30d", now) == pytest.approx(0.5)
+    assert tracker.budget_remaining(now) == pytest.approx(0.5)
+    now = record(tracker, 20, 1000, start=now + 60)
+    # 25 of 2000 checks failed against 20 allowed
+    assert tracker.budget_remaining(now) == pytest.approx(1 - 25 / 20)
+
+def test_burn_rate_per_window():
+    tracker = SLOTracker(objective=0.99)
+    # Ten failed checks a minute apart, then fifty healthy ones
+    now = record(tracker, 10, 60)
+    assert tracker.burn_rate("1h", now) == pytest.approx(10 / 60 / 0.01)
+    assert tracker.burn_rate("5m", now) == 0.0
+    assert tracker.burn_rate("30d", now) == pytest.approx(10 / 60 / 0.01)
+    # An hour later the short windows have forgotten them, the budget window has not
+    assert tracker.burn_rate("1h", now + 3600) == 0.0
+    assert tracker.burn_rate("30d", now + 3600) == pytest.approx(10 / 60 / 0.01)
+
+def test_a_zero_error_objective_burns_infinitely_on_any_failure():
+    tracker = SLOTracker(objective=1.0)
+    tracker.record(True, START)
+    assert tracker.burn_rate("5m", START) == 0.0
+    tracker.record(False, START + 1)
+    assert tracker.burn_rate("5m", START + 1) == float("inf")
+
+@pytest.fixture
+def engine():
+    engine = SLOEngine(objective=0.99)
+    engine.alerts = []
+    engine.notify = lambda deployment_name, message: engine.alerts.append((deployment_name, message))
+    return engine
+
+def replay(engine, healthy, minutes, start=START):
+    """Record one check a minute; `healthy(minute)` decides each result. Returns the minutes that alerted."""
+    return [minute for minute in range(minutes) if engine.record("web", healthy(minute), start + minute * 60)]
+
+def test_one_failed_check_does_not_alert(engine):
+    replay(engine, lambda minute: minute != 0, 1)
+    replay(engine, lambda minute: minute != 90, 180, start=START + 60)
+    assert engine.alerts == []
+    assert engine.firing("web") == ()
+
+def test_a_sustained_outage_pages_once(engine):
+    outage = 120
+    alerted = replay(engine, lambda minute: minute < outage, outage + 30)
+    assert [message.split(")")[0] for _, message in engine.alerts] == ["ALERT (page"]
+    assert len(alerted) == 1 and 0 < alerted[0] - outage <= 15
+    assert "page" in engine.firing("web")
+
+def test_a_slow_burn_opens_a_ticket_without_paging(engine):
+    # 3% of checks failing for a day: three times the allowed rate, far from a page
+    replay(engine, lambda minute: minute % 33 != 0, 24 * 60)
+    assert [message.split(")")[0] for _, message in engine.alerts] == ["ALERT (ticket"]
+    assert engine.snapshot(START + 24 * 3600)["web"]["budget_remaining"] < 0
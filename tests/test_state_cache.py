@@ -0,0 +1,191 @@
+import random
+import time
+
+import pytest
+
+import docker_dep.docker_manager as docker_manager
+from docker_dep.state_cache import ContainerState, StateCache
+
+TEAMS = ("payments", "search")
+
+def wait_for(condition, timeout=2):
+    """Poll until the events thread has caught up with `condition`."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "the state cache did not catch up"
+        time.sleep(0.01)
+
+def in_sync(docker, cache):
+    actual = {container.id: (container.name, container.status) for container in docker.containers.containers.values()}
+    return actual == {state.id: (state.name, state.status) for state in cache.find_containers()}
+
+@pytest.fixture
+def fleet(docker):
+    for i in range(6):
+        docker.containers.add(f"service-{i}", status="running" if i % 3 else "exited",
+                              labels={"team": TEAMS[i % 2], "app": f"service-{i}"})
+    return docker
+
+@pytest.fixture
+def cache(fleet):
+    cache = StateCache(fleet)
+    cache.start()
+    yield cache
+    cache.stop()
+
+def replay_events(docker, rng, count):
+    """Create, start, stop and remove containers the way other clients of the daemon would."""
+    collection = docker.containers
+    for i in range(count):
+        action = rng.choice(("create", "start", "die", "destroy"))
+        if action == "create" or not collection.containers:
+            collection.add(f"job-{i}", labels={"team": rng.choice(TEAMS), "app": "job"})
+            continue
+        container = collection.containers[rng.choice(sorted(collection.containers))]
+        if action == "destroy":
+            del collection.containers[container.name]
+        else:
+            container.status = "running" if action == "start" else "exited"
+        container._emit(action)
+
+def test_lookups_after_one_list(fleet, cache):
+    assert dict(fleet.calls) == {"containers.list": 1, "images.list": 1, "events": 1}
+    service = fleet.containers.containers["service-1"]
+    assert cache.get_container("service-1") == ContainerState(service.id, "service-1", service.image, "running",
+                                                              {"team": "search", "app": "service-1"})
+    assert cache.get_container(service.id).name == "service-1"
+    assert cache.get_container("missing") is None
+    assert {state.name for state in cache.find_containers(labels=["team=payments"])} == {"service-0", "service-2", "service-4"}
+    assert {state.name for state in cache.find_containers(status="exited")} == {"service-0", "service-3"}
+    assert {state.name for state in cache.find_containers(labels=["team=search", "app"], status="running")} == {"service-1", "service-5"}
+    assert len(cache.find_containers()) == 6
+    assert cache.find_containers(labels=["team=nobody"]) == []
+    # None of these reached the daemon
+    assert fleet.total_calls == 3
+
+def test_a_synthetic_event_stream_keeps_the_cache_current(fleet, cache):
+    replay_events(fleet, random.Random(1), 200)
+    wait_for(lambda: in_sync(fleet, cache))
+    assert cache.stats["lists"] == 1
+    assert fleet.total_calls == 3
+
+def test_renames_move_the_name_index(fleet, cache):
+    service = fleet.containers.containers["service-1"]
+    fleet.emit("container", "rename", service.id, {"name": "api", "oldName": "/service-1"})
+    wait_for(lambda: cache.get_container("api") is not None)
+    assert cache.get_container("service-1") is None
+    assert cache.get_container("api").labels == {"team": "search", "app": "service-1"}
+
+def test_listeners_see_every_change(fleet, cache):
+    changes = []
+    cache.add_listener(lambda old, new: changes.append((old and old.status, new and new.status)))
+    container = fleet.containers.add("job", status="created")
+    container.start()
+    container.stop(timeout=0)
+    container.remove()
+    wait_for(lambda: len(changes) == 4)
+    assert changes == [(None, "created"), ("created", "running"), ("running", "exited"), ("exited", None)]
+
+def test_a_failing_listener_does_not_stop_the_others(fleet, cache, capsys):
+    seen = []
+    cache.add_listener(lambda old, new: 1 / 0)
+    cache.add_listener(lambda old, new: seen.append(new.name))
+    fleet.containers.add("job")
+    wait_for(lambda: seen == ["job", "job"])
+    assert "Error in container state listener" in capsys.readouterr().out
+
+def test_changes_missed_while_the_stream_was_down_are_reported(fleet, cache):
+    changes = []
+    cache.add_listener(lambda old, new: changes.append((old and old.name, new and new.status)))
+    # Changed without an event, as if it happened while the stream was broken
+    fleet.containers.containers["service-0"].status = "running"
+    cache._stream.close()
+    wait_for(lambda: cache.stats["lists"] == 2)
+    assert changes == [("service-0", "running")]
+    assert cache.get_container("service-0").status == "running"
+    wait_for(lambda: cache.stats["streams"] == 2)
+
+def test_images_are_inspected_once_per_tag_change(docker):
+    docker.images.add("api:latest", labels={"context-hash": "1"})
+    cache = StateCache(docker)
+    cache.start()
+    try:
+        assert cache.get_image("api").labels == {"context-hash": "1"}
+        assert cache.stats["image_inspects"] == 0
+        # A rebuild tags a new image; its labels are read on the next lookup, once
+        docker.images.add("api:latest", labels={"context-hash": "2"}, layers=["sha256:rebuilt"])
+        wait_for(lambda: cache.stats["events"] == 1)
+        assert cache.get_image("api:latest").labels == {"context-hash": "2"}
+        assert cache.get_image("api:latest").labels == {"context-hash": "2"}
+        assert cache.stats["image_inspects"] == 1
+        assert cache.get_image("missing:latest") is None
+    finally:
+        cache.stop()
+
+def lookups(docker, rounds, rng):
+    """Rounds of dashboard lookups by name, label and status, with other clients changing containers in between."""
+    for _ in range(rounds):
+        for name in sorted(docker.containers.containers):
+            docker_manager.container_status(name)
+        for team in TEAMS:
+            docker_manager.select_containers(labels={"team": team}, status="running")
+        replay_events(docker, rng, 20)
+        if docker_manager.USE_STATE_CACHE:
+            wait_for(lambda: in_sync(docker, docker_manager.get_state_cache()))
+
+@pytest.mark.parametrize("rounds", [1, 10])
+def test_daemon_calls_saved(fleet, monkeypatch, rounds):
+    monkeypatch.setattr(docker_manager, "USE_STATE_CACHE", False)
+    lookups(fleet, rounds, random.Random(2))
+    direct = fleet.total_calls
+
+    fleet.calls.clear()
+    monkeypatch.setattr(docker_manager, "USE_STATE_CACHE", True)
+    lookups(fleet, rounds, random.Random(2))
+    # One list of containers and images and one events stream, however many lookups follow
+    assert fleet.total_calls == 3
+    assert direct >= rounds * (6 + len(TEAMS))
+
+def test_results_match_direct_lookups(fleet, monkeypatch):
+    replay_events(fleet, random.Random(3), 30)
+    results = {}
+    for use_cache in (False, True):
+        monkeypatch.setattr(docker_manager, "USE_STATE_CACHE", use_cache)
+        if use_cache:
+            wait_for(lambda: in_sync(fleet, docker_manager.get_state_cache()))
+        results[use_cache] = (
+            {name: docker_manager.container_status(name) for name in list(fleet.containers.containers) + ["missing"]},
+            {team: sorted(c.name for c in docker_manager.select_containers(labels={"team": team}, status="running"))
+             for team in TEAMS},
+            sorted(c.name for c in docker_manager.select_containers(pattern="service-*", labels=["app"])),
+        )
+    assert results[True] == results[False]
+
+def test_one_shot_commands_ask_the_daemon_directly(fleet, monkeypatch):
+    monkeypatch.setattr(docker_manager, "USE_STATE_CACHE", False)
+    docker_manager.stop_container("service-1", timeout=0)
+    assert dict(fleet.calls) == {"containers.get": 1, "stop": 1}
+    assert docker_manager._state_cache is None
+
+def test_enable_state_cache_serves_lookups_from_the_cache(fleet, monkeypatch):
+    monkeypatch.setattr(docker_manager, "DOCKER_STATE_CACHE", "")
+    monkeypatch.setattr(docker_manager, "USE_STATE_CACHE", False)
+    docker_manager.enable_state_cache()
+    for _ in range(3):
+        assert docker_manager.container_status("service-1") == "running"
+    assert dict(fleet.calls) == {"containers.list": 1, "images.list": 1, "events": 1}
+
+def test_docker_state_cache_0_overrides_enable_state_cache(fleet, monkeypatch):
+    monkeypatch.setattr(docker_manager, "DOCKER_STATE_CACHE", "0")
+    monkeypatch.setattr(docker_manager, "USE_STATE_CACHE", False)
+    docker_manager.enable_state_cache()
+    assert docker_manager.USE_STATE_CACHE is False
+
+def test_watching_containers_enables_the_cache(fleet, monkeypatch):
+    monkeypatch.setattr(docker_manager, "DOCKER_STATE_CACHE", "")
+    monkeypatch.setattr(docker_manager, "USE_STATE_CACHE", False)
+    changes = []
+    docker_manager.on_container_change(lambda old, new: changes.append(new and new.status))
+    assert docker_manager.USE_STATE_CACHE is True
+    fleet.containers.containers["service-1"].stop(timeout=0)
+    wait_for(lambda: changes == ["exited"])